@@ -0,0 +1,247 @@
+"""
+Headless batch export for the Arctic Expedition Planner.
+Finds itinerary files, skips those whose content (and export options) have not changed
+since the last run, exports the rest to JSON summaries and/or PDFs on a process pool,
+and prints a machine-readable JSON report.
+
+Usage:
+    python -m src.batch plans/ extra_plan.json --output-dir exports --formats json,pdf
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from src.binary_format import BINARY_EXTENSION, read_binary
+from src.export import export_to_json, export_to_pdf
+from src.itinerary_io import NDJSON_EXTENSIONS, load_itinerary
+from src.simplify import METHODS, RDP, simplify_itinerary
+from src.stats import DEFAULT_MAX_HOURS_PER_DAY
+from src.track_import import TRACK_EXTENSIONS, is_track_file, load_track
+from src.travel_time import FLAT, SPEED_MODELS, get_speed_model
+
+INPUT_EXTENSIONS = (".json",) + NDJSON_EXTENSIONS + (BINARY_EXTENSION,) + TRACK_EXTENSIONS
+OUTPUT_SUFFIXES = {"json": ".summary.json", "pdf": ".pdf"}
+MANIFEST_NAME = ".aep_batch_manifest.json"
+BATCH_VERSION = 1  # Bump when output changes, so every input is re-exported once
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def job_hash(path, formats, max_hours_per_day, simplify_m=None, simplify_method=RDP, speed_model=FLAT):
+    """Content hash of an input combined with everything else that shapes its outputs."""
+    options = {"version": BATCH_VERSION, "formats": sorted(formats), "max_hours_per_day": max_hours_per_day}
+    if simplify_m is not None:
+        options["simplify"] = [simplify_m, simplify_method]
+    if speed_model != FLAT:
+        options["speed_model"] = speed_model
+    options = json.dumps(options, sort_keys=True)
+    return hashlib.sha256((file_digest(path) + options).encode()).hexdigest()
+
+
+def find_inputs(paths, output_dir):
+    """
+    Expand files and directories into (input path, output stem) pairs, sorted per directory.
+    Files inside a directory keep their relative path in the output stem, and a file named more
+    than once is listed once. Stems that would still clash (a.json next to a.gpx, or plans of the
+    same name from different places) keep their input's extension, then get a numeric suffix.
+    """
+    output_dir = os.path.abspath(output_dir)
+    found = []
+    seen = set()
+
+    def add(full, name):
+        key = os.path.normcase(os.path.abspath(full))
+        if key not in seen:
+            seen.add(key)
+            found.append((full, name))
+
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted(d for d in dirnames
+                                     if os.path.abspath(os.path.join(dirpath, d)) != output_dir)
+                for name in sorted(filenames):
+                    # Hidden files (such as the manifest) and earlier summaries are not inputs
+                    if (name.lower().endswith(INPUT_EXTENSIONS) and not name.startswith(".")
+                            and not name.endswith(OUTPUT_SUFFIXES["json"])):
+                        full = os.path.join(dirpath, name)
+                        add(full, os.path.relpath(full, path))
+        else:
+            add(path, os.path.basename(path))
+    return _unique_stems(found)
+
+
+def _unique_stems(found):
+    """(path, stem) pairs for (path, name) pairs, disambiguating stems shared by several names."""
+    def stem_key(name):
+        return os.path.normcase(os.path.splitext(name)[0])
+
+    clashes = Counter(stem_key(name) for _, name in found)
+    used = {stem_key(name) for _, name in found if clashes[stem_key(name)] == 1}
+    unique = []
+    for path, name in found:
+        stem = os.path.splitext(name)[0]
+        if clashes[stem_key(name)] > 1:
+            stem, candidate, suffix = name, name, 1
+            while os.path.normcase(candidate) in used:
+                suffix += 1
+                candidate = f"{stem}-{suffix}"
+            stem = candidate
+            used.add(os.path.normcase(stem))
+        unique.append((path, stem))
+    return unique
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def process_itinerary(path, outputs, max_hours_per_day, simplify_m=None, simplify_method=RDP, speed_model=FLAT):
+    """
+    Load one itinerary, optionally simplify it to within simplify_m metres, and write its outputs
+    with travel times from the named speed model. Runs in a worker process.
+    """
+    started = time.perf_counter()
+    if path.lower().endswith(BINARY_EXTENSION):
+        itinerary = read_binary(path, columnar=False)
+    elif is_track_file(path):
+        itinerary = load_track(path, columnar=True)  # Recorded tracks can run to millions of points
+    else:
+        itinerary = load_itinerary(path)
+    simplified = None
+    if simplify_m is not None:
+        simplified = simplify_itinerary(itinerary, tolerance_m=simplify_m, method=simplify_method)
+        itinerary = simplified.itinerary
+    if speed_model != FLAT:
+        itinerary.set_speed_model(get_speed_model(speed_model))
+
+    for kind, target in outputs.items():
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        if kind == "json":
+            export_to_json(itinerary, target, max_hours_per_day=max_hours_per_day)
+        else:
+            export_to_pdf(itinerary, target, max_hours_per_day=max_hours_per_day)
+
+    stats = itinerary.stats()
+    result = {
+        "waypoints": len(itinerary.waypoints),
+        "total_distance_km": round(stats.total_distance(), 2),
+        "estimated_time_hours": round(stats.total_time(), 2),
+        "days": len(stats.daily_stages(max_hours_per_day))
+    }
+    if simplified is not None:
+        result["simplification"] = simplified.to_dict()
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def run_batch(paths, output_dir, formats=("json", "pdf"), workers=None,
+              max_hours_per_day=DEFAULT_MAX_HOURS_PER_DAY, force=False, simplify_m=None, simplify_method=RDP,
+              speed_model=FLAT):
+    """
+    Export every itinerary under paths into output_dir and return the run report as a dict.
+    With simplify_m, routes are simplified to within that many metres before export;
+    speed_model names the travel-time model (see travel_time.py).
+    """
+    get_speed_model(speed_model)  # Reject unknown names before any work starts
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    results = []
+    pending = []
+
+    for path, stem in find_inputs(paths, output_dir):
+        key = os.path.abspath(path)
+        outputs = {kind: os.path.join(output_dir, stem + OUTPUT_SUFFIXES[kind]) for kind in formats}
+        result = {"input": path, "status": None, "outputs": outputs}
+        results.append(result)
+        try:
+            result["hash"] = job_hash(path, formats, max_hours_per_day, simplify_m, simplify_method, speed_model)
+        except OSError as e:
+            result.update(status="failed", error=str(e))
+            continue
+        previous = manifest.get(key)
+        if (not force and previous and previous["hash"] == result["hash"]
+                and all(os.path.exists(target) for target in result["outputs"].values())):
+            result["status"] = "skipped"
+        else:
+            pending.append(result)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(result, pool.submit(process_itinerary, result["input"], result["outputs"],
+                                            max_hours_per_day, simplify_m, simplify_method, speed_model))
+                       for result in pending]
+            for result, future in futures:
+                try:
+                    result.update(future.result(), status="processed")
+                    manifest[os.path.abspath(result["input"])] = {"hash": result["hash"],
+                                                                  "outputs": result["outputs"]}
+                except Exception as e:
+                    result.update(status="failed", error=f"{type(e).__name__}: {e}")
+        save_manifest(output_dir, manifest)
+
+    counts = {status: sum(1 for r in results if r["status"] == status)
+              for status in ("processed", "skipped", "failed")}
+    return dict(counts, total=len(results), elapsed_seconds=round(time.perf_counter() - started, 4),
+                results=results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export itinerary files to JSON summaries and PDFs.")
+    parser.add_argument("inputs", nargs="+", help="Itinerary files or directories to scan")
+    parser.add_argument("-o", "--output-dir", default="exports", help="Where outputs and the manifest go")
+    parser.add_argument("--formats", default="json,pdf", help="Comma-separated list of: json, pdf")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--max-hours-per-day", type=float, default=DEFAULT_MAX_HOURS_PER_DAY,
+                        help="Travel hours per day used to split stages")
+    parser.add_argument("--simplify", type=float, metavar="METRES",
+                        help="Simplify routes to within this many metres before export")
+    parser.add_argument("--simplify-method", choices=METHODS, default=RDP, help="Simplification algorithm")
+    parser.add_argument("--speed-model", choices=SPEED_MODELS, default=FLAT,
+                        help="Travel-time model: flat distance/speed, or slope-adjusted for foot, ski or sled")
+    parser.add_argument("--force", action="store_true", help="Re-export inputs even if unchanged")
+    parser.add_argument("--report", help="Also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = set(formats) - set(OUTPUT_SUFFIXES)
+    if unknown or not formats:
+        parser.error(f"unknown format(s): {', '.join(sorted(unknown)) or 'none given'}")
+
+    report = run_batch(args.inputs, args.output_dir, formats, args.workers, args.max_hours_per_day, args.force,
+                       args.simplify, args.simplify_method, args.speed_model)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(text)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
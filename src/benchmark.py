@@ -0,0 +1,430 @@
+"""
+Reproducible performance benchmarks for the Arctic Expedition Planner.
+Runs the hot paths (distances, totals, exports, preview maps, bulk elevation) on seeded synthetic
+Arctic itineraries of 10 to 1M waypoints and records throughput, latency percentiles and peak
+memory. Results are saved as JSON baselines and a later run can be compared against one,
+flagging regressions beyond a threshold. Everything runs offline: elevation lookups are stubbed
+and any network connection attempt fails.
+
+Usage:
+    python -m src.benchmark --output baseline.json
+    python -m src.benchmark --compare baseline.json --threshold 0.2
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from unittest import mock
+
+import numpy as np
+
+from src import elevation
+from src.distance import AdaptiveEngine, synthetic_track
+from src.elevation import ElevationService
+from src.elevation_profile import densify_legs
+from src.export import export_to_json, export_to_pdf
+from src.planner import ColumnarItinerary, Itinerary, Waypoint
+from src.preview import render_preview_map
+from src.travel_time import TerrainModel, leg_climbs
+from src.utils import haversine_distance, haversine_distances
+
+BENCHMARK_VERSION = 1  # Bump when cases or fixtures change, so old baselines are not compared
+DEFAULT_SIZES = (10, 1_000, 100_000, 1_000_000)
+DEFAULT_SEED = 0
+DEFAULT_THRESHOLD = 0.2     # Relative slow-down (or memory growth) reported as a regression
+MIN_SAMPLES = 5
+MIN_TIME_S = 1.0            # Keep sampling until both MIN_SAMPLES and MIN_TIME_S are reached...
+MAX_TIME_S = 30.0           # ...but stop after this long, keeping at least one sample
+MAX_SAMPLES = 1000
+ITINERARY_LEGS_M = (200.0, 20e3)  # Camp-to-camp and GPS-logged legs of a sledge expedition
+
+
+@dataclass
+class Case:
+    """
+    One benchmarked operation. setup(fixture, workdir) returns the zero-argument callable that is
+    timed; sizes above max_size are skipped unless the run asks for every size.
+    """
+    name: str
+    setup: object
+    max_size: int = DEFAULT_SIZES[-1]
+
+
+@dataclass
+class Comparison:
+    """A metric of one case and size in a baseline and the current run."""
+    case: str
+    waypoints: int
+    metric: str
+    baseline: float
+    current: float
+    change: float
+    regression: bool
+
+    def to_dict(self):
+        return {"case": self.case, "waypoints": self.waypoints, "metric": self.metric,
+                "baseline": self.baseline, "current": self.current,
+                "change": round(self.change, 4), "regression": self.regression}
+
+
+class Fixture:
+    """Seeded synthetic itinerary of a given size, built lazily in list and columnar form."""
+    def __init__(self, size, seed=DEFAULT_SEED):
+        self.size = size
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.latitudes, self.longitudes = synthetic_track(size, *ITINERARY_LEGS_M, seed=seed)
+        self.speeds = np.round(rng.uniform(2.0, 6.0, size), 1)
+        self.altitudes = rng.integers(0, 2500, size).astype(np.int32)
+        self.names = [f"Camp {i + 1}" for i in range(size)]
+        self._itinerary = None
+        self._columnar = None
+
+    @property
+    def itinerary(self):
+        """List-backed Itinerary of Waypoint objects, as built by the GUI."""
+        if self._itinerary is None:
+            distances = haversine_distances(self.latitudes, self.longitudes).tolist()
+            self._itinerary = Itinerary([
+                Waypoint(name, lat, lon, distance, speed, altitude)
+                for name, lat, lon, distance, speed, altitude in zip(
+                    self.names, self.latitudes.tolist(), self.longitudes.tolist(), distances,
+                    self.speeds.tolist(), self.altitudes.tolist())])
+        return self._itinerary
+
+    @property
+    def columnar(self):
+        """ColumnarItinerary over the same data, as used for long tracks."""
+        if self._columnar is None:
+            self._columnar = ColumnarItinerary.from_arrays(self.latitudes, self.longitudes, speeds=self.speeds,
+                                                           altitudes=self.altitudes, names=self.names)
+        return self._columnar
+
+
+def stub_elevation(lat, lon):
+    """Deterministic stand-in terrain, in metres, for offline elevation lookups."""
+    return round(abs(math.sin(math.radians(lat * 7)) * math.cos(math.radians(lon * 5))) * 2000.0, 1)
+
+
+def _stub_fetch_batch(self, batch):
+    self.requests_made += 1
+    return True, [stub_elevation(lat, lon) for lat, lon in batch]
+
+
+def _stub_fetch_elevation(lat, lon, *args, **kwargs):
+    return stub_elevation(lat, lon)
+
+
+def _refuse_connection(*args, **kwargs):
+    raise OSError("network access is disabled while benchmarking")
+
+
+@contextmanager
+def offline():
+    """Stub every elevation lookup and make any attempt to open a network connection fail."""
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(ElevationService, "_fetch_batch", _stub_fetch_batch))
+        stack.enter_context(mock.patch.object(elevation, "fetch_elevation", _stub_fetch_elevation))
+        stack.enter_context(mock.patch.object(socket, "create_connection", _refuse_connection))
+        stack.enter_context(mock.patch.object(socket.socket, "connect", _refuse_connection))
+        stack.enter_context(mock.patch.object(socket.socket, "connect_ex", _refuse_connection))
+        yield
+
+
+def _scalar_haversine(fixture, workdir):
+    coords = list(zip(fixture.latitudes.tolist(), fixture.longitudes.tolist()))
+
+    def run():
+        for (lat1, lon1), (lat2, lon2) in zip(coords, coords[1:]):
+            haversine_distance(lat1, lon1, lat2, lon2)
+    return run
+
+
+def _vectorized_haversine(fixture, workdir):
+    return lambda: haversine_distances(fixture.latitudes, fixture.longitudes)
+
+
+def _adaptive_legs(fixture, workdir):
+    engine = AdaptiveEngine()
+    return lambda: engine.legs(fixture.latitudes, fixture.longitudes)
+
+
+def _total_distance(fixture, workdir):
+    return fixture.itinerary.total_distance
+
+
+def _estimated_time(fixture, workdir):
+    return fixture.itinerary.estimated_time
+
+
+def _terrain_leg_hours(fixture, workdir):
+    model = TerrainModel("ski")
+    distances = haversine_distances(fixture.latitudes, fixture.longitudes)
+    climbs = leg_climbs(fixture.altitudes)
+    return lambda: model.leg_hours(distances, fixture.speeds, climbs)
+
+
+def _recalculate_distances(fixture, workdir):
+    return fixture.itinerary.recalculate_distances
+
+
+def _columnar_total_distance(fixture, workdir):
+    return fixture.columnar.total_distance
+
+
+def _daily_stages(fixture, workdir):
+    itinerary = fixture.columnar
+
+    def run():
+        itinerary.reset_running_totals()
+        itinerary.stats().daily_stages()
+    return run
+
+
+def _export_json(fixture, workdir):
+    path = os.path.join(workdir, "itinerary.json")
+    return lambda: export_to_json(fixture.itinerary, path)
+
+
+def _export_pdf(fixture, workdir):
+    path = os.path.join(workdir, "itinerary.pdf")
+    return lambda: export_to_pdf(fixture.itinerary, path)
+
+
+def _preview_map(fixture, workdir):
+    """Render into a fresh cache directory each time, so the cached map is never reused."""
+    def run():
+        render_preview_map(fixture.names, fixture.latitudes, fixture.longitudes,
+                           cache_dir=tempfile.mkdtemp(dir=workdir))
+    return run
+
+
+def _densify_legs(fixture, workdir):
+    return lambda: densify_legs(fixture.latitudes, fixture.longitudes)
+
+
+def _elevate_itinerary(fixture, workdir):
+    service = ElevationService(use_cache=False, min_interval=0.0)
+    return lambda: service.elevate_itinerary(fixture.columnar)
+
+
+CASES = [
+    Case("utils.haversine_distance", _scalar_haversine),
+    Case("utils.haversine_distances", _vectorized_haversine),
+    Case("distance.AdaptiveEngine.legs", _adaptive_legs),
+    Case("Itinerary.total_distance", _total_distance),
+    Case("Itinerary.estimated_time", _estimated_time),
+    Case("Itinerary.recalculate_distances", _recalculate_distances),
+    Case("travel_time.TerrainModel.leg_hours", _terrain_leg_hours),
+    Case("ColumnarItinerary.total_distance", _columnar_total_distance),
+    Case("stats.daily_stages", _daily_stages),
+    Case("export.export_to_json", _export_json, max_size=100_000),
+    Case("export.export_to_pdf", _export_pdf, max_size=100_000),
+    Case("preview.render_preview_map", _preview_map, max_size=100_000),
+    Case("ElevationService.elevate_itinerary", _elevate_itinerary, max_size=100_000),
+    Case("elevation_profile.densify_legs", _densify_legs, max_size=100_000),
+]
+
+
+def measure(fn, size, min_samples=MIN_SAMPLES, min_time_s=MIN_TIME_S, max_time_s=MAX_TIME_S):
+    """
+    Time fn: one warm-up call under tracemalloc for the peak memory, then repeated timed calls.
+    Returns the latency percentiles in seconds, waypoints per second and peak bytes allocated.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < MAX_SAMPLES:
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+        if elapsed >= max_time_s or (len(samples) >= min_samples and elapsed >= min_time_s):
+            break
+
+    samples = np.array(samples)
+    p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+    return {
+        "samples": len(samples),
+        "min_s": float(samples.min()),
+        "mean_s": float(samples.mean()),
+        "p50_s": float(p50),
+        "p90_s": float(p90),
+        "p99_s": float(p99),
+        "waypoints_per_s": size / p50 if p50 > 0 else math.inf,
+        "peak_memory_bytes": int(peak),
+    }
+
+
+def select_cases(names=None):
+    """The cases whose names contain any of the given substrings (all cases by default)."""
+    if not names:
+        return list(CASES)
+    selected = [case for case in CASES if any(name in case.name for name in names)]
+    if not selected:
+        raise ValueError(f"no benchmark matches {', '.join(names)}")
+    return selected
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, cases=None, seed=DEFAULT_SEED, all_sizes=False,
+                   min_samples=MIN_SAMPLES, min_time_s=MIN_TIME_S, max_time_s=MAX_TIME_S, report=None):
+    """
+    Run the cases at every size, offline and in a scratch directory that is removed afterwards.
+    report, if given, is called with each result dict as it completes. Returns the results document.
+    """
+    cases = CASES if cases is None else cases
+    results = []
+    workdir = tempfile.mkdtemp(prefix="aep_benchmark_")
+    try:
+        with offline():
+            for size in sizes:
+                fixture = Fixture(size, seed)
+                for case in cases:
+                    if size > case.max_size and not all_sizes:
+                        continue
+                    result = {"case": case.name, "waypoints": size,
+                              **measure(case.setup(fixture, workdir), size, min_samples, min_time_s, max_time_s)}
+                    results.append(result)
+                    if report is not None:
+                        report(result)
+                del fixture
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "version": BENCHMARK_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "seed": seed,
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "platform": platform.platform(), "processor": platform.machine()},
+        "results": results,
+    }
+
+
+def save_results(document, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    if document.get("version") != BENCHMARK_VERSION:
+        raise ValueError(f"{path} was recorded by benchmark version {document.get('version')}, "
+                         f"not {BENCHMARK_VERSION}")
+    return document
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, metrics=("p50_s", "peak_memory_bytes")):
+    """
+    Compare the cases and sizes present in both result documents. A metric regresses when it grew
+    by more than threshold (0.2 = 20%) relative to the baseline.
+    """
+    previous = {(r["case"], r["waypoints"]): r for r in baseline["results"]}
+    comparisons = []
+    for result in current["results"]:
+        old = previous.get((result["case"], result["waypoints"]))
+        if old is None:
+            continue
+        for metric in metrics:
+            before, after = old[metric], result[metric]
+            change = (after - before) / before if before > 0 else (math.inf if after > 0 else 0.0)
+            comparisons.append(Comparison(result["case"], result["waypoints"], metric,
+                                          before, after, change, change > threshold))
+    return comparisons
+
+
+def format_size(size):
+    for factor, suffix in ((1_000_000, "M"), (1_000, "k")):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{suffix}"
+    return str(size)
+
+
+def parse_sizes(text):
+    """Parse a comma-separated list of sizes such as "10,1k,100k,1M"."""
+    sizes = []
+    for part in text.split(","):
+        part = part.strip()
+        factor = {"k": 1_000, "m": 1_000_000}.get(part[-1:].lower(), 1)
+        try:
+            size = int(part[:-1] if factor > 1 else part) * factor
+        except ValueError:
+            raise ValueError(f"invalid size: {part!r}") from None
+        if size < 2:
+            raise ValueError("itineraries need at least 2 waypoints")
+        sizes.append(size)
+    return sizes
+
+
+def print_result(result):
+    print(f"{result['case']:<38}{format_size(result['waypoints']):>6}{result['samples']:>6}"
+          f"{result['p50_s'] * 1000:>12.3f}{result['p90_s'] * 1000:>12.3f}{result['p99_s'] * 1000:>12.3f}"
+          f"{result['waypoints_per_s']:>16,.0f}{result['peak_memory_bytes'] / 2**20:>12.1f}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the planner on synthetic Arctic itineraries.")
+    parser.add_argument("--sizes", type=parse_sizes, default=list(DEFAULT_SIZES),
+                        help="Comma-separated waypoint counts (default: 10,1k,100k,1M)")
+    parser.add_argument("--cases", nargs="+", metavar="NAME", help="Only run cases whose name contains NAME")
+    parser.add_argument("--all-sizes", action="store_true",
+                        help="Also run the slow cases (exports, preview map) above 100k waypoints")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", metavar="JSON", help="Save the results as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="Compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative growth in median latency or peak memory reported as a regression")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME_S, metavar="SECONDS",
+                        help="Minimum sampling time per case and size")
+    args = parser.parse_args(argv)
+
+    try:
+        cases = select_cases(args.cases)
+        baseline = load_results(args.compare) if args.compare else None
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    print(f"{'case':<38}{'size':>6}{'runs':>6}{'p50 ms':>12}{'p90 ms':>12}{'p99 ms':>12}"
+          f"{'waypoints/s':>16}{'peak MiB':>12}")
+    document = run_benchmarks(args.sizes, cases, args.seed, args.all_sizes,
+                              min_time_s=args.min_time, max_time_s=max(MAX_TIME_S, args.min_time),
+                              report=print_result)
+    if args.output:
+        save_results(document, args.output)
+        print(f"Saved results to {args.output}")
+    if baseline is None:
+        return 0
+
+    comparisons = compare(baseline, document, args.threshold)
+    regressions = [c for c in comparisons if c.regression]
+    for c in regressions:
+        print(f"REGRESSION {c.case} at {format_size(c.waypoints)}: {c.metric} "
+              f"{c.baseline:.6g} -> {c.current:.6g} ({c.change:+.0%})")
+    print(f"{len(regressions)} regression(s) in {len(comparisons)} comparisons "
+          f"(threshold {args.threshold:.0%})", file=sys.stderr if regressions else sys.stdout)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,169 @@
+"""
+Compact binary itinerary format (.aepb) for archived expedition tracks.
+
+Layout, all little-endian:
+  header    magic, format version, record size, waypoint count, total distance and time,
+            name count and the offset of the string table
+  records   one fixed-width record per waypoint (lat, lon, distance, speed, altitude, name id)
+  strings   name count + 1 uint64 offsets into a UTF-8 blob of deduplicated names
+
+Files are opened through mmap, so reading the header totals or any single waypoint
+does not depend on the size of the track.
+"""
+
+import mmap
+import struct
+
+import numpy as np
+
+from src.itinerary_io import is_ndjson, load_itinerary, write_json, write_ndjson
+from src.planner import Waypoint, Itinerary, ColumnarItinerary
+
+BINARY_EXTENSION = ".aepb"
+MAGIC = b"AEPB"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<4sHHQddQQ")
+RECORD_DTYPE = np.dtype([
+    ("latitude", "<f8"),
+    ("longitude", "<f8"),
+    ("distance_km", "<f8"),
+    ("estimated_speed_kph", "<f8"),
+    ("altitude_m", "<i4"),
+    ("name_id", "<u4"),
+])
+
+
+def write_binary(itinerary, filename):
+    """Write an Itinerary (list-backed or columnar) to a binary itinerary file."""
+    if not isinstance(itinerary, ColumnarItinerary):
+        itinerary = ColumnarItinerary.from_itinerary(itinerary)
+    count = len(itinerary)
+
+    records = np.empty(count, dtype=RECORD_DTYPE)
+    records["latitude"] = itinerary.latitudes
+    records["longitude"] = itinerary.longitudes
+    records["distance_km"] = itinerary.distances
+    records["estimated_speed_kph"] = itinerary.speeds
+    records["altitude_m"] = itinerary.altitudes
+
+    table = {}
+    records["name_id"] = np.fromiter((table.setdefault(name, len(table)) for name in itinerary.names),
+                                     dtype=np.uint32, count=count)
+    encoded = [name.encode("utf-8") for name in table]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+
+    strings_offset = HEADER.size + records.nbytes
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, RECORD_DTYPE.itemsize, count,
+                         itinerary.total_distance(), itinerary.estimated_time(), len(encoded), strings_offset)
+    with open(filename, "wb") as f:
+        f.write(header)
+        f.write(records.tobytes())
+        f.write(offsets.tobytes())
+        f.write(b"".join(encoded))
+
+
+class BinaryItinerary:
+    """
+    Read-only, memory-mapped view of a binary itinerary file.
+    Header totals are available immediately; waypoints are decoded only when accessed.
+    Use as a context manager, or call close() once the arrays it hands out are no longer needed.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_layout()
+        except Exception:
+            self._mmap.close()
+            raise
+
+    def _read_layout(self):
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"{self.filename} is too short to be a binary itinerary")
+        (magic, version, record_size, self.count, self.total_distance_km, self.total_time_hours,
+         name_count, strings_offset) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.filename} is not a binary itinerary")
+        if version != FORMAT_VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"Unsupported binary itinerary version {version} in {self.filename}")
+        self.version = version
+
+        self.records = np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=self.count, offset=HEADER.size)
+        self._offsets = np.frombuffer(self._mmap, dtype="<u8", count=name_count + 1, offset=strings_offset)
+        self._strings_start = strings_offset + self._offsets.nbytes
+        if self._strings_start + int(self._offsets[-1]) > len(self._mmap):
+            raise ValueError(f"{self.filename} is truncated")
+        self._names = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def name(self, name_id):
+        """Decode one entry of the string table (cached)."""
+        name = self._names.get(name_id)
+        if name is None:
+            start = self._strings_start + int(self._offsets[name_id])
+            end = self._strings_start + int(self._offsets[name_id + 1])
+            name = self._names[name_id] = self._mmap[start:end].decode("utf-8")
+        return name
+
+    def __getitem__(self, index):
+        """The waypoint at index, decoded straight from its record."""
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("waypoint index out of range")
+        record = self.records[index]
+        return Waypoint(self.name(int(record["name_id"])), float(record["latitude"]),
+                        float(record["longitude"]), float(record["distance_km"]),
+                        float(record["estimated_speed_kph"]), int(record["altitude_m"]))
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def to_itinerary(self, columnar=True):
+        """Load every waypoint, by default into a ColumnarItinerary built from the record columns."""
+        if not columnar:
+            itinerary = Itinerary(list(self))
+            itinerary.reset_running_totals()
+            return itinerary
+        # Columns are copied out of the mapping so the itinerary outlives this file
+        table = [self.name(i) for i in range(len(self._offsets) - 1)]
+        columns = [self.records[field].copy() for field in
+                   ("latitude", "longitude", "distance_km", "estimated_speed_kph", "altitude_m")]
+        return ColumnarItinerary.from_arrays(*columns, names=(table[i] for i in self.records["name_id"]))
+
+    def close(self):
+        self.records = None
+        self._offsets = None
+        self._mmap.close()
+
+
+def read_binary(filename, columnar=True):
+    """Load a binary itinerary file into an Itinerary."""
+    with BinaryItinerary(filename) as binary:
+        return binary.to_itinerary(columnar)
+
+
+def json_to_binary(json_filename, binary_filename):
+    """Convert a JSON or NDJSON itinerary file to the binary format."""
+    write_binary(load_itinerary(json_filename, columnar=True), binary_filename)
+
+
+def binary_to_json(binary_filename, json_filename):
+    """Convert a binary itinerary file to JSON (or NDJSON, by extension), streaming the waypoints."""
+    with BinaryItinerary(binary_filename) as binary:
+        if is_ndjson(json_filename):
+            write_ndjson(binary, json_filename)
+        else:
+            write_json(binary, json_filename)
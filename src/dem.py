@@ -0,0 +1,143 @@
+"""
+Offline elevation for the Arctic Expedition Planner.
+Reads SRTM-style .hgt terrain tiles through mmap and bilinearly interpolates
+elevations for many points at once, so planning works without connectivity.
+"""
+
+import math
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.instrumentation import traced
+
+HGT_VOID = -32768  # SRTM marker for missing samples
+
+
+def tile_name(lat_floor, lon_floor):
+    """SRTM file name for the 1x1 degree tile whose south-west corner is (lat_floor, lon_floor)."""
+    ns = "N" if lat_floor >= 0 else "S"
+    ew = "E" if lon_floor >= 0 else "W"
+    return f"{ns}{abs(lat_floor):02d}{ew}{abs(lon_floor):03d}.hgt"
+
+
+class HGTTile:
+    """
+    One 1x1 degree .hgt tile: a square grid of big-endian int16 samples, north row first,
+    with edges shared with neighbouring tiles (1201x1201 for SRTM3, 3601x3601 for SRTM1).
+    The file is memory-mapped, so only the pages that are sampled are ever read.
+    """
+    def __init__(self, path, lat_floor, lon_floor):
+        self.path = path
+        self.lat_floor = lat_floor
+        self.lon_floor = lon_floor
+
+        size = os.path.getsize(path)
+        samples = math.isqrt(size // 2)
+        if samples < 2 or samples * samples * 2 != size:
+            raise ValueError(f"{path} is not a square grid of int16 samples")
+        self.samples = samples
+
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = np.frombuffer(self._mmap, dtype=">i2").reshape(samples, samples)
+
+    def sample(self, lats, lons):
+        """Bilinear elevation in metres for points inside the tile; NaN where all neighbours are void."""
+        last = self.samples - 1
+        rows = (self.lat_floor + 1 - np.asarray(lats, dtype=np.float64)) * last
+        cols = (np.asarray(lons, dtype=np.float64) - self.lon_floor) * last
+        r0 = np.clip(np.floor(rows).astype(np.intp), 0, last - 1)
+        c0 = np.clip(np.floor(cols).astype(np.intp), 0, last - 1)
+        fr = np.clip(rows - r0, 0.0, 1.0)
+        fc = np.clip(cols - c0, 0.0, 1.0)
+
+        corners = np.stack([self.data[r0, c0], self.data[r0, c0 + 1],
+                            self.data[r0 + 1, c0], self.data[r0 + 1, c0 + 1]]).astype(np.float64)
+        weights = np.stack([(1 - fr) * (1 - fc), (1 - fr) * fc, fr * (1 - fc), fr * fc])
+
+        # Renormalize over valid corners so a single void sample does not wipe out the point
+        valid = corners != HGT_VOID
+        weights = np.where(valid, weights, 0.0)
+        total = weights.sum(axis=0)
+        values = (np.where(valid, corners, 0.0) * weights).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(total > 0, values / total, np.nan)
+
+    def close(self):
+        self.data = None
+        self._mmap.close()
+        self._file.close()
+
+
+class DEMElevationProvider:
+    """
+    Elevation provider backed by a directory of .hgt tiles.
+    Keeps at most max_open_tiles memory-mapped at once, closing the least recently used.
+    Points outside the available tiles or on voids come back as None. Safe to share between
+    threads: a tile is never evicted and closed while another thread samples it.
+    """
+    def __init__(self, tile_dir, max_open_tiles=8):
+        self.tile_dir = tile_dir
+        self.max_open_tiles = max_open_tiles
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()  # Guards the open tiles and every read from them
+
+    def _tile(self, lat_floor, lon_floor):
+        """The open tile for a corner, or None if there is no such file; call with the lock held."""
+        key = (lat_floor, lon_floor)
+        if key in self._tiles:
+            self._tiles.move_to_end(key)
+            return self._tiles[key]
+
+        path = os.path.join(self.tile_dir, tile_name(lat_floor, lon_floor))
+        tile = HGTTile(path, lat_floor, lon_floor) if os.path.exists(path) else None
+        self._tiles[key] = tile
+        while len(self._tiles) > self.max_open_tiles:
+            _, evicted = self._tiles.popitem(last=False)
+            if evicted is not None:
+                evicted.close()
+        return tile
+
+    def elevations(self, lats, lons):
+        """Vectorized lookup. Returns a float64 array with NaN where no elevation is available."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        result = np.full(lats.shape, np.nan)
+        if lats.size == 0:
+            return result
+
+        lat_floor = np.floor(lats).astype(np.int64)
+        lon_floor = np.floor(lons).astype(np.int64)
+        keys = np.stack([lat_floor, lon_floor], axis=1)
+        unique, groups = np.unique(keys, axis=0, return_inverse=True)
+        for group, (lat_key, lon_key) in enumerate(unique):
+            members = np.flatnonzero(groups.ravel() == group)
+            with self._lock:
+                tile = self._tile(int(lat_key), int(lon_key))
+                if tile is not None:
+                    result[members] = tile.sample(lats[members], lons[members])
+        return result
+
+    def lookup(self, lat, lon):
+        """Elevation in metres for a single point, or None."""
+        return self.lookup_many([(lat, lon)])[0]
+
+    @traced("dem.lookup_many", "elevation")
+    def lookup_many(self, points, progress=None):
+        """Elevations for (lat, lon) points, None where unavailable."""
+        points = np.asarray(list(points), dtype=np.float64).reshape(-1, 2)
+        values = self.elevations(points[:, 0], points[:, 1])
+        if progress is not None:
+            progress(1, 1)
+        return [None if np.isnan(v) else float(v) for v in values]
+
+    def close(self):
+        with self._lock:
+            for tile in self._tiles.values():
+                if tile is not None:
+                    tile.close()
+            self._tiles.clear()
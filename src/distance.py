@@ -0,0 +1,365 @@
+"""
+Distance engines for the Arctic Expedition Planner.
+Each engine measures legs in kilometers, one at a time with distance() or many at once with
+pairs() and legs(). The models trade accuracy for speed:
+
+- equirectangular: flat-earth fast path scaled by the WGS84 radii of curvature at the leg's
+  mid-latitude; accurate to well under a millimetre for legs of a few hundred metres.
+- haversine: the project's spherical model (mean radius 6371 km); within 0.6% of WGS84.
+- wgs84: Vincenty's inverse solution on the WGS84 ellipsoid; the reference for the others.
+- adaptive: per leg, the cheapest of the above whose error bound is within max_error_m.
+
+Run ``python -m src.distance`` for a throughput/accuracy benchmark on synthetic tracks.
+"""
+
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+from src.utils import EARTH_RADIUS_KM
+
+WGS84_A = 6378137.0  # Semi-major axis in metres
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+VINCENTY_TOLERANCE = 1e-12  # Convergence of the longitude on the auxiliary sphere, in radians
+VINCENTY_MAX_ITERATIONS = 200
+HAVERSINE_RELATIVE_ERROR = 0.006  # Worst case of the sphere against WGS84 is 0.56%
+EQUIRECTANGULAR_ERROR_FLOOR_M = 1e-5  # Covers the reference solver's own tolerance (about 6 micrometres)
+DEFAULT_MAX_ERROR_M = 1.0
+
+
+def _wrap_longitude(dlon):
+    """Longitude difference in degrees wrapped to [-180, 180)."""
+    return (dlon + 180.0) % 360.0 - 180.0
+
+
+# Scalar models (plain math, fastest for one leg at a time); all return metres
+
+def _equirectangular_m(lat1, lon1, lat2, lon2, with_error=False):
+    """
+    Flat-earth leg with the WGS84 meridian (M) and prime vertical (N) radii at the mid-latitude.
+    With with_error, also returns an upper bound on its error against WGS84; the bound was fitted
+    to Vincenty results over all latitudes and leg lengths and carries a factor 2 margin.
+    """
+    sin2 = math.sin(math.radians(lat1 + lat2) / 2) ** 2
+    w2 = 1 - WGS84_E2 * sin2
+    dlon2 = math.radians(_wrap_longitude(lon2 - lon1)) ** 2
+    dlat2 = math.radians(lat2 - lat1) ** 2
+    distance = WGS84_A * math.sqrt((dlon2 * (1 - sin2) + dlat2 * ((1 - WGS84_E2) / w2) ** 2) / w2)
+    if not with_error:
+        return distance
+    # dlon^2 sin^2 / 4 + dlat^2 + dlon^2 cos^2
+    return distance, distance * (dlon2 * (1 - 0.75 * sin2) + dlat2) + EQUIRECTANGULAR_ERROR_FLOOR_M
+
+
+def _haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2000 * EARTH_RADIUS_KM * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _vincenty_m(lat1, lon1, lat2, lon2):
+    """Vincenty inverse; falls back to the sphere for the near-antipodal legs where it does not converge."""
+    f = WGS84_F
+    u1 = math.atan((1 - f) * math.tan(math.radians(lat1)))
+    u2 = math.atan((1 - f) * math.tan(math.radians(lat2)))
+    sin_u1, cos_u1, sin_u2, cos_u2 = math.sin(u1), math.cos(u1), math.sin(u2), math.cos(u2)
+    big_l = math.radians(_wrap_longitude(lon2 - lon1))
+    lam = big_l
+    for _ in range(VINCENTY_MAX_ITERATIONS):
+        sin_lam, cos_lam = math.sin(lam), math.cos(lam)
+        sin_sigma = math.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+        if sin_sigma == 0:
+            return 0.0
+        cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+        sigma = math.atan2(sin_sigma, cos_sigma)
+        sin_alpha = cos_u1 * cos_u2 * sin_lam / sin_sigma
+        cos2_alpha = 1 - sin_alpha ** 2
+        cos_2sm = cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha if cos2_alpha else 0.0
+        c = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+        previous = lam
+        lam = big_l + (1 - c) * f * sin_alpha * (
+            sigma + c * sin_sigma * (cos_2sm + c * cos_sigma * (-1 + 2 * cos_2sm ** 2)))
+        if abs(lam - previous) < VINCENTY_TOLERANCE:
+            break
+    else:
+        return _haversine_m(lat1, lon1, lat2, lon2)
+    u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = b * sin_sigma * (cos_2sm + b / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sm ** 2) - b / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sm ** 2)))
+    return WGS84_B * a * (sigma - delta_sigma)
+
+
+# Vectorized models (float64 arrays in degrees); all return metres
+
+def _as_arrays(*columns):
+    arrays = [np.asarray(c, dtype=np.float64) for c in columns]
+    if any(a.shape != arrays[0].shape for a in arrays):
+        raise ValueError("coordinate arrays must have the same shape")
+    return arrays
+
+
+def _equirectangular_array_m(lat1, lon1, lat2, lon2, with_error=False):
+    """
+    Vectorized _equirectangular_m, arranged to need one trig call and few temporaries:
+    with s = sin(mid) and w2 = 1 - e2 s^2, d = a / w * sqrt(cos^2 dlon^2 + ((1 - e2) / w2)^2 dlat^2).
+    """
+    sin2 = np.sin((lat1 + lat2) * (np.pi / 360)) ** 2
+    w2 = 1 - WGS84_E2 * sin2
+    dlon2 = _wrap_longitude(lon2 - lon1) ** 2
+    dlat2 = (lat2 - lat1) ** 2
+    total = dlon2 * (1 - sin2)
+    total += dlat2 * ((1 - WGS84_E2) / w2) ** 2
+    total /= w2
+    distance = np.sqrt(total) * (WGS84_A * np.pi / 180)
+    if not with_error:
+        return distance
+    # dlon^2 sin^2 / 4 + dlat^2 + dlon^2 cos^2, in radians
+    spread = dlon2 * (1 - 0.75 * sin2)
+    spread += dlat2
+    return distance, distance * spread * (np.pi / 180) ** 2 + EQUIRECTANGULAR_ERROR_FLOOR_M
+
+
+def _haversine_array_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2000 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _vincenty_array_m(lat1, lon1, lat2, lon2):
+    """Vincenty inverse over arrays; each iteration only updates the legs that have not converged."""
+    f = WGS84_F
+    u1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1, sin_u2, cos_u2 = np.sin(u1), np.cos(u1), np.sin(u2), np.cos(u2)
+    big_l = np.radians(_wrap_longitude(lon2 - lon1))
+
+    lam = big_l.copy()
+    sin_sigma = np.zeros_like(lam)
+    cos_sigma = np.ones_like(lam)
+    sigma = np.zeros_like(lam)
+    cos2_alpha = np.ones_like(lam)
+    cos_2sm = np.zeros_like(lam)
+    active = np.arange(lam.size)
+    for _ in range(VINCENTY_MAX_ITERATIONS):
+        if not active.size:
+            break
+        su1, cu1, su2, cu2, l = sin_u1[active], cos_u1[active], sin_u2[active], cos_u2[active], lam[active]
+        sin_lam, cos_lam = np.sin(l), np.cos(l)
+        ss = np.hypot(cu2 * sin_lam, cu1 * su2 - su1 * cu2 * cos_lam)
+        cs = su1 * su2 + cu1 * cu2 * cos_lam
+        coincident = ss == 0
+        safe_ss = np.where(coincident, 1.0, ss)
+        sin_alpha = np.where(coincident, 0.0, cu1 * cu2 * sin_lam / safe_ss)
+        c2a = 1 - sin_alpha ** 2
+        c2sm = np.where(c2a == 0, 0.0, cs - 2 * su1 * su2 / np.where(c2a == 0, 1.0, c2a))
+        sig = np.arctan2(ss, cs)
+        c = f / 16 * c2a * (4 + f * (4 - 3 * c2a))
+        new = big_l[active] + (1 - c) * f * sin_alpha * (sig + c * ss * (c2sm + c * cs * (-1 + 2 * c2sm ** 2)))
+        sin_sigma[active], cos_sigma[active], sigma[active] = ss, cs, sig
+        cos2_alpha[active], cos_2sm[active], lam[active] = c2a, c2sm, new
+        active = active[(np.abs(new - l) >= VINCENTY_TOLERANCE) & ~coincident]
+
+    u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = b * sin_sigma * (cos_2sm + b / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sm ** 2) - b / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sm ** 2)))
+    distance = WGS84_B * a * (sigma - delta_sigma)
+    if active.size:
+        distance[active] = _haversine_array_m(lat1[active], lon1[active], lat2[active], lon2[active])
+    return distance
+
+
+class DistanceEngine:
+    """
+    Base for the distance models. Subclasses implement _scalar_m and _array_m in metres;
+    the public methods take coordinates in degrees and return kilometers.
+    """
+    name = None
+
+    def distance(self, lat1, lon1, lat2, lon2):
+        """Length of one leg in kilometers."""
+        return self._scalar_m(float(lat1), float(lon1), float(lat2), float(lon2)) / 1000
+
+    def pairs(self, lats1, lons1, lats2, lons2):
+        """Element-wise leg lengths between two coordinate arrays, in kilometers."""
+        lats1, lons1, lats2, lons2 = _as_arrays(lats1, lons1, lats2, lons2)
+        return self._array_m(lats1, lons1, lats2, lons2) / 1000
+
+    def legs(self, lats, lons):
+        """Consecutive leg lengths like utils.haversine_distances: entry 0 is 0.0, entry i ends at point i."""
+        lats, lons = _as_arrays(lats, lons)
+        distances = np.zeros(len(lats))
+        if len(lats) > 1:
+            distances[1:] = self._array_m(lats[:-1], lons[:-1], lats[1:], lons[1:]) / 1000
+        return distances
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class EquirectangularEngine(DistanceEngine):
+    """Local flat-earth approximation with WGS84 radii; error grows with the cube of leg length."""
+    name = "equirectangular"
+    _scalar_m = staticmethod(_equirectangular_m)
+    _array_m = staticmethod(_equirectangular_array_m)
+
+
+class HaversineEngine(DistanceEngine):
+    """Great circle on a sphere of radius EARTH_RADIUS_KM, as in utils.haversine_distance (unrounded)."""
+    name = "haversine"
+    _scalar_m = staticmethod(_haversine_m)
+    _array_m = staticmethod(_haversine_array_m)
+
+
+class WGS84Engine(DistanceEngine):
+    """Geodesic on the WGS84 ellipsoid (Vincenty), accurate to well under a millimetre."""
+    name = "wgs84"
+    _scalar_m = staticmethod(_vincenty_m)
+    _array_m = staticmethod(_vincenty_array_m)
+
+
+class AdaptiveEngine(DistanceEngine):
+    """
+    Measures every leg with the cheapest model whose worst-case error against WGS84 is within
+    max_error_m: equirectangular for short legs, haversine where 0.6% of the leg is tolerable,
+    and the ellipsoidal solver for the rest. The last counts of legs per model are kept in usage.
+    """
+    name = "adaptive"
+
+    def __init__(self, max_error_m=DEFAULT_MAX_ERROR_M):
+        if max_error_m <= 0:
+            raise ValueError("max_error_m must be positive")
+        self.max_error_m = max_error_m
+        self.usage = {}
+
+    def _scalar_m(self, lat1, lon1, lat2, lon2):
+        distance, error = _equirectangular_m(lat1, lon1, lat2, lon2, with_error=True)
+        if error <= self.max_error_m:
+            return distance
+        distance = _haversine_m(lat1, lon1, lat2, lon2)
+        if distance * HAVERSINE_RELATIVE_ERROR <= self.max_error_m:
+            return distance
+        return _vincenty_m(lat1, lon1, lat2, lon2)
+
+    def _array_m(self, lat1, lon1, lat2, lon2):
+        distance, error = _equirectangular_array_m(lat1, lon1, lat2, lon2, with_error=True)
+        rough = np.flatnonzero(error > self.max_error_m)
+        sphere = _haversine_array_m(lat1[rough], lon1[rough], lat2[rough], lon2[rough])
+        distance[rough] = sphere
+        ellipsoid = rough[sphere * HAVERSINE_RELATIVE_ERROR > self.max_error_m]
+        distance[ellipsoid] = _vincenty_array_m(lat1[ellipsoid], lon1[ellipsoid], lat2[ellipsoid], lon2[ellipsoid])
+        self.usage = {EquirectangularEngine.name: len(distance) - len(rough),
+                      HaversineEngine.name: len(rough) - len(ellipsoid), WGS84Engine.name: len(ellipsoid)}
+        return distance
+
+    def __repr__(self):
+        return f"AdaptiveEngine(max_error_m={self.max_error_m})"
+
+
+ENGINES = {engine.name: engine for engine in (EquirectangularEngine, HaversineEngine, WGS84Engine, AdaptiveEngine)}
+
+
+def get_engine(name, **options):
+    """Engine instance by name (see ENGINES); options are passed to its constructor."""
+    try:
+        return ENGINES[name](**options)
+    except KeyError:
+        raise ValueError(f"Unknown distance engine {name!r}; choose from {', '.join(ENGINES)}") from None
+
+
+# Benchmark
+
+def synthetic_track(points, min_leg_m, max_leg_m, seed=0):
+    """Random walk from Longyearbyen with log-uniform leg lengths, as (lats, lons) arrays."""
+    rng = np.random.default_rng(seed)
+    legs_m = np.exp(rng.uniform(np.log(min_leg_m), np.log(max_leg_m), points - 1))
+    bearings = rng.uniform(0, 2 * np.pi, points - 1)
+    lats = np.empty(points)
+    lons = np.empty(points)
+    lats[0], lons[0] = 78.22, 15.65
+    # Steps are small enough for a local flat step; the walk is kept north of 60N
+    for start in range(0, points - 1, 100_000):
+        stop = min(start + 100_000, points - 1)
+        dlat = np.degrees(legs_m[start:stop] * np.cos(bearings[start:stop]) / (EARTH_RADIUS_KM * 1000))
+        lat = lats[start] + np.cumsum(dlat)
+        lat = 60 + np.abs((lat - 60 + 29.5) % 59 - 29.5)  # Fold back into 60..89.5
+        dlon = np.degrees(legs_m[start:stop] * np.sin(bearings[start:stop])
+                          / (EARTH_RADIUS_KM * 1000 * np.cos(np.radians(lat))))
+        lats[start + 1:stop + 1] = lat
+        lons[start + 1:stop + 1] = _wrap_longitude(lons[start] + np.cumsum(dlon))
+    return lats, lons
+
+
+BENCHMARK_TRACKS = {
+    "dense": (1.0, 100.0),       # Recorded GPS track
+    "expedition": (1e3, 5e5),    # Planned camp-to-camp legs
+}
+
+
+def benchmark(points=200_000, scalar_points=20_000, max_error_m=DEFAULT_MAX_ERROR_M, seed=0, repeat=3):
+    """
+    Time every engine on each synthetic track and measure its error against the WGS84 solver.
+    Returns a list of result dicts (legs per second vectorized and scalar, max and mean error in metres).
+    """
+    results = []
+    for track, (min_leg_m, max_leg_m) in BENCHMARK_TRACKS.items():
+        lats, lons = synthetic_track(points, min_leg_m, max_leg_m, seed)
+        reference = WGS84Engine().legs(lats, lons) * 1000
+        for name in ENGINES:
+            engine = get_engine(name, max_error_m=max_error_m) if name == AdaptiveEngine.name else get_engine(name)
+            best = math.inf
+            for _ in range(repeat):
+                started = time.perf_counter()
+                distances = engine.legs(lats, lons)
+                best = min(best, time.perf_counter() - started)
+            coords = list(zip(lats[:scalar_points].tolist(), lons[:scalar_points].tolist()))
+            started = time.perf_counter()
+            for (lat1, lon1), (lat2, lon2) in zip(coords, coords[1:]):
+                engine.distance(lat1, lon1, lat2, lon2)
+            scalar_seconds = time.perf_counter() - started
+            error = np.abs(distances * 1000 - reference)
+            result = {
+                "track": track,
+                "engine": name,
+                "legs": points - 1,
+                "vectorized_legs_per_s": round((points - 1) / best),
+                "scalar_legs_per_s": round((len(coords) - 1) / scalar_seconds),
+                "max_error_m": float(error.max()),
+                "mean_error_m": float(error.mean()),
+            }
+            if isinstance(engine, AdaptiveEngine):
+                result["usage"] = engine.usage
+            results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare distance engines for speed and accuracy.")
+    parser.add_argument("--points", type=int, default=200_000, help="Points per synthetic track")
+    parser.add_argument("--max-error", type=float, default=DEFAULT_MAX_ERROR_M, metavar="METRES",
+                        help="Error bound for the adaptive engine")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = benchmark(points=args.points, scalar_points=min(args.points, 20_000), max_error_m=args.max_error)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'track':<12}{'engine':<17}{'vector legs/s':>15}{'scalar legs/s':>15}"
+          f"{'max error m':>14}{'mean error m':>14}")
+    for r in results:
+        print(f"{r['track']:<12}{r['engine']:<17}{r['vectorized_legs_per_s']:>15,}{r['scalar_legs_per_s']:>15,}"
+              f"{r['max_error_m']:>14.3g}{r['mean_error_m']:>14.3g}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,415 @@
+"""
+Elevation lookups for the Arctic Expedition Planner.
+Wraps the OpenTopoData API with a persistent SQLite cache so repeated lookups
+of the same ground (within the dataset's resolution) never hit the network twice,
+and provides a batched, pooled service for elevating whole itineraries.
+
+Providers share a small interface: lookup(lat, lon) and lookup_many(points, progress=None),
+returning metres or None. The offline DEM provider in src/dem.py implements the same calls.
+"""
+
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.dem import DEMElevationProvider
+from src.instrumentation import count, span, traced
+
+OPENTOPODATA_URL = "https://api.opentopodata.org/v1/eudem25m"
+DATASET_RESOLUTION_M = 25  # EU-DEM grid spacing; coordinates closer than this share a cache entry
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".arctic_expedition_planner", "elevation_cache.sqlite3")
+DEM_DIR_ENV = "AEP_DEM_DIR"  # Directory of .hgt tiles to use before falling back to the API
+METERS_PER_DEGREE = 111320.0
+MAX_LOCATIONS_PER_REQUEST = 100  # OpenTopoData limit for pipe-separated locations
+PUBLIC_API_MIN_INTERVAL_S = 1.0  # The public OpenTopoData API allows about one request per second
+
+
+class ElevationCache:
+    """
+    Persistent elevation cache keyed on coordinates quantized to the dataset resolution.
+    Entries are evicted least-recently-used once max_entries is exceeded and, when ttl_seconds
+    is set, treated as misses after they expire. Safe to share between threads.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=200_000, ttl_seconds=None,
+                 resolution_m=DATASET_RESOLUTION_M):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.resolution_m = resolution_m
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS elevation ("
+            " lat_key INTEGER NOT NULL, lon_key INTEGER NOT NULL, elevation REAL,"
+            " fetched_at REAL NOT NULL, last_access REAL NOT NULL,"
+            " PRIMARY KEY (lat_key, lon_key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON elevation (last_access)")
+        self._conn.commit()
+
+    def key(self, lat, lon):
+        """Quantize a coordinate to its grid cell. Longitude cells widen toward the equator."""
+        lat_step = self.resolution_m / METERS_PER_DEGREE
+        lat_key = round(float(lat) / lat_step)
+        lon_step = lat_step / max(math.cos(math.radians(lat_key * lat_step)), 1e-6)
+        lon_key = round(float(lon) / lon_step)
+        return lat_key, lon_key
+
+    def get(self, lat, lon):
+        """
+        Look up a coordinate. Returns (True, elevation) on a hit and (False, None) on a miss.
+        A hit may carry None for points the dataset has no data for.
+        """
+        return self.get_many([(lat, lon)])[0]
+
+    def get_many(self, points):
+        """Look up many (lat, lon) points at once. Returns a (hit, elevation) pair per point."""
+        keys = [self.key(lat, lon) for lat, lon in points]
+        now = time.time()
+        found = {}
+        with self._lock:
+            for key in set(keys):
+                row = self._conn.execute(
+                    "SELECT elevation, fetched_at FROM elevation WHERE lat_key = ? AND lon_key = ?", key
+                ).fetchone()
+                if row is None:
+                    continue
+                if self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM elevation WHERE lat_key = ? AND lon_key = ?", key)
+                    continue
+                found[key] = row[0]
+            if found:
+                self._conn.executemany(
+                    "UPDATE elevation SET last_access = ? WHERE lat_key = ? AND lon_key = ?",
+                    [(now, *key) for key in found]
+                )
+            self._conn.commit()
+
+            results = []
+            for key in keys:
+                if key in found:
+                    self.hits += 1
+                    results.append((True, found[key]))
+                else:
+                    self.misses += 1
+                    results.append((False, None))
+        return results
+
+    def put(self, lat, lon, elevation):
+        """Store the elevation for a coordinate (None marks a no-data point)."""
+        self.put_many([(lat, lon, elevation)])
+
+    def put_many(self, entries):
+        """Store many (lat, lon, elevation) entries and evict old ones if over the size cap."""
+        now = time.time()
+        rows = [(*self.key(lat, lon), elevation, now, now) for lat, lon, elevation in entries]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO elevation (lat_key, lon_key, elevation, fetched_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop the least recently used entries beyond max_entries."""
+        count = self._conn.execute("SELECT COUNT(*) FROM elevation").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM elevation WHERE rowid IN"
+                " (SELECT rowid FROM elevation ORDER BY last_access ASC LIMIT ?)", (excess,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM elevation").fetchone()[0]
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def clear(self):
+        """Remove every cached entry and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM elevation")
+            self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self._conn.close()
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """Return the shared on-disk cache, or None if it cannot be created (e.g. read-only home)."""
+    global _default_cache
+    if _default_cache is None:
+        try:
+            _default_cache = ElevationCache()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Elevation cache unavailable: {e}")
+            return None
+    return _default_cache
+
+
+def fetch_elevation(lat, lon, cache=None, use_cache=True, api_url=OPENTOPODATA_URL, timeout=5):
+    """
+    Query OpenTopoData API to get ground elevation for a given coordinate.
+    Results are served from and stored in the persistent cache (the shared default unless one is passed).
+    """
+    if use_cache and cache is None:
+        cache = get_default_cache()
+    if use_cache and cache is not None:
+        hit, elevation = cache.get(lat, lon)
+        if hit:
+            count("elevation.cache_hits")
+            return elevation
+
+    with span("elevation.fetch", "elevation") as traced:
+        count("elevation.requests")
+        try:
+            response = requests.get(
+                api_url,
+                params={"locations": f"{lat},{lon}"},
+                timeout=timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            elevation = result["results"][0]["elevation"]
+        except Exception as e:
+            print(f"Elevation fetch failed: {e}")
+            traced.set(error=type(e).__name__)
+            return None
+
+    if use_cache and cache is not None:
+        cache.put(lat, lon, elevation)
+    return elevation
+
+
+class ElevationService:
+    """
+    Bulk elevation lookups against the OpenTopoData API.
+    Points are de-duplicated against the cache, split into API-sized batches and fetched
+    concurrently by a bounded worker pool over one pooled keep-alive session. HTTP 429 and
+    5xx responses are retried with exponential backoff (honouring Retry-After), and
+    min_interval spaces out request starts to stay under a rate limit: by default
+    PUBLIC_API_MIN_INTERVAL_S against the public API and none against any other server.
+    """
+    def __init__(self, api_url=OPENTOPODATA_URL, cache=None, use_cache=True,
+                 batch_size=MAX_LOCATIONS_PER_REQUEST, max_workers=4, timeout=10,
+                 max_retries=5, backoff_seconds=1.0, min_interval=None):
+        self.api_url = api_url
+        self.cache = (cache if cache is not None else get_default_cache()) if use_cache else None
+        self.batch_size = max(1, min(batch_size, MAX_LOCATIONS_PER_REQUEST))
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        if min_interval is None:
+            min_interval = PUBLIC_API_MIN_INTERVAL_S if api_url == OPENTOPODATA_URL else 0.0
+        self.min_interval = min_interval
+        self.requests_made = 0  # Counted under _rate_lock, as pool threads finish requests
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._rate_lock = threading.Lock()  # Guards the request spacing and requests_made
+        self._next_request_at = 0.0
+
+    def _wait_for_slot(self):
+        """Block until the next request may start under min_interval."""
+        if self.min_interval <= 0:
+            return
+        with self._rate_lock:
+            now = time.monotonic()
+            start = max(now, self._next_request_at)
+            self._next_request_at = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _fetch_batch(self, batch):
+        """
+        Fetch one batch of (lat, lon) points, retrying throttled or failed requests.
+        Returns (ok, elevations); a batch that ultimately fails yields (False, [None, ...]).
+        """
+        locations = "|".join(f"{lat},{lon}" for lat, lon in batch)
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_slot()
+            if attempt:
+                count("elevation.retries")
+            try:
+                with span("elevation.request", "elevation", points=len(batch), attempt=attempt):
+                    response = self.session.get(self.api_url, params={"locations": locations}, timeout=self.timeout)
+                with self._rate_lock:
+                    self.requests_made += 1
+                count("elevation.requests")
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                response.raise_for_status()
+                try:
+                    elevations = [result["elevation"] for result in response.json()["results"]]
+                except (KeyError, TypeError, ValueError) as e:
+                    # An error payload (e.g. {"status": "INVALID_REQUEST"}) or a body that is not JSON
+                    print(f"Elevation batch failed: unexpected response ({type(e).__name__}: {e})")
+                    return False, [None] * len(batch)
+                if len(elevations) != len(batch):
+                    print(f"Elevation batch failed: {len(elevations)} results for {len(batch)} points")
+                    return False, [None] * len(batch)
+                return True, elevations
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                retryable = e.response is None or e.response.status_code == 429 or e.response.status_code >= 500
+                if not retryable or attempt == self.max_retries:
+                    print(f"Elevation batch failed: {e}")
+                    return False, [None] * len(batch)
+                delay = self.backoff_seconds * 2 ** attempt * (1 + random.random() * 0.1)
+                retry_after = e.response.headers.get("Retry-After") if e.response is not None else None
+                if retry_after is not None:
+                    try:
+                        delay = max(float(retry_after), 0.0)
+                    except ValueError:
+                        pass
+                time.sleep(delay)
+
+    def lookup(self, lat, lon):
+        """Elevation for a single point, or None."""
+        return self.lookup_many([(lat, lon)])[0]
+
+    @traced("elevation.lookup_many", "elevation")
+    def lookup_many(self, points, progress=None):
+        """
+        Return elevations for a sequence of (lat, lon) points, None where unavailable.
+        progress, if given, is called as progress(done_batches, total_batches) from worker threads;
+        an exception raised by it aborts the lookup.
+        """
+        points = [(float(lat), float(lon)) for lat, lon in points]
+        results = [None] * len(points)
+
+        # Serve what we can from the cache and fetch each remaining grid cell once
+        pending = {}
+        cached = self.cache.get_many(points) if self.cache is not None else [(False, None)] * len(points)
+        for i, (point, (hit, elevation)) in enumerate(zip(points, cached)):
+            if hit:
+                results[i] = elevation
+            else:
+                key = self.cache.key(*point) if self.cache is not None else point
+                pending.setdefault(key, (point, []))[1].append(i)
+
+        count("elevation.cache_hits", len(points) - sum(len(indices) for _, indices in pending.values()))
+        unique = list(pending.values())
+        batches = [unique[i:i + self.batch_size] for i in range(0, len(unique), self.batch_size)]
+        done = 0
+        done_lock = threading.Lock()
+
+        def run(batch):
+            nonlocal done
+            ok, elevations = self._fetch_batch([point for point, _ in batch])
+            with done_lock:
+                done += 1
+                if progress is not None:
+                    progress(done, len(batches))
+            return batch, ok, elevations
+
+        fetched = []
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            for batch, ok, elevations in pool.map(run, batches):
+                for (point, indices), elevation in zip(batch, elevations):
+                    for i in indices:
+                        results[i] = elevation
+                    if ok:
+                        fetched.append((*point, elevation))
+        except BaseException:
+            # e.g. a progress callback cancelling the job: drop the batches that have not started
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+
+        if self.cache is not None and fetched:
+            self.cache.put_many(fetched)
+        return results
+
+    def elevate_itinerary(self, itinerary, progress=None):
+        """
+        Fill altitude_m for every waypoint of an itinerary in bulk.
+        Waypoints without a result keep their altitude. Returns the number of waypoints updated.
+        """
+        if hasattr(itinerary, "latitudes"):
+            points = zip(itinerary.latitudes, itinerary.longitudes)
+        else:
+            points = [(wp.latitude, wp.longitude) for wp in itinerary.waypoints]
+        elevations = self.lookup_many(points, progress)
+
+        updated = 0
+        if hasattr(itinerary, "altitudes"):
+            values = np.array([np.nan if e is None else e for e in elevations], dtype=np.float64)
+            found = ~np.isnan(values)
+            itinerary.altitudes[found] = np.round(values[found]).astype(np.int32)
+            updated = int(found.sum())
+        else:
+            for wp, elevation in zip(itinerary.waypoints, elevations):
+                if elevation is not None:
+                    wp.altitude_m = int(round(elevation))
+                    updated += 1
+        itinerary.reset_running_totals()  # Altitudes feed the ascent/descent statistics
+        return updated
+
+    def close(self):
+        self.session.close()
+
+
+class FallbackElevationProvider:
+    """Ask each provider in turn, passing only the points still without an elevation to the next."""
+    def __init__(self, *providers):
+        self.providers = providers
+
+    def lookup(self, lat, lon):
+        return self.lookup_many([(lat, lon)])[0]
+
+    def lookup_many(self, points, progress=None):
+        points = list(points)
+        results = [None] * len(points)
+        missing = list(range(len(points)))
+        for provider in self.providers:
+            if not missing:
+                break
+            found = provider.lookup_many([points[i] for i in missing], progress)
+            for i, elevation in zip(missing, found):
+                results[i] = elevation
+            missing = [i for i in missing if results[i] is None]
+        return results
+
+    def close(self):
+        for provider in self.providers:
+            provider.close()
+
+
+def default_elevation_provider():
+    """
+    Build the provider the GUI uses: local DEM tiles from $AEP_DEM_DIR when configured,
+    with the cached OpenTopoData service as the fallback.
+    """
+    service = ElevationService()
+    dem_dir = os.environ.get(DEM_DIR_ENV)
+    if dem_dir and os.path.isdir(dem_dir):
+        return FallbackElevationProvider(DEMElevationProvider(dem_dir), service)
+    return service
@@ -0,0 +1,284 @@
+"""
+Along-route elevation profiles for the Arctic Expedition Planner.
+Waypoint altitudes say nothing about the ground between camps, so each leg is densified along
+its great circle at a fixed spacing and the ground elevation of every sample point is looked up
+in one bulk request to an elevation provider (see src/elevation.py). Per-leg results are cached
+by the leg's end coordinates, so re-profiling after a reorder only samples the legs that are new;
+a leg travelled in the opposite direction reuses its profile reversed.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.instrumentation import count, span
+from src.utils import EARTH_RADIUS_KM
+
+DEFAULT_SAMPLE_SPACING_M = 250.0
+MIN_SAMPLE_SPACING_M = 25.0      # The EU-DEM grid spacing; closer samples repeat the same cell
+MAX_SAMPLES_PER_LEG = 2000       # Very long legs are sampled more coarsely than the spacing asks
+DEFAULT_MAX_CACHED_LEGS = 50_000
+
+
+def _unit_vectors(lats, lons):
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def effective_spacing(spacing_m):
+    """The sample spacing actually used for a requested one: never below MIN_SAMPLE_SPACING_M."""
+    if spacing_m <= 0:
+        raise ValueError("sample spacing must be positive")
+    return max(float(spacing_m), MIN_SAMPLE_SPACING_M)
+
+
+def densify_pairs(lats1, lons1, lats2, lons2, spacing_m=DEFAULT_SAMPLE_SPACING_M):
+    """
+    Sample points along the great circle from each start to the matching end coordinate.
+    Returns (lats, lons, offsets_km, bounds): the sample coordinates of every leg, both ends
+    included, their distance from the start of their leg, and bounds such that the samples of
+    leg i are [bounds[i], bounds[i + 1]). Spacings below MIN_SAMPLE_SPACING_M are raised to it.
+    """
+    spacing_m = effective_spacing(spacing_m)
+    a, b = _unit_vectors(lats1, lons1), _unit_vectors(lats2, lons2)
+    angles = np.arctan2(np.linalg.norm(np.cross(a, b), axis=1), np.einsum("ij,ij->i", a, b))
+    lengths_m = angles * EARTH_RADIUS_KM * 1000
+    samples = np.clip(np.ceil(lengths_m / spacing_m), 1, MAX_SAMPLES_PER_LEG - 1)
+    samples = samples.astype(np.int64) + 1
+    bounds = np.concatenate([[0], np.cumsum(samples)])
+
+    # Fraction of the way along its leg for every sample, then spherical interpolation
+    leg = np.repeat(np.arange(len(samples)), samples)
+    t = (np.arange(bounds[-1]) - bounds[leg]) / (samples[leg] - 1)
+    theta = angles[leg]
+    sin_theta = np.sin(theta)
+    short = sin_theta < 1e-12  # Zero-length legs: linear weights, the end points coincide
+    safe = np.where(short, 1.0, sin_theta)
+    wa = np.where(short, 1 - t, np.sin((1 - t) * theta) / safe)
+    wb = np.where(short, t, np.sin(t * theta) / safe)
+    points = wa[:, None] * a[leg] + wb[:, None] * b[leg]
+    sample_lats = np.degrees(np.arctan2(points[:, 2], np.hypot(points[:, 0], points[:, 1])))
+    sample_lons = np.degrees(np.arctan2(points[:, 1], points[:, 0]))
+    return sample_lats, sample_lons, t * lengths_m[leg] / 1000, bounds
+
+
+def densify_legs(lats, lons, spacing_m=DEFAULT_SAMPLE_SPACING_M):
+    """densify_pairs for the legs between consecutive coordinates of a route."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    return densify_pairs(lats[:-1], lons[:-1], lats[1:], lons[1:], spacing_m)
+
+
+def _rounded(value, digits=1):
+    return None if value is None else round(value, digits)
+
+
+@dataclass
+class LegProfile:
+    """Sampled ground along one leg: distance from its start (km) and elevation (m, NaN where unknown)."""
+    offsets_km: np.ndarray
+    elevations: np.ndarray
+
+    @property
+    def length_km(self):
+        return float(self.offsets_km[-1]) if len(self.offsets_km) else 0.0
+
+    @property
+    def complete(self):
+        return not np.isnan(self.elevations).any()
+
+    def _known(self):
+        return self.elevations[~np.isnan(self.elevations)]
+
+    @property
+    def ascent_m(self):
+        steps = np.diff(self._known())
+        return float(steps[steps > 0].sum())
+
+    @property
+    def descent_m(self):
+        steps = np.diff(self._known())
+        return float(np.abs(steps[steps < 0]).sum())
+
+    @property
+    def max_altitude_m(self):
+        known = self._known()
+        return float(known.max()) if len(known) else None
+
+    def reversed(self):
+        """The same leg travelled the other way."""
+        return LegProfile(self.length_km - self.offsets_km[::-1], self.elevations[::-1])
+
+    def to_dict(self):
+        return {"length_km": round(self.length_km, 3), "samples": len(self.offsets_km),
+                "ascent_m": round(self.ascent_m, 1), "descent_m": round(self.descent_m, 1),
+                "max_altitude_m": _rounded(self.max_altitude_m)}
+
+
+@dataclass
+class RouteProfile:
+    """Leg profiles of a whole route; legs[i] runs from waypoint i to waypoint i + 1."""
+    legs: list
+    spacing_m: float = DEFAULT_SAMPLE_SPACING_M
+
+    @property
+    def ascent_m(self):
+        return sum(leg.ascent_m for leg in self.legs)
+
+    @property
+    def descent_m(self):
+        return sum(leg.descent_m for leg in self.legs)
+
+    @property
+    def max_altitude_m(self):
+        highs = [leg.max_altitude_m for leg in self.legs if leg.max_altitude_m is not None]
+        return max(highs) if highs else None
+
+    @property
+    def samples(self):
+        return sum(len(leg.offsets_km) for leg in self.legs)
+
+    def series(self):
+        """
+        (distances_km, elevations, leg_starts_km) for charting: every sample at its distance from
+        the start of the route and the route distance at which each leg begins.
+        """
+        starts = np.concatenate([[0.0], np.cumsum([leg.length_km for leg in self.legs])])
+        if not self.legs:
+            return np.zeros(0), np.zeros(0), starts
+        distances = np.concatenate([start + leg.offsets_km for start, leg in zip(starts, self.legs)])
+        elevations = np.concatenate([leg.elevations for leg in self.legs])
+        return distances, elevations, starts[:-1]
+
+    def chart_points(self, max_points=1000):
+        """
+        Known samples as (distances_km, elevations), thinned to about max_points for drawing by
+        keeping the lowest and highest sample of each stretch so ridges and valleys survive.
+        """
+        distances, elevations, _ = self.series()
+        known = ~np.isnan(elevations)
+        distances, elevations = distances[known], elevations[known]
+        buckets = max(max_points // 2, 1)
+        if len(distances) <= max_points:
+            return distances, elevations
+        edges = np.linspace(0, len(distances), buckets + 1).astype(np.int64)
+        keep = set()
+        for lo, hi in zip(edges[:-1], edges[1:]):
+            if hi > lo:
+                keep.add(lo + int(np.argmin(elevations[lo:hi])))
+                keep.add(lo + int(np.argmax(elevations[lo:hi])))
+        keep = sorted(keep)
+        return distances[keep], elevations[keep]
+
+    def to_dict(self):
+        return {"spacing_m": self.spacing_m, "samples": self.samples, "ascent_m": round(self.ascent_m, 1),
+                "descent_m": round(self.descent_m, 1), "max_altitude_m": _rounded(self.max_altitude_m),
+                "legs": [leg.to_dict() for leg in self.legs]}
+
+
+def _route_points(route):
+    """(lats, lons) of an itinerary, columnar itinerary or sequence of (lat, lon) points."""
+    if hasattr(route, "latitudes"):
+        return np.asarray(route.latitudes, dtype=np.float64), np.asarray(route.longitudes, dtype=np.float64)
+    if hasattr(route, "waypoints"):
+        route = [(wp.latitude, wp.longitude) for wp in route.waypoints]
+    points = np.asarray(list(route), dtype=np.float64).reshape(-1, 2)
+    return points[:, 0], points[:, 1]
+
+
+class ElevationProfiler:
+    """
+    Builds RouteProfiles with one provider.lookup_many call for the samples of every uncached leg.
+    Legs whose samples all resolved are kept per spacing (least recently used first out beyond
+    max_cached_legs); legs with gaps are sampled again next time, when the provider's own cache
+    answers what it can. Safe to share between threads.
+    """
+    def __init__(self, provider, spacing_m=DEFAULT_SAMPLE_SPACING_M, max_cached_legs=DEFAULT_MAX_CACHED_LEGS):
+        if spacing_m <= 0:
+            raise ValueError("sample spacing must be positive")
+        self.provider = provider
+        self.spacing_m = spacing_m
+        self.max_cached_legs = max_cached_legs
+        self.legs_sampled = 0  # Legs looked up so far, for diagnostics
+        self._legs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._legs.clear()
+
+    def __len__(self):
+        return len(self._legs)
+
+    def _cached(self, key):
+        """Cached profile of a (lat1, lon1, lat2, lon2, spacing) leg in either direction, or None."""
+        reverse = (key[2], key[3], key[0], key[1], key[4])
+        with self._lock:
+            if key in self._legs:
+                self._legs.move_to_end(key)
+                return self._legs[key]
+            if reverse in self._legs:
+                self._legs.move_to_end(reverse)
+                return self._legs[reverse].reversed()
+        return None
+
+    def _store(self, key, leg):
+        with self._lock:
+            self._legs[key] = leg
+            self._legs.move_to_end(key)
+            while len(self._legs) > self.max_cached_legs:
+                self._legs.popitem(last=False)
+
+    def _leg_keys(self, route, spacing_m):
+        lats, lons = (column.tolist() for column in _route_points(route))
+        spacing_m = effective_spacing(spacing_m or self.spacing_m)
+        return [(lats[i], lons[i], lats[i + 1], lons[i + 1], spacing_m) for i in range(len(lats) - 1)], spacing_m
+
+    def cached_profile(self, route, spacing_m=None):
+        """The route's profile from cached legs alone, or None if any leg has not been profiled."""
+        keys, spacing_m = self._leg_keys(route, spacing_m)
+        legs = []
+        for key in keys:
+            leg = self._cached(key)
+            if leg is None:
+                return None
+            legs.append(leg)
+        return RouteProfile(legs, spacing_m)
+
+    def profile(self, route, progress=None, spacing_m=None):
+        """
+        Profile every leg of a route (sampled every spacing_m metres, the profiler's default if not
+        given), looking up the samples of all uncached legs in bulk. progress is passed through to
+        the provider's lookup_many. The profile's spacing_m is the one used, which is never below
+        MIN_SAMPLE_SPACING_M.
+        """
+        keys, spacing_m = self._leg_keys(route, spacing_m)
+        with span("elevation_profile.profile", "elevation", legs=len(keys)) as traced:
+            legs = [self._cached(key) for key in keys]
+            missing = {}  # Leg key -> indices of the legs that need it sampled
+            for i, key in enumerate(keys):
+                if legs[i] is None:
+                    missing.setdefault(key, []).append(i)
+            count("elevation_profile.cached_legs", len(legs) - sum(map(len, missing.values())))
+
+            if missing:
+                keys = list(missing)
+                lats1, lons1, lats2, lons2 = np.array([key[:4] for key in keys]).T
+                sample_lats, sample_lons, offsets, bounds = densify_pairs(lats1, lons1, lats2, lons2, spacing_m)
+                found = self.provider.lookup_many(list(zip(sample_lats.tolist(), sample_lons.tolist())), progress)
+                elevations = np.array([np.nan if e is None else e for e in found], dtype=np.float64)
+                for k, key in enumerate(keys):
+                    lo, hi = bounds[k], bounds[k + 1]
+                    leg = LegProfile(offsets[lo:hi], elevations[lo:hi])
+                    if leg.complete:
+                        self._store(key, leg)
+                    for i in missing[key]:
+                        legs[i] = leg
+                self.legs_sampled += len(keys)
+                count("elevation_profile.sampled_legs", len(keys))
+                traced.set(sampled_legs=len(missing), samples=len(sample_lats))
+        return RouteProfile(legs, spacing_m)
+
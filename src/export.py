@@ -2,13 +2,19 @@
 Handles exporting the itinerary to JSON and PDF formats.
 """
 
-import json
 import os
-from dataclasses import asdict
-from PIL import Image
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
 from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfgen import canvas
+from src.instrumentation import count, span
+from src.itinerary_io import is_ndjson, write_json, write_ndjson
 from src.planner import Itinerary
+from src.stats import DEFAULT_MAX_HOURS_PER_DAY
+from src.travel_time import FLAT
 
 # FOR FUTURE IMPLEMENTATION OF MAP IMAGE INSIDE GENERATED PDF.
 # def generate_map_image(itinerary, image_path="assets/route_map.png"):
@@ -34,65 +40,287 @@ from src.planner import Itinerary
 #     import imgkit
 #     imgkit.from_file(map_html, image_path)
 
-def export_to_json(itinerary, filename):
-    """Export the given itinerary to a JSON file."""
-    data = itinerary.to_dict()
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=4)
-
-
-def export_to_pdf(itinerary, filename):
-    """Export the given itinerary to a PDF file."""
-    c = canvas.Canvas(filename, pagesize=A4)
-    width, height = A4
-
-    # Draw the image at the top of the page
-    image_path = os.path.join(os.path.dirname(__file__), "../assets/aep_gui_header.png")
-
-    # Load image to get original size in pixels
-    img = Image.open(image_path)
-    img_width_px, img_height_px = img.size
-
-    # Convert pixels to PDF points
-    dpi = 72
-    img_width_pt = img_width_px * 72 / dpi
-    img_height_pt = img_height_px * 72 / dpi
-
-    # Scale down to 50%
-    scale = 0.5
-    img_width_pt *= scale
-    img_height_pt *= scale
-
-    # Center the image at the top
-    x = (width - img_width_pt) / 2
-    y = height - img_height_pt - 40
-
-    # Draw scaled image
-    c.drawImage(image_path, x, y, width=img_width_pt, height=img_height_pt)
-
-    # Move cursor below the image
-    y_position = y - 50
-
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(40, y_position, "Arctic Expedition Itinerary")
-    y_position -= 30
-
-    # Draw expedition summary
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y_position, f"Total Distance: {itinerary.total_distance():.2f} km")
-    y_position -= 20
-    c.drawString(50, y_position, f"Estimated Time: {itinerary.estimated_time():.2f} hours")
-    y_position -= 30
-
-    # Draw waypoint details
-    c.setFont("Helvetica", 12)
-    for i, wp in enumerate(itinerary.waypoints, 1):
-        text = f"{i}. {wp.name} | Lat: {wp.latitude:.4f}, Lon: {wp.longitude:.4f} | " f"Distance: {wp.distance_km:.2f} km | Speed: {wp.estimated_speed_kph:.1f} kph | Alt: {wp.altitude_m} m"
-        c.drawString(40, y_position, text)
-        y_position -= 20
-        if y_position < 50:
-            c.showPage()
-            y_position = height - 100
-            c.setFont("Helvetica", 12)
-
-    c.save()
+def export_to_json(itinerary, filename, max_hours_per_day=DEFAULT_MAX_HOURS_PER_DAY):
+    """
+    Export the given itinerary, with totals and daily stages, to a JSON file.
+    Waypoints are streamed to disk one at a time. A .ndjson or .jsonl filename writes
+    one waypoint per line instead, without the summary.
+    """
+    with span("export.json", "export", profile=True, waypoints=len(itinerary.waypoints)):
+        if is_ndjson(filename):
+            write_ndjson(itinerary.waypoints, filename)
+        else:
+            write_json(itinerary.waypoints, filename, summary=itinerary.stats().summary(max_hours_per_day))
+
+
+HEADER_IMAGE_PATH = os.path.join(os.path.dirname(__file__), "../assets/aep_gui_header.png")
+HEADER_FORM = "aep_header"
+PAGE_MARGIN = 40
+FOOTER_HEIGHT = 50
+ROW_HEIGHT = 14
+TABLE_FONT_SIZE = 8
+PROFILE_CHART_HEIGHT = 150
+PROFILE_MAX_LEG_MARKERS = 60  # Leg boundaries are marked on the chart only for routes up to this many legs
+
+# (title, width in points, alignment) of each waypoint table column
+TABLE_COLUMNS = [
+    ("No.", 34, "right"),
+    ("Name", 100, "left"),
+    ("Latitude", 58, "right"),
+    ("Longitude", 60, "right"),
+    ("Leg km", 48, "right"),
+    ("Speed kph", 50, "right"),
+    ("Alt m", 40, "right"),
+    ("Leg h", 44, "right"),
+    ("Total km", 60, "right"),
+]
+
+
+@dataclass
+class PdfRenderStats:
+    """Timing of a PDF export: render time of each page in seconds, in page order."""
+    page_seconds: list = field(default_factory=list)
+    total_seconds: float = 0.0
+
+    @property
+    def pages(self):
+        return len(self.page_seconds)
+
+
+@lru_cache(maxsize=None)
+def _header_image(path=HEADER_IMAGE_PATH):
+    """Decoded header image, shared by every export instead of being re-read each time."""
+    return ImageReader(path)
+
+
+def _fit_text(text, width, font_name, font_size):
+    """Truncate text with an ellipsis so it fits in a column of the given width."""
+    text_width = stringWidth(text, font_name, font_size)
+    if text_width <= width:
+        return text
+    text = text[:int(len(text) * width / text_width)]  # Close first guess, then trim to fit
+    while text and stringWidth(text + "...", font_name, font_size) > width:
+        text = text[:-1]
+    return text + "..."
+
+
+class _PdfRenderer:
+    """
+    Draws an itinerary onto a canvas page by page: a title page summary, the daily stages,
+    then a paginated waypoint table with column headings, page subtotals and page numbers.
+    Rows are drawn as they are read from the itinerary, so nothing is built up per waypoint.
+    """
+    def __init__(self, c, itinerary, max_hours_per_day, progress=None, profile=None):
+        self.c = c
+        self.itinerary = itinerary
+        self.max_hours_per_day = max_hours_per_day
+        self.progress = progress
+        self.profile = profile
+        self.width, self.height = c._pagesize
+        self.stats = PdfRenderStats()
+        self.page_number = 1
+        self.page_started = time.perf_counter()
+        self.page_distance = 0.0
+        self.page_time = 0.0
+        self.page_rows = 0
+        self.in_table = False
+        self.y = self.height
+
+    def render(self):
+        started = time.perf_counter()
+        self._define_header_form()
+        self._draw_title_page()
+        self._draw_stages()
+        self._draw_profile()
+        self._draw_table()
+        self._finish_page()
+        self.stats.total_seconds = time.perf_counter() - started
+        return self.stats
+
+    def _define_header_form(self):
+        """Store the header image once in the PDF as a form XObject that every page reuses."""
+        image = _header_image()
+        self.header_width, self.header_height = image.getSize()
+        self.c.beginForm(HEADER_FORM, 0, 0, self.header_width, self.header_height)
+        self.c.drawImage(image, 0, 0, width=self.header_width, height=self.header_height)
+        self.c.endForm()
+
+    def _draw_header(self, scale):
+        """Place the shared header form, centred at the top of the page."""
+        width, height = self.header_width * scale, self.header_height * scale
+        self.c.saveState()
+        self.c.translate((self.width - width) / 2, self.height - height - PAGE_MARGIN)
+        self.c.scale(scale, scale)
+        self.c.doForm(HEADER_FORM)
+        self.c.restoreState()
+        return self.height - height - PAGE_MARGIN
+
+    def _draw_title_page(self):
+        self.y = self._draw_header(0.5) - 50
+        self.c.setFont("Helvetica-Bold", 16)
+        self.c.drawString(PAGE_MARGIN, self.y, "Arctic Expedition Itinerary")
+        self.y -= 30
+        self.c.setFont("Helvetica-Bold", 12)
+        self.c.drawString(50, self.y, f"Total Distance: {self.itinerary.total_distance():.2f} km")
+        self.y -= 20
+        self.c.drawString(50, self.y, f"Estimated Time: {self.itinerary.estimated_time():.2f} hours")
+        model = getattr(self.itinerary, "speed_model", None)
+        if model is not None and model.name != FLAT:
+            self.y -= 20
+            self.c.setFont("Helvetica", 10)
+            self.c.drawString(50, self.y, f"Travel times adjusted for slope ({model.name} profile)")
+        self.y -= 30
+
+    def _new_page(self):
+        """Finish the current page and start the next one below a small copy of the header."""
+        self._finish_page()
+        self.c.showPage()
+        self.page_number += 1
+        self.page_started = time.perf_counter()
+        self.y = self._draw_header(0.2) - 20
+        if self.in_table:
+            self._draw_table_header()
+
+    def _finish_page(self):
+        """Draw the page footer (subtotals of the rows on this page and the page number) and time the page."""
+        self.c.setFont("Helvetica", 9)
+        if self.page_rows:
+            self.c.drawString(PAGE_MARGIN, FOOTER_HEIGHT - 20,
+                              f"Page subtotal: {self.page_rows} waypoints | {self.page_distance:.2f} km | "
+                              f"{self.page_time:.2f} hours")
+        self.c.drawRightString(self.width - PAGE_MARGIN, FOOTER_HEIGHT - 20, f"Page {self.page_number}")
+        self.page_distance = self.page_time = 0.0
+        self.page_rows = 0
+        self.stats.page_seconds.append(time.perf_counter() - self.page_started)
+        count("export.pdf_pages")
+
+    def _next_line(self, height):
+        """Move down by height, starting a new page first if it would run into the footer."""
+        if self.y - height < FOOTER_HEIGHT:
+            self._new_page()
+        self.y -= height
+
+    def _draw_stages(self):
+        stages = self.itinerary.stats().daily_stages(self.max_hours_per_day)
+        if not stages:
+            return
+        self.c.setFont("Helvetica-Bold", 12)
+        self.c.drawString(50, self.y, f"Daily Stages (max {self.max_hours_per_day:g} hours/day): {len(stages)} days")
+        self.y -= 6
+        for stage in stages:
+            self._next_line(16)
+            self.c.setFont("Helvetica", 10)
+            self.c.drawString(50, self.y,
+                              f"Day {stage.day}: WP {stage.start_index + 1} to WP {stage.end_index + 1} | "
+                              f"{stage.distance_km:.2f} km | {stage.time_hours:.2f} hours | "
+                              f"+{stage.ascent_m:.0f} m / -{stage.descent_m:.0f} m"
+                              + (" (over limit)" if stage.over_limit else ""))
+        self.y -= 24
+
+    def _draw_profile(self):
+        """Elevation profile chart along the route, then the climb and high point of each leg."""
+        profile = self.profile
+        if profile is None or profile.max_altitude_m is None:
+            return
+        distances, elevations = profile.chart_points(max_points=int(self.width))
+        self._next_line(16 + PROFILE_CHART_HEIGHT + 30)
+        self.c.setFont("Helvetica-Bold", 12)
+        self.c.drawString(50, self.y + PROFILE_CHART_HEIGHT + 30,
+                          f"Elevation Profile: +{profile.ascent_m:.0f} m / -{profile.descent_m:.0f} m, "
+                          f"max {profile.max_altitude_m:.0f} m")
+
+        left, right = PAGE_MARGIN + 40, self.width - PAGE_MARGIN
+        bottom, top = self.y, self.y + PROFILE_CHART_HEIGHT
+        low, high = min(0.0, float(elevations.min())), float(elevations.max())
+        high = max(high, low + 1.0)
+        length = max(float(distances[-1]), 1e-9)
+        x = left + (distances / length) * (right - left)
+        y = bottom + (elevations - low) / (high - low) * (top - bottom)
+
+        self.c.setLineWidth(0.5)
+        self.c.rect(left, bottom, right - left, top - bottom)
+        self.c.setFont("Helvetica", 7)
+        self.c.drawRightString(left - 4, top - 3, f"{high:.0f} m")
+        self.c.drawRightString(left - 4, bottom, f"{low:.0f} m")
+        self.c.drawString(left, bottom - 10, "0 km")
+        self.c.drawRightString(right, bottom - 10, f"{length:.1f} km")
+        _, _, leg_starts = profile.series()
+        if 1 < len(leg_starts) <= PROFILE_MAX_LEG_MARKERS:
+            self.c.setDash(1, 2)
+            for start in leg_starts[1:]:
+                marker = left + start / length * (right - left)
+                self.c.line(marker, bottom, marker, top)
+            self.c.setDash()
+        path = self.c.beginPath()
+        path.moveTo(x[0], y[0])
+        for px, py in zip(x[1:].tolist(), y[1:].tolist()):
+            path.lineTo(px, py)
+        self.c.setLineWidth(1)
+        self.c.drawPath(path, stroke=1, fill=0)
+        self.y -= 24
+
+        self.c.setFont("Helvetica", 10)
+        for i, leg in enumerate(profile.legs):
+            if leg.max_altitude_m is None:
+                continue
+            self._next_line(14)
+            self.c.drawString(50, self.y, f"Leg {i + 1}: WP {i + 1} to WP {i + 2} | {leg.length_km:.2f} km | "
+                                          f"+{leg.ascent_m:.0f} m / -{leg.descent_m:.0f} m | "
+                                          f"max {leg.max_altitude_m:.0f} m")
+        self.y -= 24
+
+    def _draw_table_header(self):
+        self._next_line(ROW_HEIGHT)
+        self.c.setFont("Helvetica-Bold", TABLE_FONT_SIZE)
+        self._draw_cells([title for title, _, _ in TABLE_COLUMNS], "Helvetica-Bold")
+        self.c.line(PAGE_MARGIN, self.y - 4, PAGE_MARGIN + sum(w for _, w, _ in TABLE_COLUMNS), self.y - 4)
+        self.c.setFont("Helvetica", TABLE_FONT_SIZE)
+
+    def _draw_cells(self, values, font_name):
+        x = PAGE_MARGIN
+        for value, (_, width, align) in zip(values, TABLE_COLUMNS):
+            # Numbers always fit their columns; only free text needs measuring
+            text = value if align == "right" else _fit_text(value, width - 6, font_name, TABLE_FONT_SIZE)
+            if align == "right":
+                self.c.drawRightString(x + width - 4, self.y, text)
+            else:
+                self.c.drawString(x + 4, self.y, text)
+            x += width
+
+    def _draw_table(self):
+        total = len(self.itinerary.waypoints)
+        if not total:
+            return
+        self.in_table = True
+        self._draw_table_header()
+        stats = self.itinerary.stats()
+        cumulative_km, _ = stats.cumulative()
+        leg_hours = stats.leg_times().tolist()
+        for i, wp in enumerate(self.itinerary.waypoints):
+            self._next_line(ROW_HEIGHT)
+            self._draw_cells([str(i + 1), wp.name, f"{wp.latitude:.4f}", f"{wp.longitude:.4f}",
+                              f"{wp.distance_km:.2f}", f"{wp.estimated_speed_kph:.1f}", str(wp.altitude_m),
+                              f"{leg_hours[i]:.2f}", f"{cumulative_km[i]:.2f}"], "Helvetica")
+            self.page_rows += 1
+            self.page_distance += wp.distance_km
+            self.page_time += leg_hours[i]
+            if self.progress is not None and self.y - ROW_HEIGHT < FOOTER_HEIGHT:
+                self.progress(i + 1, total)
+        self.in_table = False
+        if self.progress is not None:
+            self.progress(total, total)
+
+
+def export_to_pdf(itinerary, filename, max_hours_per_day=DEFAULT_MAX_HOURS_PER_DAY, progress=None, profile=None):
+    """
+    Export the given itinerary, with totals, daily stages and a paginated waypoint table, to a PDF file.
+    A RouteProfile from src/elevation_profile.py adds an elevation chart and per-leg climbs.
+    progress(done, total) is called as table pages fill up. Returns the per-page render times.
+    """
+    with span("export.pdf", "export", profile=True, waypoints=len(itinerary.waypoints)) as traced:
+        c = canvas.Canvas(filename, pagesize=A4, pageCompression=1)
+        stats = _PdfRenderer(c, itinerary, max_hours_per_day, progress, profile).render()
+        with span("export.pdf_save", "export"):
+            c.save()
+        traced.set(pages=stats.pages)
+    return stats
@@ -9,42 +9,75 @@ GUI for Arctic Expedition Planner, featuring:
 """
 
 import tkinter as tk
-from tkinter import messagebox, filedialog, font
+from tkinter import messagebox, filedialog, font, simpledialog
 from PIL import Image, ImageTk
+import hashlib
 import webbrowser
-import subprocess
-import threading
-import time
 import os
-import json
-import requests
+from dataclasses import replace
 
+import numpy as np
+
+from src.binary_format import BINARY_EXTENSION, read_binary
+from src.elevation import default_elevation_provider
+from src.elevation_profile import DEFAULT_SAMPLE_SPACING_M, ElevationProfiler
+from src.map_click_server import clicks, MapServer
+from src.optimizer import optimize_itinerary
 from src.planner import Waypoint, Itinerary
-from src.export import export_to_pdf, export_to_json
-from src.utils import is_valid_coordinate, format_coords, haversine_distance
-
-import folium
-
-def fetch_elevation(lat, lon):
-    """Query OpenTopoData API to get ground elevation for a given coordinate."""
-    try:
-        response = requests.get(
-            "https://api.opentopodata.org/v1/eudem25m",
-            params={"locations": f"{lat},{lon}"},
-            timeout=5
-        )
-        response.raise_for_status()
-        result = response.json()
-        return result["results"][0]["elevation"]
-    except Exception as e:
-        print(f"Elevation fetch failed: {e}")
-        return None
+from src.export import PROFILE_MAX_LEG_MARKERS, export_to_pdf, export_to_json
+from src.instrumentation import count, traced
+from src.itinerary_io import load_itinerary
+from src.stats import DEFAULT_MAX_HOURS_PER_DAY
+from src.tasks import TaskRunner, CANCELLED
+from src.travel_time import DEFAULT_TERRAIN_MODE, FLAT, SPEED_MODELS, get_speed_model
+from src.track_import import is_track_file, load_track
+from src.preview import DEFAULT_MAP_CACHE_DIR, itinerary_hash, render_preview_map
+from src.simplify import simplify_itinerary
+from src.spatial_index import DUPLICATE_RADIUS_M, SpatialIndex, near_duplicates
+from src.utils import is_valid_coordinate
+from src.virtual_list import VirtualListbox
+
+CLICK_POLL_MS = 100  # How often map clicks are collected from the click queue
+DEFAULT_SIMPLIFY_TOLERANCE_M = 10.0
+SNAP_DISTANCE_KM = 0.5  # Map clicks this close to a waypoint snap to it
+PROFILE_CHART_SIZE = (640, 240)  # Elevation profile canvas, in pixels
+ITINERARY_FILETYPES = [("JSON itinerary", "*.json"), ("Newline-delimited JSON", "*.ndjson *.jsonl"),
+                       ("All files", "*.*")]
+IMPORT_FILETYPES = ITINERARY_FILETYPES[:-1] + [("Binary itinerary", "*" + BINARY_EXTENSION),
+                                               ("GPS track", "*.gpx *.kml"), ("All files", "*.*")]
+
+
+def task_key(name, *columns):
+    """
+    Task key for a job over these input columns. Requests are coalesced by key, so a job whose
+    inputs changed while the previous one runs gets a task of its own instead of the stale result.
+    """
+    digest = hashlib.sha256()
+    for column in columns:
+        digest.update(np.ascontiguousarray(column).tobytes())
+    return name, digest.hexdigest()
 
 class ExpeditionPlannerGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Arctic Expedition Planner")
         self.waypoints = []
+        self.itinerary = Itinerary(self.waypoints, speed_model=get_speed_model(DEFAULT_TERRAIN_MODE))
+        self.spatial_index = SpatialIndex()  # Waypoint coordinates keyed by id(waypoint)
+        self.elevation_provider = None
+        self.elevation_profiler = None
+        self.map_cache_dir = DEFAULT_MAP_CACHE_DIR
+
+        # Slow jobs run on worker threads and report back through root.after
+        self.tasks = TaskRunner()
+        self.tasks.on_status = self.show_task_status
+        self.tasks.attach(root)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Map clicks are pushed into an in-process queue and collected from the main loop
+        self.map_server = MapServer()
+        self.click_cursor = clicks.last_seq
+        self.pending_clicks = []
 
         self.name_var = tk.StringVar()
         self.lat_var = tk.DoubleVar()
@@ -100,6 +133,8 @@ class ExpeditionPlannerGUI:
         tk.Button(button_frame, text="Preview Map", command=self.preview_map).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="Open Click Map", command=self.launch_map_server).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="Add from Map Click", command=self.load_clicked_point).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Add Clicked Path", command=self.add_clicked_path).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Import Itinerary", command=self.import_itinerary).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="Export as JSON", command=self.export_json).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="Export as PDF", command=self.export_pdf).pack(side=tk.LEFT, padx=5)
 
@@ -107,26 +142,16 @@ class ExpeditionPlannerGUI:
         headers = f"{'No.':<5} {'Name':<20} {'Coordinates':<30} {'Dist. from prev. WP (km)':>10}"
         tk.Label(root, text=headers, font=mono_font).grid(row=8, column=0, columnspan=3, sticky="w", padx=10)
 
-        # Waypoint list frame with scrollbars
-        list_frame = tk.Frame(root)
-        list_frame.grid(row=9, column=0, columnspan=3, sticky="nsew")
-
-        self.waypoint_listbox = tk.Listbox(
-            list_frame,
+        # Waypoint list with scrollbar; only the rows in view are formatted and drawn
+        self.waypoint_listbox = VirtualListbox(
+            root,
+            row_count=lambda: len(self.waypoints),
+            format_row=self.format_waypoint_row,
             font=mono_font,
             height=8,
             width=100
         )
-        self.waypoint_listbox.grid(row=0, column=0, sticky="nsew")
-
-        yscroll = tk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.waypoint_listbox.yview)
-        yscroll.grid(row=0, column=1, sticky="ns")
-
-        list_frame.grid_rowconfigure(0, weight=1)
-        list_frame.grid_columnconfigure(0, weight=1)
-
-        self.waypoint_listbox.config(yscrollcommand=yscroll.set)
-        self.waypoint_listbox.config(exportselection=False)
+        self.waypoint_listbox.grid(row=9, column=0, columnspan=3, sticky="nsew")
 
         # Waypoint control buttons
         wp_button_frame = tk.Frame(root)
@@ -134,6 +159,14 @@ class ExpeditionPlannerGUI:
         tk.Button(wp_button_frame, text="Delete Waypoint", command=self.delete_waypoint).pack(side=tk.LEFT, padx=5)
         tk.Button(wp_button_frame, text="Move Up", command=self.move_waypoint_up).pack(side=tk.LEFT, padx=5)
         tk.Button(wp_button_frame, text="Move Down", command=self.move_waypoint_down).pack(side=tk.LEFT, padx=5)
+        tk.Button(wp_button_frame, text="Fetch All Altitudes", command=self.fill_altitudes).pack(side=tk.LEFT, padx=5)
+        tk.Button(wp_button_frame, text="Simplify Route", command=self.simplify_route).pack(side=tk.LEFT, padx=5)
+        tk.Button(wp_button_frame, text="Optimize Order", command=self.optimize_order).pack(side=tk.LEFT, padx=5)
+        tk.Button(wp_button_frame, text="Elevation Profile",
+                  command=self.show_elevation_profile).pack(side=tk.LEFT, padx=5)
+        self.profile_spacing_var = tk.DoubleVar(value=DEFAULT_SAMPLE_SPACING_M)
+        tk.Label(wp_button_frame, text="every (m)").pack(side=tk.LEFT)
+        tk.Entry(wp_button_frame, textvariable=self.profile_spacing_var, width=6).pack(side=tk.LEFT, padx=5)
 
         # Summary labels
         summary_frame = tk.Frame(root)
@@ -144,6 +177,39 @@ class ExpeditionPlannerGUI:
         self.total_time_label = tk.Label(summary_frame, text="Estimated Time: 0.0 hours")
         self.total_time_label.pack(pady=(0,10), anchor="center")
 
+        # Daily stage splitting and cumulative stats for the selected waypoint
+        self.max_hours_var = tk.DoubleVar(value=DEFAULT_MAX_HOURS_PER_DAY)
+        stage_frame = tk.Frame(summary_frame)
+        stage_frame.pack(anchor="center")
+        tk.Label(stage_frame, text="Max Travel Hours/Day").pack(side=tk.LEFT)
+        tk.Entry(stage_frame, textvariable=self.max_hours_var, width=6).pack(side=tk.LEFT, padx=5)
+        tk.Button(stage_frame, text="Update Stages", command=self.update_summary).pack(side=tk.LEFT)
+
+        # Travel-time model: flat distance/speed, or slope-adjusted for the mode of travel
+        self.speed_model_var = tk.StringVar(value=DEFAULT_TERRAIN_MODE)
+        tk.Label(stage_frame, text="Travel Model").pack(side=tk.LEFT, padx=(15, 0))
+        tk.OptionMenu(stage_frame, self.speed_model_var, *SPEED_MODELS,
+                      command=lambda _: self.change_speed_model()).pack(side=tk.LEFT, padx=5)
+
+        self.stages_label = tk.Label(summary_frame, text="Daily Stages: -", justify=tk.LEFT, font=mono_font)
+        self.stages_label.pack(pady=(5,0), anchor="center")
+
+        self.selection_label = tk.Label(summary_frame, text="")
+        self.selection_label.pack(pady=(0,10), anchor="center")
+        self.waypoint_listbox.bind("<<ListboxSelect>>", lambda event: self.show_selection_stats())
+
+        # Background task status
+        status_frame = tk.Frame(root)
+        status_frame.grid(row=12, column=0, columnspan=3, sticky="ew", padx=10, pady=(0,10))
+        self.status_label = tk.Label(status_frame, text="Ready", anchor="w")
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        tk.Button(status_frame, text="Cancel Tasks", command=self.tasks.cancel_all).pack(side=tk.RIGHT)
+        tk.Button(status_frame, text="Clear Clicks", command=self.clear_clicks).pack(side=tk.RIGHT, padx=5)
+        self.clicks_label = tk.Label(status_frame, text="Map clicks: 0")
+        self.clicks_label.pack(side=tk.RIGHT, padx=5)
+
+        self.root.after(CLICK_POLL_MS, self.poll_map_clicks)
+
 
     def toggle_distance_field(self):
         """Enable or disable manual editing of the Distance field."""
@@ -152,6 +218,7 @@ class ExpeditionPlannerGUI:
         else:
             self.distance_entry.config(state='readonly')
 
+    @traced("gui.add_waypoint", "gui")
     def add_waypoint(self):
         """Add a waypoint and calculate or accept distance."""
         lat = self.lat_var.get()
@@ -161,26 +228,23 @@ class ExpeditionPlannerGUI:
             messagebox.showerror("Invalid Input", "Latitude or Longitude is out of valid range.")
             return
 
-        if self.manual_distance_enabled.get():
-            distance_km = self.dist_var.get()
-        else:
-            if self.waypoints:
-                prev = self.waypoints[-1]
-                distance_km = haversine_distance(prev.latitude, prev.longitude, lat, lon)
-            else:
-                distance_km = 0.0
-            self.dist_var.set(distance_km)  # Only update the field in auto mode
-
+        manual = self.manual_distance_enabled.get()
         wp = Waypoint(
             name=self.name_var.get(),
             latitude=lat,
             longitude=lon,
-            distance_km=distance_km,
+            distance_km=self.dist_var.get() if manual else 0.0,
             estimated_speed_kph=self.speed_var.get(),
             altitude_m=self.alt_var.get()
         )
 
-        self.waypoints.append(wp)
+        # Only the new leg is computed; earlier legs and the totals are left as they are
+        self.itinerary.append_waypoint(wp, recalculate=not manual)
+        self.spatial_index.insert(id(wp), wp.latitude, wp.longitude)
+        distance_km = wp.distance_km
+        if not manual:
+            self.dist_var.set(distance_km)  # Only update the field in auto mode
+
         self.refresh_waypoint_list()
 
         # Confirm to user
@@ -191,40 +255,39 @@ class ExpeditionPlannerGUI:
         self.toggle_distance_field()
 
 
+    def format_waypoint_row(self, idx):
+        """Waypoint list line for the waypoint at idx."""
+        wp = self.waypoints[idx]
+        num = f"{idx+1:<5}"
+        name = f"{wp.name:<20.20}"
+        coords = f"({wp.latitude:.4f}, {wp.longitude:.4f})"
+        coords = f"{coords:<30}"
+        dist = f"{wp.distance_km:>10.2f}"
+        return f"{num}{name}{coords}{dist}"
+
+    @traced("gui.refresh_waypoint_list", "gui")
     def refresh_waypoint_list(self):
-        """Update the current itinerary and recalculate distances."""
-        if not self.manual_distance_enabled.get():
-            self.recalculate_distances()
-        
-        self.waypoint_listbox.delete(0, tk.END)
-
-        for idx, wp in enumerate(self.waypoints):
-            num = f"{idx+1:<5}"
-            name = f"{wp.name:<20.20}"
-            coords = f"({wp.latitude:.4f}, {wp.longitude:.4f})"
-            coords = f"{coords:<30}"
-            dist = f"{wp.distance_km:>10.2f}"
-            line = f"{num}{name}{coords}{dist}"
-            self.waypoint_listbox.insert(tk.END, line)
+        """
+        Redraw the visible part of the itinerary, keeping the selection and scroll position.
+        Leg distances are kept up to date by the edit operations.
+        """
+        self.waypoint_listbox.refresh()
 
         self.update_summary()
 
     def recalculate_distances(self):
         """Recalculate distances the current itinerary."""
-        for i, wp in enumerate(self.waypoints):
-            if i == 0:
-                wp.distance_km = 0.0
-            else:
-                prev = self.waypoints[i-1]
-                wp.distance_km = haversine_distance(prev.latitude, prev.longitude, wp.latitude, wp.longitude)
+        self.itinerary.recalculate_distances()
 
+    @traced("gui.delete_waypoint", "gui")
     def delete_waypoint(self):
         """Delete a waypoint, updating the current itinerary and recalculating distances."""
         idx = self.waypoint_listbox.curselection()
         if not idx:
             messagebox.showwarning("No Selection", "Select a waypoint to delete.")
             return
-        del self.waypoints[idx[0]]
+        self.spatial_index.remove(id(self.waypoints[idx[0]]))
+        self.itinerary.delete_waypoint(idx[0])
         self.refresh_waypoint_list()
 
         self.update_summary()
@@ -235,9 +298,10 @@ class ExpeditionPlannerGUI:
         if not idx or idx[0] == 0:
             return
         i = idx[0]
-        self.waypoints[i-1], self.waypoints[i] = self.waypoints[i], self.waypoints[i-1]
+        self.itinerary.swap_waypoints(i-1, i)
         self.refresh_waypoint_list()
         self.waypoint_listbox.selection_set(i-1)
+        self.waypoint_listbox.see(i-1)
 
         self.update_summary()
 
@@ -247,99 +311,459 @@ class ExpeditionPlannerGUI:
         if not idx or idx[0] >= len(self.waypoints)-1:
             return
         i = idx[0]
-        self.waypoints[i+1], self.waypoints[i] = self.waypoints[i], self.waypoints[i+1]
+        self.itinerary.swap_waypoints(i, i+1)
         self.refresh_waypoint_list()
         self.waypoint_listbox.selection_set(i+1)
+        self.waypoint_listbox.see(i+1)
 
         self.update_summary()
 
+    def fill_altitudes(self):
+        """Look up ground elevation for every waypoint with batched API requests in the background."""
+        if not self.waypoints:
+            messagebox.showinfo("No Waypoints", "Add at least one waypoint to look up altitudes.")
+            return
+        self.lookup_altitudes(list(self.waypoints))
+
+    def lookup_altitudes(self, targets, key="fill_altitudes"):
+        """Fetch elevations for the given waypoints in one background job and apply them afterwards."""
+        provider = self.get_elevation_provider()
+
+        # Look up off the main thread; results are applied to the same waypoint objects afterwards
+        points = [(wp.latitude, wp.longitude) for wp in targets]
+
+        def lookup(task):
+            return provider.lookup_many(
+                points, progress=lambda done, total: task.report_progress(done / total, f"{done}/{total} batches"))
+
+        def apply(elevations):
+            updated = 0
+            for wp, elevation in zip(targets, elevations):
+                if elevation is not None:
+                    wp.altitude_m = int(round(elevation))
+                    updated += 1
+            self.itinerary.reset_running_totals()
+            self.refresh_waypoint_list()
+            messagebox.showinfo("Altitudes Updated",
+                f"Elevation found for {updated} of {len(targets)} waypoints.")
+
+        key = task_key(key, [wp.latitude for wp in targets], [wp.longitude for wp in targets],
+                       [id(wp) for wp in targets])
+        self.tasks.submit(lookup, key=key, description="Fetching altitudes",
+                          on_done=apply, on_error=self.show_task_error)
+
+    def get_elevation_provider(self):
+        """Offline DEM tiles when configured, with the cached OpenTopoData API as fallback."""
+        if self.elevation_provider is None:
+            self.elevation_provider = default_elevation_provider()
+        return self.elevation_provider
+
+    def get_elevation_profiler(self):
+        """Shared profiler, so legs profiled once are reused after reorders and edits."""
+        if self.elevation_profiler is None:
+            self.elevation_profiler = ElevationProfiler(self.get_elevation_provider())
+        return self.elevation_profiler
+
+    def profile_spacing(self):
+        """Sample spacing from the entry field, or the default when it is not a positive number."""
+        try:
+            spacing = float(self.profile_spacing_var.get())
+        except (tk.TclError, ValueError):
+            return DEFAULT_SAMPLE_SPACING_M
+        return spacing if spacing > 0 else DEFAULT_SAMPLE_SPACING_M
+
+    def show_elevation_profile(self):
+        """Sample the ground along every leg in the background and chart it in a new window."""
+        if len(self.waypoints) < 2:
+            messagebox.showinfo("No Route", "Add at least two waypoints to see an elevation profile.")
+            return
+        profiler = self.get_elevation_profiler()
+        points = [(wp.latitude, wp.longitude) for wp in self.waypoints]
+        spacing = self.profile_spacing()
+
+        def build(task):
+            return profiler.profile(points, spacing_m=spacing, progress=lambda done, total: task.report_progress(
+                done / total, f"{done}/{total} batches"))
+
+        key = task_key("elevation_profile", points, [spacing])
+        self.tasks.submit(build, key=key, description="Sampling elevation profile",
+                          on_done=self.draw_elevation_profile, on_error=self.show_task_error)
+
+    def draw_elevation_profile(self, profile):
+        """Chart a RouteProfile in its own window, with dotted lines at the waypoints."""
+        if profile.max_altitude_m is None:
+            messagebox.showinfo("Elevation Profile", "No elevation data was found along the route.")
+            return
+        width, height = PROFILE_CHART_SIZE
+        pad = 40
+        window = tk.Toplevel(self.root)
+        window.title("Elevation Profile")
+        tk.Label(window, text=f"Ascent {profile.ascent_m:.0f} m | Descent {profile.descent_m:.0f} m | "
+                              f"Max {profile.max_altitude_m:.0f} m | {profile.samples} samples every "
+                              f"{profile.spacing_m:g} m").pack(padx=10, pady=(10, 0))
+        chart = tk.Canvas(window, width=width, height=height, background="white")
+        chart.pack(padx=10, pady=10)
+
+        distances, elevations = profile.chart_points(max_points=2 * width)
+        _, _, leg_starts = profile.series()
+        low, high = min(0.0, float(elevations.min())), float(elevations.max())
+        high = max(high, low + 1.0)
+        length = max(float(distances[-1]), 1e-9)
+        xs = pad + distances / length * (width - 2 * pad)
+        ys = height - pad - (elevations - low) / (high - low) * (height - 2 * pad)
+
+        chart.create_rectangle(pad, pad, width - pad, height - pad, outline="grey")
+        for start in (leg_starts[1:] if len(leg_starts) <= PROFILE_MAX_LEG_MARKERS else []):
+            x = pad + start / length * (width - 2 * pad)
+            chart.create_line(x, pad, x, height - pad, fill="grey", dash=(1, 3))
+        if len(xs) > 1:
+            chart.create_line(*np.column_stack([xs, ys]).ravel().tolist(), fill="steelblue", width=2)
+        chart.create_text(pad - 4, pad, text=f"{high:.0f} m", anchor="e")
+        chart.create_text(pad - 4, height - pad, text=f"{low:.0f} m", anchor="e")
+        chart.create_text(width - pad, height - pad + 12, text=f"{length:.1f} km", anchor="e")
+        return window
+
+    @traced("gui.update_summary", "gui")
     def update_summary(self):
-        """Update total distance and estimated travel time display."""
-        total_distance = sum(wp.distance_km for wp in self.waypoints)
-        total_time = 0.0
-        for wp in self.waypoints:
-            if wp.estimated_speed_kph > 0:
-                total_time += wp.distance_km / wp.estimated_speed_kph
+        """Update total distance and estimated travel time display from the running totals."""
+        total_distance = self.itinerary.running_distance
+        total_time = self.itinerary.running_time
 
         self.total_distance_label.config(text=f"Total Distance: {total_distance:.2f} km")
-        self.total_time_label.config(text=f"Estimated Time: {total_time:.2f} hours")
+        model = self.itinerary.speed_model
+        terrain = f" ({model.name}, slope-adjusted)" if model is not None and model.name != FLAT else ""
+        self.total_time_label.config(text=f"Estimated Time: {total_time:.2f} hours{terrain}")
+
+        max_hours = self.max_hours_per_day()
+        stages = self.itinerary.stats().daily_stages(max_hours)
+        lines = [f"Daily Stages: {len(stages)} day(s) at up to {max_hours:g} hours/day"]
+        for stage in stages[:5]:
+            flag = " (long leg)" if stage.over_limit else ""
+            lines.append(f"Day {stage.day}: WP {stage.start_index + 1}-{stage.end_index + 1}, "
+                         f"{stage.distance_km:.2f} km, {stage.time_hours:.2f} h{flag}")
+        if len(stages) > 5:
+            lines.append(f"... {len(stages) - 5} more day(s)")
+        self.stages_label.config(text="\n".join(lines))
+        self.show_selection_stats()
+
+    def change_speed_model(self):
+        """Switch the travel-time model selected in the summary and refresh the totals."""
+        self.itinerary.set_speed_model(get_speed_model(self.speed_model_var.get()))
+        self.update_summary()
+
+    def max_hours_per_day(self):
+        """Return the daily travel limit from the summary field, falling back to the default."""
+        try:
+            max_hours = self.max_hours_var.get()
+        except tk.TclError:
+            return DEFAULT_MAX_HOURS_PER_DAY
+        return max_hours if max_hours > 0 else DEFAULT_MAX_HOURS_PER_DAY
+
+    @traced("gui.show_selection_stats", "gui")
+    def show_selection_stats(self):
+        """Show cumulative distance and time from the start to the selected waypoint."""
+        idx = self.waypoint_listbox.curselection()
+        if not idx or idx[0] >= len(self.waypoints):
+            self.selection_label.config(text="")
+            return
+        stats = self.itinerary.stats()
+        i = idx[0]
+        self.selection_label.config(
+            text=f"WP {i + 1} reached after {stats.cumulative_distance(i):.2f} km "
+                 f"and {stats.cumulative_time(i):.2f} hours")
+
+    @traced("gui.reindex_waypoints", "gui")
+    def reindex_waypoints(self):
+        """Rebuild the spatial index after the waypoint list has been replaced wholesale."""
+        self.spatial_index.reset([id(wp) for wp in self.waypoints], [wp.latitude for wp in self.waypoints],
+                                 [wp.longitude for wp in self.waypoints])
+
+    def snap_click(self, click):
+        """The waypoint nearest a map click as (index, waypoint, distance_km) if within SNAP_DISTANCE_KM, else None."""
+        match = self.spatial_index.nearest(click.latitude, click.longitude, max_distance_km=SNAP_DISTANCE_KM)
+        if match:
+            for i, wp in enumerate(self.waypoints):
+                if id(wp) == match[0].key:
+                    return i, wp, match[0].distance_km
+        return None
+
+    def snapshot_itinerary(self):
+        """Copy the waypoints so background jobs never see edits made while they run."""
+        return Itinerary([replace(wp) for wp in self.waypoints], speed_model=self.itinerary.speed_model)
+
+    def import_itinerary(self):
+        """Replace the current itinerary with one loaded from an itinerary file or a GPX/KML track."""
+        filename = filedialog.askopenfilename(filetypes=IMPORT_FILETYPES)
+        if not filename:
+            return
+
+        def load(task):
+            if filename.lower().endswith(BINARY_EXTENSION):
+                itinerary = read_binary(filename, columnar=False)
+            elif is_track_file(filename):
+                itinerary = load_track(filename, progress=lambda done, total: task.report_progress(
+                    done / total, f"{done / 2 ** 20:.0f}/{total / 2 ** 20:.0f} MB"))
+            else:
+                itinerary = load_itinerary(filename)
+            duplicates = near_duplicates([wp.latitude for wp in itinerary.waypoints],
+                                         [wp.longitude for wp in itinerary.waypoints])
+            return itinerary, duplicates
+
+        def apply(loaded):
+            itinerary, duplicates = loaded
+            if len(duplicates) and messagebox.askyesno(
+                    "Import", f"{len(duplicates)} waypoints are within {DUPLICATE_RADIUS_M:g} m of an earlier "
+                              f"waypoint. Remove them?"):
+                itinerary = self.drop_waypoints(itinerary, duplicates)
+            self.waypoints[:] = itinerary.waypoints
+            self.itinerary.reset_running_totals()
+            self.reindex_waypoints()
+            self.refresh_waypoint_list()
+            messagebox.showinfo("Import", f"Imported {len(self.waypoints)} waypoints.")
+
+        self.tasks.submit(load, key=("import", filename),
+                          description="Importing itinerary", on_done=apply, on_error=self.show_task_error)
+
+    def drop_waypoints(self, itinerary, indices):
+        """Itinerary without the waypoints at the given positions; the legs that closed up are recomputed."""
+        keep = np.ones(len(itinerary.waypoints), dtype=bool)
+        keep[indices] = False
+        kept = Itinerary([wp for wp, k in zip(itinerary.waypoints, keep.tolist()) if k])
+        # A leg changes wherever the waypoint before it was dropped
+        position = np.cumsum(keep) - 1
+        kept.refresh_legs(position[1:][keep[1:] & ~keep[:-1]].tolist())
+        return kept
+
+    def simplify_route(self):
+        """
+        Thin out a dense track to within a tolerance in metres. When waypoints between the ends
+        have names (typed in, from map clicks or from a track file), the user chooses whether they
+        are all kept or simplified like any other point.
+        """
+        if len(self.waypoints) < 3:
+            messagebox.showinfo("Simplify Route", "Add at least three waypoints to simplify the route.")
+            return
+        tolerance = simpledialog.askfloat("Simplify Route", "Tolerance (metres):",
+                                          initialvalue=DEFAULT_SIMPLIFY_TOLERANCE_M, minvalue=0.0)
+        if tolerance is None:
+            return
+        named = sum(1 for wp in self.waypoints[1:-1] if wp.name.strip())
+        preserve_named = False
+        if named:
+            preserve_named = messagebox.askyesnocancel(
+                "Simplify Route", f"Keep all {named} named waypoints between the start and end?\n"
+                                  "Choose No to simplify them like unnamed track points.")
+            if preserve_named is None:
+                return
+        itinerary = self.snapshot_itinerary()
+
+        def apply(result):
+            self.waypoints[:] = result.itinerary.waypoints
+            self.itinerary.reset_running_totals()
+            self.reindex_waypoints()
+            self.refresh_waypoint_list()
+            messagebox.showinfo("Simplify Route",
+                                f"Kept {result.kept_points} of {result.original_points} waypoints.\n"
+                                f"Largest offset: {result.max_offset_m:.1f} m\n"
+                                f"Distance lost: {result.distance_error_km:.2f} km")
+
+        self.tasks.submit(lambda task: simplify_itinerary(itinerary, tolerance_m=tolerance,
+                                                          preserve_named=preserve_named),
+                          key="simplify", description="Simplifying route", on_done=apply,
+                          on_error=self.show_task_error)
+
+    def optimize_order(self):
+        """Reorder the waypoints for the shortest route from the first one, in the background."""
+        if len(self.waypoints) < 3:
+            messagebox.showinfo("Optimize Order", "Add at least three waypoints to optimize their order.")
+            return
+        fixed_end = messagebox.askyesnocancel("Optimize Order", "Keep the last waypoint as the end point?")
+        if fixed_end is None:
+            return
+        itinerary = self.snapshot_itinerary()
+
+        def apply(result):
+            self.waypoints[:] = result.itinerary.waypoints
+            self.itinerary.reset_running_totals()
+            self.reindex_waypoints()
+            self.refresh_waypoint_list()
+            note = "" if result.converged else "\n(Stopped at the time limit; running again may improve it.)"
+            messagebox.showinfo("Optimize Order",
+                                f"Route distance: {result.before_km:.2f} km -> {result.after_km:.2f} km\n"
+                                f"Saved {result.saved_km:.2f} km ({result.saved_percent:.1f}%) "
+                                f"in {result.seconds:.1f} s{note}")
+
+        self.tasks.submit(lambda task: optimize_itinerary(itinerary, fixed_start=True, fixed_end=fixed_end),
+                          key="optimize", description="Optimizing waypoint order", on_done=apply,
+                          on_error=self.show_task_error)
 
     def export_json(self):
-        """Export itinerary to a JSON file using a Save As dialog."""
-        filename = filedialog.asksaveasfilename(defaultextension=".json")
+        """Export itinerary to a JSON (or NDJSON) file using a Save As dialog."""
+        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=ITINERARY_FILETYPES)
         if filename:
-            export_to_json(Itinerary(self.waypoints), filename)
-            messagebox.showinfo("Export", "Exported itinerary to JSON.")
+            itinerary = self.snapshot_itinerary()
+            max_hours = self.max_hours_per_day()
+            self.tasks.submit(lambda task: export_to_json(itinerary, filename, max_hours_per_day=max_hours),
+                              key=("export", filename), description="Exporting JSON",
+                              on_done=lambda _: messagebox.showinfo("Export", "Exported itinerary to JSON."),
+                              on_error=self.show_task_error)
 
     def export_pdf(self):
         """Export current itinerary as a PDF file."""
         filename = filedialog.asksaveasfilename(defaultextension=".pdf")
         if filename:
-            export_to_pdf(Itinerary(self.waypoints), filename)
-            messagebox.showinfo("Export", "Exported itinerary to PDF.")
+            itinerary = self.snapshot_itinerary()
+            max_hours = self.max_hours_per_day()
+            profiler, spacing = self.elevation_profiler, self.profile_spacing()
+
+            def render(task):
+                # Include the elevation profile when every leg has been profiled (no lookups here)
+                profile = profiler.cached_profile(itinerary, spacing_m=spacing) if profiler else None
+                return export_to_pdf(itinerary, filename, max_hours_per_day=max_hours, profile=profile,
+                                     progress=lambda done, total: task.report_progress(
+                                         done / total, f"{done}/{total} waypoints"))
+
+            self.tasks.submit(render, key=("export", filename), description="Exporting PDF",
+                              on_done=lambda stats: messagebox.showinfo(
+                                  "Export", f"Exported itinerary to PDF ({stats.pages} pages in "
+                                            f"{stats.total_seconds:.1f} s)."),
+                              on_error=self.show_task_error)
 
     def preview_map(self):
-        """Generate interactive map with waypoints and polyline path."""
+        """Open an interactive map of the route, reusing the cached render if nothing has changed."""
         if not self.waypoints:
             messagebox.showinfo("No Waypoints", "Add at least one waypoint to preview on the map.")
             return
 
-        lat_center = self.waypoints[0].latitude
-        lon_center = self.waypoints[0].longitude
-        m = folium.Map(location=[lat_center, lon_center], zoom_start=7)
+        names = [wp.name for wp in self.waypoints]
+        lats = [wp.latitude for wp in self.waypoints]
+        lons = [wp.longitude for wp in self.waypoints]
 
-        points = []
-        for wp in self.waypoints:
-            folium.Marker(
-                location=[wp.latitude, wp.longitude],
-                popup=f"{wp.name}<br>{format_coords(wp.latitude, wp.longitude)}",
-                tooltip=wp.name
-            ).add_to(m)
-            points.append([wp.latitude, wp.longitude])
+        def build_map(task):
+            return render_preview_map(names, lats, lons, cache_dir=self.map_cache_dir,
+                                      check_cancelled=task.check_cancelled)
 
-        folium.PolyLine(points, color="blue", weight=3, opacity=0.7).add_to(m)
-
-        map_path = "map.html"
-        m.save(map_path)
-        webbrowser.open(map_path)
+        self.tasks.submit(build_map, key=("preview_map", itinerary_hash(names, lats, lons)),
+                          description="Building preview map",
+                          on_done=webbrowser.open, on_error=self.show_task_error)
 
     def launch_map_server(self):
-        """Launch the Flask server for map clicks and open browser."""
-        def start_server():
-            subprocess.run(["python", "src/map_click_server.py"], check=False)
-
-        threading.Thread(target=start_server, daemon=True).start()
-        time.sleep(1)
-        webbrowser.open("http://127.0.0.1:5000")
+        """Start (or reuse) the in-process click map server and open browser once it is serving."""
+        self.tasks.submit(lambda task: self.map_server.start(), key="map_server",
+                          description="Starting map server", on_done=webbrowser.open,
+                          on_error=self.show_task_error)
+
+    def show_task_status(self, task):
+        """Reflect background task state and progress in the status bar."""
+        active = self.tasks.active_tasks()
+        if active:
+            current = active[-1] if task not in active else task
+            text = current.description
+            if current.progress:
+                text += f"... {current.progress:.0%}"
+            if current.message:
+                text += f" ({current.message})"
+            if len(active) > 1:
+                text += f" [+{len(active) - 1} more]"
+        elif task.status == CANCELLED:
+            text = f"{task.description} cancelled"
+        else:
+            text = "Ready"
+        self.status_label.config(text=text)
+
+    def show_task_error(self, error):
+        """Report a failed background task."""
+        messagebox.showerror("Task Failed", str(error))
+
+    def on_close(self):
+        """Stop background work and close the window."""
+        self.tasks.shutdown()
+        self.map_server.shutdown()
+        self.root.destroy()
+
+    def poll_map_clicks(self):
+        """Collect clicks pushed by the map page since the last poll; reschedules itself."""
+        new = clicks.since(self.click_cursor)
+        if new:
+            self.click_cursor = new[-1].seq
+            self.pending_clicks.extend(new)
+            count("gui.map_clicks", len(new))
+            self.clicks_label.config(text=f"Map clicks: {len(self.pending_clicks)}")
+        self.root.after(CLICK_POLL_MS, self.poll_map_clicks)
+
+    def clear_clicks(self):
+        """Forget map clicks that have not been added yet."""
+        self.pending_clicks.clear()
+        self.clicks_label.config(text="Map clicks: 0")
 
     def load_clicked_point(self):
-        """Load clicked coordinates and elevation, populate GUI fields."""
-        if not os.path.exists("click_coords.json"):
+        """
+        Load the most recent map click and its elevation into the GUI fields.
+        A click close to an existing waypoint snaps to it and selects it in the list.
+        """
+        if not self.pending_clicks:
             messagebox.showerror("No Click Data", "No clicked location found. Use the map first.")
             return
 
-        with open("click_coords.json") as f:
-            data = json.load(f)
-        lat = float(data['latitude'])
-        lon = float(data['longitude'])
+        click = self.pending_clicks[-1]
+        lat = click.latitude
+        lon = click.longitude
 
         if not (is_valid_coordinate(lat) and is_valid_coordinate(lon)):
             messagebox.showerror("Invalid Coords", "Coordinates are not valid.")
             return
 
+        snapped = ""
+        snap = self.snap_click(click)
+        if snap is not None:
+            i, wp, distance_km = snap
+            lat, lon = wp.latitude, wp.longitude
+            self.waypoint_listbox.selection_set(i)
+            self.waypoint_listbox.see(i)
+            snapped = f"Snapped to waypoint {i + 1} ({wp.name}), {distance_km * 1000:.0f} m from the click\n"
+
         self.lat_var.set(lat)
         self.lon_var.set(lon)
 
-        elevation = fetch_elevation(lat, lon)
-        if elevation is not None:
-            self.alt_var.set(int(round(elevation)))
-            messagebox.showinfo("Coordinates Loaded",
-                f"Latitude and Longitude fields updated to: {lat}, {lon}\n"
-                f"Estimated Altitude: {elevation} m")
-        else:
-            messagebox.showinfo("Coordinates Loaded",
-                f"Latitude and Longitude fields updated to: {lat}, {lon}\n"
-                f"(Elevation lookup failed)")
+        def show_elevation(elevation):
+            if elevation is not None:
+                self.alt_var.set(int(round(elevation)))
+                messagebox.showinfo("Coordinates Loaded",
+                    f"{snapped}Latitude and Longitude fields updated to: {lat}, {lon}\n"
+                    f"Estimated Altitude: {elevation} m")
+            else:
+                messagebox.showinfo("Coordinates Loaded",
+                    f"{snapped}Latitude and Longitude fields updated to: {lat}, {lon}\n"
+                    f"(Elevation lookup failed)")
+
+        provider = self.get_elevation_provider()
+        self.tasks.submit(lambda task: provider.lookup(lat, lon), key=("elevation", lat, lon),
+                          description="Looking up elevation", on_done=show_elevation,
+                          on_error=self.show_task_error)
+
+    @traced("gui.add_clicked_path", "gui")
+    def add_clicked_path(self):
+        """
+        Append every pending map click as a waypoint in one operation, then fetch their altitudes.
+        Clicks close to an existing waypoint take its exact coordinates.
+        """
+        if not self.pending_clicks:
+            messagebox.showerror("No Click Data", "No clicked locations found. Use the map first.")
+            return
+
+        start = len(self.waypoints)
+        path = []
+        for i, click in enumerate(self.pending_clicks):
+            snap = self.snap_click(click)
+            lat, lon = (snap[1].latitude, snap[1].longitude) if snap else (click.latitude, click.longitude)
+            path.append(Waypoint(name=f"Map Point {start + i + 1}", latitude=lat, longitude=lon,
+                                 distance_km=0.0, estimated_speed_kph=self.speed_var.get(), altitude_m=0))
+        self.itinerary.extend_waypoints(path)
+        self.spatial_index.insert_many([id(wp) for wp in path], [wp.latitude for wp in path],
+                                       [wp.longitude for wp in path])
+        self.clear_clicks()
+        self.refresh_waypoint_list()
+        self.lookup_altitudes(path, key="path_altitudes")
 
 if __name__ == '__main__':
     root = tk.Tk()
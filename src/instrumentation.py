@@ -0,0 +1,283 @@
+"""
+Lightweight tracing for the Arctic Expedition Planner.
+Key operations (elevation lookups, map rendering, exports, distance recomputes, GUI refreshes and
+background tasks) are wrapped in timing spans and counters. Tracing is off unless $AEP_TRACE is set,
+and then costs one global lookup per span. The trace is written on exit as Chrome trace JSON,
+which chrome://tracing or https://ui.perfetto.dev can open; with $AEP_PROFILE also set, the
+heaviest spans are captured with cProfile into .prof files next to the trace.
+
+Usage:
+    AEP_TRACE=trace.json AEP_PROFILE=1 python -m src.gui
+"""
+
+import atexit
+import cProfile
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+TRACE_ENV = "AEP_TRACE"        # Trace file path, or 1/true/yes for a timestamped file in DEFAULT_TRACE_DIR
+PROFILE_ENV = "AEP_PROFILE"    # 1/true/yes to capture cProfile output for profiled spans
+DEFAULT_TRACE_DIR = os.path.join(os.path.expanduser("~"), ".arctic_expedition_planner", "traces")
+MAX_EVENTS = 1_000_000         # Events beyond this are dropped (and counted) to bound memory
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+_tracer = None
+_write_at_exit = False
+
+
+class _NullSpan:
+    """Shared do-nothing span returned while tracing is disabled."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    A timed region recorded as one complete event when it exits.
+    set() attaches values known only inside the span, such as result counts.
+    """
+    __slots__ = ("tracer", "name", "category", "args", "profile", "_start", "_profiler")
+
+    def __init__(self, tracer, name, category, args, profile=False):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.profile = profile
+        self._profiler = None
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        if self.profile and self.tracer.profile:
+            self._profiler = self.tracer._start_profile()
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        if self._profiler is not None:
+            self.args["profile"] = self.tracer._finish_profile(self._profiler, self.name)
+        self.tracer._complete(self, self._start, end)
+        return False
+
+
+class Tracer:
+    """
+    Collects spans and counters from every thread in memory, in Chrome trace event format.
+    write() saves them, with per-span totals and final counter values, as one JSON document.
+    """
+    def __init__(self, path=None, profile=False, max_events=MAX_EVENTS):
+        self.path = path
+        self.profile = profile
+        self.max_events = max_events
+        self.events = []
+        self.counters = defaultdict(int)
+        self.dropped_events = 0
+        self._pid = os.getpid()
+        self._origin = time.perf_counter_ns()
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profile_seq = itertools.count(1)
+
+    def span(self, name, category="aep", profile=False, **args):
+        return Span(self, name, category, args, profile)
+
+    def count(self, name, value=1):
+        """Add to a counter; every change is also recorded as a counter event for the timeline."""
+        now = time.perf_counter_ns()
+        with self._lock:
+            self.counters[name] += value
+            self._emit({"name": name, "ph": "C", "ts": (now - self._origin) / 1000, "pid": self._pid,
+                        "args": {"value": self.counters[name]}})
+
+    def _emit(self, event):
+        if len(self.events) < self.max_events:
+            self.events.append(event)
+        else:
+            self.dropped_events += 1
+
+    def _complete(self, span, start, end):
+        thread = threading.current_thread()
+        event = {"name": span.name, "cat": span.category, "ph": "X", "ts": (start - self._origin) / 1000,
+                 "dur": (end - start) / 1000, "pid": self._pid, "tid": thread.ident}
+        if span.args:
+            event["args"] = span.args
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self._emit(event)
+
+    def _start_profile(self):
+        """Start a profiler for this thread, unless one is already running (nested or, on 3.12+, anywhere)."""
+        if getattr(self._local, "profiling", False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return None  # Another profiler is active in the process
+        self._local.profiling = True
+        return profiler
+
+    def _finish_profile(self, profiler, name):
+        profiler.disable()
+        self._local.profiling = False
+        base = os.path.splitext(self.path)[0] if self.path else os.path.join(DEFAULT_TRACE_DIR, "profile")
+        path = f"{base}.{next(self._profile_seq)}.{name}.prof"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            profiler.dump_stats(path)
+        except OSError as e:
+            return f"not saved: {e}"
+        return path
+
+    def summary(self):
+        """Per span name: number of calls, total and longest duration in milliseconds."""
+        totals = {}
+        with self._lock:
+            events = [e for e in self.events if e["ph"] == "X"]
+        for event in events:
+            entry = totals.setdefault(event["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += event["dur"] / 1000
+            entry["max_ms"] = max(entry["max_ms"], event["dur"] / 1000)
+        return {name: {**entry, "total_ms": round(entry["total_ms"], 3), "max_ms": round(entry["max_ms"], 3)}
+                for name, entry in sorted(totals.items(), key=lambda item: -item[1]["total_ms"])}
+
+    def to_chrome_trace(self):
+        """The trace as a Chrome trace JSON object, thread names included."""
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+            counters = dict(self.counters)
+        metadata = [{"name": "process_name", "ph": "M", "pid": self._pid,
+                     "args": {"name": "Arctic Expedition Planner"}}]
+        metadata += [{"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+                     for tid, name in threads.items()]
+        return {
+            "traceEvents": metadata + events,
+            "displayTimeUnit": "ms",
+            "otherData": {"counters": counters, "spans": self.summary(), "dropped_events": self.dropped_events},
+        }
+
+    def write(self, path=None):
+        """Save the trace (to self.path by default) and return the path written."""
+        path = path or self.path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+        os.replace(tmp_path, path)
+        return path
+
+
+def enabled():
+    return _tracer is not None
+
+
+def current_tracer():
+    return _tracer
+
+
+def span(name, category="aep", profile=False, **args):
+    """
+    Context manager timing a block as a named span. profile=True also captures it with cProfile
+    when profiling is on. Returns a shared no-op span while tracing is disabled.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, category, profile, **args)
+
+
+def count(name, value=1):
+    """Add value to a named counter (no-op while tracing is disabled)."""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.count(name, value)
+
+
+def traced(name=None, category="aep", profile=False):
+    """Decorator recording every call of a function as a span (named after the function by default)."""
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return fn(*args, **kwargs)
+            with tracer.span(label, category, profile):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def enable(path=None, profile=False, max_events=MAX_EVENTS):
+    """Start collecting spans and counters into a new Tracer, replacing any current one, and return it."""
+    global _tracer
+    _tracer = Tracer(path, profile, max_events)
+    return _tracer
+
+
+def disable():
+    """Stop collecting; returns the tracer that was active (not written), or None."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def default_trace_path():
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(DEFAULT_TRACE_DIR, f"trace-{stamp}-{os.getpid()}.json")
+
+
+def write_trace():
+    """Write the active trace to its file, if it has one. Registered at exit when enabled by the environment."""
+    tracer = _tracer
+    if tracer is None or not tracer.path:
+        return None
+    try:
+        path = tracer.write()
+    except OSError as e:
+        print(f"Could not write trace: {e}", file=sys.stderr)
+        return None
+    print(f"Trace written to {path}", file=sys.stderr)
+    return path
+
+
+def configure_from_environment(environ=os.environ):
+    """Enable tracing when $AEP_TRACE is set, writing the trace at interpreter exit. Returns the tracer or None."""
+    value = environ.get(TRACE_ENV, "").strip()
+    if not value or value.lower() in ("0", "false", "no", "off"):
+        return None
+    path = default_trace_path() if value.lower() in TRUE_VALUES else value
+    global _write_at_exit
+    tracer = enable(path, profile=environ.get(PROFILE_ENV, "").strip().lower() in TRUE_VALUES)
+    if not _write_at_exit:
+        atexit.register(write_trace)
+        _write_at_exit = True
+    return tracer
+
+
+configure_from_environment()
@@ -0,0 +1,225 @@
+"""
+Streaming import and export of itineraries.
+Supports the JSON layout of assets/example_itinerary.json ({"itinerary": [...]}) and a
+newline-delimited variant (NDJSON, one waypoint object per line). Waypoints are read and
+written one at a time through generators, so memory use does not grow with file size.
+"""
+
+import json
+import math
+from array import array
+
+from src.planner import Waypoint, Itinerary, ColumnarItinerary
+
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+CHUNK_SIZE = 1 << 16
+
+_compact_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def waypoint_to_dict(wp):
+    """Serializable form of a single waypoint, matching Itinerary.to_dict entries."""
+    return {
+        "name": wp.name,
+        "latitude": wp.latitude,
+        "longitude": wp.longitude,
+        "distance_km": wp.distance_km,
+        "estimated_speed_kph": wp.estimated_speed_kph,
+        "altitude_m": wp.altitude_m
+    }
+
+
+def waypoint_from_dict(data):
+    """Build a Waypoint from a parsed entry; only latitude and longitude are required."""
+    try:
+        return Waypoint(
+            name=str(data.get("name", "")),
+            latitude=float(data["latitude"]),
+            longitude=float(data["longitude"]),
+            distance_km=float(data.get("distance_km", 0.0)),
+            estimated_speed_kph=float(data.get("estimated_speed_kph", 0.0)),
+            altitude_m=int(data.get("altitude_m", 0))
+        )
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise ValueError(f"Invalid waypoint entry {data!r}: {e}") from None
+
+
+def _json_value(value):
+    """JSON text for a waypoint field, as json.dumps would write it."""
+    if isinstance(value, str):
+        return json.encoder.encode_basestring_ascii(value)
+    if isinstance(value, float) and math.isfinite(value):
+        return float.__repr__(value)
+    return json.dumps(value)
+
+
+def is_ndjson(filename):
+    """True for file names that use the newline-delimited format."""
+    return str(filename).lower().endswith(NDJSON_EXTENSIONS)
+
+
+class _JSONStream:
+    """Incremental reader that decodes one JSON value at a time from a file in fixed-size chunks."""
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f):
+        self._file = f
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """Read another chunk, dropping what has already been consumed. False at end of file."""
+        if self._eof:
+            return False
+        chunk = self._file.read(CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character without consuming it, or '' at end of file."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos].isspace():
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            found = self.peek() or "end of file"
+            raise ValueError(f"Expected {char!r} in itinerary JSON, found {found!r}")
+        self._pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value, reading more of the file until it is whole."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number that runs into the end of the buffer may still continue in the next chunk
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def _iter_json_entries(filename):
+    """Yield the parsed entries of the "itinerary" array of a JSON file, one at a time."""
+    with open(filename, "r", encoding="utf-8") as f:
+        stream = _JSONStream(f)
+        stream.expect("{")
+        while stream.peek() != "}":
+            key = stream.value()
+            stream.expect(":")
+            if key != "itinerary":
+                stream.value()  # Skip other top-level entries such as the summary
+            else:
+                stream.expect("[")
+                while stream.peek() != "]":
+                    yield stream.value()
+                    if stream.peek() == ",":
+                        stream.expect(",")
+                stream.expect("]")
+            if stream.peek() == ",":
+                stream.expect(",")
+        stream.expect("}")
+
+
+def _iter_ndjson_entries(filename):
+    """Yield the parsed entries of a newline-delimited JSON file, one line at a time."""
+    with open(filename, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{filename}, line {line_number}: {e}") from None
+            yield data
+
+
+def iter_json_waypoints(filename):
+    """Yield Waypoints from the "itinerary" array of a JSON file, one at a time."""
+    return map(waypoint_from_dict, _iter_json_entries(filename))
+
+
+def iter_ndjson_waypoints(filename):
+    """Yield Waypoints from a newline-delimited JSON file, one line at a time."""
+    return map(waypoint_from_dict, _iter_ndjson_entries(filename))
+
+
+def iter_waypoints(filename):
+    """Yield Waypoints from a JSON or NDJSON itinerary file, chosen by extension."""
+    if is_ndjson(filename):
+        return iter_ndjson_waypoints(filename)
+    return iter_json_waypoints(filename)
+
+
+def load_itinerary(filename, columnar=False):
+    """
+    Load an itinerary file. With columnar=True the waypoints are streamed straight into
+    a ColumnarItinerary's column arrays, which suits very large files; otherwise a list-backed
+    Itinerary of Waypoint objects is returned.
+    """
+    if not columnar:
+        itinerary = Itinerary(list(iter_waypoints(filename)))
+        itinerary.reset_running_totals()
+        return itinerary
+
+    # Entries go straight into typed arrays; no Waypoint objects are created
+    lats, lons, distances, speeds = array("d"), array("d"), array("d"), array("d")
+    altitudes = array("i")
+    names = []
+    entries = _iter_ndjson_entries(filename) if is_ndjson(filename) else _iter_json_entries(filename)
+    for entry in entries:
+        try:
+            lats.append(float(entry["latitude"]))
+            lons.append(float(entry["longitude"]))
+            distances.append(float(entry.get("distance_km", 0.0)))
+            speeds.append(float(entry.get("estimated_speed_kph", 0.0)))
+            altitudes.append(int(entry.get("altitude_m", 0)))
+            names.append(str(entry.get("name", "")))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"Invalid waypoint entry {entry!r}: {e}") from None
+    return ColumnarItinerary.from_arrays(lats, lons, distances, speeds, altitudes, names)
+
+
+def write_json(waypoints, filename, summary=None, indent=4):
+    """
+    Write waypoints (any iterable, including a generator) in the {"itinerary": [...]} layout,
+    one entry at a time. The output is identical to json.dump of the equivalent dict.
+    """
+    pad = " " * indent
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write("{\n" + pad + '"itinerary": [')
+        # Each entry is laid out by hand; json.dumps with indent falls back to the slow pure-Python encoder
+        entry_start = "\n" + pad * 2 + "{\n" + pad * 3
+        separator = ",\n" + pad * 3
+        entry_end = "\n" + pad * 2 + "}"
+        first = True
+        for wp in waypoints:
+            fields = separator.join(f'"{key}": {_json_value(value)}' for key, value in waypoint_to_dict(wp).items())
+            f.write(("" if first else ",") + entry_start + fields + entry_end)
+            first = False
+        f.write("]" if first else "\n" + pad + "]")
+        if summary is not None:
+            f.write(",\n" + pad + '"summary": ' + json.dumps(summary, indent=indent).replace("\n", "\n" + pad))
+        f.write("\n}")
+
+
+def write_ndjson(waypoints, filename):
+    """Write waypoints as newline-delimited JSON, one compact object per line."""
+    with open(filename, "w", encoding="utf-8") as f:
+        for wp in waypoints:
+            f.write(_compact_encoder.encode(waypoint_to_dict(wp)))
+            f.write("\n")
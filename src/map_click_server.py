@@ -1,5 +1,18 @@
-from flask import Flask, request, render_template_string
-import json
+"""
+Click map for the Arctic Expedition Planner.
+A Flask page with a Leaflet map; every click is posted back and kept, in order,
+in an in-process ClickQueue that the GUI polls from its main loop.
+"""
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+from flask import Flask, request, render_template_string, jsonify
+from werkzeug.serving import make_server
+
+from src.instrumentation import count, span
+from src.utils import is_valid_coordinate
 
 app = Flask(__name__)
 
@@ -15,26 +28,85 @@ MAP_TEMPLATE = '''
 </head>
 <body>
 <h2>Click the map to select coordinates</h2>
-<div id="map" style="height: 90vh;"></div>
+<p id="status">Click once for a single waypoint, or click along a route to send a whole path.</p>
+<div id="map" style="height: 85vh;"></div>
 <script>
 var map = L.map('map').setView([69.65, 18.95], 6);
 L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
   maxZoom: 18,
 }).addTo(map);
+var path = L.polyline([], {color: 'blue'}).addTo(map);
 map.on('click', function(e) {
   let lat = e.latlng.lat.toFixed(5);
   let lon = e.latlng.lng.toFixed(5);
+  path.addLatLng(e.latlng);
   fetch('/add', {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ latitude: lat, longitude: lon })
-  }).then(() => alert('Coordinates sent: ' + lat + ", " + lon));
+  }).then(r => r.json()).then(click => {
+    document.getElementById('status').textContent =
+      'Sent point ' + click.seq + ': ' + lat + ', ' + lon;
+  });
 });
 </script>
 </body>
 </html>
 '''
 
+
+@dataclass(frozen=True)
+class Click:
+    """A map click; seq numbers increase by one per click, starting at 1."""
+    seq: int
+    latitude: float
+    longitude: float
+
+
+class ClickQueue:
+    """
+    Thread-safe, ordered record of map clicks. Consumers keep the seq of the last click
+    they have seen and ask for everything after it, so no click is lost or delivered twice,
+    however fast they arrive. Only the most recent maxlen clicks are retained.
+    """
+    def __init__(self, maxlen=10_000):
+        self._clicks = deque(maxlen=maxlen)
+        self._last_seq = 0
+        self._changed = threading.Condition()
+
+    @property
+    def last_seq(self):
+        with self._changed:
+            return self._last_seq
+
+    def put(self, latitude, longitude):
+        """Record a click and wake any waiting consumers."""
+        with self._changed:
+            self._last_seq += 1
+            click = Click(self._last_seq, float(latitude), float(longitude))
+            self._clicks.append(click)
+            self._changed.notify_all()
+        return click
+
+    def since(self, seq, timeout=0.0):
+        """
+        Clicks newer than seq, oldest first. With a timeout, waits up to that many seconds
+        for a new click (long-poll); the default returns immediately.
+        """
+        with self._changed:
+            if timeout:
+                self._changed.wait_for(lambda: self._last_seq > seq, timeout)
+            return [click for click in self._clicks if click.seq > seq]
+
+    def latest(self):
+        """The most recent click, or None."""
+        with self._changed:
+            return self._clicks[-1] if self._clicks else None
+
+
+clicks = ClickQueue()
+
+
 @app.route('/')
 def map_page():
     """Serves an HTML page with a map."""
@@ -42,11 +114,92 @@ def map_page():
 
 @app.route('/add', methods=['POST'])
 def add():
-    """Receives coordinates and stores them in a file."""
-    coord = request.json
-    with open("click_coords.json", "w") as f:
-        json.dump(coord, f)
-    return '', 204
+    """Receives coordinates and queues them for the GUI."""
+    with span("map_click.add", "map_click"):
+        coord = request.get_json(silent=True) or {}
+        try:
+            lat = float(coord['latitude'])
+            lon = float(coord['longitude'])
+        except (KeyError, TypeError, ValueError):
+            count("map_click.rejected")
+            return jsonify(error="latitude and longitude are required"), 400
+        if not (is_valid_coordinate(lat) and is_valid_coordinate(lon)):
+            count("map_click.rejected")
+            return jsonify(error="coordinates out of range"), 400
+        click = clicks.put(lat, lon)
+        count("map_click.clicks")
+        return jsonify(seq=click.seq, latitude=click.latitude, longitude=click.longitude)
+
+@app.route('/clicks')
+def recent_clicks():
+    """Long-poll for clicks after ?since=<seq>, waiting up to ?timeout= seconds (max 30)."""
+    since = request.args.get('since', 0, type=int)
+    timeout = min(max(request.args.get('timeout', 0.0, type=float), 0.0), 30.0)
+    with span("map_click.poll", "map_click", timeout=timeout) as traced:
+        new = clicks.since(since, timeout)
+        traced.set(clicks=len(new))
+    return jsonify(clicks=[{"seq": c.seq, "latitude": c.latitude, "longitude": c.longitude} for c in new],
+                   last_seq=clicks.last_seq)
+
+
+class MapServer:
+    """
+    The click map app served by a WSGI server thread inside the planner process.
+    It binds an ephemeral port by default, signals readiness once it is serving, can be
+    started repeatedly (later calls reuse the running instance) and shuts down cleanly.
+    """
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def url(self):
+        """Base URL of the running server, or None."""
+        if self._server is None:
+            return None
+        return f"http://{self.host}:{self._server.server_port}"
+
+    def start(self, timeout=5.0):
+        """Start serving if not already running, wait until ready and return the URL."""
+        with span("map_click.start_server", "map_click"):
+            with self._lock:
+                if not self.running:
+                    self._ready.clear()
+                    # Binding happens here, so a port conflict is raised to the caller
+                    self._server = make_server(self.host, self.port, app, threaded=True)
+                    self._thread = threading.Thread(target=self._serve, name="aep-map-server", daemon=True)
+                    self._thread.start()
+            if not self._ready.wait(timeout):
+                raise TimeoutError("Map click server did not start.")
+            return self.url
+
+    def _serve(self):
+        self._ready.set()
+        self._server.serve_forever(poll_interval=0.1)
+
+    def shutdown(self, timeout=5.0):
+        """Stop serving, release the port and join the server thread."""
+        with self._lock:
+            if self._server is None:
+                return
+            if self.running:
+                self._server.shutdown()
+                self._thread.join(timeout)
+            self._server.server_close()
+            self._server = None
+            self._thread = None
+            self._ready.clear()
+
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Standalone, for trying the page out; run from the repository root as
+    # `python -m src.map_click_server` so that the src package imports resolve
+    app.run()
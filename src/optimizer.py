@@ -0,0 +1,196 @@
+"""
+Route order optimization for the Arctic Expedition Planner.
+Reorders the waypoints of an Itinerary to shorten the total route: a nearest-neighbour path
+is built from the pairwise distance matrix and then improved with 2-opt and Or-opt moves
+until no move helps or the time budget runs out. Every move is evaluated against all
+candidate positions at once with numpy, so a few thousand waypoints take seconds.
+"""
+
+import time
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from src.planner import ColumnarItinerary, Itinerary
+from src.utils import haversine_distances, haversine_matrix
+
+DEFAULT_TIME_BUDGET_S = 5.0
+MAX_SEGMENT = 3  # Longest run of waypoints an Or-opt move relocates
+EPSILON_KM = 1e-9  # Smallest gain worth applying; guards against float noise
+
+
+@dataclass
+class OptimizeResult:
+    """A reordered itinerary plus the route length before and after."""
+    itinerary: Itinerary
+    order: np.ndarray  # order[k] is the original index of the waypoint now at position k
+    before_km: float
+    after_km: float
+    seconds: float
+    converged: bool  # False if the time budget ran out before no move could improve the route
+
+    @property
+    def saved_km(self):
+        return self.before_km - self.after_km
+
+    @property
+    def saved_percent(self):
+        return 100.0 * self.saved_km / self.before_km if self.before_km else 0.0
+
+    def to_dict(self):
+        return {
+            "before_km": round(self.before_km, 2),
+            "after_km": round(self.after_km, 2),
+            "saved_km": round(self.saved_km, 2),
+            "saved_percent": round(self.saved_percent, 1),
+            "seconds": round(self.seconds, 3),
+            "converged": self.converged
+        }
+
+
+def path_length(matrix, path):
+    """Total length of a path through the matrix, in the matrix's units."""
+    path = np.asarray(path)
+    return float(matrix[path[:-1], path[1:]].sum())
+
+
+def nearest_neighbour_path(matrix, start, end):
+    """Greedy path from start that always moves to the closest unvisited node, finishing at end."""
+    n = len(matrix)
+    visited = np.zeros(n, dtype=bool)
+    visited[[start, end]] = True
+    path = np.empty(n, dtype=np.intp)
+    path[0], path[-1] = start, end
+    current = start
+    for k in range(1, n - 1):
+        current = int(np.argmin(np.where(visited, np.inf, matrix[current])))
+        visited[current] = True
+        path[k] = current
+    return path
+
+
+def two_opt_pass(matrix, path, deadline):
+    """
+    One sweep of 2-opt over a path with fixed endpoints, in place. For each edge the best
+    reversal of the section after it is found with a single vectorized evaluation.
+    Returns True if the path was improved.
+    """
+    m = len(path)
+    edges = matrix[path[:-1], path[1:]]
+    improved = False
+    for i in range(m - 3):
+        if time.perf_counter() > deadline:
+            break
+        a, b = path[i], path[i + 1]
+        # Replace edges (a, b) and (c, d) by (a, c) and (b, d), reversing the path from b to c
+        delta = matrix[a][path[i + 2:m - 1]] + matrix[b][path[i + 3:]] - edges[i] - edges[i + 2:]
+        k = int(np.argmin(delta))
+        if delta[k] < -EPSILON_KM:
+            j = i + 2 + k
+            path[i + 1:j + 1] = path[i + 1:j + 1][::-1].copy()
+            edges[i:j + 1] = matrix[path[i:j + 1], path[i + 1:j + 2]]
+            improved = True
+    return improved
+
+
+def or_opt_pass(matrix, path, deadline, max_segment=MAX_SEGMENT):
+    """
+    One sweep of Or-opt over a path with fixed endpoints: move runs of 1..max_segment nodes,
+    possibly reversed, to the best place elsewhere in the path. Returns (path, improved).
+    """
+    improved = False
+    for length in range(1, max_segment + 1):
+        edges = matrix[path[:-1], path[1:]]
+        i = 1
+        while i + length < len(path):
+            if time.perf_counter() > deadline:
+                return path, improved
+            p, first, last, q = path[i - 1], path[i], path[i + length - 1], path[i + length]
+            gain = matrix[p, first] + matrix[last, q] - matrix[p, q]
+
+            # Cost of inserting the run into each edge (path[k], path[k + 1]), both ways round;
+            # edges that touch the run itself are ruled out
+            to_first, to_last = matrix[first][path], matrix[last][path]
+            forward = to_first[:-1] + to_last[1:] - edges
+            backward = to_last[:-1] + to_first[1:] - edges
+            forward[i - 1:i + length] = np.inf
+            backward[i - 1:i + length] = np.inf
+            kf, kb = int(np.argmin(forward)), int(np.argmin(backward))
+            reverse = backward[kb] < forward[kf]
+            cost = backward[kb] if reverse else forward[kf]
+            if cost < gain - EPSILON_KM:
+                k = kb if reverse else kf
+                run = path[i:i + length][::-1] if reverse else path[i:i + length]
+                rest = np.concatenate([path[:i], path[i + length:]])
+                at = (k if k < i else k - length) + 1
+                path = np.concatenate([rest[:at], run, rest[at:]])
+                edges = matrix[path[:-1], path[1:]]
+                improved = True
+            else:
+                i += 1
+    return path, improved
+
+
+def optimize_indices(matrix, fixed_start=True, fixed_end=False, time_budget_s=DEFAULT_TIME_BUDGET_S):
+    """
+    Find a short visiting order for the nodes of a symmetric distance matrix.
+    Node 0 stays first if fixed_start and node n-1 stays last if fixed_end.
+    Returns (order, converged).
+    """
+    n = len(matrix)
+    deadline = time.perf_counter() + time_budget_s
+    if n <= 3 and fixed_start and fixed_end or n <= 2:
+        return np.arange(n), True
+
+    # A free end is modelled as a fixed dummy node that is zero distance from everything
+    size = n + (not fixed_start) + (not fixed_end)
+    work = np.zeros((size, size))
+    work[:n, :n] = matrix
+    start = 0 if fixed_start else n
+    end = n - 1 if fixed_end else size - 1
+
+    path = nearest_neighbour_path(work, start, end)
+    converged = False
+    while time.perf_counter() < deadline:
+        improved = two_opt_pass(work, path, deadline)
+        path, moved = or_opt_pass(work, path, deadline)
+        if not (improved or moved):
+            converged = time.perf_counter() < deadline
+            break
+    return path[path < n], converged
+
+
+def optimize_itinerary(itinerary, fixed_start=True, fixed_end=False, time_budget_s=DEFAULT_TIME_BUDGET_S):
+    """
+    Reorder an itinerary (list-backed or columnar) to shorten the route. Leg distances of the
+    result are recomputed from the coordinates. Returns an OptimizeResult.
+    """
+    started = time.perf_counter()
+    if isinstance(itinerary, ColumnarItinerary):
+        lats, lons = itinerary.latitudes, itinerary.longitudes
+    else:
+        lats = np.array([wp.latitude for wp in itinerary.waypoints], dtype=np.float64)
+        lons = np.array([wp.longitude for wp in itinerary.waypoints], dtype=np.float64)
+
+    matrix = haversine_matrix(lats, lons)
+    order, converged = optimize_indices(matrix, fixed_start, fixed_end, time_budget_s)
+    distances = haversine_distances(lats[order], lons[order])
+
+    if isinstance(itinerary, ColumnarItinerary):
+        names = itinerary.names
+        optimized = ColumnarItinerary.from_arrays(
+            lats[order], lons[order], distances, itinerary.speeds[order], itinerary.altitudes[order],
+            [names[i] for i in order])
+    else:
+        optimized = Itinerary([replace(itinerary.waypoints[i], distance_km=float(d))
+                               for i, d in zip(order.tolist(), distances)])
+    optimized.reset_running_totals()
+
+    return OptimizeResult(
+        itinerary=optimized,
+        order=order,
+        before_km=path_length(matrix, np.arange(len(lats))),
+        after_km=path_length(matrix, order),
+        seconds=time.perf_counter() - started,
+        converged=converged
+    )
@@ -1,10 +1,19 @@
 """
 Data models for the Arctic Expedition Planner.
-Defines Waypoint and Itinerary classes with travel estimation logic.
+Defines Waypoint and Itinerary classes with travel estimation logic,
+plus a columnar (struct-of-arrays) Itinerary backend for very long tracks.
 """
 
+from collections.abc import Sequence
 from dataclasses import dataclass
 
+import numpy as np
+
+from src.instrumentation import count, span
+from src.stats import ItineraryStats
+from src.travel_time import FlatModel, LegTimeCache, leg_climbs
+from src.utils import haversine_distances, haversine_pairs
+
 @dataclass
 class Waypoint:
     """Represents a point in the expedition route."""
@@ -23,22 +32,234 @@ class Waypoint:
 
 @dataclass
 class Itinerary:
-    """Represents a collection of waypoints and computes overall stats."""
-    def __init__(self, waypoints):
+    """
+    Represents a collection of waypoints and computes overall stats.
+    Travel times are distance over speed, or come from speed_model (see travel_time.py) when set.
+    """
+    def __init__(self, waypoints, speed_model=None):
         self.waypoints = waypoints
+        self._running_distance = None
+        self._running_time = None
+        self._stats = None
+        self.set_speed_model(speed_model)
+
+    def set_speed_model(self, speed_model):
+        """Use a travel-time model for every time total, or None for plain distance over speed."""
+        self.speed_model = speed_model
+        self._leg_time_cache = LegTimeCache(speed_model) if speed_model is not None else None
+        self._running_time = None
+        self._stats = None
 
     def total_distance(self):
         """Return total distance of the itinerary."""
         return sum(wp.distance_km for wp in self.waypoints)
 
     def estimated_time(self):
-        """Calculate estimated time in hours based on each waypoint's distance and speed."""
+        """Calculate estimated time in hours based on each waypoint's distance and speed (and the speed model)."""
+        if self.speed_model is not None:
+            return float(self.leg_times().sum())
         total_time = 0.0
         for wp in self.waypoints:
             if wp.estimated_speed_kph > 0:
                 total_time += wp.distance_km / wp.estimated_speed_kph
         return total_time
 
+    def leg_arrays(self):
+        """Per-waypoint (distance, speed, altitude) columns as float arrays."""
+        return (np.array([wp.distance_km for wp in self.waypoints], dtype=np.float64),
+                np.array([wp.estimated_speed_kph for wp in self.waypoints], dtype=np.float64),
+                np.array([wp.altitude_m for wp in self.waypoints], dtype=np.float64))
+
+    def leg_times(self, distances=None, speeds=None, altitudes=None):
+        """
+        Travel time in hours of every leg, evaluated in one vectorized pass. With a speed model,
+        legs whose inputs are unchanged since the last call are served from the per-leg cache.
+        The columns are read from the itinerary unless passed in.
+        """
+        if distances is None:
+            distances, speeds, altitudes = self.leg_arrays()
+        if self._leg_time_cache is None:
+            return FlatModel().leg_hours(distances, speeds, leg_climbs(altitudes))
+        return self._leg_time_cache.hours(distances, speeds, altitudes)
+
+    def recalculate_distances(self, engine=None):
+        """
+        Recompute every leg distance from the coordinates in a single vectorized pass, with
+        haversine or the given distance engine (see distance.py), rounded to 2 decimals.
+        """
+        if not self.waypoints:
+            return
+        with span("planner.recalculate_distances", "planner", waypoints=len(self.waypoints)):
+            lats = [wp.latitude for wp in self.waypoints]
+            lons = [wp.longitude for wp in self.waypoints]
+            distances = haversine_distances(lats, lons) if engine is None else np.round(engine.legs(lats, lons), 2)
+            for wp, distance in zip(self.waypoints, distances):
+                wp.distance_km = float(distance)
+            self.reset_running_totals()
+
+    def reset_running_totals(self):
+        """
+        Recompute running_distance and running_time from scratch.
+        The incremental edit methods below keep both up to date by applying deltas,
+        so this is only needed after the waypoint list has been changed directly.
+        """
+        self._running_distance = self.total_distance()
+        self._running_time = self.estimated_time()
+        self._stats = None
+
+    def stats(self):
+        """
+        Return the prefix-sum statistics index (cumulative values, range and daily stage queries).
+        It is built on first use and kept current by the edit methods below.
+        """
+        if self._stats is None:
+            with span("planner.build_stats", "planner", waypoints=len(self.waypoints)):
+                self._stats = ItineraryStats(self)
+        return self._stats
+
+    @property
+    def running_distance(self):
+        """Total distance maintained incrementally by the edit methods."""
+        if self._running_distance is None:
+            self.reset_running_totals()
+        return self._running_distance
+
+    @property
+    def running_time(self):
+        """
+        Estimated time maintained incrementally by the edit methods. With a speed model a leg's
+        time also depends on the previous waypoint's altitude, so each edit re-evaluates the
+        model for the legs around it only.
+        """
+        if self._running_time is None:
+            if self._running_distance is None:
+                self.reset_running_totals()
+            else:
+                self._running_time = self.estimated_time()
+        return self._running_time
+
+    @staticmethod
+    def _leg_time(wp):
+        """Travel time in hours for the leg ending at the given waypoint."""
+        if wp.estimated_speed_kph > 0:
+            return wp.distance_km / wp.estimated_speed_kph
+        return 0.0
+
+    def _add_to_totals(self, wp, sign=1):
+        """Add (or with sign=-1 remove) a waypoint's leg from the running totals."""
+        if self._running_distance is None:
+            return  # Totals are computed on first use, after the edit
+        self._running_distance += sign * wp.distance_km
+        if self.speed_model is None and self._running_time is not None:
+            self._running_time += sign * self._leg_time(wp)
+
+    def _model_hours(self, legs):
+        """
+        Speed-model hours of the given legs while running_time is kept with a speed model, else None.
+        Edits take this before and after they change a route and pass both to _retime.
+        """
+        if self.speed_model is None or self._running_time is None:
+            return None
+        legs = sorted({i for i in legs if 0 <= i < len(self.waypoints)})
+        if not legs:
+            return 0.0
+        wps = [self.waypoints[i] for i in legs]
+        climbs = [wp.altitude_m - self.waypoints[i - 1].altitude_m if i > 0 else 0.0 for i, wp in zip(legs, wps)]
+        return float(self.speed_model.leg_hours([wp.distance_km for wp in wps],
+                                                [wp.estimated_speed_kph for wp in wps], climbs).sum())
+
+    def _retime(self, before, legs):
+        """Replace the hours before (from _model_hours) in running_time by those of the given legs now."""
+        if before is not None and self._running_time is not None:
+            self._running_time += self._model_hours(legs) - before
+
+    def refresh_legs(self, indices):
+        """
+        Recompute only the given legs from the coordinates and adjust the running totals by the change.
+        Leg i runs from waypoint i-1 to waypoint i; leg 0 is always 0.0. Returns the refreshed indices.
+        """
+        indices = sorted({i for i in indices if 0 <= i < len(self.waypoints)})
+        if not indices:
+            return []
+        count("planner.legs_refreshed", len(indices))
+
+        inner = [i for i in indices if i > 0]
+        distances = haversine_pairs(
+            [self.waypoints[i-1].latitude for i in inner],
+            [self.waypoints[i-1].longitude for i in inner],
+            [self.waypoints[i].latitude for i in inner],
+            [self.waypoints[i].longitude for i in inner]
+        )
+        new_distances = dict(zip(inner, distances))
+
+        before = self._model_hours(indices)
+        for i in indices:
+            wp = self.waypoints[i]
+            self._add_to_totals(wp, -1)
+            wp.distance_km = float(new_distances.get(i, 0.0))
+            self._add_to_totals(wp)
+        self._retime(before, indices)
+        if self._stats is not None:
+            self._stats.update_legs(indices)
+        return indices
+
+    def append_waypoint(self, wp, recalculate=True):
+        """Append a waypoint, computing only its own leg unless the distance was entered manually."""
+        return self.insert_waypoint(len(self.waypoints), wp, recalculate)
+
+    def extend_waypoints(self, waypoints):
+        """Append several waypoints (e.g. a clicked path), computing all of their legs in one batch."""
+        start = len(self.waypoints)
+        before = self._model_hours([])
+        for wp in waypoints:
+            self.waypoints.append(wp)
+            self._add_to_totals(wp)
+            if self._stats is not None:
+                self._stats.append()
+        self._retime(before, range(start, len(self.waypoints)))
+        return self.refresh_legs(range(start, len(self.waypoints)))
+
+    def insert_waypoint(self, index, wp, recalculate=True):
+        """Insert a waypoint at index; only the legs into and out of it change."""
+        index = min(index, len(self.waypoints))
+        before = self._model_hours([index])
+        self.waypoints.insert(index, wp)
+        self._add_to_totals(wp)
+        self._retime(before, [index, index + 1])
+        if self._stats is not None:
+            if index == len(self.waypoints) - 1:
+                self._stats.append()
+            else:
+                self._stats = None  # Shifting the middle of the route needs a rebuild
+        if recalculate:
+            return self.refresh_legs([index, index + 1])
+        return self.refresh_legs([index + 1])
+
+    def delete_waypoint(self, index):
+        """Remove the waypoint at index; only the leg of its successor changes."""
+        if index < 0:
+            index += len(self.waypoints)
+        before = self._model_hours([index, index + 1])
+        wp = self.waypoints.pop(index)
+        if self._stats is not None:
+            if index == len(self.waypoints):
+                self._stats.pop()
+            else:
+                self._stats = None
+        if not self.waypoints:
+            self.reset_running_totals()  # Avoid carrying float drift into an empty route
+            return []
+        self._add_to_totals(wp, -1)
+        self._retime(before, [index])
+        return self.refresh_legs([index])
+
+    def swap_waypoints(self, i, j):
+        """Swap two waypoints; only the legs into and out of both positions change."""
+        before = self._model_hours([i, i + 1, j, j + 1])
+        self.waypoints[i], self.waypoints[j] = self.waypoints[j], self.waypoints[i]
+        self._retime(before, [i, i + 1, j, j + 1])
+        return self.refresh_legs([i, i + 1, j, j + 1])
+
     def to_dict(self):
         """Convert itinerary to a serializable dictionary format."""
         return {
@@ -53,5 +274,314 @@ class Itinerary:
                 }
                 for wp in self.waypoints
             ]
-        }   
+        }
+
+
+class WaypointView:
+    """
+    Lightweight view of one row of a ColumnarItinerary.
+    Reads and writes go straight to the underlying columns. A view is bound to a
+    position, so it follows whatever waypoint occupies that row after later edits.
+    """
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    @property
+    def name(self):
+        return self._store._name_table[self._store._name_ids[self._index]]
+
+    @name.setter
+    def name(self, value):
+        self._store._name_ids[self._index] = self._store._intern_name(value)
+
+    @property
+    def latitude(self):
+        return float(self._store._lat[self._index])
+
+    @latitude.setter
+    def latitude(self, value):
+        self._store._lat[self._index] = value
+
+    @property
+    def longitude(self):
+        return float(self._store._lon[self._index])
+
+    @longitude.setter
+    def longitude(self, value):
+        self._store._lon[self._index] = value
+
+    @property
+    def distance_km(self):
+        return float(self._store._distance[self._index])
+
+    @distance_km.setter
+    def distance_km(self, value):
+        self._store._distance[self._index] = value
+
+    @property
+    def estimated_speed_kph(self):
+        return float(self._store._speed[self._index])
+
+    @estimated_speed_kph.setter
+    def estimated_speed_kph(self, value):
+        self._store._speed[self._index] = value
+
+    @property
+    def altitude_m(self):
+        return int(self._store._altitude[self._index])
+
+    @altitude_m.setter
+    def altitude_m(self, value):
+        self._store._altitude[self._index] = value
+
+    def estimated_time_hours(self) -> float:
+        """Calculate and return the estimated travel time in hours."""
+        return self.to_waypoint().estimated_time_hours()
+
+    def to_waypoint(self):
+        """Copy this row out into a standalone Waypoint."""
+        return Waypoint(self.name, self.latitude, self.longitude, self.distance_km,
+                        self.estimated_speed_kph, self.altitude_m)
+
+    def __eq__(self, other):
+        if isinstance(other, (Waypoint, WaypointView)):
+            return self.to_waypoint() == (other if isinstance(other, Waypoint) else other.to_waypoint())
+        return NotImplemented
+
+    def __repr__(self):
+        return f"WaypointView({self._index}, {self.to_waypoint()!r})"
+
+
+class _WaypointColumnsSequence(Sequence):
+    """List-like facade over a ColumnarItinerary so code written against Itinerary.waypoints keeps working."""
+    __slots__ = ("_store",)
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return self._store._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [WaypointView(self._store, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("waypoint index out of range")
+        return WaypointView(self._store, index)
+
+    def __setitem__(self, index, wp):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("waypoint index out of range")
+        self._store._write_row(index, wp)
+        # A direct write bypasses the edit methods, so totals are recomputed on next use
+        self._store._running_distance = None
+        self._store._running_time = None
+        self._store._stats = None
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield WaypointView(self._store, i)
+
+    def append(self, wp):
+        self._store._insert_row(len(self), wp)
+
+    def insert(self, index, wp):
+        self._store._insert_row(index, wp)
+
+    def pop(self, index=-1):
+        return self._store._delete_row(index)
+
+
+class ColumnarItinerary(Itinerary):
+    """
+    Struct-of-arrays Itinerary for long tracks.
+    Coordinates, leg distances and speeds are stored in contiguous float64 columns,
+    altitudes in an int32 column, and names as int32 ids into a deduplicated name table.
+    Totals are computed directly on the columns; waypoints are exposed as WaypointView rows.
+    """
+    _INITIAL_CAPACITY = 16
+
+    def __init__(self, waypoints=(), speed_model=None):
+        self._size = 0
+        self._allocate(self._INITIAL_CAPACITY)
+        self._name_table = []
+        self._name_lookup = {}
+        self._running_distance = None
+        self._running_time = None
+        self._stats = None
+        for wp in waypoints:
+            self._insert_row(self._size, wp)
+        self.set_speed_model(speed_model)
+
+    @classmethod
+    def from_arrays(cls, latitudes, longitudes, distances=None, speeds=None, altitudes=None, names=None,
+                    speed_model=None):
+        """
+        Build an itinerary straight from column arrays without creating per-waypoint objects.
+        Arrays that already have the right dtype are used without copying. Missing distances
+        are computed from the coordinates; missing speeds, altitudes and names default to 0/"".
+        """
+        itinerary = cls()
+        lat = np.ascontiguousarray(latitudes, dtype=np.float64)
+        n = len(lat)
+        itinerary._lat = lat
+        itinerary._lon = np.ascontiguousarray(longitudes, dtype=np.float64)
+        if distances is None:
+            itinerary._distance = haversine_distances(itinerary._lat, itinerary._lon)
+        else:
+            itinerary._distance = np.ascontiguousarray(distances, dtype=np.float64)
+        itinerary._speed = np.zeros(n) if speeds is None else np.ascontiguousarray(speeds, dtype=np.float64)
+        itinerary._altitude = (np.zeros(n, dtype=np.int32) if altitudes is None
+                               else np.ascontiguousarray(altitudes, dtype=np.int32))
+        if names is None:
+            itinerary._name_ids = np.zeros(n, dtype=np.int32)
+            itinerary._intern_name("")
+        else:
+            itinerary._name_ids = np.fromiter((itinerary._intern_name(name) for name in names),
+                                              dtype=np.int32, count=n)
+        for column in itinerary._columns():
+            if len(column) != n:
+                raise ValueError("all columns must have the same length")
+        itinerary._size = n
+        itinerary.set_speed_model(speed_model)
+        return itinerary
+
+    @classmethod
+    def from_itinerary(cls, itinerary):
+        """Copy any Itinerary into columnar storage."""
+        return cls(itinerary.waypoints, speed_model=itinerary.speed_model)
+
+    def to_itinerary(self):
+        """Materialize a list-backed Itinerary of standalone Waypoint objects."""
+        return Itinerary([view.to_waypoint() for view in self.waypoints], speed_model=self.speed_model)
+
+    @property
+    def waypoints(self):
+        return _WaypointColumnsSequence(self)
+
+    @property
+    def latitudes(self):
+        return self._lat[:self._size]
+
+    @property
+    def longitudes(self):
+        return self._lon[:self._size]
+
+    @property
+    def distances(self):
+        return self._distance[:self._size]
+
+    @property
+    def speeds(self):
+        return self._speed[:self._size]
+
+    @property
+    def altitudes(self):
+        return self._altitude[:self._size]
+
+    @property
+    def names(self):
+        """Waypoint names in order, resolved through the name table."""
+        return [self._name_table[i] for i in self._name_ids[:self._size]]
+
+    def __len__(self):
+        return self._size
+
+    def total_distance(self):
+        """Return total distance of the itinerary."""
+        return float(self.distances.sum())
+
+    def estimated_time(self):
+        """Calculate estimated time in hours based on each waypoint's distance and speed (and the speed model)."""
+        if self.speed_model is not None:
+            return float(self.leg_times().sum())
+        speeds = self.speeds
+        moving = speeds > 0
+        return float((self.distances[moving] / speeds[moving]).sum())
+
+    def leg_arrays(self):
+        return self.distances, self.speeds, self.altitudes.astype(np.float64)
+
+    def recalculate_distances(self, engine=None):
+        """Recompute every leg distance from the coordinate columns, optionally with a distance engine."""
+        with span("planner.recalculate_distances", "planner", waypoints=self._size):
+            if engine is None:
+                self._distance[:self._size] = haversine_distances(self.latitudes, self.longitudes)
+            else:
+                self._distance[:self._size] = np.round(engine.legs(self.latitudes, self.longitudes), 2)
+            self.reset_running_totals()
+
+    def swap_waypoints(self, i, j):
+        """Swap two rows; only the legs into and out of both positions change."""
+        before = self._model_hours([i, i + 1, j, j + 1])
+        for column in self._columns():
+            column[[i, j]] = column[[j, i]]
+        self._retime(before, [i, i + 1, j, j + 1])
+        return self.refresh_legs([i, i + 1, j, j + 1])
+
+    def _columns(self):
+        return (self._lat, self._lon, self._distance, self._speed, self._altitude, self._name_ids)
+
+    def _allocate(self, capacity):
+        self._lat = np.zeros(capacity, dtype=np.float64)
+        self._lon = np.zeros(capacity, dtype=np.float64)
+        self._distance = np.zeros(capacity, dtype=np.float64)
+        self._speed = np.zeros(capacity, dtype=np.float64)
+        self._altitude = np.zeros(capacity, dtype=np.int32)
+        self._name_ids = np.zeros(capacity, dtype=np.int32)
+
+    def _ensure_capacity(self, needed):
+        """Grow every column geometrically so appends stay amortized O(1)."""
+        capacity = len(self._lat)
+        if needed <= capacity and all(column.flags.writeable for column in self._columns()):
+            return
+        old = [column[:self._size] for column in self._columns()]
+        self._allocate(max(needed, capacity * 2, self._INITIAL_CAPACITY))
+        for new, values in zip(self._columns(), old):
+            new[:self._size] = values
+
+    def _intern_name(self, name):
+        name_id = self._name_lookup.get(name)
+        if name_id is None:
+            name_id = len(self._name_table)
+            self._name_table.append(name)
+            self._name_lookup[name] = name_id
+        return name_id
+
+    def _write_row(self, index, wp):
+        self._lat[index] = wp.latitude
+        self._lon[index] = wp.longitude
+        self._distance[index] = wp.distance_km
+        self._speed[index] = wp.estimated_speed_kph
+        self._altitude[index] = wp.altitude_m
+        self._name_ids[index] = self._intern_name(wp.name)
+
+    def _insert_row(self, index, wp):
+        if index < 0:
+            index += self._size
+        index = min(max(index, 0), self._size)
+        self._ensure_capacity(self._size + 1)
+        if index < self._size:
+            for column in self._columns():
+                column[index + 1:self._size + 1] = column[index:self._size]
+        self._size += 1
+        self._write_row(index, wp)
 
+    def _delete_row(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("waypoint index out of range")
+        self._ensure_capacity(self._size)
+        removed = WaypointView(self, index).to_waypoint()
+        for column in self._columns():
+            column[index:self._size - 1] = column[index + 1:self._size]
+        self._size -= 1
+        return removed
@@ -0,0 +1,185 @@
+"""
+Level-of-detail preview maps for the Arctic Expedition Planner.
+Markers are clustered in the browser; the route is embedded once and each zoom band lists the
+vertices it draws, its polyline built only when the map first reaches that band. Rendered HTML
+is cached on disk under a hash of the itinerary content so unchanged routes are not rebuilt.
+"""
+
+import glob
+import hashlib
+import html
+import os
+
+import folium
+import numpy as np
+from branca.element import MacroElement
+from folium.plugins import FastMarkerCluster
+from jinja2 import Template
+
+from src.instrumentation import span
+from src.simplify import simplify_indices
+from src.utils import format_coords
+
+PREVIEW_VERSION = 2  # Bump when the generated HTML changes, invalidating cached maps
+DEFAULT_MAP_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".arctic_expedition_planner", "map_cache")
+MAX_CACHED_MAPS = 20
+
+# (min zoom, max zoom) bands; each draws the route downsampled for its most zoomed-out level
+ZOOM_BANDS = [(0, 4), (5, 7), (8, 10), (11, 13), (14, 19)]
+TILE_SIZE_PX = 256
+ROUTE_TOLERANCE_M = 5.0    # The most detailed band strays at most this far from the recorded track
+COORDINATE_DECIMALS = 6    # About 0.1 m, well below ROUTE_TOLERANCE_M
+
+MARKER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(row[2]);
+    marker.bindTooltip(row[3]);
+    return marker;
+}
+"""
+
+
+class ZoomBandRoute(MacroElement):
+    """
+    The route as one shared coordinate array plus, per zoom band, the indices of the vertices it
+    draws (None for all of them). Only the band matching the map's zoom is shown, and a band's
+    polyline is created the first time it is needed.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var coords = {{ this.coordinates|tojson }};
+            var options = {{ this.options|tojson }};
+            var bands = {{ this.bands|tojson }};
+            function showBand() {
+                var zoom = map.getZoom();
+                bands.forEach(function(band) {
+                    var visible = zoom >= band.min && zoom <= band.max;
+                    if (visible && !band.layer) {
+                        band.layer = L.polyline(band.indices === null ? coords : band.indices.map(function(i) {
+                            return coords[i];
+                        }), options);
+                    }
+                    if (visible && !map.hasLayer(band.layer)) { map.addLayer(band.layer); }
+                    if (!visible && band.layer && map.hasLayer(band.layer)) { map.removeLayer(band.layer); }
+                });
+            }
+            map.on("zoomend", showBand);
+            showBand();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, coordinates, bands, **options):
+        super().__init__()
+        self._name = "ZoomBandRoute"
+        self.coordinates = coordinates
+        self.bands = [{"min": min_zoom, "max": max_zoom, "indices": indices} for indices, min_zoom, max_zoom in bands]
+        self.options = options
+
+
+def itinerary_hash(names, latitudes, longitudes):
+    """Content hash of the parts of an itinerary that appear on the preview map."""
+    digest = hashlib.sha256(f"preview-v{PREVIEW_VERSION}".encode())
+    digest.update(np.ascontiguousarray(latitudes, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(longitudes, dtype=np.float64).tobytes())
+    for name in names:
+        digest.update(name.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+def degrees_per_pixel(zoom):
+    """Approximate size of one screen pixel in degrees of longitude at a web map zoom level."""
+    return 360.0 / (TILE_SIZE_PX * 2 ** zoom)
+
+
+def downsample_polyline(latitudes, longitudes, zoom):
+    """
+    Keep the vertices that land on a different screen pixel from the previous one at this zoom.
+    Vectorized: coordinates are snapped to the pixel grid and consecutive duplicates dropped.
+    The first and last points are always kept. Returns the indices of the kept points.
+    """
+    lats = np.asarray(latitudes, dtype=np.float64)
+    lons = np.asarray(longitudes, dtype=np.float64)
+    if len(lats) <= 2:
+        return np.arange(len(lats))
+    pixel = degrees_per_pixel(zoom)
+    cells = np.stack([np.floor(lats / pixel), np.floor(lons / pixel)], axis=1)
+    keep = np.empty(len(lats), dtype=bool)
+    keep[0] = True
+    keep[1:] = np.any(cells[1:] != cells[:-1], axis=1)
+    keep[-1] = True
+    return np.flatnonzero(keep)
+
+
+def build_preview_map(names, latitudes, longitudes):
+    """Build the folium map: clustered markers plus the route, downsampled per zoom band."""
+    lats = np.asarray(latitudes, dtype=np.float64)
+    lons = np.asarray(longitudes, dtype=np.float64)
+    m = folium.Map(location=[lats[0], lons[0]], zoom_start=7)
+    if len(lats) > 1:
+        m.fit_bounds([[lats.min(), lons.min()], [lats.max(), lons.max()]])
+
+    # Marker data is one compact array; the browser creates and clusters the markers
+    rows = [[lat, lon, f"{html.escape(name)}<br>{format_coords(lat, lon)}", html.escape(name)]
+            for name, lat, lon in zip(names, lats.tolist(), lons.tolist())]
+    FastMarkerCluster(rows, callback=MARKER_CALLBACK, name="Waypoints").add_to(m)
+
+    m.add_child(ZoomBandRoute(*route_bands(lats, lons), color="blue", weight=3, opacity=0.7))
+    return m
+
+
+def route_bands(latitudes, longitudes):
+    """
+    ([[lat, lon], ...], [(indices, min zoom, max zoom), ...]) for ZoomBandRoute. The coordinates
+    are the most detailed band: the route downsampled for its zoom and simplified to within
+    ROUTE_TOLERANCE_M. Coarser bands downsample those further, so every index refers to them.
+    """
+    lats = np.asarray(latitudes, dtype=np.float64)
+    lons = np.asarray(longitudes, dtype=np.float64)
+    *coarse, (min_zoom, max_zoom) = ZOOM_BANDS
+    shared = downsample_polyline(lats, lons, min_zoom)
+    shared = shared[simplify_indices(lats[shared], lons[shared], tolerance_m=ROUTE_TOLERANCE_M)]
+    lats, lons = lats[shared], lons[shared]
+    bands = [(downsample_polyline(lats, lons, low).tolist(), low, high) for low, high in coarse]
+    bands.append((None, min_zoom, max_zoom))
+    coordinates = np.round(np.column_stack([lats, lons]), COORDINATE_DECIMALS).tolist()
+    return coordinates, bands
+
+
+def render_preview_map(names, latitudes, longitudes, cache_dir=DEFAULT_MAP_CACHE_DIR, check_cancelled=None):
+    """
+    Return the path of an HTML preview for the route, rendering it only if no map with the
+    same content hash is cached. check_cancelled, if given, is called before the file is written.
+    """
+    with span("preview.render_map", "preview", profile=True, waypoints=len(latitudes)) as traced:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, itinerary_hash(names, latitudes, longitudes) + ".html")
+        if os.path.exists(path):
+            os.utime(path)  # Mark as recently used
+            traced.set(cached=True)
+            return path
+
+        with span("preview.build_map", "preview"):
+            m = build_preview_map(names, latitudes, longitudes)
+        if check_cancelled is not None:
+            check_cancelled()
+        tmp_path = path + ".tmp"
+        with span("preview.save_html", "preview"):
+            m.save(tmp_path)
+        os.replace(tmp_path, path)
+        _prune_cache(cache_dir)
+        traced.set(cached=False)
+        return path
+
+
+def _prune_cache(cache_dir, keep=MAX_CACHED_MAPS):
+    """Delete the least recently used cached maps beyond the newest keep."""
+    cached = sorted(glob.glob(os.path.join(cache_dir, "*.html")), key=os.path.getmtime, reverse=True)
+    for stale in cached[keep:]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
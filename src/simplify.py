@@ -0,0 +1,282 @@
+"""
+Route simplification for dense GPS tracks.
+Reduces an Itinerary with Ramer-Douglas-Peucker or Visvalingam-Whyatt, either under a
+tolerance in metres or down to a target number of points. Named waypoints are always kept,
+and the result reports how far the simplified route strays from the original.
+"""
+
+import heapq
+import math
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from src.planner import Itinerary, ColumnarItinerary
+from src.utils import EARTH_RADIUS_KM, haversine_distances
+
+RDP = "rdp"
+VISVALINGAM = "visvalingam"
+METHODS = (RDP, VISVALINGAM)
+
+# Vectorized Visvalingam rounds continue while each removes at least 1/ROUND_MIN_FRACTION of the points
+ROUND_MIN_FRACTION = 64
+
+
+@dataclass
+class SimplifyResult:
+    """A simplified itinerary plus the error it introduces relative to the original."""
+    itinerary: Itinerary
+    kept_indices: np.ndarray
+    original_points: int
+    max_offset_m: float  # Largest distance from a removed point to the simplified route
+    mean_offset_m: float
+    original_distance_km: float
+    simplified_distance_km: float
+
+    @property
+    def kept_points(self):
+        return len(self.kept_indices)
+
+    @property
+    def distance_error_km(self):
+        """How much shorter the simplified route is (cutting corners never makes it longer)."""
+        return self.original_distance_km - self.simplified_distance_km
+
+    def to_dict(self):
+        return {
+            "original_points": self.original_points,
+            "kept_points": self.kept_points,
+            "max_offset_m": round(self.max_offset_m, 2),
+            "mean_offset_m": round(self.mean_offset_m, 2),
+            "original_distance_km": round(self.original_distance_km, 2),
+            "simplified_distance_km": round(self.simplified_distance_km, 2),
+            "distance_error_km": round(self.distance_error_km, 2)
+        }
+
+
+def _coordinates(itinerary):
+    """Latitude and longitude columns of any Itinerary."""
+    if hasattr(itinerary, "latitudes"):
+        return itinerary.latitudes, itinerary.longitudes
+    lats = np.fromiter((wp.latitude for wp in itinerary.waypoints), dtype=np.float64, count=len(itinerary.waypoints))
+    lons = np.fromiter((wp.longitude for wp in itinerary.waypoints), dtype=np.float64, count=len(itinerary.waypoints))
+    return lats, lons
+
+
+def project(latitudes, longitudes):
+    """
+    Sinusoidal projection to metres about the track's median meridian: every point's east-west
+    offset is scaled by the cosine of its own latitude, so it stays true however far north the
+    track runs. Meridians dlon radians away from the median lean by about dlon * sin(lat), which
+    distorts offsets by under 1% within 8 degrees of longitude of it.
+    """
+    lats = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lons = np.radians(np.asarray(longitudes, dtype=np.float64))
+    lons = np.unwrap(lons)  # Tracks that cross the antimeridian stay continuous
+    if len(lons):
+        lons = lons - np.median(lons)
+    radius_m = EARTH_RADIUS_KM * 1000.0
+    return radius_m * lons * np.cos(lats), radius_m * lats
+
+
+def _segment_offsets(x, y, px, py, ax, ay, bx, by):
+    """Distances from points (px, py) to the segments (ax, ay)-(bx, by), all arrays."""
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length_sq > 0, ((px - ax) * dx + (py - ay) * dy) / length_sq, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def _rdp(x, y, anchors, tolerance=None, target=None):
+    """
+    Ramer-Douglas-Peucker, splitting the worst segment first so that it can stop either at
+    a tolerance or at a target count. Each split scans only its own segment with numpy.
+    """
+    keep = np.zeros(len(x), dtype=bool)
+    keep[anchors] = True
+    kept = len(anchors)
+    heap = []
+
+    def push(start, end):
+        if end - start < 2:
+            return
+        offsets = _segment_offsets(x, y, x[start + 1:end], y[start + 1:end], x[start], y[start], x[end], y[end])
+        worst = int(np.argmax(offsets))
+        heapq.heappush(heap, (-float(offsets[worst]), start, end, start + 1 + worst))
+
+    for start, end in zip(anchors[:-1], anchors[1:]):
+        push(start, end)
+    while heap:
+        offset, start, end, split = heap[0]
+        if tolerance is not None and -offset <= tolerance:
+            break
+        if target is not None and kept >= target:
+            break
+        heapq.heappop(heap)
+        keep[split] = True
+        kept += 1
+        push(start, split)
+        push(split, end)
+    return keep
+
+
+def _visvalingam_heap(x, y, anchored, threshold, stop_at):
+    """
+    Exact Visvalingam-Whyatt over lists: repeatedly drop the point whose triangle with its
+    neighbours has the smallest area, using a heap with lazy invalidation (O(n log n)).
+    """
+    n = len(x)
+    removed = [False] * n
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    xs, ys = x.tolist(), y.tolist()
+    areas = _triangle_areas(x, y)
+    areas[anchored] = math.inf
+    current = areas.tolist()
+    candidates = np.flatnonzero(~anchored)
+    heap = list(zip(areas[candidates].tolist(), candidates.tolist()))
+    heapq.heapify(heap)
+    anchored = anchored.tolist()  # The loop below would otherwise be dominated by numpy scalar indexing
+
+    remaining = n
+    floor = 0.0  # Effective areas never decrease, so removal order stays consistent
+    heappop, heappush = heapq.heappop, heapq.heappush
+    while heap and remaining > stop_at:
+        area, i = heappop(heap)
+        if removed[i] or area != current[i]:
+            continue  # Stale entry
+        if area >= threshold:
+            break
+        removed[i] = True
+        remaining -= 1
+        if area > floor:
+            floor = area
+        a, c = prev[i], nxt[i]
+        nxt[a] = c
+        prev[c] = a
+        for j in (a, c):
+            if not anchored[j]:  # Endpoints are anchors, so j always has two neighbours
+                p, q = prev[j], nxt[j]
+                xp, yp = xs[p], ys[p]
+                new_area = abs((xs[j] - xp) * (ys[q] - yp) - (xs[q] - xp) * (ys[j] - yp)) / 2.0
+                if new_area < floor:
+                    new_area = floor
+                current[j] = new_area
+                heappush(heap, (new_area, j))
+    return ~np.array(removed, dtype=bool)
+
+
+def _triangle_areas(x, y):
+    """Area of the triangle each point forms with its two neighbours; infinite at the ends."""
+    areas = np.full(len(x), math.inf)
+    areas[1:-1] = np.abs((x[1:-1] - x[:-2]) * (y[2:] - y[:-2]) - (x[2:] - x[:-2]) * (y[1:-1] - y[:-2])) / 2.0
+    return areas
+
+
+def _visvalingam(x, y, anchors, tolerance=None, target=None):
+    """
+    Visvalingam-Whyatt with an area threshold of tolerance * tolerance, or down to target points.
+    Most points are removed in vectorized rounds: each round drops every point whose area is
+    a local minimum (such points are never adjacent, so they can go together). Once rounds
+    stop making good progress, the exact heap-based algorithm finishes the survivors.
+    """
+    n = len(x)
+    threshold = math.inf if tolerance is None else tolerance * tolerance
+    stop_at = 0 if target is None else target
+    alive = np.arange(n)
+    anchored = np.zeros(n, dtype=bool)
+    anchored[anchors] = True
+
+    while len(alive) > max(stop_at, 2):
+        ax, ay = x[alive], y[alive]
+        areas = _triangle_areas(ax, ay)
+        areas[anchored[alive]] = math.inf
+        # Strict local minima; ties go to the earlier point so that neighbours never both qualify
+        minimum = np.zeros(len(alive), dtype=bool)
+        minimum[1:-1] = ((areas[1:-1] <= areas[:-2]) & (areas[1:-1] < areas[2:])
+                         & (areas[1:-1] < threshold))
+        drop = np.flatnonzero(minimum)
+        excess = len(alive) - stop_at
+        if len(drop) > excess:
+            drop = drop[np.argpartition(areas[drop], excess - 1)[:excess]]
+        if len(drop) == 0 or len(drop) < len(alive) // ROUND_MIN_FRACTION:
+            break
+        keep = np.ones(len(alive), dtype=bool)
+        keep[drop] = False
+        alive = alive[keep]
+
+    keep = np.zeros(n, dtype=bool)
+    if len(alive) > max(stop_at, 2):
+        keep[alive[_visvalingam_heap(x[alive], y[alive], anchored[alive], threshold, stop_at)]] = True
+    else:
+        keep[alive] = True
+    return keep
+
+
+def simplify_indices(latitudes, longitudes, tolerance_m=None, target_points=None, method=RDP, keep=()):
+    """
+    Indices of the points to keep when simplifying a track.
+    Give tolerance_m (metres; for Visvalingam the area threshold is tolerance_m squared),
+    target_points, or both (whichever stops first). The first and last points and the indices
+    in keep are always retained.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown simplification method {method!r}; use one of {', '.join(METHODS)}")
+    if tolerance_m is None and target_points is None:
+        raise ValueError("Give a tolerance in metres or a target number of points")
+    n = len(latitudes)
+    if n <= 2:
+        return np.arange(n)
+
+    x, y = project(latitudes, longitudes)
+    anchors = np.unique(np.concatenate([[0, n - 1], np.asarray(list(keep), dtype=np.intp)]))
+    simplify = _rdp if method == RDP else _visvalingam
+    return np.flatnonzero(simplify(x, y, anchors, tolerance_m, target_points))
+
+
+def route_offsets(latitudes, longitudes, kept_indices):
+    """Distance in metres from every original point to the simplified route through kept_indices."""
+    x, y = project(latitudes, longitudes)
+    kept = np.asarray(kept_indices)
+    if len(kept) < 2:
+        return np.zeros(len(x))
+    # Each point is measured against the simplified segment that replaced it
+    segment = np.clip(np.searchsorted(kept, np.arange(len(x)), side="right") - 1, 0, len(kept) - 2)
+    a, b = kept[segment], kept[segment + 1]
+    return _segment_offsets(x, y, x, y, x[a], y[a], x[b], y[b])
+
+
+def simplify_itinerary(itinerary, tolerance_m=None, target_points=None, method=RDP, preserve_named=True):
+    """
+    Simplify an itinerary. Waypoints with a non-empty name are kept when preserve_named is set.
+    Leg distances of the result are recomputed from the remaining coordinates; every kept
+    waypoint keeps its own name, speed and altitude. Returns a SimplifyResult.
+    """
+    lats, lons = _coordinates(itinerary)
+    names = itinerary.names if hasattr(itinerary, "names") else [wp.name for wp in itinerary.waypoints]
+    named = [i for i, name in enumerate(names) if name.strip()] if preserve_named else []
+    kept = simplify_indices(lats, lons, tolerance_m, target_points, method, named)
+
+    offsets = route_offsets(lats, lons, kept)
+    distances = haversine_distances(lats[kept], lons[kept])
+
+    if isinstance(itinerary, ColumnarItinerary):
+        simplified = ColumnarItinerary.from_arrays(
+            lats[kept], lons[kept], distances, itinerary.speeds[kept], itinerary.altitudes[kept],
+            [names[i] for i in kept])
+    else:
+        simplified = Itinerary([replace(itinerary.waypoints[i], distance_km=float(d))
+                                for i, d in zip(kept.tolist(), distances)])
+    simplified.reset_running_totals()
+
+    return SimplifyResult(
+        itinerary=simplified,
+        kept_indices=kept,
+        original_points=len(lats),
+        max_offset_m=float(offsets.max()) if len(offsets) else 0.0,
+        mean_offset_m=float(offsets.mean()) if len(offsets) else 0.0,
+        original_distance_km=float(haversine_distances(lats, lons, decimals=None).sum()),
+        simplified_distance_km=float(haversine_distances(lats[kept], lons[kept], decimals=None).sum())
+    )
@@ -0,0 +1,404 @@
+"""
+Spatial index over waypoint coordinates for the Arctic Expedition Planner.
+Points are stored as 3D unit vectors, so straight-line (chord) distance between them grows
+monotonically with great-circle distance and there is no trouble at the poles or the
+antimeridian. A SpatialIndex answers nearest-neighbour, radius and along-leg corridor queries
+from a KD-tree over those vectors and accepts inserts and removals between queries;
+near_duplicates finds coincident points of a whole track at once with a hashed grid.
+"""
+
+import heapq
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.utils import EARTH_RADIUS_KM
+
+LEAF_SIZE = 32  # Points per KD-tree leaf
+REBUILD_MIN_PENDING = 64  # Inserts kept outside the tree before a rebuild is considered
+DUPLICATE_RADIUS_M = 1.0  # Default distance under which two imported points count as the same place
+PAIR_BLOCK = 1 << 22  # Candidate pairs checked at once by near_duplicates
+
+# Multipliers for hashing integer grid cells; the hash is linear, so neighbouring cells can be
+# found by adding the hash of the offset. Collisions only add candidates that are then rejected.
+_CELL_HASH = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+_HALF_OFFSETS = np.array([(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)
+                          if (x, y, z) > (0, 0, 0)], dtype=np.int64)
+
+
+@dataclass(frozen=True)
+class Neighbour:
+    """A point returned by a query, with its great-circle distance from the query in kilometers."""
+    key: object
+    distance_km: float
+
+
+def unit_vectors(latitudes, longitudes):
+    """(N, 3) array of unit vectors for coordinates in degrees."""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord):
+    """Great-circle distance in kilometers for a chord length on the unit sphere."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.asarray(chord) / 2, 1.0))
+
+
+def km_to_chord(distance_km):
+    """Chord length on the unit sphere for a great-circle distance in kilometers."""
+    return 2 * np.sin(min(np.pi, distance_km / EARTH_RADIUS_KM) / 2)
+
+
+def _box_distance(point, lo, hi):
+    """Distance from a point to an axis-aligned box (0 inside it)."""
+    gap = np.maximum(np.maximum(lo - point, point - hi), 0.0)
+    return float(np.sqrt(gap @ gap))
+
+
+class _KDTree:
+    """
+    Static KD-tree over an (N, 3) array. Nodes split the longest side of their bounding box at
+    the median; leaves cover a contiguous range of self.points, which is stored in tree order.
+    """
+    def __init__(self, points, slots, leaf_size=LEAF_SIZE):
+        order = np.arange(len(points))
+        self.lo, self.hi, self.start, self.stop, self.children = [], [], [], [], []
+        pending = [(0, len(points), None, 0)] if len(points) else []  # (start, stop, parent, side)
+        while pending:
+            start, stop, parent, side = pending.pop()
+            node = len(self.start)
+            if parent is not None:
+                self.children[parent][side] = node
+            box = points[order[start:stop]]
+            self.lo.append(box.min(axis=0))
+            self.hi.append(box.max(axis=0))
+            self.start.append(start)
+            self.stop.append(stop)
+            self.children.append(None)
+            if stop - start > leaf_size:
+                axis = int(np.argmax(self.hi[node] - self.lo[node]))
+                mid = (start + stop) // 2
+                section = order[start:stop]
+                order[start:stop] = section[np.argpartition(box[:, axis], mid - start)]
+                self.children[node] = [None, None]
+                pending.append((mid, stop, node, 1))
+                pending.append((start, mid, node, 0))
+        self.points = points[order]
+        self.slots = slots[order]
+
+    def __len__(self):
+        return len(self.points)
+
+    def search(self, prune, visit):
+        """
+        Depth-first walk: prune(node) is True for nodes that cannot hold a match and
+        visit(start, stop) is called for the point range of every leaf reached.
+        """
+        if not len(self.points):
+            return
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if prune(node):
+                continue
+            children = self.children[node]
+            if children is None:
+                visit(self.start[node], self.stop[node])
+            else:
+                stack.extend(children)
+
+
+class SpatialIndex:
+    """
+    Points on the sphere keyed by any hashable value (a waypoint's position or identity).
+    Inserted points wait in a small unindexed buffer that every query scans directly; once the
+    buffer (or the number of removed points) grows past a fraction of the tree, the tree is
+    rebuilt on the next query. Edits are therefore O(1) and queries stay logarithmic.
+    """
+    def __init__(self, rebuild_fraction=0.125):
+        self.rebuild_fraction = rebuild_fraction
+        self._points = np.empty((0, 3))  # Unit vector per slot
+        self._alive = np.empty(0, dtype=bool)
+        self._keys = []  # Key per slot
+        self._slot_of = {}
+        self._count = 0  # Slots in use; slots from self._tree_size up are the unindexed buffer
+        self._tree = _KDTree(self._points, np.empty(0, dtype=np.intp))
+        self._tree_size = 0
+        self._dead = 0  # Removed slots still inside the tree
+
+    @classmethod
+    def from_coordinates(cls, latitudes, longitudes, keys=None):
+        """Index a sequence of coordinates, keyed by position unless keys are given."""
+        index = cls()
+        index.reset(range(len(latitudes)) if keys is None else keys, latitudes, longitudes)
+        return index
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def __contains__(self, key):
+        return key in self._slot_of
+
+    # Editing
+
+    def reset(self, keys, latitudes, longitudes):
+        """Replace the whole contents; the tree is built on the first query."""
+        keys = list(keys)
+        if len(keys) != len(latitudes) or len(keys) != len(longitudes):
+            raise ValueError("keys, latitudes and longitudes must have the same length")
+        self._points = unit_vectors(latitudes, longitudes).reshape(-1, 3)
+        self._alive = np.ones(len(keys), dtype=bool)
+        self._keys = keys
+        self._slot_of = {key: slot for slot, key in enumerate(keys)}
+        if len(self._slot_of) != len(keys):
+            raise ValueError("keys must be unique")
+        self._count = len(keys)
+        self._tree = _KDTree(self._points[:0], np.empty(0, dtype=np.intp))
+        self._tree_size = 0
+        self._dead = 0
+
+    def clear(self):
+        self.reset([], [], [])
+
+    def insert(self, key, latitude, longitude):
+        """Add a point, replacing any earlier point with the same key."""
+        self.insert_many([key], [latitude], [longitude])
+
+    def insert_many(self, keys, latitudes, longitudes):
+        """Add several points in one call."""
+        keys = list(keys)
+        if len(set(keys)) != len(keys):
+            raise ValueError("keys must be unique")
+        for key in keys:
+            self.remove(key)
+        points = unit_vectors(latitudes, longitudes).reshape(-1, 3)
+        needed = self._count + len(keys)
+        if needed > len(self._points):
+            capacity = max(needed, 2 * len(self._points), 16)
+            grown = np.empty((capacity, 3))
+            grown[:self._count] = self._points[:self._count]
+            alive = np.zeros(capacity, dtype=bool)
+            alive[:self._count] = self._alive[:self._count]
+            self._points, self._alive = grown, alive
+        self._points[self._count:needed] = points
+        self._alive[self._count:needed] = True
+        for key in keys:
+            self._slot_of[key] = len(self._keys)
+            self._keys.append(key)
+        self._count = needed
+
+    def remove(self, key):
+        """Drop the point with this key; returns False if there was none."""
+        slot = self._slot_of.pop(key, None)
+        if slot is None:
+            return False
+        self._alive[slot] = False
+        self._keys[slot] = None
+        if slot < self._tree_size:
+            self._dead += 1
+        return True
+
+    def _refresh(self):
+        """Rebuild the tree from the live points if the buffer or the dead slots have grown too large."""
+        limit = max(REBUILD_MIN_PENDING, int(self._tree_size * self.rebuild_fraction))
+        if self._count - self._tree_size <= limit and self._dead <= limit:
+            return
+        live = np.flatnonzero(self._alive[:self._count])
+        self._points = self._points[live]
+        self._alive = np.ones(len(live), dtype=bool)
+        self._keys = [self._keys[slot] for slot in live]
+        self._slot_of = {key: slot for slot, key in enumerate(self._keys)}
+        self._count = len(live)
+        self._tree = _KDTree(self._points, np.arange(len(live)))
+        self._tree_size = len(live)
+        self._dead = 0
+
+    def _pending_slots(self):
+        slots = np.arange(self._tree_size, self._count)
+        return slots[self._alive[slots]]
+
+    def _matches(self, slots, chords):
+        order = np.argsort(chords, kind="stable")
+        return [Neighbour(self._keys[slot], float(d))
+                for slot, d in zip(slots[order].tolist(), chord_to_km(chords[order]))]
+
+    # Queries
+
+    def nearest(self, latitude, longitude, k=1, max_distance_km=None):
+        """The k closest points, nearest first, optionally no further than max_distance_km."""
+        self._refresh()
+        query = unit_vectors([latitude], [longitude])[0]
+        limit = np.inf if max_distance_km is None else km_to_chord(max_distance_km)
+        best = []  # Max-heap of (-chord, slot) holding the k closest points so far
+
+        def worst():
+            return -best[0][0] if len(best) == k else limit
+
+        def offer(slots, points):
+            chords = np.sqrt(((points - query) ** 2).sum(axis=1))
+            keep = np.flatnonzero(chords <= worst())
+            if len(keep) > k:
+                keep = keep[np.argpartition(chords[keep], k - 1)[:k]]
+            for chord, slot in sorted(zip(chords[keep].tolist(), slots[keep].tolist())):
+                if chord > worst():
+                    break
+                if len(best) < k:
+                    heapq.heappush(best, (-chord, slot))
+                else:
+                    heapq.heappushpop(best, (-chord, slot))
+
+        if k <= 0:
+            return []
+        pending = self._pending_slots()
+        offer(pending, self._points[pending])
+
+        tree = self._tree
+        if len(tree):
+            # Best-first over the tree: nodes come off the heap nearest box first
+            nodes = [(0.0, 0)]
+            while nodes:
+                distance, node = heapq.heappop(nodes)
+                if distance > worst():
+                    break
+                children = tree.children[node]
+                if children is None:
+                    slots = tree.slots[tree.start[node]:tree.stop[node]]
+                    alive = self._alive[slots]
+                    offer(slots[alive], tree.points[tree.start[node]:tree.stop[node]][alive])
+                else:
+                    for child in children:
+                        heapq.heappush(nodes, (_box_distance(query, tree.lo[child], tree.hi[child]), child))
+
+        slots = np.array([slot for _, slot in best], dtype=np.intp)
+        chords = np.array([-chord for chord, _ in best])
+        return self._matches(slots, chords)
+
+    def within(self, latitude, longitude, radius_km):
+        """Every point within radius_km of the given coordinates, nearest first."""
+        self._refresh()
+        query = unit_vectors([latitude], [longitude])[0]
+        limit = km_to_chord(radius_km)
+        return self._collect(
+            lambda node: _box_distance(query, self._tree.lo[node], self._tree.hi[node]) > limit,
+            lambda points: np.sqrt(((points - query) ** 2).sum(axis=1)),
+            limit)
+
+    def along_leg(self, lat1, lon1, lat2, lon2, width_km):
+        """
+        Every point within width_km of the great-circle leg between two coordinates,
+        ordered by that distance. Points beyond either end are measured to the nearer end.
+        """
+        a, b = unit_vectors([lat1, lat2], [lon1, lon2])
+        normal = np.cross(a, b)
+        length = np.linalg.norm(normal)
+        if length < 1e-12:
+            return self.within(lat1, lon1, width_km)
+        self._refresh()
+        normal /= length
+        width = width_km / EARTH_RADIUS_KM
+        slab = np.sin(min(width, np.pi / 2))
+
+        # Candidates lie in a ball around the leg's midpoint and in a slab around its plane
+        half_angle = np.arctan2(length, a @ b) / 2
+        centre = (a + b) / np.linalg.norm(a + b)
+        ball = 2 * np.sin(min(np.pi, half_angle + width) / 2)
+
+        def prune(node):
+            lo, hi = self._tree.lo[node], self._tree.hi[node]
+            if _box_distance(centre, lo, hi) > ball:
+                return True
+            low = np.where(normal > 0, lo, hi) @ normal
+            high = np.where(normal > 0, hi, lo) @ normal
+            return low > slab or high < -slab
+
+        def angles(points):
+            cross_track = np.arcsin(np.clip(np.abs(points @ normal), 0.0, 1.0))
+            inside = (np.cross(a, points) @ normal >= 0) & (np.cross(points, b) @ normal >= 0)
+            to_a = np.arctan2(np.linalg.norm(np.cross(points, a), axis=1), points @ a)
+            to_b = np.arctan2(np.linalg.norm(np.cross(points, b), axis=1), points @ b)
+            return np.where(inside, cross_track, np.minimum(to_a, to_b))
+
+        # Compare as chords so results are reported like the other queries
+        return self._collect(prune, lambda points: 2 * np.sin(angles(points) / 2), 2 * np.sin(min(width, np.pi) / 2))
+
+    def _collect(self, prune, measure, limit):
+        """Matches from the buffer and from every tree leaf that survives prune, with measure() <= limit."""
+        found_slots, found_chords = [], []
+
+        def take(slots, points):
+            chords = measure(points)
+            keep = chords <= limit
+            found_slots.append(slots[keep])
+            found_chords.append(chords[keep])
+
+        pending = self._pending_slots()
+        take(pending, self._points[pending])
+
+        def visit(start, stop):
+            slots = self._tree.slots[start:stop]
+            alive = self._alive[slots]
+            take(slots[alive], self._tree.points[start:stop][alive])
+
+        self._tree.search(prune, visit)
+        return self._matches(np.concatenate(found_slots), np.concatenate(found_chords))
+
+
+def _cell_keys(cells):
+    """Wrapping linear hash of integer grid cells."""
+    return cells.astype(np.uint64) @ _CELL_HASH if len(cells) else np.empty(0, dtype=np.uint64)
+
+
+def near_duplicates(latitudes, longitudes, radius_m=DUPLICATE_RADIUS_M):
+    """
+    Indices of the points that lie within radius_m of an earlier point, ascending.
+    Points are bucketed into a grid of cubes one radius wide, so each point only has to be
+    compared with the points of its own and the 26 surrounding cells.
+    """
+    points = unit_vectors(latitudes, longitudes).reshape(-1, 3)
+    if len(points) < 2:
+        return np.empty(0, dtype=np.intp)
+    size = km_to_chord(radius_m / 1000.0)
+    if size <= 0:
+        raise ValueError("radius_m must be positive")
+
+    cells = np.floor(points / size).astype(np.int64)
+    keys = _cell_keys(cells)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    firsts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    unique_keys = sorted_keys[firsts]
+    counts = np.diff(np.r_[firsts, len(order)])
+
+    duplicate = np.zeros(len(points), dtype=bool)
+
+    def check(cell_a, cell_b):
+        """Compare every point of cell_a[i] with every point of cell_b[i], in bounded blocks."""
+        sizes = counts[cell_a] * counts[cell_b]
+        ends = np.cumsum(sizes)
+        block_start = 0
+        while block_start < len(cell_a):
+            budget = ends[block_start] - sizes[block_start] + PAIR_BLOCK
+            block_stop = max(block_start + 1, int(np.searchsorted(ends, budget)))
+            a, b = cell_a[block_start:block_stop], cell_b[block_start:block_stop]
+            n_b, total = counts[b], sizes[block_start:block_stop]
+            pair = np.repeat(np.arange(len(a)), total)
+            within = np.arange(total.sum()) - np.repeat(np.cumsum(total) - total, total)
+            i = order[firsts[a][pair] + within // n_b[pair]]
+            j = order[firsts[b][pair] + within % n_b[pair]]
+            close = (i != j) & (((points[i] - points[j]) ** 2).sum(axis=1) <= size * size)
+            duplicate[np.maximum(i, j)[close]] = True
+            block_start = block_stop
+
+    # Pairs inside one cell, then with each neighbouring cell (each neighbour pair is met once)
+    all_cells = np.arange(len(unique_keys))
+    crowded = all_cells[counts > 1]
+    check(crowded, crowded)
+    for offset in _HALF_OFFSETS:
+        target = unique_keys + _cell_keys(offset[None, :])[0]
+        found = np.searchsorted(unique_keys, target)
+        found[found == len(unique_keys)] = 0
+        match = unique_keys[found] == target
+        check(all_cells[match], found[match])
+    return np.flatnonzero(duplicate)
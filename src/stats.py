@@ -0,0 +1,261 @@
+"""
+Route statistics for the Arctic Expedition Planner.
+Maintains prefix sums over the legs of an Itinerary (Fenwick trees) so cumulative
+values, waypoint range queries and daily stage splitting never rescan the route.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+DEFAULT_MAX_HOURS_PER_DAY = 8.0
+
+# Per-leg quantities tracked by the index, in column order
+DISTANCE, TIME, ASCENT, DESCENT = range(4)
+
+
+class FenwickTree:
+    """
+    Binary indexed tree over rows of per-leg values.
+    Point updates, prefix sums and appends are O(log n); the initial build is a vectorized O(n).
+    """
+    def __init__(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, None]
+        self.size = len(values)
+        self.values = np.zeros((max(self.size, 1) * 2, values.shape[1]))
+        self.values[:self.size] = values
+        self.tree = np.zeros((len(self.values) + 1, values.shape[1]))
+
+        # tree[i] holds the sum of values[i - lowbit(i), i), which is a difference of plain prefix sums
+        prefix = np.zeros((self.size + 1, values.shape[1]))
+        np.cumsum(values, axis=0, out=prefix[1:])
+        idx = np.arange(1, self.size + 1)
+        self.tree[1:self.size + 1] = prefix[idx] - prefix[idx - (idx & -idx)]
+
+    def add(self, index, delta):
+        """Add delta to the value at index."""
+        self.values[index] += delta
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def set(self, index, value):
+        """Replace the value at index."""
+        self.add(index, np.asarray(value, dtype=np.float64) - self.values[index])
+
+    def prefix_sum(self, count):
+        """Sum of the first count values."""
+        total = np.zeros(self.tree.shape[1])
+        i = min(count, self.size)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def range_sum(self, start, stop):
+        """Sum of values[start:stop]."""
+        if stop <= start:
+            return np.zeros(self.tree.shape[1])
+        return self.prefix_sum(stop) - self.prefix_sum(start)
+
+    def append(self, value):
+        """Append a value at the end in O(log n)."""
+        if self.size + 1 >= len(self.tree):
+            self._grow()
+        self.size += 1
+        i = self.size
+        value = np.asarray(value, dtype=np.float64)
+        self.values[i - 1] = value
+        # The new node covers values[i - lowbit(i), i): the new value plus a run of existing ones
+        self.tree[i] = value + self.prefix_sum(i - 1) - self.prefix_sum(i - (i & -i))
+
+    def pop(self):
+        """Drop the last value. No other node covers it, so this is O(1)."""
+        self.size -= 1
+        self.tree[self.size + 1] = 0.0
+        self.values[self.size] = 0.0
+
+    def search(self, column, target):
+        """
+        Return the largest count such that prefix_sum(count)[column] <= target.
+        Assumes the column is non-negative, so its prefix sums are non-decreasing.
+        """
+        pos = 0
+        remaining = target
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt, column] <= remaining:
+                pos = nxt
+                remaining -= self.tree[nxt, column]
+            step >>= 1
+        return pos
+
+    def _grow(self):
+        capacity = len(self.values) * 2
+        values = np.zeros((capacity, self.values.shape[1]))
+        values[:len(self.values)] = self.values
+        tree = np.zeros((capacity + 1, self.tree.shape[1]))
+        tree[:len(self.tree)] = self.tree
+        self.values, self.tree = values, tree
+
+
+@dataclass
+class RangeStats:
+    """Totals for travelling from one waypoint to another."""
+    start_index: int
+    end_index: int
+    distance_km: float
+    time_hours: float
+    ascent_m: float
+    descent_m: float
+
+    def to_dict(self):
+        """Convert to a serializable dictionary."""
+        return {
+            "start_index": self.start_index,
+            "end_index": self.end_index,
+            "distance_km": round(self.distance_km, 2),
+            "time_hours": round(self.time_hours, 2),
+            "ascent_m": round(self.ascent_m, 1),
+            "descent_m": round(self.descent_m, 1)
+        }
+
+
+@dataclass
+class Stage(RangeStats):
+    """One day of travel produced by ItineraryStats.daily_stages."""
+    day: int = 0
+    over_limit: bool = False  # A single leg longer than the daily limit
+
+    def to_dict(self):
+        """Convert to a serializable dictionary."""
+        data = {"day": self.day}
+        data.update(super().to_dict())
+        data["over_limit"] = self.over_limit
+        return data
+
+
+def leg_columns(itinerary):
+    """
+    Return per-leg (distance, time, ascent, descent) as an (n, 4) array.
+    Leg i ends at waypoint i; leg 0 only carries its own (normally zero) distance.
+    """
+    distances, speeds, altitudes = itinerary.leg_arrays()
+    legs = np.zeros((len(distances), 4))
+    legs[:, DISTANCE] = distances
+    legs[:, TIME] = itinerary.leg_times(distances, speeds, altitudes)
+    if len(altitudes) > 1:
+        climb = np.diff(altitudes)
+        legs[1:, ASCENT] = np.maximum(climb, 0.0)
+        legs[1:, DESCENT] = np.maximum(-climb, 0.0)
+    return legs
+
+
+class ItineraryStats:
+    """
+    Prefix-sum index over an itinerary's legs.
+    Answers cumulative, range and daily stage queries in O(log n). Keep it current with
+    update_legs after point edits and append/pop at the end; other structural changes need rebuild.
+    """
+    def __init__(self, itinerary):
+        self.itinerary = itinerary
+        self.rebuild()
+
+    def rebuild(self):
+        """Rebuild the index from the itinerary in one vectorized pass."""
+        self.tree = FenwickTree(leg_columns(self.itinerary))
+
+    def __len__(self):
+        return self.tree.size
+
+    def _leg(self, index):
+        wp = self.itinerary.waypoints[index]
+        climb = wp.altitude_m - self.itinerary.waypoints[index - 1].altitude_m if index > 0 else 0.0
+        model = getattr(self.itinerary, "speed_model", None)
+        if model is None:
+            time = wp.distance_km / wp.estimated_speed_kph if wp.estimated_speed_kph > 0 else 0.0
+        else:
+            time = float(model.leg_hours([wp.distance_km], [wp.estimated_speed_kph], [climb])[0])
+        return [wp.distance_km, time, max(climb, 0.0), max(-climb, 0.0)]
+
+    def leg_times(self):
+        """Travel time in hours of every leg, as indexed."""
+        return self.tree.values[:self.tree.size, TIME].copy()
+
+    def update_legs(self, indices):
+        """Re-read the given legs from the itinerary after a point edit."""
+        for i in indices:
+            if 0 <= i < self.tree.size:
+                self.tree.set(i, self._leg(i))
+
+    def append(self):
+        """Index the itinerary's last waypoint after it has been appended."""
+        self.tree.append(self._leg(self.tree.size))
+
+    def pop(self):
+        """Drop the last leg after the itinerary's last waypoint has been removed."""
+        self.tree.pop()
+
+    def total_distance(self):
+        return float(self.tree.prefix_sum(self.tree.size)[DISTANCE])
+
+    def total_time(self):
+        return float(self.tree.prefix_sum(self.tree.size)[TIME])
+
+    def cumulative_distance(self, index):
+        """Distance travelled from the start when arriving at waypoint index."""
+        return float(self.tree.prefix_sum(index + 1)[DISTANCE])
+
+    def cumulative_time(self, index):
+        """Travel time from the start when arriving at waypoint index."""
+        return float(self.tree.prefix_sum(index + 1)[TIME])
+
+    def cumulative(self):
+        """Cumulative (distance, time) arrays for every waypoint."""
+        sums = np.cumsum(self.tree.values[:self.tree.size], axis=0)
+        return sums[:, DISTANCE], sums[:, TIME]
+
+    def range_stats(self, start_index, end_index):
+        """Totals for travelling from waypoint start_index to waypoint end_index (legs start+1..end)."""
+        if not 0 <= start_index <= end_index < self.tree.size:
+            raise IndexError("waypoint range out of bounds")
+        sums = self.tree.range_sum(start_index + 1, end_index + 1)
+        return RangeStats(start_index, end_index, float(sums[DISTANCE]), float(sums[TIME]),
+                          float(sums[ASCENT]), float(sums[DESCENT]))
+
+    def daily_stages(self, max_hours_per_day=DEFAULT_MAX_HOURS_PER_DAY):
+        """
+        Split the route into days of at most max_hours_per_day travel, ending each day at a waypoint.
+        A single leg longer than the limit becomes its own day and is flagged over_limit.
+        """
+        if max_hours_per_day <= 0:
+            raise ValueError("max_hours_per_day must be positive")
+
+        stages = []
+        start = 0
+        last = self.tree.size - 1
+        while start < last:
+            reached = self.tree.prefix_sum(start + 1)[TIME] + max_hours_per_day
+            # Small tolerance so a day that exactly fills the limit is not split by rounding noise
+            end = self.tree.search(TIME, reached + 1e-9) - 1
+            over_limit = end <= start
+            end = min(max(end, start + 1), last)
+            stats = self.range_stats(start, end)
+            stages.append(Stage(stats.start_index, stats.end_index, stats.distance_km, stats.time_hours,
+                                stats.ascent_m, stats.descent_m, day=len(stages) + 1, over_limit=over_limit))
+            start = end
+        return stages
+
+    def summary(self, max_hours_per_day=DEFAULT_MAX_HOURS_PER_DAY):
+        """Serializable overview used by the exporters."""
+        return {
+            "total_distance_km": round(self.total_distance(), 2),
+            "estimated_time_hours": round(self.total_time(), 2),
+            "speed_model": getattr(getattr(self.itinerary, "speed_model", None), "name", "flat"),
+            "max_hours_per_day": max_hours_per_day,
+            "daily_stages": [stage.to_dict() for stage in self.daily_stages(max_hours_per_day)]
+        }
@@ -0,0 +1,186 @@
+"""
+Background task execution for the Arctic Expedition Planner GUI.
+Slow jobs (elevation lookups, exports, map generation) run on a worker pool while
+results, progress and errors are handed back to the Tk main thread through root.after,
+so the window stays responsive and widgets are only ever touched from the main thread.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.instrumentation import count, span
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+
+
+class TaskCancelled(Exception):
+    """Raised inside a job when its task has been cancelled."""
+
+
+class Task:
+    """
+    Handle for a background job. The job function receives it as its first argument
+    to report progress and to check for cancellation between units of work.
+    """
+    def __init__(self, runner, key, description):
+        self.key = key
+        self.description = description
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self._runner = runner
+        self._cancel_event = threading.Event()
+        self._finished = threading.Event()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    def cancel(self):
+        """Request cancellation. Jobs notice it at their next check_cancelled or progress report."""
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        """Raise TaskCancelled if cancellation was requested."""
+        if self.cancelled:
+            raise TaskCancelled(self.description)
+
+    def report_progress(self, fraction, message=""):
+        """Record progress (0.0-1.0) from the worker thread; also a cancellation point."""
+        self.check_cancelled()
+        self.progress = max(0.0, min(1.0, fraction))
+        self.message = message
+        self._runner._post(self, "progress")
+
+    def add_callbacks(self, on_done=None, on_error=None, on_progress=None):
+        """Register extra callbacks, e.g. after a submit was coalesced into this task."""
+        self._callbacks.append((on_done, on_error, on_progress))
+
+    def wait(self, timeout=None):
+        """Block until the job has finished (for scripts and tests, never the Tk main thread)."""
+        return self._finished.wait(timeout)
+
+
+class TaskRunner:
+    """
+    Worker pool for GUI jobs. Submitting a job with the key of one that is still pending or
+    running coalesces the two: the existing task is returned and its original callbacks deliver
+    the single result (use Task.add_callbacks to hear about it as well). The new fn and its
+    arguments are dropped, so keys of jobs over changing inputs should include a digest of them.
+    Callbacks run on whichever thread calls poll(); attach() makes that the Tk main loop.
+    """
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="aep-task")
+        self._events = queue.Queue()
+        self._active = {}  # key -> unfinished Task, for coalescing
+        self._tasks = set()  # every unfinished Task
+        self._lock = threading.Lock()
+        self._root = None
+        self._interval_ms = 50
+        self.on_status = None  # Called with a Task whenever any task's state or progress changes
+
+    def attach(self, root, interval_ms=50):
+        """Deliver task events on the Tk main thread by polling from root.after."""
+        self._root = root
+        self._interval_ms = interval_ms
+        self._root.after(self._interval_ms, self._tick)
+
+    def _tick(self):
+        self.poll()
+        if self._root is not None:
+            self._root.after(self._interval_ms, self._tick)
+
+    def submit(self, fn, *args, key=None, description="", on_done=None, on_error=None,
+               on_progress=None, **kwargs):
+        """
+        Run fn(task, *args, **kwargs) on the pool and return its Task.
+        on_done(result), on_error(exception) and on_progress(task) are called from poll().
+        """
+        with self._lock:
+            task = self._active.get(key) if key is not None else None
+            if task is None or task.finished or task.cancelled:
+                task = Task(self, key, description or getattr(fn, "__name__", "task"))
+                if key is not None:
+                    self._active[key] = task
+                self._tasks.add(task)
+                task._callbacks.append((on_done, on_error, on_progress))
+            else:
+                return task
+
+        self._executor.submit(self._run, task, fn, args, kwargs)
+        self._post(task, "status")
+        return task
+
+    def _run(self, task, fn, args, kwargs):
+        try:
+            task.check_cancelled()
+            task.status = RUNNING
+            self._post(task, "status")
+            with span(task.description, "task", key=repr(task.key)):
+                task.result = fn(task, *args, **kwargs)
+            task.status = DONE
+        except TaskCancelled:
+            task.status = CANCELLED
+            count("tasks.cancelled")
+        except Exception as e:
+            task.error = e
+            task.status = FAILED
+        finally:
+            with self._lock:
+                if task.key is not None and self._active.get(task.key) is task:
+                    del self._active[task.key]
+                self._tasks.discard(task)
+            self._post(task, "finished")
+            task._finished.set()
+
+    def _post(self, task, kind):
+        self._events.put((task, kind))
+
+    def poll(self):
+        """Run pending callbacks. Called periodically on the main thread once attached."""
+        while True:
+            try:
+                task, kind = self._events.get_nowait()
+            except queue.Empty:
+                return
+            if self.on_status is not None:
+                self.on_status(task)
+            for on_done, on_error, on_progress in list(task._callbacks):
+                if kind == "progress" and on_progress is not None:
+                    on_progress(task)
+                elif kind == "finished" and task.status == DONE and on_done is not None:
+                    with span(f"{task.description} (apply)", "gui"):
+                        on_done(task.result)
+                elif kind == "finished" and task.status == FAILED and on_error is not None:
+                    on_error(task.error)
+
+    def wait_all(self, timeout=None):
+        """Block until every active task has finished, then deliver their callbacks."""
+        with self._lock:
+            tasks = list(self._tasks)
+        for task in tasks:
+            task.wait(timeout)
+        self.poll()
+
+    def active_tasks(self):
+        with self._lock:
+            return list(self._tasks)
+
+    def cancel_all(self):
+        """Request cancellation of every task that has not finished."""
+        for task in self.active_tasks():
+            task.cancel()
+
+    def shutdown(self):
+        """Cancel outstanding work and stop the pool without blocking the caller."""
+        self.cancel_all()
+        self._root = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,244 @@
+"""
+Streaming import of recorded GPS tracks from GPX and KML files.
+Files are fed to an expat pull parser one chunk at a time and each point is handed on as soon
+as its closing tag has been read; no element tree is built, so memory use during parsing does
+not grow with file size. Leg distances are computed in bulk once every point is known, and
+elevations are taken from the file where present.
+"""
+
+import os
+from array import array
+from dataclasses import dataclass
+from itertools import starmap
+from typing import Optional
+from xml.parsers import expat
+
+import numpy as np
+
+from src.planner import Waypoint, Itinerary, ColumnarItinerary
+from src.utils import haversine_distances
+
+GPX_EXTENSION = ".gpx"
+KML_EXTENSION = ".kml"
+TRACK_EXTENSIONS = (GPX_EXTENSION, KML_EXTENSION)
+CHUNK_SIZE = 1 << 20  # Bytes fed to the parser at a time; progress is reported per chunk
+
+GPX_POINT_TAGS = frozenset({"wpt", "rtept", "trkpt"})
+GPX_ROUTE_TAGS = frozenset({"rtept", "trkpt"})  # wpt elements are standalone points of interest
+
+
+@dataclass(frozen=True)
+class TrackPoint:
+    """One point read from a track file; elevation_m is None when the file gives none."""
+    name: str
+    latitude: float
+    longitude: float
+    elevation_m: Optional[float] = None
+
+
+def is_track_file(filename):
+    """True for file names handled by this module."""
+    return str(filename).lower().endswith(TRACK_EXTENSIONS)
+
+
+class _LocalNames(dict):
+    """Element name -> name without its namespace prefix, memoized since files use only a few names."""
+    def __missing__(self, name):
+        local = self[name] = name.rpartition(":")[2]
+        return local
+
+
+def _float(text, what):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {what} {text!r} in track file") from None
+
+
+class _GPXHandler:
+    """
+    Expat callbacks collecting (name, lat, lon, elevation) tuples: route and track points in
+    points, and standalone wpt points of interest separately in waypoints.
+    """
+    def __init__(self):
+        self.points = []
+        self.waypoints = []
+        self._local = _LocalNames()
+        self._point = None  # [name, lat, lon, elevation] of the point being read
+        self._text = None   # Character data of the name or ele element being read
+
+    def start(self, name, attrs):
+        tag = self._local[name]
+        if tag in GPX_POINT_TAGS:
+            try:
+                self._point = ["", float(attrs["lat"]), float(attrs["lon"]), None]
+            except (KeyError, ValueError):
+                raise ValueError(f"Invalid {tag} coordinates {attrs!r} in track file") from None
+        elif self._point is not None and (tag == "name" or tag == "ele"):
+            self._text = []
+
+    def end(self, name):
+        if self._point is None:
+            return
+        tag = self._local[name]
+        if tag in GPX_POINT_TAGS:
+            (self.points if tag in GPX_ROUTE_TAGS else self.waypoints).append(tuple(self._point))
+            self._point = None
+        elif self._text is not None:
+            text = "".join(self._text).strip()
+            self._text = None
+            if tag == "name":
+                self._point[0] = text
+            elif text:
+                self._point[3] = _float(text, "elevation")
+
+    def characters(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+
+class _KMLHandler:
+    """
+    Expat callbacks collecting points from a KML file: named Point placemarks, LineString
+    vertices and gx:Track samples. Coordinate lists are split as they arrive, so even a
+    single LineString with millions of vertices is never held as one string.
+    """
+    def __init__(self):
+        self.points = []
+        self._local = _LocalNames()
+        self._placemark_name = ""
+        self._in_point = False
+        self._name_text = None    # Character data of a placemark's name
+        self._coords_tail = None  # Unfinished coordinate tuple while inside <coordinates>
+        self._coord_text = None   # Character data of a gx:coord sample
+
+    def start(self, name, attrs):
+        tag = self._local[name]
+        if tag == "Placemark":
+            self._placemark_name = ""
+        elif tag == "name" and not self._placemark_name:
+            self._name_text = []
+        elif tag == "Point":
+            self._in_point = True
+        elif tag == "coordinates":
+            self._coords_tail = ""
+        elif tag == "coord":
+            self._coord_text = []
+
+    def end(self, name):
+        tag = self._local[name]
+        if tag == "name" and self._name_text is not None:
+            self._placemark_name = "".join(self._name_text).strip()
+            self._name_text = None
+        elif tag == "Point":
+            self._in_point = False
+        elif tag == "coordinates":
+            if self._coords_tail:
+                self._add_tuple(self._coords_tail)
+            self._coords_tail = None
+        elif tag == "coord":
+            parts = "".join(self._coord_text).split()
+            self._coord_text = None
+            self._add_parts(parts, "")
+        elif tag == "Placemark":
+            self._placemark_name = ""
+
+    def characters(self, data):
+        if self._coords_tail is not None:
+            tuples = (self._coords_tail + data).split()
+            # The last tuple may continue in the next piece of character data
+            self._coords_tail = tuples.pop() if tuples and not data[-1].isspace() else ""
+            for text in tuples:
+                self._add_tuple(text)
+        elif self._name_text is not None:
+            self._name_text.append(data)
+        elif self._coord_text is not None:
+            self._coord_text.append(data)
+
+    def _add_tuple(self, text):
+        """Add one "lon,lat[,alt]" tuple; only a Point's coordinates carry the placemark name."""
+        self._add_parts(text.split(","), self._placemark_name if self._in_point else "")
+
+    def _add_parts(self, parts, name):
+        if len(parts) < 2:
+            raise ValueError(f"Invalid KML coordinate {' '.join(parts)!r}")
+        elevation = _float(parts[2], "elevation") if len(parts) > 2 and parts[2] else None
+        self.points.append((name, _float(parts[1], "latitude"), _float(parts[0], "longitude"), elevation))
+
+
+def _iter_point_tuples(filename, progress=None):
+    """
+    Yield (name, lat, lon, elevation) tuples from a GPX or KML file, chosen by extension.
+    GPX wpt points are only yielded, at the end, for files without any route or track points.
+    progress(bytes_read, total_bytes) is called after every chunk.
+    """
+    handler = _KMLHandler() if str(filename).lower().endswith(KML_EXTENSION) else _GPXHandler()
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = handler.start
+    parser.EndElementHandler = handler.end
+    parser.CharacterDataHandler = handler.characters
+
+    total = os.path.getsize(filename)
+    done = 0
+    routed = False
+    with open(filename, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            try:
+                parser.Parse(chunk, not chunk)
+            except expat.ExpatError as e:
+                raise ValueError(f"{filename}: {e}") from None
+            routed = routed or bool(handler.points)
+            yield from handler.points
+            handler.points.clear()
+            if not chunk:
+                break
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+    if not routed:
+        yield from getattr(handler, "waypoints", ())
+
+
+def iter_track_points(filename, progress=None):
+    """
+    Yield TrackPoints from a GPX or KML file in file order. For GPX, route and track points;
+    standalone waypoints (wpt) are points of interest rather than part of the path, so they are
+    used only when the file has no route or track. For KML, named Point placemarks, LineString
+    vertices and gx:Track samples.
+    """
+    return starmap(TrackPoint, _iter_point_tuples(filename, progress))
+
+
+def load_track(filename, columnar=False, speed_kph=0.0, progress=None, engine=None):
+    """
+    Import a GPX or KML track as an Itinerary. Points are collected into typed columns while
+    the file streams past, then leg distances are computed in one vectorized pass, with
+    haversine or the given distance engine (see distance.py). Points without an elevation
+    in the file get an altitude of 0. Every waypoint gets speed_kph.
+    Memory stays bounded (a few tens of bytes per point) only with columnar=True; the default builds
+    a list-backed Itinerary with one Waypoint object per point, several hundred bytes each,
+    which is what the GUI edits but is unsuitable for tracks of millions of points.
+    """
+    lats, lons, altitudes = array("d"), array("d"), array("i")
+    names = []
+    for name, lat, lon, elevation in _iter_point_tuples(filename, progress):
+        lats.append(lat)
+        lons.append(lon)
+        altitudes.append(0 if elevation is None else round(elevation))
+        names.append(name)
+
+    # Recorded legs are often only metres long, so they are kept at full precision
+    if engine is None:
+        distances = haversine_distances(np.frombuffer(lats), np.frombuffer(lons), decimals=None)
+    else:
+        distances = engine.legs(np.frombuffer(lats), np.frombuffer(lons))
+    if columnar:
+        return ColumnarItinerary.from_arrays(lats, lons, distances, np.full(len(lats), float(speed_kph)),
+                                             altitudes, names)
+    itinerary = Itinerary([Waypoint(name, lat, lon, distance, speed_kph, altitude)
+                           for name, lat, lon, distance, altitude
+                           in zip(names, lats, lons, distances.tolist(), altitudes)])
+    itinerary.reset_running_totals()
+    return itinerary
@@ -0,0 +1,155 @@
+"""
+Terrain-aware travel time for the Arctic Expedition Planner.
+A speed model turns every leg of an itinerary (distance, the planned flat-ground speed of the
+waypoint it ends at and the altitude change along it) into hours in one vectorized pass.
+Terrain models scale the planned speed by a Tobler-style function of the leg's slope, with
+profiles for travel on foot, on ski and hauling a sled. LegTimeCache keeps the per-leg hours
+and only re-evaluates legs whose inputs changed since the last call.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+FLAT = "flat"
+DEFAULT_TERRAIN_MODE = "foot"
+
+
+@dataclass(frozen=True)
+class TravelProfile:
+    """
+    Slope response of one mode of travel: speed falls off exponentially either side of the
+    fastest grade, as in Tobler's hiking function, and is scaled so flat ground keeps the
+    planned speed. Grades are rise over run (0.1 = 10% uphill).
+    """
+    name: str
+    optimum_slope: float   # Grade of the fastest travel; a gentle descent for every mode
+    uphill_decay: float    # Exponential slow-down per unit of grade above the optimum
+    downhill_decay: float  # ... and below it
+    min_factor: float = 0.05
+    max_factor: float = 2.0
+
+    def speed_factors(self, slopes):
+        """Multiplier on the flat-ground speed for each slope."""
+        slopes = np.asarray(slopes, dtype=np.float64)
+        offset = slopes - self.optimum_slope
+        decay = np.where(offset >= 0, self.uphill_decay, self.downhill_decay)
+        flat_decay = self.uphill_decay if self.optimum_slope <= 0 else self.downhill_decay
+        factors = np.exp(flat_decay * abs(self.optimum_slope) - decay * np.abs(offset))
+        return np.clip(factors, self.min_factor, self.max_factor)
+
+
+PROFILES = {
+    # Tobler (1993): 6 exp(-3.5 |S + 0.05|) km/h, fastest on a 5% descent
+    "foot": TravelProfile("foot", -0.05, 3.5, 3.5),
+    # Skinning uphill is slow; gentle descents glide, steep ones need care
+    "ski": TravelProfile("ski", -0.08, 5.0, 2.5, max_factor=1.6),
+    # Man-hauling a loaded sled: climbs are very slow and descents are braked
+    "sled": TravelProfile("sled", -0.02, 8.0, 4.0, max_factor=1.15),
+}
+
+
+def leg_climbs(altitudes):
+    """Altitude change in metres along each leg; leg 0 (the start) has none."""
+    altitudes = np.asarray(altitudes, dtype=np.float64)
+    climbs = np.zeros(len(altitudes))
+    climbs[1:] = np.diff(altitudes)
+    return climbs
+
+
+class FlatModel:
+    """Distance over the planned speed, ignoring terrain. Legs with no speed take no time."""
+    name = FLAT
+
+    def speed_factors(self, distances, climbs):
+        return np.ones(len(distances))
+
+    def leg_hours(self, distances, speeds, climbs):
+        """Hours for each leg, from distances (km), planned speeds (km/h) and climbs (m)."""
+        distances = np.asarray(distances, dtype=np.float64)
+        speeds = np.asarray(speeds, dtype=np.float64)
+        effective = speeds * self.speed_factors(distances, np.asarray(climbs, dtype=np.float64))
+        hours = np.zeros(len(distances))
+        np.divide(distances, effective, out=hours, where=speeds > 0)
+        return hours
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class TerrainModel(FlatModel):
+    """Planned speeds scaled by a TravelProfile of each leg's slope."""
+    def __init__(self, profile=DEFAULT_TERRAIN_MODE):
+        if isinstance(profile, str):
+            if profile not in PROFILES:
+                raise ValueError(f"unknown travel profile {profile!r}; choose from {', '.join(PROFILES)}")
+            profile = PROFILES[profile]
+        self.profile = profile
+        self.name = profile.name
+
+    def speed_factors(self, distances, climbs):
+        slopes = np.zeros(len(distances))
+        np.divide(climbs, distances * 1000.0, out=slopes, where=distances > 0)
+        return self.profile.speed_factors(slopes)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+
+SPEED_MODELS = (FLAT,) + tuple(PROFILES)
+
+
+def get_speed_model(name):
+    """Speed model by name: "flat" or one of the terrain profiles."""
+    if name == FLAT:
+        return FlatModel()
+    if name in PROFILES:
+        return TerrainModel(name)
+    raise ValueError(f"unknown speed model {name!r}; choose from {', '.join(SPEED_MODELS)}")
+
+
+class LegTimeCache:
+    """
+    Per-leg hours from a speed model, remembered with the (distance, speed, climb) they were
+    computed from. A later call re-evaluates only the legs whose inputs differ: position by
+    position for a route of the same length, and outside the unchanged head and tail otherwise,
+    so an insert, delete or move recomputes just the legs around the edit.
+    """
+    def __init__(self, model):
+        self.model = model
+        self._inputs = np.zeros((0, 3))
+        self._hours = np.zeros(0)
+        self.evaluated = 0  # Legs passed to the model so far, for diagnostics
+
+    def clear(self):
+        self._inputs = np.zeros((0, 3))
+        self._hours = np.zeros(0)
+
+    def hours(self, distances, speeds, altitudes):
+        """Hours for every leg of a route with these per-waypoint columns."""
+        inputs = np.column_stack([np.asarray(distances, dtype=np.float64), np.asarray(speeds, dtype=np.float64),
+                                  leg_climbs(altitudes)])
+        old_inputs, old_hours = self._inputs, self._hours
+        n, m = len(inputs), len(old_inputs)
+        hours = np.empty(n)
+        if n == m:
+            stale = np.any(inputs != old_inputs, axis=1)
+            hours[~stale] = old_hours[~stale]
+        else:
+            # Longest matching head, then longest matching tail of what is left
+            k = min(n, m)
+            same = np.all(inputs[:k] == old_inputs[:k], axis=1)
+            head = k if same.all() else int(np.argmin(same))
+            left = k - head
+            same = np.all(inputs[n - left:] == old_inputs[m - left:], axis=1)[::-1] if left else same[:0]
+            tail = left if same.all() else int(np.argmin(same))
+            stale = np.ones(n, dtype=bool)
+            stale[:head] = False
+            stale[n - tail:] = False
+            hours[:head] = old_hours[:head]
+            hours[n - tail:] = old_hours[m - tail:]
+        if stale.any():
+            hours[stale] = self.model.leg_hours(*inputs[stale].T)
+            self.evaluated += int(stale.sum())
+        self._inputs, self._hours = inputs, hours
+        return hours.copy()
@@ -6,6 +6,10 @@ Includes common validation, formatting, or helper methods.
 
 from math import radians, sin, cos, sqrt, atan2
 
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
 def format_coords(lat, lon):
     """Format lat/lon as a degree string for display, converting input to float if needed."""
     lat = float(lat)
@@ -25,7 +29,7 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     Calculate the great-circle distance between two points on the Earth
     using the Haversine formula. Returns distance in kilometers.
     """
-    R = 6371  # Earth's radius in kilometers
+    R = EARTH_RADIUS_KM
     lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
     dlat = lat2 - lat1
     dlon = lon2 - lon1
@@ -33,3 +37,83 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
     c = 2 * atan2(sqrt(a), sqrt(1 - a))
     return round(R * c, 2)
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    """Vectorized Haversine core. Inputs are NumPy arrays in radians."""
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2)**2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def haversine_distances(lats, lons, decimals=2):
+    """
+    Calculate all consecutive leg distances for a sequence of coordinates in one call.
+    Returns a float64 array in kilometers, the same length as the input, where
+    entry i is the distance from point i-1 to point i (entry 0 is always 0.0).
+    Results are rounded like haversine_distance; pass decimals=None for full precision.
+    """
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lons = np.radians(np.asarray(lons, dtype=np.float64))
+    if lats.shape != lons.shape or lats.ndim != 1:
+        raise ValueError("lats and lons must be 1-D arrays of the same length")
+
+    distances = np.zeros(len(lats), dtype=np.float64)
+    if len(lats) > 1:
+        distances[1:] = _haversine_km(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    if decimals is not None:
+        distances = np.round(distances, decimals)
+    return distances
+
+def haversine_pairs(lats1, lons1, lats2, lons2, decimals=2):
+    """
+    Calculate element-wise distances between two equally sized coordinate arrays.
+    Useful for recomputing an arbitrary set of legs at once. Returns kilometers.
+    """
+    distances = _haversine_km(np.radians(np.asarray(lats1, dtype=np.float64)),
+                              np.radians(np.asarray(lons1, dtype=np.float64)),
+                              np.radians(np.asarray(lats2, dtype=np.float64)),
+                              np.radians(np.asarray(lons2, dtype=np.float64)))
+    if decimals is not None:
+        distances = np.round(distances, decimals)
+    return distances
+
+def haversine_matrix_chunks(lats1, lons1, lats2=None, lons2=None, max_bytes=64 * 1024 * 1024):
+    """
+    Yield (row_start, block) pairs covering the N x M pairwise distance matrix in kilometers.
+    Rows are processed in chunks sized so the working arrays of a chunk stay within max_bytes,
+    which lets callers reduce or stream very large matrices without allocating them whole.
+    If the second coordinate set is omitted, the matrix is computed against the first.
+    """
+    lats1 = np.radians(np.asarray(lats1, dtype=np.float64))
+    lons1 = np.radians(np.asarray(lons1, dtype=np.float64))
+    if lats2 is None or lons2 is None:
+        lats2, lons2 = lats1, lons1
+    else:
+        lats2 = np.radians(np.asarray(lats2, dtype=np.float64))
+        lons2 = np.radians(np.asarray(lons2, dtype=np.float64))
+
+    n, m = len(lats1), len(lats2)
+    if n == 0 or m == 0:
+        return
+
+    # Roughly six float64 temporaries of shape (rows, m) are alive at once.
+    rows_per_chunk = max(1, int(max_bytes // (6 * 8 * m)))
+    for start in range(0, n, rows_per_chunk):
+        stop = min(start + rows_per_chunk, n)
+        block = _haversine_km(lats1[start:stop, None], lons1[start:stop, None], lats2[None, :], lons2[None, :])
+        yield start, block
+
+def haversine_matrix(lats1, lons1, lats2=None, lons2=None, max_bytes=64 * 1024 * 1024, decimals=None):
+    """
+    Return the N x M pairwise great-circle distance matrix in kilometers.
+    Computed chunk by chunk (see haversine_matrix_chunks) so temporary memory is bounded
+    by max_bytes on top of the result array itself.
+    """
+    n = len(lats1)
+    m = n if lats2 is None else len(lats2)
+    result = np.empty((n, m), dtype=np.float64)
+    for start, block in haversine_matrix_chunks(lats1, lons1, lats2, lons2, max_bytes=max_bytes):
+        if decimals is not None:
+            block = np.round(block, decimals)
+        result[start:start + len(block)] = block
+    return result
@@ -0,0 +1,157 @@
+"""
+Virtualized list view for the Arctic Expedition Planner GUI.
+A VirtualListbox looks like a tk.Listbox to its callers but never holds more than the rows
+currently in view: rows are formatted on demand from callbacks, and a refresh only rewrites
+the visible rows whose text has changed. Editing, scrolling and selecting therefore cost
+O(visible rows) however long the itinerary grows.
+"""
+
+import tkinter as tk
+
+WHEEL_ROWS = 3  # Rows scrolled per mouse wheel notch
+
+
+class VirtualListbox(tk.Frame):
+    """
+    Single-selection list over row_count() rows, each rendered by format_row(index).
+    The inner tk.Listbox holds exactly the visible window of rows, starting at self.top;
+    the scrollbar is driven from the row count rather than from the inner listbox.
+    Selection is tracked as a row index, so it survives scrolling and edits, and a
+    <<ListboxSelect>> event is generated on this frame whenever the user changes it.
+    """
+    def __init__(self, master, row_count, format_row, height=8, font=None, **listbox_options):
+        super().__init__(master)
+        self.row_count = row_count
+        self.format_row = format_row
+        self.visible_rows = height
+        self.top = 0
+        self.selected = None
+        self._font = font
+        self._rendered = []  # Text currently shown in each slot of the inner listbox
+
+        self.listbox = tk.Listbox(self, height=height, font=font, exportselection=False, **listbox_options)
+        self.listbox.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.listbox.bind("<<ListboxSelect>>", self._on_click_select)
+        self.listbox.bind("<Configure>", self._on_resize)
+        self.listbox.bind("<MouseWheel>", lambda event: self._scroll_by(-WHEEL_ROWS if event.delta > 0 else WHEEL_ROWS))
+        self.listbox.bind("<Button-4>", lambda event: self._scroll_by(-WHEEL_ROWS))
+        self.listbox.bind("<Button-5>", lambda event: self._scroll_by(WHEEL_ROWS))
+        self.listbox.bind("<Up>", lambda event: self._move_selection(-1))
+        self.listbox.bind("<Down>", lambda event: self._move_selection(1))
+        self.listbox.bind("<Prior>", lambda event: self._move_selection(-self.visible_rows))
+        self.listbox.bind("<Next>", lambda event: self._move_selection(self.visible_rows))
+
+    # Listbox-compatible interface
+
+    def size(self):
+        return self.row_count()
+
+    def get(self, index):
+        return self.format_row(index)
+
+    def curselection(self):
+        return () if self.selected is None else (self.selected,)
+
+    def selection_set(self, index, last=None):
+        count = self.row_count()
+        if 0 <= index < count:
+            self.selected = index
+            self._show_selection()
+
+    def selection_clear(self, first=0, last=None):
+        self.selected = None
+        self._show_selection()
+
+    def see(self, index):
+        """Scroll the least distance that brings row index into view."""
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.visible_rows:
+            self.top = index - self.visible_rows + 1
+        else:
+            return
+        self.refresh()
+
+    def yview(self, *args):
+        """Scrollbar protocol: with no arguments return the visible fraction, else scroll."""
+        count = self.row_count()
+        if not args:
+            if not count:
+                return 0.0, 1.0
+            return self.top / count, min(1.0, (self.top + self.visible_rows) / count)
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * count)
+        elif args[0] == "scroll":
+            step = self.visible_rows if args[2] == "pages" else 1
+            self.top += int(args[1]) * step
+        self.refresh()
+
+    # Rendering
+
+    def refresh(self):
+        """Re-render the visible window, rewriting only the rows whose text has changed."""
+        count = self.row_count()
+        if self.selected is not None and self.selected >= count:
+            self.selected = count - 1 if count else None
+        self.top = max(0, min(self.top, count - self.visible_rows))
+
+        rows = [self.format_row(i) for i in range(self.top, min(count, self.top + self.visible_rows))]
+        for slot, text in enumerate(rows):
+            if slot >= len(self._rendered):
+                self.listbox.insert(tk.END, text)
+            elif self._rendered[slot] != text:
+                self.listbox.delete(slot)
+                self.listbox.insert(slot, text)
+        if len(self._rendered) > len(rows):
+            self.listbox.delete(len(rows), tk.END)
+        self._rendered = rows
+
+        self._show_selection()
+        self.scrollbar.set(*self.yview())
+
+    def _show_selection(self):
+        """Mirror the selected row onto the inner listbox if it is in view."""
+        self.listbox.selection_clear(0, tk.END)
+        if self.selected is not None and 0 <= self.selected - self.top < len(self._rendered):
+            self.listbox.selection_set(self.selected - self.top)
+
+    # Event handlers
+
+    def _on_click_select(self, event):
+        slots = self.listbox.curselection()
+        if slots and slots[0] < len(self._rendered):
+            self.selected = self.top + slots[0]
+            self.event_generate("<<ListboxSelect>>")
+
+    def _on_resize(self, event):
+        """Track how many rows fit when the widget is resized."""
+        if self._font is None:
+            return
+        # Tk listbox lines are the font's linespace plus one pixel and the selection border
+        line_height = self._font.metrics("linespace") + 1 + 2 * int(self.listbox.cget("selectborderwidth"))
+        padding = 2 * (int(self.listbox.cget("borderwidth")) + int(self.listbox.cget("highlightthickness")))
+        rows = max(1, (event.height - padding) // line_height)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.refresh()
+
+    def _scroll_by(self, rows):
+        self.top += rows
+        self.refresh()
+        return "break"
+
+    def _move_selection(self, step):
+        count = self.row_count()
+        if count:
+            # With nothing selected, the first key press selects the top visible row
+            target = self.top if self.selected is None else self.selected + step
+            self.selected = max(0, min(count - 1, target))
+            self.see(self.selected)
+            self._show_selection()
+            self.event_generate("<<ListboxSelect>>")
+        return "break"
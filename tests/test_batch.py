@@ -0,0 +1,149 @@
+"""
+Unit tests for the headless batch exporter in batch.py
+"""
+
+import unittest
+import io
+import json
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from unittest.mock import patch
+from src import batch
+from src.batch import find_inputs, main, process_itinerary, run_batch, MANIFEST_NAME
+from src.itinerary_io import write_ndjson
+from src.planner import Waypoint
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "../assets/example_itinerary.json")
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        """Create an input tree with a JSON and an NDJSON plan, one of them nested."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.plans = os.path.join(self.tmpdir, "plans")
+        os.makedirs(os.path.join(self.plans, "2025"))
+        shutil.copy(EXAMPLE, os.path.join(self.plans, "example.json"))
+        write_ndjson([Waypoint("A", 70.0, 20.0, 0.0, 5.0, 10), Waypoint("B", 70.1, 20.1, 12.0, 5.0, 20)],
+                     os.path.join(self.plans, "2025", "svalbard.ndjson"))
+        self.out = os.path.join(self.tmpdir, "out")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _run(self, *args):
+        buffer = io.StringIO()
+        with redirect_stdout(buffer):
+            code = main([self.plans, "-o", self.out, "-j", "2", *args])
+        return code, json.loads(buffer.getvalue())
+
+    def test_exports_every_plan(self):
+        """Each plan gets a JSON summary and a PDF, mirrored under the output directory."""
+        code, report = self._run()
+        self.assertEqual(code, 0)
+        self.assertEqual((report["processed"], report["skipped"], report["failed"]), (2, 0, 0))
+        self.assertTrue(os.path.exists(os.path.join(self.out, "example.pdf")))
+        with open(os.path.join(self.out, "2025", "svalbard.summary.json")) as f:
+            self.assertEqual(json.load(f)["summary"]["total_distance_km"], 12.0)
+        example = next(r for r in report["results"] if r["input"].endswith("example.json"))
+        self.assertEqual(example["waypoints"], 3)
+        self.assertEqual(example["total_distance_km"], 30.8)
+
+    def test_unchanged_inputs_are_skipped(self):
+        """A second run skips everything until an input, an option or an output changes."""
+        self._run()
+        _, report = self._run()
+        self.assertEqual((report["processed"], report["skipped"]), (0, 2))
+
+        with open(os.path.join(self.plans, "example.json"), "a") as f:
+            f.write("\n")
+        os.remove(os.path.join(self.out, "2025", "svalbard.pdf"))
+        _, report = self._run()
+        self.assertEqual((report["processed"], report["skipped"]), (2, 0))
+
+        _, report = self._run("--max-hours-per-day", "4")
+        self.assertEqual(report["processed"], 2)
+        _, report = self._run("--max-hours-per-day", "4", "--force")
+        self.assertEqual(report["processed"], 2)
+
+    def test_failures_are_reported(self):
+        """A broken plan fails on its own, is retried next run and sets the exit code."""
+        with open(os.path.join(self.plans, "broken.json"), "w") as f:
+            f.write('{"itinerary": [{"name": "no coordinates"}]}')
+        code, report = self._run("--formats", "json")
+        self.assertEqual(code, 1)
+        self.assertEqual((report["processed"], report["failed"]), (2, 1))
+        broken = next(r for r in report["results"] if r["status"] == "failed")
+        self.assertIn("ValueError", broken["error"])
+        self.assertFalse(os.path.exists(os.path.join(self.out, "example.pdf")))
+
+        _, report = self._run("--formats", "json")
+        self.assertEqual((report["skipped"], report["failed"]), (2, 1))
+
+    def test_simplify_before_export(self):
+        """--simplify thins dense tracks, reports the error and counts as a changed option."""
+        track = [Waypoint("", 70.0, 20.0 + i * 0.001, 0.0, 5.0, 0) for i in range(100)]
+        write_ndjson(track, os.path.join(self.plans, "track.ndjson"))
+        self._run("--formats", "json")
+        code, report = self._run("--formats", "json", "--simplify", "5")
+        self.assertEqual((code, report["processed"]), (0, 3))
+        result = next(r for r in report["results"] if r["input"].endswith("track.ndjson"))
+        self.assertEqual(result["waypoints"], 2)
+        self.assertEqual(result["simplification"]["original_points"], 100)
+        self.assertLessEqual(result["simplification"]["max_offset_m"], 5)
+
+    def test_speed_model_option(self):
+        """--speed-model adjusts times for slope and counts as a changed option."""
+        _, flat = self._run("--formats", "json")
+        code, terrain = self._run("--formats", "json", "--speed-model", "ski")
+        self.assertEqual((code, terrain["processed"]), (0, 2))
+        hours = {r["input"]: r["estimated_time_hours"] for r in flat["results"]}
+        svalbard = next(r for r in terrain["results"] if r["input"].endswith("svalbard.ndjson"))
+        self.assertGreater(svalbard["estimated_time_hours"], hours[svalbard["input"]])
+        with open(os.path.join(self.out, "2025", "svalbard.summary.json")) as f:
+            self.assertEqual(json.load(f)["summary"]["speed_model"], "ski")
+
+    def test_tracks_are_loaded_into_columns(self):
+        """GPX tracks are read column-wise so very large recordings stay in bounded memory."""
+        path = os.path.join(self.plans, "run.gpx")
+        with open(path, "w") as f:
+            f.write('<gpx><trk><trkseg>' + "".join(f'<trkpt lat="{70 + i / 100}" lon="20.0"/>' for i in range(5))
+                    + '</trkseg></trk></gpx>')
+        target = os.path.join(self.out, "run.summary.json")
+        with patch.object(batch, "load_track", wraps=batch.load_track) as load:
+            result = process_itinerary(path, {"json": target}, 8.0, simplify_m=5.0)
+        self.assertTrue(load.call_args.kwargs["columnar"])
+        self.assertEqual((result["waypoints"], result["simplification"]["original_points"]), (2, 5))
+        with open(target) as f:
+            self.assertEqual(len(json.load(f)["itinerary"]), 2)
+
+    def test_output_directory_inside_inputs_is_ignored(self):
+        """Outputs and the manifest are never picked up as inputs."""
+        report = run_batch([self.plans], os.path.join(self.plans, "exports"), formats=["json"], workers=1)
+        self.assertEqual(report["total"], 2)
+        report = run_batch([self.plans], self.plans, formats=["json"], workers=1)
+        self.assertEqual(report["total"], 2)
+        self.assertTrue(os.path.exists(os.path.join(self.plans, MANIFEST_NAME)))
+        report = run_batch([self.plans], self.plans, formats=["json"], workers=1)
+        self.assertEqual((report["total"], report["skipped"]), (2, 2))
+
+
+    def test_clashing_output_names_are_disambiguated(self):
+        """Inputs that share a stem never overwrite each other's outputs."""
+        write_ndjson([Waypoint("A", 70.0, 20.0, 0.0, 5.0, 10)], os.path.join(self.plans, "example.ndjson"))
+        other = os.path.join(self.tmpdir, "other")
+        os.makedirs(other)
+        shutil.copy(EXAMPLE, os.path.join(other, "example.json"))
+        explicit = os.path.join(self.plans, "example.json")
+        inputs = find_inputs([self.plans, explicit, os.path.join(other, "example.json")], self.out)
+        self.assertEqual([stem for _, stem in inputs],
+                         ["example.json", "example.ndjson", os.path.join("2025", "svalbard"), "example.json-2"])
+
+        report = run_batch([self.plans, os.path.join(other, "example.json")], self.out, formats=["json"], workers=1)
+        self.assertEqual(report["processed"], 4)
+        self.assertEqual(len({result["outputs"]["json"] for result in report["results"]}), 4)
+        self.assertTrue(os.path.exists(os.path.join(self.out, "example.json-2.summary.json")))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Unit tests for the benchmark suite in benchmark.py
+"""
+
+import copy
+import io
+import json
+import os
+import socket
+import tempfile
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+from dataclasses import replace
+import numpy as np
+from src.benchmark import (BENCHMARK_VERSION, Fixture, compare, load_results, main, offline, parse_sizes,
+                           run_benchmarks, select_cases, stub_elevation)
+from src.elevation import ElevationService
+from src.planner import ColumnarItinerary
+
+
+def quick_run(sizes=(10, 50), cases=("haversine", "total_distance")):
+    return run_benchmarks(sizes, select_cases(cases), min_samples=3, min_time_s=0.0)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_fixture_is_reproducible(self):
+        a, b = Fixture(500, seed=3), Fixture(500, seed=3)
+        np.testing.assert_array_equal(a.latitudes, b.latitudes)
+        self.assertEqual(a.itinerary.total_distance(), b.itinerary.total_distance())
+        self.assertTrue(np.all(a.latitudes >= 60.0))
+        self.assertAlmostEqual(a.columnar.total_distance(), a.itinerary.total_distance(), places=6)
+        self.assertFalse(np.array_equal(Fixture(500, seed=4).latitudes, a.latitudes))
+
+    def test_results_document(self):
+        document = quick_run()
+        self.assertEqual(document["version"], BENCHMARK_VERSION)
+        self.assertEqual(len(document["results"]), 2 * 4)
+        for result in document["results"]:
+            self.assertEqual(result["samples"], 3)
+            self.assertTrue(result["min_s"] <= result["p50_s"] <= result["p90_s"] <= result["p99_s"])
+            self.assertGreater(result["waypoints_per_s"], 0)
+            self.assertGreaterEqual(result["peak_memory_bytes"], 0)
+        json.dumps(document)
+
+    def test_slow_cases_are_capped(self):
+        cases = [replace(case, max_size=20) for case in select_cases(["export_to_pdf"])]
+        self.assertEqual([r["waypoints"] for r in run_benchmarks([10, 30], cases, min_samples=1, min_time_s=0.0)
+                          ["results"]], [10])
+
+    def test_compare_flags_regressions(self):
+        baseline = quick_run()
+        current = copy.deepcopy(baseline)
+        current["results"][0]["p50_s"] = baseline["results"][0]["p50_s"] * 1.5
+        current["results"][1]["p50_s"] = baseline["results"][1]["p50_s"] * 1.1
+        current["results"][2]["peak_memory_bytes"] = baseline["results"][2]["peak_memory_bytes"] * 2 + 1000
+        comparisons = compare(baseline, current, threshold=0.2)
+        self.assertEqual(len(comparisons), 2 * len(baseline["results"]))
+        flagged = [(c.case, c.waypoints, c.metric) for c in comparisons if c.regression]
+        self.assertEqual(flagged, [(baseline["results"][0]["case"], 10, "p50_s"),
+                                   (baseline["results"][2]["case"], 10, "peak_memory_bytes")])
+        # Cases missing from the baseline are not compared
+        self.assertEqual(compare({"results": []}, current), [])
+
+    def test_offline_stubs_elevation_and_blocks_network(self):
+        itinerary = ColumnarItinerary.from_arrays([70.0, 71.0], [20.0, 21.0])
+        with offline():
+            service = ElevationService(use_cache=False)
+            self.assertEqual(service.elevate_itinerary(itinerary), 2)
+            with self.assertRaises(OSError):
+                socket.create_connection(("example.com", 80), timeout=1)
+        self.assertEqual(itinerary.altitudes.tolist(), [round(stub_elevation(70.0, 20.0)),
+                                                        round(stub_elevation(71.0, 21.0))])
+
+    def test_parse_sizes(self):
+        self.assertEqual(parse_sizes("10,1k,100K,1M"), [10, 1000, 100000, 1000000])
+        for text in ("ten", "1"):
+            with self.assertRaises(ValueError):
+                parse_sizes(text)
+        with self.assertRaises(ValueError):
+            select_cases(["no such case"])
+
+    def test_main_saves_and_compares(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            args = ["--sizes", "10", "--cases", "Itinerary.total_distance", "--min-time", "0"]
+            with redirect_stdout(io.StringIO()):
+                self.assertEqual(main(args + ["--output", path]), 0)
+            baseline = load_results(path)
+            # A baseline that was impossibly fast makes the current run a regression
+            for result in baseline["results"]:
+                result["p50_s"] = 1e-12
+            with open(path, "w") as f:
+                json.dump(baseline, f)
+            out, err = io.StringIO(), io.StringIO()
+            with redirect_stdout(out), redirect_stderr(err):
+                self.assertEqual(main(args + ["--compare", path]), 1)
+            self.assertIn("REGRESSION Itinerary.total_distance at 10: p50_s", out.getvalue())
+
+            baseline["version"] = BENCHMARK_VERSION + 1
+            with open(path, "w") as f:
+                json.dump(baseline, f)
+            with self.assertRaises(ValueError):
+                load_results(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Unit tests for the memory-mapped binary itinerary format in binary_format.py
+"""
+
+import unittest
+import json
+import os
+import struct
+import tempfile
+import numpy as np
+from src.binary_format import (BinaryItinerary, HEADER, binary_to_json, json_to_binary,
+                               read_binary, write_binary)
+from src.itinerary_io import load_itinerary, write_ndjson
+from src.planner import Waypoint, Itinerary, ColumnarItinerary
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "../assets/example_itinerary.json")
+
+
+class TestBinaryFormat(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "route.aepb")
+        self.itinerary = Itinerary([
+            Waypoint("Camp", 70.0, 20.0, 0.0, 10.0, 100),
+            Waypoint("Fjord", 70.1, 20.1, 5.0, 12.0, -3),
+            Waypoint("Camp", 70.2, 20.3, 9.5, 0.0, 250),
+            Waypoint("Tromsø", 69.65, 18.95, 60.0, 8.0, 10),
+        ])
+
+    def tearDown(self):
+        for name in os.listdir(self.tmpdir):
+            os.remove(os.path.join(self.tmpdir, name))
+        os.rmdir(self.tmpdir)
+
+    def test_round_trip(self):
+        """Every field, including non-ASCII names, survives a write and read in both backends."""
+        write_binary(self.itinerary, self.path)
+        for columnar in (True, False):
+            loaded = read_binary(self.path, columnar=columnar)
+            self.assertEqual([view.to_waypoint() if columnar else view for view in loaded.waypoints],
+                             self.itinerary.waypoints)
+        self.assertIsInstance(read_binary(self.path), ColumnarItinerary)
+
+    def test_header_totals_and_random_access(self):
+        """Totals come from the header and single waypoints decode without loading the rest."""
+        write_binary(self.itinerary, self.path)
+        with BinaryItinerary(self.path) as binary:
+            self.assertEqual(len(binary), 4)
+            self.assertAlmostEqual(binary.total_distance_km, self.itinerary.total_distance())
+            self.assertAlmostEqual(binary.total_time_hours, self.itinerary.estimated_time())
+            self.assertEqual(binary[-1], self.itinerary.waypoints[-1])
+            self.assertEqual(binary[2].name, "Camp")
+            with self.assertRaises(IndexError):
+                binary[4]
+
+    def test_names_are_deduplicated(self):
+        """Repeated names are stored once in the string table."""
+        write_binary(self.itinerary, self.path)
+        with BinaryItinerary(self.path) as binary:
+            self.assertEqual(list(binary.records["name_id"]), [0, 1, 0, 2])
+
+    def test_columnar_source_written_without_conversion(self):
+        """A large columnar itinerary round-trips through the record array."""
+        n = 10_000
+        source = ColumnarItinerary.from_arrays(np.linspace(65, 80, n), np.linspace(-10, 30, n),
+                                               speeds=np.full(n, 6.0), names=[f"P{i % 100}" for i in range(n)])
+        write_binary(source, self.path)
+        with BinaryItinerary(self.path) as binary:
+            np.testing.assert_array_equal(binary.records["distance_km"], source.distances)
+            self.assertEqual(binary[9_999].name, "P99")
+            self.assertAlmostEqual(binary.total_time_hours, source.estimated_time())
+
+    def test_rejects_other_files_and_versions(self):
+        """Files without the magic number or with a newer version are refused."""
+        with open(self.path, "wb") as f:
+            f.write(b"{}" * 40)
+        with self.assertRaisesRegex(ValueError, "not a binary itinerary"):
+            BinaryItinerary(self.path)
+
+        write_binary(self.itinerary, self.path)
+        with open(self.path, "r+b") as f:
+            f.seek(4)
+            f.write(struct.pack("<H", 99))
+        with self.assertRaisesRegex(ValueError, "version 99"):
+            BinaryItinerary(self.path)
+
+    def test_json_converters(self):
+        """JSON and NDJSON convert to binary and back without changing the waypoints."""
+        json_to_binary(EXAMPLE, self.path)
+        out = os.path.join(self.tmpdir, "back.json")
+        binary_to_json(self.path, out)
+        with open(EXAMPLE) as f, open(out) as g:
+            self.assertEqual(json.load(g), json.load(f))
+
+        ndjson = os.path.join(self.tmpdir, "route.ndjson")
+        write_ndjson(self.itinerary.waypoints, ndjson)
+        json_to_binary(ndjson, self.path)
+        binary_to_json(self.path, os.path.join(self.tmpdir, "back.ndjson"))
+        self.assertEqual(list(load_itinerary(os.path.join(self.tmpdir, "back.ndjson")).waypoints),
+                         self.itinerary.waypoints)
+
+    def test_empty_itinerary(self):
+        """An empty itinerary has a valid file with zero records."""
+        write_binary(Itinerary([]), self.path)
+        with BinaryItinerary(self.path) as binary:
+            self.assertEqual(len(binary), 0)
+            self.assertEqual(binary.total_distance_km, 0.0)
+        self.assertEqual(os.path.getsize(self.path), HEADER.size + 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
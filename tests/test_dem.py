@@ -0,0 +1,128 @@
+"""
+Unit tests for the offline DEM elevation provider in dem.py, using synthetic .hgt tiles.
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+from src.dem import HGT_VOID, DEMElevationProvider, tile_name
+from src.elevation import FallbackElevationProvider
+
+SAMPLES = 121  # Small SRTM-style tile: 0.5 arc-minute spacing with shared edges
+
+
+def plane(lats, lons):
+    """Synthetic terrain: a tilted plane, which bilinear interpolation reproduces exactly."""
+    return 1000.0 * (np.asarray(lats) - 69.0) + 500.0 * (np.asarray(lons) - 19.0)
+
+
+def write_tile(directory, lat_floor, lon_floor, voids=()):
+    """Write a .hgt tile sampling the synthetic plane, north row first."""
+    lats = lat_floor + 1 - np.arange(SAMPLES) / (SAMPLES - 1)
+    lons = lon_floor + np.arange(SAMPLES) / (SAMPLES - 1)
+    grid = np.round(plane(lats[:, None], lons[None, :])).astype(">i2")
+    for row, col in voids:
+        grid[row, col] = HGT_VOID
+    path = os.path.join(directory, tile_name(lat_floor, lon_floor))
+    grid.tofile(path)
+    return path
+
+
+class RecordingProvider:
+    """Fallback stand-in that returns a fixed value and records what it was asked for."""
+    def __init__(self, value):
+        self.value = value
+        self.calls = []
+
+    def lookup_many(self, points, progress=None):
+        self.calls.append(list(points))
+        return [self.value] * len(self.calls[-1])
+
+    def close(self):
+        pass
+
+
+class TestDEMElevationProvider(unittest.TestCase):
+    def setUp(self):
+        """Create two adjacent synthetic tiles."""
+        self.tmpdir = tempfile.mkdtemp()
+        write_tile(self.tmpdir, 69, 19)
+        write_tile(self.tmpdir, 69, 20)
+        self.provider = DEMElevationProvider(self.tmpdir)
+
+    def tearDown(self):
+        self.provider.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_tile_name(self):
+        """File names follow the SRTM convention."""
+        self.assertEqual(tile_name(69, 19), "N69E019.hgt")
+        self.assertEqual(tile_name(-1, -75), "S01W075.hgt")
+
+    def test_bilinear_interpolation(self):
+        """Points between samples should match the plane to within integer rounding."""
+        lat, lon = 69.4321, 19.8765
+        self.assertAlmostEqual(self.provider.lookup(lat, lon), plane(lat, lon), delta=1.0)
+
+    def test_vectorized_lookup_across_tiles(self):
+        """Many points spanning both tiles are answered in one call."""
+        rng = np.random.default_rng(5)
+        lats = rng.uniform(69.0, 70.0, 500)
+        lons = rng.uniform(19.0, 21.0, 500)
+        values = self.provider.elevations(lats, lons)
+        np.testing.assert_allclose(values, plane(lats, lons), atol=1.0)
+
+    def test_missing_tiles_and_voids(self):
+        """Points without a tile give None; a void corner is ignored rather than poisoning the result."""
+        self.assertIsNone(self.provider.lookup(75.5, 19.5))
+        write_tile(self.tmpdir, 70, 19, voids=[(60, 60)])  # The sample at (70.5, 19.5)
+        self.assertIsNone(self.provider.lookup(70.5, 19.5))
+        lat, lon = 70.5 - 0.3 / 120, 19.5 + 0.4 / 120  # Void is one of four corners
+        self.assertAlmostEqual(self.provider.lookup(lat, lon), plane(lat, lon), delta=1.0)
+
+    def test_lru_of_open_tiles(self):
+        """Only max_open_tiles tiles stay mapped."""
+        provider = DEMElevationProvider(self.tmpdir, max_open_tiles=1)
+        provider.lookup(69.5, 19.5)
+        provider.lookup(69.5, 20.5)
+        self.assertEqual(list(provider._tiles), [(69, 20)])
+        self.assertAlmostEqual(provider.lookup(69.5, 19.5), plane(69.5, 19.5), delta=1.0)
+        provider.close()
+
+    def test_shared_between_threads(self):
+        """Concurrent lookups never read from a tile that another thread has evicted and closed."""
+        provider = DEMElevationProvider(self.tmpdir, max_open_tiles=1)
+        lats = np.linspace(69.01, 69.99, 2_000)
+        errors = []
+
+        def worker(lon):
+            try:
+                for _ in range(30):
+                    np.testing.assert_allclose(provider.elevations(lats, np.full(len(lats), lon)),
+                                               plane(lats, lon), atol=1.0)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(19.5 + i % 2,)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        provider.close()
+        self.assertEqual(errors, [])
+
+    def test_fallback_only_receives_missing_points(self):
+        """The API fallback is only asked for points the DEM cannot answer."""
+        fallback = RecordingProvider(42.0)
+        provider = FallbackElevationProvider(self.provider, fallback)
+        results = provider.lookup_many([(69.5, 19.5), (75.5, 19.5)])
+        self.assertAlmostEqual(results[0], plane(69.5, 19.5), delta=1.0)
+        self.assertEqual(results[1], 42.0)
+        self.assertEqual(fallback.calls, [[(75.5, 19.5)]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Unit tests for the distance engines in distance.py
+"""
+
+import unittest
+import numpy as np
+from src.distance import (AdaptiveEngine, EquirectangularEngine, HaversineEngine, WGS84Engine, ENGINES,
+                          _equirectangular_array_m, benchmark, get_engine, synthetic_track)
+from src.utils import haversine_distance
+
+
+def random_legs(n, max_leg_m, seed=0, max_lat=89.99):
+    """Legs of up to max_leg_m in random directions from random points between 60N and max_lat."""
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(60.0, max_lat, n)
+    lons = rng.uniform(-180.0, 180.0, n)
+    step = np.exp(rng.uniform(0.0, np.log(max_leg_m), n)) / 6371000
+    bearing = rng.uniform(0.0, 2 * np.pi, n)
+    phi = np.radians(lats)
+    phi2 = np.arcsin(np.sin(phi) * np.cos(step) + np.cos(phi) * np.sin(step) * np.cos(bearing))
+    lon2 = lons + np.degrees(np.arctan2(np.sin(bearing) * np.sin(step) * np.cos(phi),
+                                        np.cos(step) - np.sin(phi) * np.sin(phi2)))
+    return lats, lons, np.degrees(phi2), (lon2 + 180) % 360 - 180
+
+
+class TestDistanceEngines(unittest.TestCase):
+    def test_wgs84_reference_values(self):
+        """Vincenty's own Flinders Peak - Buninyong example, an equator degree and a pole-to-equator quarter."""
+        engine = WGS84Engine()
+        cases = [((-37.95103342, 144.42486789, -37.65282114, 143.92649554), 54.972271),
+                 ((0.0, 0.0, 0.0, 1.0), 111.3194908),
+                 ((0.0, 0.0, 90.0, 0.0), 10001.965729)]
+        for (lat1, lon1, lat2, lon2), expected in cases:
+            self.assertAlmostEqual(engine.distance(lat1, lon1, lat2, lon2), expected, places=6)
+            self.assertAlmostEqual(engine.pairs([lat1], [lon1], [lat2], [lon2])[0], expected, places=6)
+
+    def test_scalar_and_vectorized_agree(self):
+        lats1, lons1, lats2, lons2 = random_legs(500, 1e6)
+        for name in ENGINES:
+            engine = get_engine(name)
+            vectorized = engine.pairs(lats1, lons1, lats2, lons2)
+            scalar = [engine.distance(*leg) for leg in zip(lats1, lons1, lats2, lons2)]
+            np.testing.assert_allclose(vectorized, scalar, rtol=1e-12, atol=1e-12, err_msg=name)
+
+    def test_haversine_matches_utils(self):
+        engine = HaversineEngine()
+        self.assertEqual(round(engine.distance(69.6496, 18.9560, 78.2232, 15.6469), 2),
+                         haversine_distance(69.6496, 18.9560, 78.2232, 15.6469))
+
+    def test_equirectangular_error_bound(self):
+        """Short legs are within a millimetre of WGS84 away from the pole; the error bound holds everywhere."""
+        lats1, lons1, lats2, lons2 = random_legs(20000, 300.0, max_lat=85.0)
+        error_m = np.abs(EquirectangularEngine().pairs(lats1, lons1, lats2, lons2)
+                         - WGS84Engine().pairs(lats1, lons1, lats2, lons2)) * 1000
+        self.assertLess(error_m.max(), 0.001)
+
+        lats1, lons1, lats2, lons2 = random_legs(20000, 1e6, seed=2)
+        distance_m, bound_m = _equirectangular_array_m(lats1, lons1, lats2, lons2, with_error=True)
+        error_m = np.abs(distance_m - WGS84Engine().pairs(lats1, lons1, lats2, lons2) * 1000)
+        self.assertTrue(np.all(error_m <= bound_m))
+        across = EquirectangularEngine().distance(70.0, 179.999, 70.0, -179.999)
+        self.assertAlmostEqual(across, WGS84Engine().distance(70.0, 179.999, 70.0, -179.999), places=9)
+
+    def test_adaptive_meets_error_bound(self):
+        lats1, lons1, lats2, lons2 = random_legs(20000, 2e6, seed=1)
+        reference = WGS84Engine().pairs(lats1, lons1, lats2, lons2)
+        for max_error_m in (0.01, 1.0, 100.0):
+            engine = AdaptiveEngine(max_error_m=max_error_m)
+            error_m = np.abs(engine.pairs(lats1, lons1, lats2, lons2) - reference) * 1000
+            self.assertLessEqual(error_m.max(), max_error_m)
+            self.assertEqual(sum(engine.usage.values()), 20000)
+        # A loose bound leaves only the longest legs to the ellipsoidal solver
+        self.assertGreater(engine.usage["equirectangular"], 2 * engine.usage["wgs84"])
+        self.assertEqual(AdaptiveEngine().distance(70.0, 20.0, 70.0, 20.0), 0.0)
+
+    def test_legs_and_errors(self):
+        lats, lons = synthetic_track(1000, 1.0, 100.0)
+        legs = EquirectangularEngine().legs(lats, lons)
+        self.assertEqual((len(legs), legs[0]), (1000, 0.0))
+        self.assertTrue(np.all((legs[1:] > 0.00099) & (legs[1:] < 0.101)))
+        with self.assertRaises(ValueError):
+            get_engine("flat")
+        with self.assertRaises(ValueError):
+            AdaptiveEngine(max_error_m=0)
+        with self.assertRaises(ValueError):
+            HaversineEngine().pairs([70.0], [20.0], [70.0, 71.0], [20.0, 20.0])
+
+    def test_benchmark_reports_every_engine(self):
+        results = benchmark(points=2000, scalar_points=200, repeat=1)
+        self.assertEqual(len(results), 2 * len(ENGINES))
+        wgs84 = [r for r in results if r["engine"] == "wgs84"]
+        self.assertTrue(all(r["max_error_m"] == 0.0 for r in wgs84))
+        adaptive = [r for r in results if r["engine"] == "adaptive"]
+        self.assertTrue(all(r["max_error_m"] <= 1.0 and r["vectorized_legs_per_s"] > 0 for r in adaptive))
+
+
+if __name__ == '__main__':
+    unittest.main()
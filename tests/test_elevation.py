@@ -0,0 +1,229 @@
+"""
+Unit tests for elevation lookups and the persistent cache in elevation.py.
+Network calls go to a local stub of the OpenTopoData API.
+"""
+
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock, patch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from src.elevation import PUBLIC_API_MIN_INTERVAL_S, ElevationCache, ElevationService, fetch_elevation
+from src.planner import Waypoint, Itinerary, ColumnarItinerary
+
+
+class StubElevationServer:
+    """
+    Local OpenTopoData stand-in that returns latitude * 10 as the elevation and counts requests.
+    Set throttle to answer that many upcoming requests with HTTP 429.
+    """
+    def __init__(self):
+        self.requests = []
+        self.connections = set()
+        self.throttle = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.connections.add(self.client_address)
+                    if stub.throttle > 0:
+                        stub.throttle -= 1
+                        self.send_response(429)
+                        self.send_header("Retry-After", "0")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                query = parse_qs(urlparse(self.path).query)
+                locations = query["locations"][0].split("|")
+                with stub.lock:
+                    stub.requests.append(locations)
+                results = []
+                for location in locations:
+                    lat, lon = (float(v) for v in location.split(","))
+                    results.append({"elevation": round(lat * 10, 1), "location": {"lat": lat, "lng": lon}})
+                body = json.dumps({"results": results, "status": "OK"}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/test"
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05},
+                                       daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestElevationCache(unittest.TestCase):
+    def setUp(self):
+        """Start a stub API and an empty on-disk cache."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.tmpdir, "elevation.sqlite3")
+        self.cache = ElevationCache(self.cache_path)
+        self.stub = StubElevationServer()
+
+    def tearDown(self):
+        """Stop the stub and remove the cache files."""
+        self.stub.close()
+        self.cache.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_repeat_lookup_uses_cache(self):
+        """A second lookup of the same point should not touch the network."""
+        first = fetch_elevation(70.0, 20.0, cache=self.cache, api_url=self.stub.url)
+        second = fetch_elevation(70.0, 20.0, cache=self.cache, api_url=self.stub.url)
+        self.assertEqual(first, 700.0)
+        self.assertEqual(second, 700.0)
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "entries": 1})
+
+    def test_quantized_keys(self):
+        """Points within the dataset resolution share an entry; points further apart do not."""
+        fetch_elevation(70.0, 20.0, cache=self.cache, api_url=self.stub.url)
+        fetch_elevation(70.00003, 20.00005, cache=self.cache, api_url=self.stub.url)  # a few metres away
+        self.assertEqual(len(self.stub.requests), 1)
+        fetch_elevation(70.001, 20.0, cache=self.cache, api_url=self.stub.url)  # ~110 m north
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_cache_persists_across_instances(self):
+        """Re-opening the cache file should keep earlier lookups."""
+        fetch_elevation(70.0, 20.0, cache=self.cache, api_url=self.stub.url)
+        reopened = ElevationCache(self.cache_path)
+        self.assertEqual(fetch_elevation(70.0, 20.0, cache=reopened, api_url=self.stub.url), 700.0)
+        self.assertEqual(len(self.stub.requests), 1)
+        reopened.close()
+
+    def test_ttl_expiry(self):
+        """Expired entries should count as misses and be fetched again."""
+        cache = ElevationCache(os.path.join(self.tmpdir, "ttl.sqlite3"), ttl_seconds=0.05)
+        fetch_elevation(70.0, 20.0, cache=cache, api_url=self.stub.url)
+        time.sleep(0.1)
+        fetch_elevation(70.0, 20.0, cache=cache, api_url=self.stub.url)
+        self.assertEqual(len(self.stub.requests), 2)
+        cache.close()
+
+    def test_lru_eviction(self):
+        """The least recently used entry should be evicted once the cap is exceeded."""
+        cache = ElevationCache(os.path.join(self.tmpdir, "lru.sqlite3"), max_entries=2)
+        cache.put(70.0, 20.0, 1.0)
+        time.sleep(0.01)
+        cache.put(71.0, 20.0, 2.0)
+        time.sleep(0.01)
+        cache.get(70.0, 20.0)  # Refresh the first entry
+        time.sleep(0.01)
+        cache.put(72.0, 20.0, 3.0)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get(70.0, 20.0), (True, 1.0))
+        self.assertEqual(cache.get(71.0, 20.0), (False, None))
+        cache.close()
+
+    def test_failed_lookup_is_not_cached(self):
+        """Network failures should return None without storing anything."""
+        url = self.stub.url
+        self.stub.close()
+        self.assertIsNone(fetch_elevation(70.0, 20.0, cache=self.cache, api_url=url, timeout=1))
+        self.assertEqual(len(self.cache), 0)
+        self.stub = StubElevationServer()
+
+
+
+class TestElevationService(unittest.TestCase):
+    def setUp(self):
+        """Start a stub API and a service with an empty cache."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = ElevationCache(os.path.join(self.tmpdir, "elevation.sqlite3"))
+        self.stub = StubElevationServer()
+        self.service = ElevationService(api_url=self.stub.url, cache=self.cache, max_workers=4,
+                                        backoff_seconds=0.01)
+
+    def tearDown(self):
+        """Stop the stub and remove the cache files."""
+        self.service.close()
+        self.stub.close()
+        self.cache.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_large_track_is_batched(self):
+        """A 5,000-point track should take 50 requests over a handful of pooled connections."""
+        lats = [68.0 + i * 0.001 for i in range(5000)]
+        itinerary = ColumnarItinerary.from_arrays(lats, [20.0] * 5000)
+        progress = []
+        updated = self.service.elevate_itinerary(itinerary, progress=lambda done, total: progress.append(total))
+        self.assertEqual(updated, 5000)
+        self.assertEqual(len(self.stub.requests), 50)
+        self.assertTrue(all(len(batch) == 100 for batch in self.stub.requests))
+        self.assertLessEqual(len(self.stub.connections), 4)
+        self.assertEqual(self.service.requests_made, 50)  # Counted from four pool threads
+        self.assertEqual(progress, [50] * 50)
+        self.assertEqual(itinerary.altitudes[4999], round(lats[4999] * 10))
+
+    def test_cached_and_duplicate_points_are_not_refetched(self):
+        """Repeated points are fetched once, and a second pass is served from the cache."""
+        itinerary = Itinerary([Waypoint(f"WP{i}", 70.0 + (i % 3) * 0.01, 20.0, 0.0, 5.0, 0) for i in range(9)])
+        self.service.elevate_itinerary(itinerary)
+        self.assertEqual(sum(len(batch) for batch in self.stub.requests), 3)
+        self.service.elevate_itinerary(itinerary)
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(itinerary.waypoints[5].altitude_m, 700)
+        self.assertEqual(self.cache.hits, 9)
+
+    def test_rate_limited_requests_are_retried(self):
+        """HTTP 429 answers should be retried until the batch succeeds."""
+        self.stub.throttle = 2
+        elevations = self.service.lookup_many([(70.0, 20.0), (71.0, 20.0)])
+        self.assertEqual(elevations, [700.0, 710.0])
+        self.assertEqual(self.service.requests_made, 3)
+
+    def test_failed_batches_are_not_cached(self):
+        """Exhausted retries give None and leave the cache untouched."""
+        self.stub.throttle = 100
+        service = ElevationService(api_url=self.stub.url, cache=self.cache, max_retries=1, backoff_seconds=0.01)
+        self.assertEqual(service.lookup_many([(70.0, 20.0)]), [None])
+        self.assertEqual(len(self.cache), 0)
+        service.close()
+
+    def test_public_api_is_spaced_out_by_default(self):
+        """Only the public API gets the one-request-per-second spacing unless one is given."""
+        public = ElevationService(use_cache=False)
+        self.assertEqual(public.min_interval, PUBLIC_API_MIN_INTERVAL_S)
+        public.close()
+        self.assertEqual(self.service.min_interval, 0.0)
+        spaced = ElevationService(api_url=self.stub.url, use_cache=False, min_interval=0.05)
+        spaced.lookup_many([(70.0, 20.0)] + [(71.0 + i, 20.0) for i in range(100)])
+        self.assertEqual(spaced.min_interval, 0.05)
+        self.assertEqual(spaced.requests_made, 2)
+        spaced.close()
+
+    def test_malformed_responses_fail_the_batch(self):
+        """A 200 answer without results, or with a body that is not JSON, gives None and is not cached."""
+        error_payload = MagicMock(status_code=200)
+        error_payload.json.return_value = {"status": "INVALID_REQUEST", "error": "Invalid locations"}
+        not_json = MagicMock(status_code=200)
+        not_json.json.side_effect = ValueError("Expecting value")
+        short = MagicMock(status_code=200)
+        short.json.return_value = {"results": [{"elevation": 700.0}]}
+        for response in (error_payload, not_json, short):
+            with patch.object(self.service.session, "get", return_value=response):
+                self.assertEqual(self.service.lookup_many([(70.0, 20.0), (71.0, 20.0)]), [None, None])
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
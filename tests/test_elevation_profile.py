@@ -0,0 +1,116 @@
+"""
+Unit tests for along-route elevation profiles in elevation_profile.py
+"""
+
+import math
+import unittest
+import numpy as np
+from src.elevation_profile import MIN_SAMPLE_SPACING_M, ElevationProfiler, LegProfile, RouteProfile, densify_legs
+from src.planner import Waypoint, Itinerary, ColumnarItinerary
+from src.utils import haversine_distance
+
+
+class RidgeProvider:
+    """Ground rising to a 900 m ridge along latitude 78.05, sea level far from it; records every bulk lookup."""
+    def __init__(self, missing_south_of=None):
+        self.calls = []
+        self.missing_south_of = missing_south_of
+
+    def lookup_many(self, points, progress=None):
+        points = list(points)
+        self.calls.append(points)
+        return [None if self.missing_south_of is not None and lat < self.missing_south_of
+                else 900 * math.exp(-((lat - 78.05) * 40) ** 2) for lat, lon in points]
+
+
+def camps(n=4):
+    return [(78.0 + 0.05 * i, 15.0 + 0.01 * i) for i in range(n)]
+
+
+class TestDensify(unittest.TestCase):
+    def test_samples_follow_the_great_circle(self):
+        lats, lons, offsets, bounds = densify_legs([78.0, 78.0, 78.0], [15.0, 16.0, 16.0], spacing_m=250)
+        length = haversine_distance(78.0, 15.0, 78.0, 16.0)
+        self.assertEqual(bounds[-1], len(lats))
+        self.assertEqual(bounds[2] - bounds[1], 2)  # A zero-length leg keeps just its two ends
+        first = slice(bounds[0], bounds[1])
+        self.assertLessEqual(np.diff(offsets[first]).max() * 1000, 250)
+        self.assertAlmostEqual(offsets[bounds[1] - 1], length, places=1)
+        self.assertAlmostEqual(lons[bounds[1] - 1], 16.0)
+        # Along a parallel the great circle bulges poleward
+        self.assertTrue(np.all(lats[first][1:-1] > 78.0))
+        with self.assertRaises(ValueError):
+            densify_legs([78.0, 78.1], [15.0, 15.0], spacing_m=0)
+
+    def test_leg_statistics(self):
+        leg = LegProfile(np.array([0.0, 1.0, 2.0, 3.0, 4.0]), np.array([10.0, 300.0, np.nan, 120.0, 200.0]))
+        self.assertEqual((leg.ascent_m, leg.descent_m, leg.max_altitude_m), (370.0, 180.0, 300.0))
+        self.assertFalse(leg.complete)
+        back = leg.reversed()
+        self.assertEqual((back.ascent_m, back.descent_m), (180.0, 370.0))
+        np.testing.assert_array_equal(back.offsets_km, [0.0, 1.0, 2.0, 3.0, 4.0])
+        route = RouteProfile([leg, back])
+        distances, _, starts = route.series()
+        self.assertEqual(distances[-1], 8.0)
+        np.testing.assert_array_equal(starts, [0.0, 4.0])
+        self.assertEqual(route.to_dict()["ascent_m"], 550.0)
+
+
+class TestElevationProfiler(unittest.TestCase):
+    def test_ridge_between_camps_is_found(self):
+        provider = RidgeProvider()
+        profile = ElevationProfiler(provider, spacing_m=100).profile(Itinerary(
+            [Waypoint(f"C{i}", lat, lon, 0.0, 4.0, 0) for i, (lat, lon) in enumerate(camps(3))]))
+        self.assertEqual(len(provider.calls), 1)  # Every sample point in one bulk lookup
+        self.assertEqual(len(profile.legs), 2)
+        self.assertGreater(profile.legs[0].ascent_m, 850)
+        self.assertGreater(profile.legs[1].descent_m, 850)
+        self.assertAlmostEqual(profile.max_altitude_m, 900, delta=5)
+        self.assertEqual(profile.samples, len(provider.calls[0]))
+
+    def test_reorder_only_samples_new_legs(self):
+        provider = RidgeProvider()
+        profiler = ElevationProfiler(provider)
+        route = camps(6)
+        first = profiler.profile(route)
+        self.assertEqual(profiler.legs_sampled, 5)
+
+        # The same route backwards reuses every leg reversed
+        backwards = profiler.profile(route[::-1])
+        self.assertEqual(profiler.legs_sampled, 5)
+        self.assertAlmostEqual(backwards.ascent_m, first.descent_m)
+
+        # Swapping two camps creates three legs that have not been seen before
+        route[2], route[3] = route[3], route[2]
+        swapped = profiler.profile(ColumnarItinerary(
+            [Waypoint(f"C{i}", lat, lon, 0.0, 4.0, 0) for i, (lat, lon) in enumerate(route)]))
+        self.assertEqual(profiler.legs_sampled, 7)
+        self.assertEqual(len(provider.calls), 2)
+        fresh = ElevationProfiler(RidgeProvider()).profile(route)
+        self.assertAlmostEqual(swapped.ascent_m, fresh.ascent_m)
+        self.assertIsNotNone(profiler.cached_profile(route))
+        self.assertIsNone(profiler.cached_profile(route, spacing_m=50))
+
+    def test_spacing_below_the_minimum_reports_the_spacing_used(self):
+        """A finer spacing than the DEM resolves is raised to the minimum, and the profile says so."""
+        profiler = ElevationProfiler(RidgeProvider())
+        fine = profiler.profile(camps(3), spacing_m=10)
+        self.assertEqual(fine.spacing_m, MIN_SAMPLE_SPACING_M)
+        self.assertEqual(fine.to_dict()["spacing_m"], MIN_SAMPLE_SPACING_M)
+        self.assertEqual(profiler.profile(camps(3), spacing_m=MIN_SAMPLE_SPACING_M).samples, fine.samples)
+        self.assertEqual(profiler.legs_sampled, 2)  # Both spacings share the cached legs
+        self.assertIsNotNone(profiler.cached_profile(camps(3), spacing_m=5))
+
+    def test_legs_with_gaps_are_not_cached(self):
+        provider = RidgeProvider(missing_south_of=78.02)
+        profiler = ElevationProfiler(provider, max_cached_legs=10)
+        profile = profiler.profile(camps(3))
+        self.assertFalse(profile.legs[0].complete)
+        self.assertIsNotNone(profile.legs[0].max_altitude_m)
+        self.assertEqual(len(profiler), 1)
+        profiler.profile(camps(3))
+        self.assertEqual(profiler.legs_sampled, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,8 +5,16 @@ Unit tests for PDF and JSON export functions in export.py
 import unittest
 import os
 import json
-from src.export import export_to_json
+from unittest.mock import patch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+import numpy as np
+from src import export
+from src.elevation_profile import LegProfile, RouteProfile
+from src.export import export_to_json, export_to_pdf
 from src.planner import Waypoint, Itinerary
+from src.travel_time import get_speed_model
 
 class TestExport(unittest.TestCase):
     def setUp(self):
@@ -17,6 +25,7 @@ class TestExport(unittest.TestCase):
         ]
         self.itinerary = Itinerary(self.waypoints)
         self.json_file = "test_itinerary_output.json"
+        self.pdf_file = "test_itinerary_output.pdf"
 
     def test_export_to_json(self):
         """Test that JSON export writes expected structure to file."""
@@ -29,10 +38,107 @@ class TestExport(unittest.TestCase):
             self.assertEqual(len(data["itinerary"]), 2)
             self.assertEqual(data["itinerary"][0]["name"], "Camp")
 
+    def test_export_to_json_summary(self):
+        """JSON export should include totals and daily stages."""
+        export_to_json(self.itinerary, self.json_file, max_hours_per_day=0.25)
+        with open(self.json_file, "r") as f:
+            summary = json.load(f)["summary"]
+        self.assertEqual(summary["total_distance_km"], 5.0)
+        self.assertEqual(summary["max_hours_per_day"], 0.25)
+        self.assertEqual(len(summary["daily_stages"]), 1)
+        self.assertTrue(summary["daily_stages"][0]["over_limit"])
+
+    def test_export_to_pdf(self):
+        """PDF export should produce a PDF document."""
+        export_to_pdf(self.itinerary, self.pdf_file)
+        with open(self.pdf_file, "rb") as f:
+            self.assertEqual(f.read(4), b"%PDF")
+
+    def test_long_itinerary_is_paginated(self):
+        """A long itinerary spans several pages, each timed and carrying a subtotal."""
+        waypoints = [Waypoint(f"WP {i}", 70.0 + i * 0.01, 20.0, 0.0, 8.0, i) for i in range(500)]
+        itinerary = Itinerary(waypoints)
+        itinerary.recalculate_distances()
+        subtotals = []
+        draw_string = canvas.Canvas.drawString
+
+        def record(c, x, y, text, *args, **kwargs):
+            if text.startswith("Page subtotal"):
+                subtotals.append(float(text.split("|")[1].split()[0]))
+            return draw_string(c, x, y, text, *args, **kwargs)
+
+        with patch.object(canvas.Canvas, "drawString", autospec=True, side_effect=record):
+            stats = export_to_pdf(itinerary, self.pdf_file)
+        self.assertGreater(stats.pages, 5)
+        self.assertEqual(len(stats.page_seconds), stats.pages)
+        self.assertTrue(all(seconds >= 0 for seconds in stats.page_seconds))
+        self.assertAlmostEqual(sum(subtotals), itinerary.total_distance(), places=1)
+
+    def test_elevation_profile_chart(self):
+        """A route profile adds a chart heading and per-leg climbs to the PDF."""
+        profile = RouteProfile([LegProfile(np.linspace(0, 5, 21), 900 * np.sin(np.linspace(0, np.pi, 21)))])
+        lines = []
+        draw_string = canvas.Canvas.drawString
+
+        def record(c, x, y, text, *args, **kwargs):
+            lines.append(text)
+            return draw_string(c, x, y, text, *args, **kwargs)
+
+        with patch.object(canvas.Canvas, "drawString", autospec=True, side_effect=record):
+            export_to_pdf(self.itinerary, self.pdf_file, profile=profile)
+        self.assertIn("Elevation Profile: +900 m / -900 m, max 900 m", lines)
+        self.assertIn("Leg 1: WP 1 to WP 2 | 5.00 km | +900 m / -900 m | max 900 m", lines)
+        lines.clear()
+        with patch.object(canvas.Canvas, "drawString", autospec=True, side_effect=record):
+            export_to_pdf(self.itinerary, self.pdf_file, profile=RouteProfile([LegProfile(np.zeros(2),
+                                                                                          np.full(2, np.nan))]))
+        self.assertFalse(any(line.startswith("Elevation Profile") for line in lines))
+
+    def test_slope_note_only_for_terrain_models(self):
+        """The title page mentions slope adjustment only when a terrain model set the times."""
+        lines = []
+        draw_string = canvas.Canvas.drawString
+
+        def record(c, x, y, text, *args, **kwargs):
+            lines.append(text)
+            return draw_string(c, x, y, text, *args, **kwargs)
+
+        with patch.object(canvas.Canvas, "drawString", autospec=True, side_effect=record):
+            for name in ("flat", "ski"):
+                self.itinerary.set_speed_model(get_speed_model(name))
+                export_to_pdf(self.itinerary, self.pdf_file)
+        notes = [line for line in lines if line.startswith("Travel times adjusted for slope")]
+        self.assertEqual(notes, ["Travel times adjusted for slope (ski profile)"])
+
+    def test_header_image_is_shared(self):
+        """The header is decoded once across exports and embedded once per document."""
+        export._header_image.cache_clear()
+        with patch("src.export.ImageReader", wraps=ImageReader) as reader:
+            export_to_pdf(Itinerary([Waypoint(f"WP {i}", 70.0, 20.0, 1.0, 8.0, 0) for i in range(200)]),
+                          self.pdf_file)
+            export_to_pdf(self.itinerary, self.pdf_file)
+        reader.assert_called_once()
+        export._header_image.cache_clear()
+        export_to_pdf(Itinerary([Waypoint(f"WP {i}", 70.0, 20.0, 1.0, 8.0, 0) for i in range(200)]),
+                      self.pdf_file)
+        with open(self.pdf_file, "rb") as f:
+            data = f.read()
+        self.assertEqual(data.count(b"/Subtype /Image"), 1)
+        self.assertEqual(data.count(b"/Subtype /Form"), 1)
+
+    def test_long_names_fit_their_column(self):
+        """Names wider than the column are cut short with an ellipsis."""
+        name = "A very long waypoint name that would run straight off the page " * 3
+        fitted = export._fit_text(name, 130, "Helvetica", 8)
+        self.assertTrue(fitted.endswith("..."))
+        self.assertLessEqual(stringWidth(fitted, "Helvetica", 8), 130)
+        self.assertEqual(export._fit_text("Camp", 130, "Helvetica", 8), "Camp")
+
     def tearDown(self):
-        """Remove test output file if it exists."""
-        if os.path.exists(self.json_file):
-            os.remove(self.json_file)
+        """Remove test output files if they exist."""
+        for path in (self.json_file, self.pdf_file):
+            if os.path.exists(path):
+                os.remove(path)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
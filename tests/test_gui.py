@@ -4,9 +4,18 @@ Covers waypoint addition, toggles, list updates, and non-visual state changes.
 """
 
 import unittest
+import os
+import shutil
+import tempfile
+import threading
 import tkinter as tk
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 from src.gui import ExpeditionPlannerGUI
+from src.map_click_server import clicks
+from src.binary_format import write_binary
+from src.preview import build_preview_map
+from src.planner import Waypoint, Itinerary
+from src.tasks import TaskRunner
 
 class TestGUI(unittest.TestCase):
     def setUp(self):
@@ -61,6 +70,322 @@ class TestGUI(unittest.TestCase):
         self.app.delete_waypoint()
         self.assertEqual(len(self.app.waypoints), 1)
 
+    def test_edits_keep_summary_in_sync(self):
+        """Incremental edits should leave legs and totals equal to a full recompute."""
+        self._add_two_waypoints()
+        self._fill_waypoint_fields("C", 70.3, 20.4, 0.0, 8.0, 170)
+        with patch("tkinter.messagebox.showinfo"):
+            self.app.add_waypoint()
+        self.app.waypoint_listbox.selection_set(2)
+        self.app.move_waypoint_up()
+        self.app.waypoint_listbox.selection_clear(0, tk.END)
+        self.app.waypoint_listbox.selection_set(0)
+        self.app.delete_waypoint()
+
+        expected = [wp.distance_km for wp in self.app.waypoints]
+        self.app.recalculate_distances()
+        self.assertEqual([wp.distance_km for wp in self.app.waypoints], expected)
+        self.assertEqual(self.app.total_distance_label.cget("text"),
+                         f"Total Distance: {self.app.itinerary.total_distance():.2f} km")
+
+    def test_long_list_edits_keep_view(self):
+        """With thousands of waypoints, edits redraw only visible rows and keep selection and scroll."""
+        self.app.waypoints[:] = [Waypoint(f"WP{i}", 70.0, 20.0 + i * 0.01, 0.0, 5.0, 0) for i in range(5000)]
+        self.app.itinerary.recalculate_distances()
+        self.app.refresh_waypoint_list()
+        self.app.waypoint_listbox.yview("moveto", 0.5)
+        self.app.waypoint_listbox.selection_set(2503)
+        with patch.object(self.app, "format_waypoint_row", wraps=self.app.format_waypoint_row) as fmt:
+            self.app.waypoint_listbox.format_row = fmt
+            self.app.move_waypoint_up()
+        self.assertLessEqual(fmt.call_count, 2 * self.app.waypoint_listbox.visible_rows)
+        self.assertEqual(self.app.waypoints[2502].name, "WP2503")
+        self.assertEqual(self.app.waypoint_listbox.curselection(), (2502,))
+        self.assertEqual(self.app.waypoint_listbox.top, 2500)
+        self.assertTrue(self.app.waypoint_listbox.listbox.get(2).startswith("2503 WP2503"))
+
+    def test_summary_shows_daily_stages(self):
+        """Summary should list daily stages and cumulative stats for the selection."""
+        self._add_two_waypoints()
+        self.app.max_hours_var.set(0.25)
+        self.app.update_summary()
+        self.assertIn("Daily Stages: 1 day(s)", self.app.stages_label.cget("text"))
+        self.app.waypoint_listbox.selection_set(1)
+        self.app.show_selection_stats()
+        self.assertIn("WP 2 reached after 5.00 km", self.app.selection_label.cget("text"))
+
+    def test_travel_model_adjusts_summary_time(self):
+        """Climbing legs take longer under a terrain model; the flat model is distance over speed."""
+        self._add_two_waypoints()
+        self.app.waypoints[1].altitude_m = 660  # 500 m up over a 5 km leg
+        self.app.itinerary.reset_running_totals()
+        self.app.speed_model_var.set("flat")
+        self.app.change_speed_model()
+        self.assertEqual(self.app.total_time_label.cget("text"), "Estimated Time: 0.56 hours")
+        self.app.speed_model_var.set("sled")
+        self.app.change_speed_model()
+        self.assertIn("(sled, slope-adjusted)", self.app.total_time_label.cget("text"))
+        self.assertGreater(self.app.itinerary.running_time, 1.0)
+        self.assertEqual(self.app.snapshot_itinerary().estimated_time(), self.app.itinerary.estimated_time())
+
+    @patch("src.gui.messagebox.showinfo")
+    def test_fill_altitudes_uses_bulk_lookup(self, mock_showinfo):
+        """Fetching altitudes should send every waypoint to the provider in one background job."""
+        self._add_two_waypoints()
+        self.app.elevation_provider = MagicMock()
+        self.app.elevation_provider.lookup_many.return_value = [300.4, None]
+        self.app.fill_altitudes()
+        self.app.tasks.wait_all(timeout=5)
+        self.app.elevation_provider.lookup_many.assert_called_once()
+        self.assertEqual(self.app.waypoints[0].altitude_m, 300)
+        self.assertEqual(self.app.waypoints[1].altitude_m, 160)
+        mock_showinfo.assert_called_once_with("Altitudes Updated", "Elevation found for 1 of 2 waypoints.")
+
+    def test_elevation_profile_reuses_sampled_legs(self):
+        """Profiling looks up all samples in one bulk call; profiling again after a reorder reuses the legs."""
+        self._add_two_waypoints()
+        self.app.elevation_provider = MagicMock()
+        self.app.elevation_provider.lookup_many.side_effect = lambda points, progress=None: [
+            400.0 + 100 * (lat - 70.0) for lat, _ in points]
+        with patch.object(self.app, "draw_elevation_profile", wraps=self.app.draw_elevation_profile) as draw:
+            self.app.show_elevation_profile()
+            self.app.tasks.wait_all(timeout=5)
+            self.app.waypoint_listbox.selection_set(1)
+            self.app.move_waypoint_up()
+            self.app.show_elevation_profile()
+            self.app.tasks.wait_all(timeout=5)
+        self.app.elevation_provider.lookup_many.assert_called_once()
+        first, second = (call.args[0] for call in draw.call_args_list)
+        self.assertAlmostEqual(first.ascent_m, 10.0)
+        self.assertAlmostEqual(second.descent_m, 10.0)
+        self.assertEqual(first.samples, len(self.app.elevation_provider.lookup_many.call_args.args[0]))
+
+    @patch("src.gui.webbrowser.open")
+    def test_preview_map_runs_in_background(self, mock_open):
+        """Preview generation should run as a task, coalesce repeated clicks and reuse the cached map."""
+        self._add_two_waypoints()
+        self.app.map_cache_dir = tempfile.mkdtemp()
+        with patch("src.preview.build_preview_map", wraps=build_preview_map) as mock_build:
+            self.app.preview_map()
+            self.app.preview_map()
+            self.app.tasks.wait_all(timeout=5)
+            self.app.preview_map()
+            self.app.tasks.wait_all(timeout=5)
+        mock_build.assert_called_once()
+        path = mock_open.call_args[0][0]
+        self.assertEqual(os.path.dirname(path), self.app.map_cache_dir)
+        self.assertEqual(mock_open.call_count, 2)
+        self.assertEqual(self.app.status_label.cget("text"), "Ready")
+        shutil.rmtree(self.app.map_cache_dir)
+
+    @patch("tkinter.messagebox.showinfo")
+    @patch("src.gui.webbrowser.open")
+    def test_preview_of_an_edited_route_is_not_dropped(self, mock_open, mock_showinfo):
+        """Previewing an edited route while the previous map still builds shows both, not the old one twice."""
+        self._add_two_waypoints()
+        release = threading.Event()
+
+        def render(names, lats, lons, cache_dir=None, check_cancelled=None):
+            release.wait(5)
+            return "-".join(names) + ".html"
+
+        with patch("src.gui.render_preview_map", side_effect=render) as mock_render:
+            self.app.preview_map()
+            self._fill_waypoint_fields("C", 70.2, 20.2, 0.0, 9.0, 170)
+            self.app.add_waypoint()
+            self.app.preview_map()
+            self.app.preview_map()  # Unchanged since the last click, so coalesced
+            release.set()
+            self.app.tasks.wait_all(timeout=5)
+        self.assertEqual(mock_render.call_count, 2)
+        self.assertCountEqual([call.args[0] for call in mock_open.call_args_list], ["A-B.html", "A-B-C.html"])
+
+    def test_map_clicks_are_collected_in_order(self):
+        """Polling picks up every click pushed since the last poll, and only once."""
+        clicks.put(70.0, 20.0)
+        clicks.put(70.1, 20.1)
+        self.app.poll_map_clicks()
+        self.app.poll_map_clicks()
+        self.assertEqual([c.latitude for c in self.app.pending_clicks], [70.0, 70.1])
+        self.assertEqual(self.app.clicks_label.cget("text"), "Map clicks: 2")
+
+    @patch("src.gui.messagebox.showinfo")
+    def test_add_clicked_path_appends_all_clicks(self, mock_showinfo):
+        """A clicked path becomes waypoints in one operation, with altitudes fetched in one job."""
+        self._add_two_waypoints()
+        for i in range(3):
+            clicks.put(71.0 + i * 0.1, 21.0)
+        self.app.poll_map_clicks()
+        self.app.elevation_provider = MagicMock()
+        self.app.elevation_provider.lookup_many.return_value = [10.0, 20.0, 30.0]
+        self.app.add_clicked_path()
+        self.app.tasks.wait_all(timeout=5)
+        self.assertEqual(len(self.app.waypoints), 5)
+        self.assertEqual(self.app.waypoints[2].name, "Map Point 3")
+        self.assertGreater(self.app.waypoints[2].distance_km, 0)
+        self.assertEqual([wp.altitude_m for wp in self.app.waypoints[2:]], [10, 20, 30])
+        self.assertEqual(self.app.pending_clicks, [])
+        self.assertEqual(self.app.waypoint_listbox.size(), 5)
+
+    @patch("src.gui.messagebox.showinfo")
+    def test_load_clicked_point_uses_latest_click(self, mock_showinfo):
+        """The most recent click fills the entry fields without any file handoff."""
+        clicks.put(70.0, 20.0)
+        clicks.put(69.5, 19.5)
+        self.app.poll_map_clicks()
+        self.app.elevation_provider = MagicMock()
+        self.app.elevation_provider.lookup.return_value = 412.0
+        self.app.load_clicked_point()
+        self.app.tasks.wait_all(timeout=5)
+        self.assertEqual(self.app.lat_var.get(), 69.5)
+        self.assertEqual(self.app.alt_var.get(), 412)
+
+    @patch("src.gui.messagebox.showinfo")
+    def test_clicks_snap_to_nearby_waypoints(self, mock_showinfo):
+        """A click a few metres from a waypoint selects it and uses its exact coordinates."""
+        self._add_two_waypoints()
+        self.app.elevation_provider = MagicMock()
+        self.app.elevation_provider.lookup.return_value = 160.0
+        clicks.put(70.1001, 20.1002)
+        self.app.poll_map_clicks()
+        self.app.load_clicked_point()
+        self.app.tasks.wait_all(timeout=5)
+        self.assertEqual((self.app.lat_var.get(), self.app.lon_var.get()), (70.1, 20.1))
+        self.assertEqual(self.app.waypoint_listbox.curselection(), (1,))
+        self.assertIn("Snapped to waypoint 2 (B), 13 m from the click", mock_showinfo.call_args[0][1])
+
+        # Deleted waypoints no longer attract clicks; clicks far from every waypoint are kept as they are
+        self.app.delete_waypoint()
+        self.app.clear_clicks()
+        self.app.elevation_provider.lookup_many.return_value = [None, None]
+        clicks.put(70.1001, 20.1002)
+        clicks.put(70.0002, 20.0)
+        self.app.poll_map_clicks()
+        self.app.add_clicked_path()
+        self.app.tasks.wait_all(timeout=5)
+        self.assertEqual([(wp.latitude, wp.longitude) for wp in self.app.waypoints[1:]],
+                         [(70.1001, 20.1002), (70.0, 20.0)])
+
+    @patch("src.gui.webbrowser.open")
+    def test_launch_map_server_reuses_running_server(self, mock_open):
+        """Launching twice opens the same in-process server instead of spawning another."""
+        self.app.launch_map_server()
+        self.app.tasks.wait_all(timeout=5)
+        self.app.launch_map_server()
+        self.app.tasks.wait_all(timeout=5)
+        url = self.app.map_server.url
+        self.assertEqual(mock_open.call_args_list, [((url,),), ((url,),)])
+        self.app.map_server.shutdown()
+        self.assertFalse(self.app.map_server.running)
+
+    @patch("src.gui.messagebox.showinfo")
+    def test_import_itinerary_replaces_waypoints(self, mock_showinfo):
+        """Importing the example file swaps in its waypoints and keeps the summary in sync."""
+        self._add_two_waypoints()
+        example = os.path.join(os.path.dirname(__file__), "../assets/example_itinerary.json")
+        with patch("src.gui.filedialog.askopenfilename", return_value=example):
+            self.app.import_itinerary()
+        self.app.tasks.wait_all(timeout=5)
+        self.assertEqual([wp.name for wp in self.app.waypoints], ["Base Camp", "Glacier View", "Aurora Point"])
+        self.assertIs(self.app.itinerary.waypoints, self.app.waypoints)
+        self.assertEqual(self.app.waypoint_listbox.size(), 3)
+        self.assertEqual(self.app.total_distance_label.cget("text"), "Total Distance: 30.80 km")
+        mock_showinfo.assert_called_once_with("Import", "Imported 3 waypoints.")
+
+    @patch("src.gui.messagebox.showinfo")
+    def test_import_binary_itinerary(self, mock_showinfo):
+        """Binary itinerary files are recognised by their extension."""
+        path = os.path.join(tempfile.mkdtemp(), "route.aepb")
+        write_binary(Itinerary([Waypoint("Camp", 70.0, 20.0, 0.0, 10.0, 100)]), path)
+        with patch("src.gui.filedialog.askopenfilename", return_value=path):
+            self.app.import_itinerary()
+        self.app.tasks.wait_all(timeout=5)
+        self.assertEqual(self.app.waypoints, [Waypoint("Camp", 70.0, 20.0, 0.0, 10.0, 100)])
+        os.remove(path)
+
+    @patch("src.gui.messagebox.showinfo")
+    def test_import_gpx_track_reports_progress(self, mock_showinfo):
+        """GPX tracks import through the background loader, with progress shown in the status bar."""
+        path = os.path.join(tempfile.mkdtemp(), "run.gpx")
+        with open(path, "w") as f:
+            f.write('<gpx><trk><trkseg><trkpt lat="70.0" lon="20.0"><ele>100</ele><name>Camp</name></trkpt>'
+                    '<trkpt lat="70.1" lon="20.1"/></trkseg></trk></gpx>')
+        statuses = []
+        self.app.tasks.on_status = lambda task: statuses.append((task.progress, task.message))
+        with patch("src.gui.filedialog.askopenfilename", return_value=path):
+            self.app.import_itinerary()
+        self.app.tasks.wait_all(timeout=5)
+        self.assertEqual([(wp.name, wp.altitude_m) for wp in self.app.waypoints], [("Camp", 100), ("", 0)])
+        self.assertIn((1.0, "0/0 MB"), statuses)
+        mock_showinfo.assert_called_once_with("Import", "Imported 2 waypoints.")
+        os.remove(path)
+
+    @patch("src.gui.messagebox.showinfo")
+    def test_import_offers_to_remove_near_duplicates(self, mock_showinfo):
+        """Points within a metre of an earlier point are found on import and dropped if the user agrees."""
+        path = os.path.join(tempfile.mkdtemp(), "loop.gpx")
+        with open(path, "w") as f:
+            f.write('<gpx><trk><trkseg><trkpt lat="70.0" lon="20.0"/><trkpt lat="70.1" lon="20.0"/>'
+                    '<trkpt lat="70.1" lon="20.000001"/><trkpt lat="70.2" lon="20.0"/></trkseg></trk></gpx>')
+        with patch("src.gui.filedialog.askopenfilename", return_value=path), \
+                patch("src.gui.messagebox.askyesno", return_value=True) as mock_ask:
+            self.app.import_itinerary()
+            self.app.tasks.wait_all(timeout=5)
+        self.assertIn("1 waypoints are within 1 m of an earlier waypoint", mock_ask.call_args[0][1])
+        self.assertEqual([wp.latitude for wp in self.app.waypoints], [70.0, 70.1, 70.2])
+        self.assertAlmostEqual(self.app.waypoints[2].distance_km, 11.12, places=2)
+        self.assertEqual(len(self.app.spatial_index), 3)
+        os.remove(path)
+
+    @patch("src.gui.messagebox.showinfo")
+    def test_simplify_route_keeps_named_waypoints(self, mock_showinfo):
+        """Simplifying a straight dense track leaves its ends and named waypoints, with totals updated."""
+        track = [Waypoint("", 70.0, 20.0 + i * 0.001, 0.0, 5.0, 0) for i in range(50)]
+        track[0].name, track[20].name, track[-1].name = "Start", "Depot", "End"
+        self.app.waypoints[:] = track
+        self.app.itinerary.recalculate_distances()
+        with patch("src.gui.simpledialog.askfloat", return_value=5.0), \
+                patch("src.gui.messagebox.askyesnocancel", return_value=True) as ask:
+            self.app.simplify_route()
+        self.app.tasks.wait_all(timeout=5)
+        self.assertIn("Keep all 1 named waypoints", ask.call_args[0][1])
+        self.assertEqual([wp.name for wp in self.app.waypoints], ["Start", "Depot", "End"])
+        self.assertIs(self.app.itinerary.waypoints, self.app.waypoints)
+        self.assertEqual(self.app.waypoint_listbox.size(), 3)
+        self.assertEqual(self.app.total_distance_label.cget("text"), "Total Distance: 1.86 km")
+        self.assertIn("Kept 3 of 50 waypoints", mock_showinfo.call_args[0][1])
+
+    @patch("src.gui.messagebox.showinfo")
+    def test_simplify_route_can_drop_named_waypoints(self, mock_showinfo):
+        """Routes built in the GUI name every point, so the user can let names be simplified away."""
+        for i in range(30):
+            self._fill_waypoint_fields(f"Map Point {i + 1}", 70.0, 20.0 + i * 0.001, 0.0, 5.0, 0)
+            self.app.add_waypoint()
+        with patch("src.gui.simpledialog.askfloat", return_value=5.0), \
+                patch("src.gui.messagebox.askyesnocancel", return_value=None):
+            self.app.simplify_route()
+        self.assertEqual(len(self.app.waypoints), 30)
+        with patch("src.gui.simpledialog.askfloat", return_value=5.0), \
+                patch("src.gui.messagebox.askyesnocancel", return_value=False):
+            self.app.simplify_route()
+        self.app.tasks.wait_all(timeout=5)
+        self.assertEqual([wp.name for wp in self.app.waypoints], ["Map Point 1", "Map Point 30"])
+
+    @patch("src.gui.messagebox.showinfo")
+    def test_optimize_order_shortens_route(self, mock_showinfo):
+        """Zig-zagging waypoints are put in order along the line, keeping both ends fixed."""
+        lons = [20.0, 20.4, 20.1, 20.3, 20.2, 20.5]
+        self.app.waypoints[:] = [Waypoint(f"C{i}", 70.0, lon, 0.0, 5.0, 0) for i, lon in enumerate(lons)]
+        self.app.itinerary.recalculate_distances()
+        with patch("src.gui.messagebox.askyesnocancel", return_value=True):
+            self.app.optimize_order()
+        self.app.tasks.wait_all(timeout=10)
+        self.assertEqual([wp.name for wp in self.app.waypoints], ["C0", "C2", "C4", "C3", "C1", "C5"])
+        self.assertEqual(self.app.total_distance_label.cget("text"),
+                         f"Total Distance: {self.app.itinerary.total_distance():.2f} km")
+        message = mock_showinfo.call_args[0][1]
+        self.assertIn("Route distance: 49.44 km -> 19.02 km", message)
+
     @patch('src.gui.filedialog.asksaveasfilename', return_value='test.json')
     @patch('src.gui.messagebox.showinfo')
     @patch('src.gui.export_to_json')
@@ -72,9 +397,14 @@ class TestGUI(unittest.TestCase):
         with patch.object(ExpeditionPlannerGUI, '__init__', lambda self, r: None):
             app = ExpeditionPlannerGUI(root)
             app.root = root
-            app.waypoints = self._add_two_waypoints()
+            self._add_two_waypoints()
+            app.waypoints = self.app.waypoints
+            app.itinerary = self.app.itinerary
+            app.max_hours_var = tk.DoubleVar(root, value=8.0)
+            app.tasks = TaskRunner()
 
         app.export_json()
+        app.tasks.wait_all(timeout=5)
 
         mock_export.assert_called_once()
         mock_showinfo.assert_called_once_with("Export", "Exported itinerary to JSON.")
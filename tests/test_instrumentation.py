@@ -0,0 +1,115 @@
+"""
+Unit tests for the tracing layer in instrumentation.py
+"""
+
+import json
+import os
+import pstats
+import tempfile
+import threading
+import unittest
+from src import instrumentation
+from src.instrumentation import configure_from_environment, count, disable, enable, span, traced
+from src.export import export_to_pdf
+from src.planner import Waypoint, Itinerary
+
+
+@traced("test.add")
+def add(a, b):
+    return a + b
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.previous = disable()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "trace.json")
+
+    def tearDown(self):
+        disable()
+        instrumentation._tracer = self.previous
+        self.tmp.cleanup()
+
+    def spans(self, tracer, name):
+        return [e for e in tracer.events if e["ph"] == "X" and e["name"] == name]
+
+    def test_disabled_is_a_no_op(self):
+        with span("anything", size=3) as s:
+            s.set(more=1)
+        count("anything")
+        self.assertIs(span("other"), span("anything"))
+        self.assertEqual(add(2, 3), 5)
+        self.assertFalse(instrumentation.enabled())
+
+    def test_spans_and_counters(self):
+        tracer = enable(self.path)
+        with span("outer", "test", waypoints=10) as outer:
+            self.assertEqual(add(1, 2), 3)
+            outer.set(pages=2)
+        with self.assertRaises(KeyError):
+            with span("failing"):
+                raise KeyError("x")
+        worker = threading.Thread(target=lambda: count("clicks", 3), name="worker")
+        worker.start()
+        worker.join()
+        count("clicks")
+
+        [outer_event] = self.spans(tracer, "outer")
+        [inner_event] = self.spans(tracer, "test.add")
+        self.assertEqual(outer_event["args"], {"waypoints": 10, "pages": 2})
+        self.assertLessEqual(outer_event["ts"], inner_event["ts"])
+        self.assertGreaterEqual(outer_event["dur"], inner_event["dur"])
+        self.assertEqual(self.spans(tracer, "failing")[0]["args"], {"error": "KeyError"})
+        self.assertEqual(tracer.counters["clicks"], 4)
+        self.assertEqual(tracer.summary()["test.add"]["count"], 1)
+
+    def test_chrome_trace_file(self):
+        tracer = enable(self.path)
+        with span("export"):
+            pass
+        self.assertEqual(tracer.write(), self.path)
+        with open(self.path) as f:
+            trace = json.load(f)
+        phases = {e["ph"] for e in trace["traceEvents"]}
+        self.assertTrue({"M", "X"} <= phases)
+        self.assertIn({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": threading.get_ident(),
+                       "args": {"name": threading.current_thread().name}}, trace["traceEvents"])
+        self.assertEqual(trace["otherData"]["spans"]["export"]["count"], 1)
+
+    def test_event_limit(self):
+        tracer = enable(self.path, max_events=5)
+        for _ in range(8):
+            with span("tick"):
+                pass
+        self.assertEqual((len(tracer.events), tracer.dropped_events), (5, 3))
+
+    def test_profiled_span_writes_stats(self):
+        tracer = enable(self.path, profile=True)
+        with span("heavy", profile=True):
+            with span("nested", profile=True):
+                sum(range(1000))
+        [heavy] = self.spans(tracer, "heavy")
+        self.assertNotIn("profile", self.spans(tracer, "nested")[0].get("args", {}))
+        self.assertTrue(heavy["args"]["profile"].endswith(".heavy.prof"))
+        self.assertGreater(pstats.Stats(heavy["args"]["profile"]).total_calls, 0)
+
+    def test_environment_switch(self):
+        self.assertIsNone(configure_from_environment({}))
+        self.assertIsNone(configure_from_environment({"AEP_TRACE": "0"}))
+        tracer = configure_from_environment({"AEP_TRACE": self.path, "AEP_PROFILE": "1"})
+        self.assertIs(instrumentation.current_tracer(), tracer)
+        self.assertEqual((tracer.path, tracer.profile), (self.path, True))
+        self.assertTrue(configure_from_environment({"AEP_TRACE": "yes"}).path.endswith(".json"))
+
+    def test_hot_paths_are_traced(self):
+        tracer = enable(self.path)
+        itinerary = Itinerary([Waypoint(f"C{i}", 70.0 + i / 10, 20.0, 0.0, 4.0, 0) for i in range(5)])
+        itinerary.recalculate_distances()
+        stats = export_to_pdf(itinerary, os.path.join(self.tmp.name, "plan.pdf"))
+        self.assertEqual(self.spans(tracer, "planner.recalculate_distances")[0]["args"], {"waypoints": 5})
+        self.assertEqual(self.spans(tracer, "export.pdf")[0]["args"]["pages"], stats.pages)
+        self.assertEqual(tracer.counters["export.pdf_pages"], stats.pages)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Unit tests for streaming itinerary import and export in itinerary_io.py
+"""
+
+import unittest
+import json
+import os
+import tempfile
+import tracemalloc
+from unittest.mock import patch
+from src import itinerary_io
+from src.itinerary_io import (iter_waypoints, load_itinerary, write_json, write_ndjson)
+from src.planner import Waypoint, Itinerary, ColumnarItinerary
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "../assets/example_itinerary.json")
+
+
+def generate_waypoints(n):
+    """Generator of synthetic waypoints, so nothing holds the whole route."""
+    for i in range(n):
+        yield Waypoint(f"WP {i}", 70.0 + i * 1e-4, 20.0 - i * 1e-4, 1.25, 8.0, i % 900)
+
+
+class TestItineraryIO(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.json_file = os.path.join(self.tmpdir, "route.json")
+        self.ndjson_file = os.path.join(self.tmpdir, "route.ndjson")
+
+    def tearDown(self):
+        for name in os.listdir(self.tmpdir):
+            os.remove(os.path.join(self.tmpdir, name))
+        os.rmdir(self.tmpdir)
+
+    def test_load_example_itinerary(self):
+        """The bundled example file loads into an Itinerary."""
+        itinerary = load_itinerary(EXAMPLE)
+        self.assertEqual([wp.name for wp in itinerary.waypoints], ["Base Camp", "Glacier View", "Aurora Point"])
+        self.assertEqual(itinerary.waypoints[1].altitude_m, 300)
+        self.assertAlmostEqual(itinerary.running_distance, 30.8)
+
+    def test_write_json_matches_json_dump(self):
+        """Streaming output is byte-for-byte what json.dump with indent=4 would write."""
+        itinerary = Itinerary(list(generate_waypoints(3)))
+        summary = {"total_distance_km": 3.75, "daily_stages": [{"day": 1}]}
+        write_json(itinerary.waypoints, self.json_file, summary=summary)
+        expected = dict(itinerary.to_dict(), summary=summary)
+        with open(self.json_file) as f:
+            self.assertEqual(f.read(), json.dumps(expected, indent=4))
+
+        write_json([], self.json_file)
+        with open(self.json_file) as f:
+            self.assertEqual(f.read(), json.dumps({"itinerary": []}, indent=4))
+
+    def test_round_trip_across_chunk_boundaries(self):
+        """Values split between read chunks are reassembled, in both formats."""
+        original = list(generate_waypoints(200))
+        write_json(iter(original), self.json_file, summary={"note": "skipped on load"})
+        write_ndjson(iter(original), self.ndjson_file)
+        with patch.object(itinerary_io, "CHUNK_SIZE", 7):
+            self.assertEqual(list(iter_waypoints(self.json_file)), original)
+        self.assertEqual(list(iter_waypoints(self.ndjson_file)), original)
+
+    def test_other_keys_before_itinerary_are_skipped(self):
+        """Top-level entries other than "itinerary" are ignored wherever they appear."""
+        with open(self.json_file, "w") as f:
+            json.dump({"summary": {"days": [1, 2]}, "itinerary": [{"latitude": 70, "longitude": 20}]}, f)
+        waypoints = list(iter_waypoints(self.json_file))
+        self.assertEqual(waypoints, [Waypoint("", 70.0, 20.0, 0.0, 0.0, 0)])
+
+    def test_invalid_input_raises_value_error(self):
+        """Malformed entries report where they are."""
+        with open(self.ndjson_file, "w") as f:
+            f.write('{"latitude": 70, "longitude": 20}\n\nnot json\n')
+        with self.assertRaisesRegex(ValueError, "line 3"):
+            list(iter_waypoints(self.ndjson_file))
+        with open(self.json_file, "w") as f:
+            f.write('{"itinerary": [{"name": "no coordinates"}]}')
+        with self.assertRaises(ValueError):
+            list(iter_waypoints(self.json_file))
+
+    def test_columnar_load_keeps_memory_flat(self):
+        """Streaming into columns needs far less memory than parsing the whole document."""
+        write_ndjson(generate_waypoints(20_000), self.ndjson_file)
+        write_json(generate_waypoints(20_000), self.json_file)
+
+        tracemalloc.start()
+        itinerary = load_itinerary(self.json_file, columnar=True)
+        _, streaming_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        with open(self.json_file) as f:
+            json.load(f)
+        _, full_parse_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.assertIsInstance(itinerary, ColumnarItinerary)
+        self.assertEqual(len(itinerary), 20_000)
+        self.assertEqual(itinerary.waypoints[-1].name, "WP 19999")
+        self.assertLess(streaming_peak, full_parse_peak / 2)
+        self.assertEqual(len(load_itinerary(self.ndjson_file, columnar=True)), 20_000)
+
+
+if __name__ == '__main__':
+    unittest.main()
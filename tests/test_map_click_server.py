@@ -0,0 +1,108 @@
+"""
+Unit tests for the click queue and endpoints in map_click_server.py
+"""
+
+import unittest
+import threading
+import requests
+from src.map_click_server import app, clicks, ClickQueue, MapServer
+
+class TestClickQueue(unittest.TestCase):
+    def test_rapid_clicks_are_kept_in_order(self):
+        """Every click is retained, in order, with increasing sequence numbers."""
+        queue = ClickQueue()
+        for i in range(50):
+            queue.put(70.0 + i / 100, 20.0)
+        received = queue.since(0)
+        self.assertEqual([c.seq for c in received], list(range(1, 51)))
+        self.assertEqual(received[-1].latitude, 70.49)
+
+    def test_since_returns_only_newer_clicks(self):
+        """A consumer's cursor prevents clicks from being delivered twice."""
+        queue = ClickQueue()
+        queue.put(70.0, 20.0)
+        queue.put(71.0, 21.0)
+        self.assertEqual(queue.since(1), [queue.latest()])
+        self.assertEqual(queue.since(2), [])
+
+    def test_long_poll_wakes_on_new_click(self):
+        """A waiting consumer returns as soon as a click arrives."""
+        queue = ClickQueue()
+        timer = threading.Timer(0.05, queue.put, args=(69.5, 19.0))
+        timer.start()
+        received = queue.since(0, timeout=5)
+        timer.join()
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0].longitude, 19.0)
+
+    def test_maxlen_drops_oldest(self):
+        """Only the most recent clicks are retained."""
+        queue = ClickQueue(maxlen=3)
+        for i in range(5):
+            queue.put(70.0, 20.0 + i)
+        self.assertEqual([c.seq for c in queue.since(0)], [3, 4, 5])
+
+
+class TestClickEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_add_queues_click(self):
+        """Posting a click queues it instead of writing a file."""
+        before = clicks.last_seq
+        response = self.client.post("/add", json={"latitude": "69.65000", "longitude": "18.95000"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["seq"], before + 1)
+        self.assertEqual(clicks.latest().latitude, 69.65)
+
+    def test_add_rejects_bad_input(self):
+        """Missing or malformed coordinates are rejected."""
+        self.assertEqual(self.client.post("/add", json={"latitude": "x"}).status_code, 400)
+        self.assertEqual(self.client.post("/add", data="nope").status_code, 400)
+
+    def test_clicks_endpoint_returns_new_clicks(self):
+        """The polling endpoint returns clicks after the given sequence number."""
+        before = clicks.last_seq
+        self.client.post("/add", json={"latitude": 70.1, "longitude": 20.1})
+        self.client.post("/add", json={"latitude": 70.2, "longitude": 20.2})
+        data = self.client.get(f"/clicks?since={before}").get_json()
+        self.assertEqual([c["latitude"] for c in data["clicks"]], [70.1, 70.2])
+        self.assertEqual(data["last_seq"], before + 2)
+
+
+class TestMapServer(unittest.TestCase):
+    def setUp(self):
+        self.server = MapServer()
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_start_binds_ephemeral_port_and_serves(self):
+        """The server is reachable as soon as start returns."""
+        url = self.server.start()
+        self.assertNotEqual(url, "http://127.0.0.1:0")
+        response = requests.get(url, timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Click the map", response.text)
+
+    def test_repeated_start_reuses_instance(self):
+        """Starting twice returns the same server rather than binding another port."""
+        first = self.server.start()
+        thread = self.server._thread
+        self.assertEqual(self.server.start(), first)
+        self.assertIs(self.server._thread, thread)
+
+    def test_shutdown_stops_thread_and_allows_restart(self):
+        """Shutdown joins the server thread; a later start serves again."""
+        self.server.start()
+        thread = self.server._thread
+        self.server.shutdown()
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(self.server.running)
+        self.assertIsNone(self.server.url)
+        url = self.server.start()
+        self.assertEqual(requests.get(url, timeout=5).status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
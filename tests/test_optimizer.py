@@ -0,0 +1,110 @@
+"""
+Unit tests for route order optimization in optimizer.py
+"""
+
+import unittest
+import itertools
+import time
+import numpy as np
+from src.optimizer import (nearest_neighbour_path, optimize_indices, optimize_itinerary, or_opt_pass,
+                           path_length, two_opt_pass)
+from src.planner import Waypoint, Itinerary, ColumnarItinerary
+from src.utils import haversine_matrix
+
+
+def random_matrix(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return haversine_matrix(70.0 + rng.random(n) * 5, 10.0 + rng.random(n) * 30)
+
+
+def brute_force(matrix, fixed_end):
+    """Shortest path from node 0 by trying every order (small n only)."""
+    n = len(matrix)
+    middle = range(1, n - 1) if fixed_end else range(1, n)
+    best = None
+    for perm in itertools.permutations(middle):
+        path = [0, *perm] + ([n - 1] if fixed_end else [])
+        length = path_length(matrix, path)
+        if best is None or length < best:
+            best = length
+    return best
+
+
+class TestOptimizer(unittest.TestCase):
+    def test_nearest_neighbour_visits_every_node(self):
+        matrix = random_matrix(50)
+        path = nearest_neighbour_path(matrix, 0, 49)
+        self.assertEqual((path[0], path[-1]), (0, 49))
+        self.assertEqual(sorted(path.tolist()), list(range(50)))
+
+    def test_improvement_moves_never_lengthen(self):
+        """2-opt and Or-opt keep the endpoints and every node, and only ever shorten the path."""
+        matrix = random_matrix(200)
+        path = np.arange(200)
+        before = path_length(matrix, path)
+        deadline = time.perf_counter() + 10
+        self.assertTrue(two_opt_pass(matrix, path, deadline))
+        after_two_opt = path_length(matrix, path)
+        path, moved = or_opt_pass(matrix, path, deadline)
+        self.assertLess(after_two_opt, before)
+        self.assertLessEqual(path_length(matrix, path), after_two_opt)
+        self.assertEqual((path[0], path[-1]), (0, 199))
+        self.assertEqual(sorted(path.tolist()), list(range(200)))
+
+    def test_small_routes_match_brute_force(self):
+        """On tiny problems the heuristic finds the optimum (within a small tolerance)."""
+        for seed in range(5):
+            matrix = random_matrix(8, seed)
+            for fixed_end in (False, True):
+                order, converged = optimize_indices(matrix, fixed_start=True, fixed_end=fixed_end)
+                self.assertTrue(converged)
+                self.assertLessEqual(path_length(matrix, order), brute_force(matrix, fixed_end) * 1.02)
+
+    def test_fixed_and_free_endpoints(self):
+        matrix = random_matrix(60)
+        order, _ = optimize_indices(matrix, fixed_start=True, fixed_end=True)
+        self.assertEqual((order[0], order[-1]), (0, 59))
+        free, _ = optimize_indices(matrix, fixed_start=False, fixed_end=False)
+        self.assertEqual(sorted(free.tolist()), list(range(60)))
+        self.assertLess(path_length(matrix, free), path_length(matrix, np.arange(60)) * 0.5)
+
+    def test_trivial_inputs(self):
+        for n in range(4):
+            order, converged = optimize_indices(random_matrix(n), fixed_start=True, fixed_end=True)
+            self.assertEqual(order.tolist(), list(range(n)))
+
+    def test_time_budget_is_respected(self):
+        matrix = random_matrix(2000)
+        started = time.perf_counter()
+        order, converged = optimize_indices(matrix, time_budget_s=0.5)
+        self.assertLess(time.perf_counter() - started, 2.0)
+        self.assertFalse(converged)
+        self.assertEqual(sorted(order.tolist()), list(range(2000)))
+
+    def test_optimize_itinerary(self):
+        """Waypoints keep their own data, legs are recomputed and the totals are reported."""
+        lons = [20.0, 20.4, 20.1, 20.3, 20.2]
+        itinerary = Itinerary([Waypoint(f"C{i}", 70.0, lon, 0.0, 4.0, i) for i, lon in enumerate(lons)])
+        itinerary.recalculate_distances()
+        result = optimize_itinerary(itinerary)
+        self.assertEqual([wp.name for wp in result.itinerary.waypoints], ["C0", "C2", "C4", "C3", "C1"])
+        self.assertEqual([wp.altitude_m for wp in result.itinerary.waypoints], [0, 2, 4, 3, 1])
+        self.assertEqual(result.order.tolist(), [0, 2, 4, 3, 1])
+        self.assertEqual(result.itinerary.waypoints[0].distance_km, 0.0)
+        self.assertAlmostEqual(result.after_km, result.itinerary.total_distance(), places=1)
+        self.assertGreater(result.saved_km, 0)
+        self.assertEqual(result.to_dict()["after_km"], round(result.after_km, 2))
+        self.assertEqual([wp.name for wp in itinerary.waypoints], ["C0", "C1", "C2", "C3", "C4"])
+
+    def test_columnar_few_thousand_points(self):
+        """A few thousand waypoints are optimized within seconds."""
+        rng = np.random.default_rng(3)
+        itinerary = ColumnarItinerary.from_arrays(70.0 + rng.random(2000) * 5, 10.0 + rng.random(2000) * 30)
+        result = optimize_itinerary(itinerary, time_budget_s=20.0)
+        self.assertIsInstance(result.itinerary, ColumnarItinerary)
+        self.assertLess(result.seconds, 20.0)
+        self.assertLess(result.after_km, result.before_km * 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
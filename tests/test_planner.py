@@ -5,12 +5,17 @@ Unit tests for the core logic in planner.py, covering:
 
 - Waypoint: attribute handling, negative altitudes, zero-speed cases
 - Itinerary: total distance, estimated time, and dictionary export
+- Incremental leg updates and the columnar ColumnarItinerary backend
 
 Focuses on validating expedition data models and calculations.
 """
 
 import unittest
-from src.planner import Waypoint, Itinerary
+import random
+import numpy as np
+from src.distance import WGS84Engine
+from src.planner import Waypoint, Itinerary, ColumnarItinerary, WaypointView
+from src.utils import haversine_distance
 
 class TestWaypoint(unittest.TestCase):
     def test_create_waypoint(self):
@@ -66,6 +71,172 @@ class TestItinerary(unittest.TestCase):
         self.assertIn("name", data["itinerary"][0])
         self.assertEqual(data["itinerary"][2]["altitude_m"], 70)
 
+    def test_recalculate_distances(self):
+        """Whole-itinerary recompute should fill every leg from the coordinates."""
+        self.itinerary.recalculate_distances()
+        self.assertEqual(self.waypoints[0].distance_km, 0.0)
+        self.assertAlmostEqual(self.waypoints[1].distance_km,
+                               haversine_distance(70.0, 20.0, 70.1, 20.1), places=2)
+        self.assertAlmostEqual(self.waypoints[2].distance_km,
+                               haversine_distance(70.1, 20.1, 70.2, 20.2), places=2)
+
+    def test_recalculate_distances_with_engine(self):
+        """A distance engine replaces haversine for every leg; both backends round the same way."""
+        engine = WGS84Engine()
+        self.itinerary.recalculate_distances(engine)
+        self.assertEqual(self.waypoints[1].distance_km, round(engine.distance(70.0, 20.0, 70.1, 20.1), 2))
+        self.assertNotEqual(self.waypoints[1].distance_km, haversine_distance(70.0, 20.0, 70.1, 20.1))
+        columnar = ColumnarItinerary(self.waypoints)
+        columnar.recalculate_distances(engine)
+        self.assertEqual(columnar.distances.tolist(), [wp.distance_km for wp in self.waypoints])
+        self.assertAlmostEqual(self.itinerary.running_distance, self.itinerary.total_distance())
+
+
+
+class TestIncrementalLegs(unittest.TestCase):
+    itinerary_class = Itinerary
+
+    def _random_waypoint(self, rng, n):
+        return Waypoint(f"WP{n}", rng.uniform(66.0, 80.0), rng.uniform(-20.0, 40.0), 0.0,
+                        rng.choice([0.0, 4.0, 8.5, 12.0]), rng.randint(0, 900))
+
+    def _assert_matches_full_recompute(self, itinerary):
+        """Legs and running totals must equal a from-scratch recompute of a copy."""
+        copy = Itinerary([Waypoint(wp.name, wp.latitude, wp.longitude, wp.distance_km,
+                                   wp.estimated_speed_kph, wp.altitude_m) for wp in itinerary.waypoints])
+        copy.recalculate_distances()
+        for wp, expected in zip(itinerary.waypoints, copy.waypoints):
+            self.assertEqual(wp.distance_km, expected.distance_km)
+        self.assertAlmostEqual(itinerary.running_distance, copy.total_distance(), places=6)
+        self.assertAlmostEqual(itinerary.running_time, copy.estimated_time(), places=6)
+
+    def test_random_edit_sequences_match_full_recompute(self):
+        """Incremental add/insert/delete/swap must agree with a full recompute after every edit."""
+        for seed in range(5):
+            rng = random.Random(seed)
+            itinerary = self.itinerary_class([])
+            for step in range(200):
+                n = len(itinerary.waypoints)
+                op = rng.random()
+                if n < 2 or op < 0.35:
+                    itinerary.append_waypoint(self._random_waypoint(rng, step))
+                elif op < 0.5:
+                    itinerary.insert_waypoint(rng.randrange(n + 1), self._random_waypoint(rng, step))
+                elif op < 0.75:
+                    itinerary.delete_waypoint(rng.randrange(n))
+                else:
+                    i = rng.randrange(n - 1)
+                    itinerary.swap_waypoints(i, i + 1)
+                self._assert_matches_full_recompute(itinerary)
+
+    def test_only_affected_legs_are_refreshed(self):
+        """A swap touches at most the legs into and out of the two positions."""
+        itinerary = self.itinerary_class([Waypoint(f"WP{i}", 70.0 + i * 0.1, 20.0, 0.0, 10.0, 0)
+                                          for i in range(10)])
+        itinerary.recalculate_distances()
+        self.assertEqual(itinerary.swap_waypoints(4, 5), [4, 5, 6])
+        self.assertEqual(itinerary.delete_waypoint(0), [0])
+
+    def test_manual_distance_is_kept(self):
+        """Appending without recalculation keeps a manually entered leg distance."""
+        itinerary = self.itinerary_class([Waypoint("A", 70.0, 20.0, 0.0, 10.0, 0)])
+        itinerary.append_waypoint(Waypoint("B", 70.1, 20.1, 42.0, 10.0, 0), recalculate=False)
+        self.assertEqual(itinerary.waypoints[1].distance_km, 42.0)
+        self.assertAlmostEqual(itinerary.running_distance, 42.0)
+        self.assertAlmostEqual(itinerary.running_time, 4.2)
+
+    def test_extend_waypoints_in_one_batch(self):
+        """Bulk-appending a path computes its legs together and keeps totals and stats current."""
+        rng = random.Random(7)
+        itinerary = self.itinerary_class([self._random_waypoint(rng, 0)])
+        itinerary.stats()
+        path = [self._random_waypoint(rng, n) for n in range(1, 6)]
+        self.assertEqual(itinerary.extend_waypoints(path), [1, 2, 3, 4, 5])
+        self._assert_matches_full_recompute(itinerary)
+        self.assertAlmostEqual(itinerary.stats().total_distance(), itinerary.running_distance, places=6)
+        self.assertEqual(itinerary.extend_waypoints([]), [])
+
+
+
+class TestColumnarIncrementalLegs(TestIncrementalLegs):
+    """Runs the incremental edit tests against the columnar backend."""
+    itinerary_class = ColumnarItinerary
+
+
+class TestColumnarItinerary(unittest.TestCase):
+    def setUp(self):
+        """Create matching list-backed and columnar itineraries."""
+        self.waypoints = [
+            Waypoint("A", 70.0, 20.0, 0.0, 10.0, 50),
+            Waypoint("B", 70.1, 20.1, 3.0, 0.0, 60),  # zero speed leg
+            Waypoint("C", 70.2, 20.2, 5.0, 15.0, 70)
+        ]
+        self.columnar = ColumnarItinerary(self.waypoints)
+
+    def test_totals_match_list_backend(self):
+        """Totals computed on the columns should equal the object-based ones."""
+        reference = Itinerary(self.waypoints)
+        self.assertAlmostEqual(self.columnar.total_distance(), reference.total_distance())
+        self.assertAlmostEqual(self.columnar.estimated_time(), reference.estimated_time())
+
+    def test_to_dict_matches_list_backend(self):
+        """The export dictionary should be identical for both backends."""
+        self.assertEqual(self.columnar.to_dict(), Itinerary(self.waypoints).to_dict())
+
+    def test_views_read_and_write_columns(self):
+        """Waypoint views should be slot-based and write straight through to the columns."""
+        view = self.columnar.waypoints[1]
+        self.assertIsInstance(view, WaypointView)
+        self.assertFalse(hasattr(view, "__dict__"))
+        self.assertEqual(view, self.waypoints[1])
+        view.altitude_m = 75
+        view.name = "B2"
+        self.assertEqual(self.columnar.altitudes[1], 75)
+        self.assertEqual(self.columnar.names, ["A", "B2", "C"])
+        self.assertEqual(self.columnar.waypoints[-1].name, "C")
+        with self.assertRaises(IndexError):
+            self.columnar.waypoints[3]
+
+    def test_item_assignment_behaves_like_a_list(self):
+        """Assigning a waypoint by index should accept negative indexes, reject out-of-range ones and refresh totals."""
+        columnar = ColumnarItinerary(self.waypoints[:2])
+        self.assertAlmostEqual(columnar.running_distance, columnar.total_distance())
+        columnar.stats()
+        columnar.waypoints[-1] = Waypoint("End", 70.3, 20.3, 25.0, 5.0, 10)
+        self.assertEqual(len(columnar), 2)
+        self.assertEqual(columnar.waypoints[1].name, "End")
+        self.assertAlmostEqual(columnar.running_distance, self.waypoints[0].distance_km + 25.0)
+        self.assertAlmostEqual(columnar.stats().total_time(), columnar.estimated_time())
+        for index in (2, 5, -3):
+            with self.assertRaises(IndexError):
+                columnar.waypoints[index] = Waypoint("X", 70.0, 20.0, 1.0, 5.0, 0)
+        self.assertEqual(columnar.names, ["A", "End"])
+
+    def test_from_arrays_without_copy(self):
+        """Arrays with matching dtypes should be adopted as-is and distances computed when missing."""
+        lats = np.array([70.0, 70.1, 70.25])
+        lons = np.array([20.0, 20.2, 20.45])
+        columnar = ColumnarItinerary.from_arrays(lats, lons, speeds=[8.0, 10.0, 9.5])
+        self.assertTrue(np.shares_memory(columnar.latitudes, lats))
+        self.assertEqual(columnar.altitudes.dtype, np.int32)
+        self.assertEqual(columnar.distances[0], 0.0)
+        self.assertGreater(columnar.total_distance(), 0.0)
+        self.assertEqual(columnar.names, ["", "", ""])
+
+    def test_name_table_is_deduplicated(self):
+        """Repeated names should share a single name table entry."""
+        columnar = ColumnarItinerary.from_arrays([70.0] * 1000, [20.0] * 1000, names=["Track"] * 1000)
+        self.assertEqual(columnar._name_table, ["Track"])
+        self.assertEqual(len(columnar), 1000)
+
+    def test_append_grows_capacity(self):
+        """Appending many waypoints should keep every row intact across reallocations."""
+        for i in range(100):
+            self.columnar.append_waypoint(Waypoint(f"P{i}", 71.0 + i * 0.01, 21.0, 0.0, 5.0, i))
+        self.assertEqual(len(self.columnar.waypoints), 103)
+        self.assertEqual(self.columnar.waypoints[50].name, "P47")
+        self.assertEqual(self.columnar.to_itinerary().waypoints[0], self.waypoints[0])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,112 @@
+"""
+Unit tests for the level-of-detail preview map in preview.py
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from unittest.mock import patch
+from src import preview
+from src.preview import (ROUTE_TOLERANCE_M, ZOOM_BANDS, build_preview_map, downsample_polyline,
+                         itinerary_hash, render_preview_map, route_bands)
+from src.simplify import route_offsets
+
+
+def long_route(n):
+    """A dense synthetic track heading north-east."""
+    lats = np.linspace(66.0, 80.0, n)
+    lons = np.linspace(-10.0, 30.0, n) + 0.01 * np.sin(np.arange(n))
+    return [f"WP {i}" for i in range(n)], lats, lons
+
+
+class TestPreviewMap(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_downsampling_depends_on_zoom(self):
+        """Zoomed-out bands keep far fewer vertices; endpoints are always kept."""
+        _, lats, lons = long_route(20_000)
+        coarse = downsample_polyline(lats, lons, 4)
+        fine = downsample_polyline(lats, lons, 14)
+        self.assertLess(len(coarse), 2_000)
+        self.assertGreater(len(fine), 10 * len(coarse))
+        self.assertEqual((coarse[0], coarse[-1]), (0, 19_999))
+        np.testing.assert_array_equal(downsample_polyline([70.0], [20.0], 4), [0])
+
+    def test_large_route_html_stays_small(self):
+        """Markers are sent as compact cluster data and the route's coordinates are embedded once."""
+        names, lats, lons = long_route(5_000)
+        html = build_preview_map(names, lats, lons).get_root().render()
+        self.assertEqual(html.count("L.marker("), 1)  # Only inside the cluster callback
+        self.assertIn("markerClusterGroup", html)
+        self.assertEqual(html.count("L.polyline("), 1)  # Built in the browser for each band on demand
+        self.assertIn("zoomend", html)
+        self.assertEqual(html.count("var coords = "), 1)
+        self.assertEqual(html.count('"indices": '), len(ZOOM_BANDS))
+        self.assertLess(len(html), 2_000_000)
+
+    def test_bands_share_one_coordinate_array(self):
+        """Coarser bands index into the most detailed one, which stays within the tolerance."""
+        _, lats, lons = long_route(20_000)
+        lats[5_000:15_000] = np.linspace(lats[5_000], lats[15_000], 10_000)  # A straight, dense stretch
+        lons[5_000:15_000] = np.linspace(lons[5_000], lons[15_000], 10_000)
+        coordinates, bands = route_bands(lats, lons)
+        self.assertEqual([(low, high) for _, low, high in bands], ZOOM_BANDS)
+        self.assertIsNone(bands[-1][0])  # The most detailed band draws every shared coordinate
+        self.assertLess(len(coordinates), len(downsample_polyline(lats, lons, ZOOM_BANDS[-1][0])) - 9_000)
+        np.testing.assert_allclose([coordinates[0], coordinates[-1]], [[lats[0], lons[0]], [lats[-1], lons[-1]]],
+                                   atol=1e-6)
+        previous = len(coordinates)
+        for indices, _, _ in reversed(bands[:-1]):
+            self.assertTrue(np.all(np.diff(indices) > 0))
+            self.assertEqual((indices[0], indices[-1]), (0, len(coordinates) - 1))
+            self.assertLessEqual(len(indices), previous)
+            previous = len(indices)
+        # Every recorded point lies within the tolerance of the drawn route
+        shared = np.array(coordinates)
+        kept = np.searchsorted(lats, shared[:, 0] - 1e-6)  # Latitudes rise by far more than the rounding
+        np.testing.assert_allclose(lats[kept], shared[:, 0], atol=1e-6)
+        self.assertLessEqual(route_offsets(lats, lons, kept).max(), ROUTE_TOLERANCE_M + 0.5)
+
+    def test_names_are_escaped(self):
+        """Waypoint names cannot inject markup into the page."""
+        html = build_preview_map(["<script>x</script>"], [70.0], [20.0]).get_root().render()
+        self.assertNotIn("<script>x</script>", html)
+        self.assertIn("\\u0026lt;script\\u0026gt;", html)  # HTML-escaped, then JSON-encoded
+
+    def test_render_is_cached_by_content(self):
+        """Unchanged routes reuse the cached file; any change renders a new one."""
+        names, lats, lons = long_route(100)
+        with patch.object(preview, "build_preview_map", wraps=build_preview_map) as build:
+            first = render_preview_map(names, lats, lons, cache_dir=self.cache_dir)
+            second = render_preview_map(list(names), lats.copy(), lons.copy(), cache_dir=self.cache_dir)
+            self.assertEqual(first, second)
+            self.assertEqual(build.call_count, 1)
+            names[0] = "Renamed"
+            third = render_preview_map(names, lats, lons, cache_dir=self.cache_dir)
+            self.assertNotEqual(third, first)
+            self.assertEqual(build.call_count, 2)
+        self.assertTrue(os.path.exists(first) and os.path.exists(third))
+
+    def test_hash_covers_coordinates_and_names(self):
+        """The content hash changes with any coordinate or name."""
+        base = itinerary_hash(["A", "B"], [70.0, 70.1], [20.0, 20.1])
+        self.assertNotEqual(base, itinerary_hash(["A", "B"], [70.0, 70.1], [20.0, 20.2]))
+        self.assertNotEqual(base, itinerary_hash(["AB", ""], [70.0, 70.1], [20.0, 20.1]))
+        self.assertEqual(base, itinerary_hash(("A", "B"), np.array([70.0, 70.1]), [20.0, 20.1]))
+
+    def test_cache_is_pruned(self):
+        """Only the most recently used maps are kept."""
+        for i in range(4):
+            render_preview_map(["A"], [70.0 + i], [20.0], cache_dir=self.cache_dir)
+        preview._prune_cache(self.cache_dir, keep=2)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
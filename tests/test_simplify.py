@@ -0,0 +1,138 @@
+"""
+Unit tests for route simplification in simplify.py
+"""
+
+import unittest
+import time
+import numpy as np
+from src.planner import Waypoint, Itinerary, ColumnarItinerary
+from src.simplify import (RDP, VISVALINGAM, METHODS, route_offsets, simplify_indices,
+                          simplify_itinerary)
+
+
+def noisy_track(n, seed=0):
+    """A dense random-walk track heading north-east, roughly 1 m between points."""
+    steps = np.random.default_rng(seed).normal(0.0, 1e-5, (n, 2)).cumsum(axis=0)
+    lats = 70.0 + np.linspace(0.0, n * 4e-6, n) + steps[:, 0]
+    lons = 20.0 + np.linspace(0.0, n * 1e-5, n) + steps[:, 1]
+    return lats, lons
+
+
+class TestSimplifyIndices(unittest.TestCase):
+    def test_straight_line_collapses_to_endpoints(self):
+        """Collinear points add nothing, so only the two ends are kept."""
+        lats = np.full(100, 70.0)
+        lons = np.linspace(20.0, 21.0, 100)
+        for method in METHODS:
+            self.assertEqual(simplify_indices(lats, lons, tolerance_m=1.0, method=method).tolist(), [0, 99])
+
+    def test_rdp_stays_within_tolerance(self):
+        """Every removed point of an RDP simplification lies within the tolerance of the result."""
+        lats, lons = noisy_track(20_000)
+        for tolerance in (2.0, 10.0):
+            kept = simplify_indices(lats, lons, tolerance_m=tolerance, method=RDP)
+            self.assertLess(len(kept), len(lats) // 2)
+            self.assertLessEqual(route_offsets(lats, lons, kept).max(), tolerance + 1e-6)
+
+    def test_larger_tolerance_keeps_fewer_points(self):
+        lats, lons = noisy_track(20_000)
+        for method in METHODS:
+            fine = simplify_indices(lats, lons, tolerance_m=1.0, method=method)
+            coarse = simplify_indices(lats, lons, tolerance_m=20.0, method=method)
+            self.assertLess(len(coarse), len(fine))
+
+    def test_target_point_count(self):
+        """A target count is met exactly, and the ends are always among the kept points."""
+        lats, lons = noisy_track(20_000)
+        for method in METHODS:
+            kept = simplify_indices(lats, lons, target_points=500, method=method)
+            self.assertEqual(len(kept), 500)
+            self.assertEqual((kept[0], kept[-1]), (0, 19_999))
+            self.assertTrue(np.all(np.diff(kept) > 0))
+
+    def test_keep_indices_are_retained(self):
+        lats = np.full(100, 70.0)
+        lons = np.linspace(20.0, 21.0, 100)
+        for method in METHODS:
+            kept = simplify_indices(lats, lons, target_points=2, method=method, keep=[10, 50])
+            self.assertEqual(kept.tolist(), [0, 10, 50, 99])
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            simplify_indices([70.0, 70.1, 70.2], [20.0, 20.1, 20.0], tolerance_m=5.0, method="bogus")
+        with self.assertRaises(ValueError):
+            simplify_indices([70.0, 70.1, 70.2], [20.0, 20.1, 20.0])
+
+    def test_offsets_are_true_across_wide_latitudes(self):
+        """A track from 60N to 89N measures east-west offsets at each point's own latitude."""
+        lats = np.concatenate([np.linspace(60.0, 87.9, 50), [88.0], np.linspace(88.1, 89.0, 10)])
+        lons = np.zeros(61)
+        lons[50] = 3.0  # About 11.6 km east of the meridian at 88N
+        self.assertAlmostEqual(route_offsets(lats, lons, [0, 60])[50], 11_600, delta=150)
+        for method in METHODS:
+            self.assertEqual(simplify_indices(lats, lons, tolerance_m=20_000, method=method).tolist(), [0, 60])
+        self.assertIn(50, simplify_indices(lats, lons, tolerance_m=5_000, method=RDP).tolist())
+
+    def test_million_points_run_quickly(self):
+        """Both algorithms stay near-linear on very large tracks."""
+        lats, lons = noisy_track(1_000_000)
+        for method in METHODS:
+            started = time.perf_counter()
+            kept = simplify_indices(lats, lons, tolerance_m=5.0, method=method)
+            self.assertLess(time.perf_counter() - started, 30.0)
+            self.assertLess(len(kept), 100_000)
+
+
+class TestSimplifyItinerary(unittest.TestCase):
+    def setUp(self):
+        """A straight 50-point track with named points at the ends and in the middle."""
+        self.track = [Waypoint("", 70.0, 20.0 + i * 0.001, 0.0, 5.0, i) for i in range(50)]
+        self.track[0].name, self.track[20].name, self.track[-1].name = "Start", "Depot", "End"
+        self.itinerary = Itinerary(self.track)
+        self.itinerary.recalculate_distances()
+
+    def test_named_waypoints_are_preserved(self):
+        result = simplify_itinerary(self.itinerary, tolerance_m=5.0)
+        self.assertEqual([wp.name for wp in result.itinerary.waypoints], ["Start", "Depot", "End"])
+        self.assertEqual([wp.altitude_m for wp in result.itinerary.waypoints], [0, 20, 49])
+        self.assertEqual(result.kept_indices.tolist(), [0, 20, 49])
+        self.assertEqual((result.original_points, result.kept_points), (50, 3))
+
+    def test_named_waypoints_can_be_dropped(self):
+        result = simplify_itinerary(self.itinerary, tolerance_m=5.0, preserve_named=False)
+        self.assertEqual([wp.name for wp in result.itinerary.waypoints], ["Start", "End"])
+
+    def test_distances_and_error_report(self):
+        """Leg distances are recomputed and the report measures what the simplification cost."""
+        result = simplify_itinerary(self.itinerary, tolerance_m=5.0)
+        self.assertAlmostEqual(result.itinerary.total_distance(), result.original_distance_km, places=1)
+        self.assertAlmostEqual(result.distance_error_km, 0.0, places=3)
+        self.assertLess(result.max_offset_m, 0.5)
+        self.assertEqual(result.itinerary.waypoints[0].distance_km, 0.0)
+        self.assertEqual(result.to_dict()["kept_points"], 3)
+
+        bent = Itinerary([Waypoint("A", 70.0, 20.0, 0, 5, 0), Waypoint("", 70.01, 20.05, 0, 5, 0),
+                          Waypoint("B", 70.0, 20.1, 0, 5, 0)])
+        result = simplify_itinerary(bent, tolerance_m=5000.0)
+        self.assertEqual(result.kept_points, 2)
+        self.assertGreater(result.distance_error_km, 0.0)
+        self.assertAlmostEqual(result.max_offset_m, 1112, delta=5)
+
+    def test_original_is_untouched(self):
+        simplify_itinerary(self.itinerary, tolerance_m=5.0)
+        self.assertEqual(len(self.itinerary.waypoints), 50)
+
+    def test_columnar_input_gives_columnar_result(self):
+        lats, lons = noisy_track(5000)
+        names = [""] * 5000
+        names[1234] = "Cache"
+        itinerary = ColumnarItinerary.from_arrays(lats, lons, names=names)
+        result = simplify_itinerary(itinerary, target_points=100, method=VISVALINGAM)
+        self.assertIsInstance(result.itinerary, ColumnarItinerary)
+        self.assertEqual(len(result.itinerary), 100)
+        self.assertIn("Cache", result.itinerary.names)
+        self.assertAlmostEqual(result.itinerary.total_distance(), result.simplified_distance_km, places=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Unit tests for the spherical spatial index in spatial_index.py
+"""
+
+import unittest
+import numpy as np
+from src.spatial_index import SpatialIndex, near_duplicates, unit_vectors, REBUILD_MIN_PENDING
+from src.utils import haversine_matrix
+
+
+class TestSpatialIndex(unittest.TestCase):
+    def setUp(self):
+        """Scattered Arctic points, including some either side of the antimeridian."""
+        rng = np.random.default_rng(1)
+        self.lats = 60.0 + rng.random(5000) * 30
+        self.lons = -180.0 + rng.random(5000) * 360
+        self.index = SpatialIndex.from_coordinates(self.lats, self.lons)
+
+    def distances(self, lat, lon):
+        return haversine_matrix([lat], [lon], self.lats, self.lons)[0]
+
+    def test_nearest_matches_brute_force(self):
+        for lat, lon in [(70.0, 20.0), (89.9, 0.0), (65.0, 179.99), (65.0, -179.99)]:
+            expected = np.argsort(self.distances(lat, lon))[:5]
+            matches = self.index.nearest(lat, lon, k=5)
+            self.assertEqual([m.key for m in matches], expected.tolist())
+            self.assertAlmostEqual(matches[0].distance_km, self.distances(lat, lon)[expected[0]], places=6)
+
+    def test_nearest_with_max_distance(self):
+        self.assertEqual(self.index.nearest(0.0, 0.0, max_distance_km=100), [])
+        self.assertEqual(len(self.index.nearest(0.0, 0.0, k=3)), 3)
+
+    def test_within_matches_brute_force(self):
+        d = self.distances(75.0, -170.0)
+        matches = self.index.within(75.0, -170.0, 150)
+        self.assertEqual(sorted(m.key for m in matches), np.flatnonzero(d <= 150).tolist())
+        self.assertEqual([m.distance_km for m in matches], sorted(m.distance_km for m in matches))
+
+    def test_along_leg_finds_points_near_the_great_circle(self):
+        """A leg along a meridian: the corridor is a band of longitude, capped at both ends."""
+        index = SpatialIndex.from_coordinates([70.0, 71.0, 72.0, 69.0, 71.0, 73.5],
+                                              [20.0, 20.1, 19.95, 20.0, 23.0, 20.0],
+                                              keys=["a", "b", "c", "before", "far", "after"])
+        matches = index.along_leg(70.0, 20.0, 73.0, 20.0, 5.0)
+        self.assertEqual([m.key for m in matches], ["a", "c", "b"])
+        self.assertAlmostEqual(matches[2].distance_km, 3.62, places=2)  # 0.1 degrees of longitude at 71N
+        wide = index.along_leg(70.0, 20.0, 73.0, 20.0, 120.0)
+        self.assertEqual({m.key for m in wide}, {"a", "b", "c", "before", "far", "after"})
+
+    def test_along_leg_matches_dense_sampling(self):
+        """Sample the leg densely (slerp) and measure every point against the samples."""
+        a, b = (70.0, 10.0), (75.0, 40.0)
+        index = SpatialIndex.from_coordinates(self.lats, self.lons)
+        t = np.linspace(0.0, 1.0, 2001)[:, None]
+        va, vb = unit_vectors([a[0], b[0]], [a[1], b[1]])
+        omega = np.arccos(va @ vb)
+        samples = (np.sin((1 - t) * omega) * va + np.sin(t * omega) * vb) / np.sin(omega)
+        sample_lats = np.degrees(np.arcsin(samples[:, 2]))
+        sample_lons = np.degrees(np.arctan2(samples[:, 1], samples[:, 0]))
+        nearest = haversine_matrix(self.lats, self.lons, sample_lats, sample_lons).min(axis=1)
+        found = {m.key for m in index.along_leg(*a, *b, 100.0)}
+        self.assertTrue(set(np.flatnonzero(nearest <= 99.9).tolist()) <= found)
+        self.assertTrue(found <= set(np.flatnonzero(nearest <= 100.1).tolist()))
+
+    def test_incremental_edits(self):
+        """Inserts and removals are visible to the next query, before and after a rebuild."""
+        nearest = self.index.nearest(70.0, 20.0)[0].key
+        self.index.insert("new", 70.0, 20.0)
+        self.assertEqual(self.index.nearest(70.0, 20.0)[0].key, "new")
+        self.assertTrue(self.index.remove("new"))
+        self.assertFalse(self.index.remove("new"))
+        self.assertEqual(self.index.nearest(70.0, 20.0)[0].key, nearest)
+        self.index.remove(nearest)
+        self.assertNotIn(nearest, self.index)
+        self.assertNotEqual(self.index.nearest(70.0, 20.0)[0].key, nearest)
+        # Enough inserts to force a rebuild of the tree
+        keys = [f"p{i}" for i in range(REBUILD_MIN_PENDING * 20)]
+        self.index.insert_many(keys, np.full(len(keys), 80.0), np.linspace(0.0, 1.0, len(keys)))
+        self.assertEqual(len(self.index), 5000 - 1 + len(keys))
+        self.assertEqual(self.index.nearest(80.0, 0.0)[0].key, "p0")
+        self.assertEqual([m.key for m in self.index.within(80.0, 0.0, 0.02)], ["p0", "p1"])
+
+    def test_reinserting_a_key_moves_it(self):
+        index = SpatialIndex()
+        index.insert("camp", 70.0, 20.0)
+        index.insert("camp", 71.0, 21.0)
+        self.assertEqual(len(index), 1)
+        self.assertAlmostEqual(index.nearest(71.0, 21.0)[0].distance_km, 0.0)
+        self.assertEqual(index.within(70.0, 20.0, 1.0), [])
+        with self.assertRaises(ValueError):
+            index.insert_many(["a", "a"], [0, 0], [0, 0])
+
+    def test_empty_index(self):
+        index = SpatialIndex()
+        self.assertEqual(index.nearest(70.0, 20.0), [])
+        self.assertEqual(index.within(70.0, 20.0, 10.0), [])
+        self.assertEqual(index.along_leg(70.0, 20.0, 71.0, 20.0, 10.0), [])
+
+
+class TestNearDuplicates(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(2)
+        lats = 70.0 + np.cumsum(rng.normal(0, 1e-5, 2000))
+        lons = 20.0 + np.cumsum(rng.normal(0, 1e-5, 2000))
+        metres = haversine_matrix(lats, lons) * 1000
+        expected = [j for j in range(len(lats)) if (metres[j, :j] <= 1.0).any()]
+        self.assertEqual(near_duplicates(lats, lons, 1.0).tolist(), expected)
+
+    def test_loop_back_to_start(self):
+        """Only the later of two coincident points is reported."""
+        lats = [70.0, 70.1, 70.1, 70.0]
+        lons = [20.0, 20.0, 20.2, 20.000001]
+        self.assertEqual(near_duplicates(lats, lons).tolist(), [3])
+        self.assertEqual(near_duplicates([70.0], [20.0]).tolist(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
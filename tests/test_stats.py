@@ -0,0 +1,118 @@
+"""
+Unit tests for the prefix-sum statistics index in stats.py
+"""
+
+import unittest
+import random
+import numpy as np
+from src.planner import Waypoint, Itinerary, ColumnarItinerary
+from src.stats import FenwickTree, ItineraryStats
+
+class TestFenwickTree(unittest.TestCase):
+    def test_prefix_and_range_sums(self):
+        """Prefix and range sums should match plain NumPy sums after updates and appends."""
+        rng = np.random.default_rng(3)
+        values = rng.uniform(0, 10, (37, 2))
+        tree = FenwickTree(values)
+        for _ in range(50):
+            i = int(rng.integers(0, len(values)))
+            values[i] = rng.uniform(0, 10, 2)
+            tree.set(i, values[i])
+        for extra in rng.uniform(0, 10, (40, 2)):
+            values = np.vstack([values, extra])
+            tree.append(extra)
+        for count in range(len(values) + 1):
+            np.testing.assert_allclose(tree.prefix_sum(count), values[:count].sum(axis=0), atol=1e-9)
+        np.testing.assert_allclose(tree.range_sum(10, 30), values[10:30].sum(axis=0), atol=1e-9)
+
+    def test_pop_and_search(self):
+        """Popping drops the last value; search finds the last prefix within a target."""
+        tree = FenwickTree([1.0, 2.0, 3.0, 4.0])
+        tree.pop()
+        self.assertEqual(tree.prefix_sum(10)[0], 6.0)
+        self.assertEqual(tree.search(0, 3.0), 2)
+        self.assertEqual(tree.search(0, 2.9), 1)
+        self.assertEqual(tree.search(0, 100.0), 3)
+
+
+class TestItineraryStats(unittest.TestCase):
+    def setUp(self):
+        """Route of five legs, each 10 km at 5 kph (2 hours), climbing then descending."""
+        altitudes = [0, 100, 250, 200, 50, 80]
+        self.itinerary = Itinerary([
+            Waypoint(f"WP{i}", 70.0 + i * 0.1, 20.0, 0.0 if i == 0 else 10.0, 5.0, alt)
+            for i, alt in enumerate(altitudes)
+        ])
+        self.stats = ItineraryStats(self.itinerary)
+
+    def test_cumulative_values(self):
+        """Cumulative distance and time at each waypoint."""
+        self.assertEqual(self.stats.cumulative_distance(0), 0.0)
+        self.assertEqual(self.stats.cumulative_distance(3), 30.0)
+        self.assertEqual(self.stats.cumulative_time(5), 10.0)
+        distances, times = self.stats.cumulative()
+        self.assertEqual(list(distances), [0.0, 10.0, 20.0, 30.0, 40.0, 50.0])
+
+    def test_range_stats(self):
+        """Range queries cover the legs between two waypoints, including climb and descent."""
+        stats = self.stats.range_stats(1, 4)
+        self.assertEqual(stats.distance_km, 30.0)
+        self.assertEqual(stats.time_hours, 6.0)
+        self.assertEqual(stats.ascent_m, 150.0)
+        self.assertEqual(stats.descent_m, 200.0)
+        with self.assertRaises(IndexError):
+            self.stats.range_stats(4, 1)
+
+    def test_daily_stages(self):
+        """Days should end at the last waypoint reachable within the daily limit."""
+        stages = self.stats.daily_stages(max_hours_per_day=5.0)
+        self.assertEqual([(s.start_index, s.end_index) for s in stages], [(0, 2), (2, 4), (4, 5)])
+        self.assertEqual([s.day for s in stages], [1, 2, 3])
+        self.assertAlmostEqual(sum(s.distance_km for s in stages), 50.0)
+
+    def test_daily_stages_long_leg(self):
+        """A leg longer than a day becomes its own stage and is flagged."""
+        stages = self.stats.daily_stages(max_hours_per_day=1.5)
+        self.assertEqual(len(stages), 5)
+        self.assertTrue(all(s.over_limit for s in stages))
+
+    def test_summary(self):
+        """Summary should be serializable and include the stages."""
+        summary = self.stats.summary(6.0)
+        self.assertEqual(summary["total_distance_km"], 50.0)
+        self.assertEqual(len(summary["daily_stages"]), 2)
+        self.assertEqual(summary["daily_stages"][0]["end_index"], 3)
+
+    def test_index_follows_incremental_edits(self):
+        """The maintained index should equal a fresh rebuild after random edits."""
+        for itinerary_class in (Itinerary, ColumnarItinerary):
+            rng = random.Random(11)
+            itinerary = itinerary_class([])
+            for step in range(150):
+                n = len(itinerary.waypoints)
+                op = rng.random()
+                wp = Waypoint(f"WP{step}", rng.uniform(68, 75), rng.uniform(10, 30), 0.0,
+                              rng.choice([0.0, 6.0, 9.0]), rng.randint(0, 1200))
+                if n < 2 or op < 0.4:
+                    itinerary.append_waypoint(wp)
+                elif op < 0.5:
+                    itinerary.insert_waypoint(rng.randrange(n), wp)
+                elif op < 0.6:
+                    itinerary.delete_waypoint(n - 1)
+                elif op < 0.7:
+                    itinerary.delete_waypoint(rng.randrange(n))
+                else:
+                    i = rng.randrange(n - 1)
+                    itinerary.swap_waypoints(i, i + 1)
+
+                maintained = itinerary.stats()
+                fresh = ItineraryStats(itinerary)
+                self.assertEqual(len(maintained), len(itinerary.waypoints))
+                np.testing.assert_allclose(maintained.tree.prefix_sum(len(fresh)),
+                                           fresh.tree.prefix_sum(len(fresh)), atol=1e-6)
+                if len(itinerary.waypoints) > 1:
+                    self.assertEqual(len(maintained.daily_stages(10.0)), len(fresh.daily_stages(10.0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Unit tests for the background task runner in tasks.py
+"""
+
+import unittest
+import threading
+from src.tasks import TaskRunner, TaskCancelled, DONE, FAILED, CANCELLED
+
+class FakeRoot:
+    """Records root.after calls so scheduled polls can be run by hand."""
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, func):
+        self.scheduled.append(func)
+
+    def run_scheduled(self):
+        pending, self.scheduled = self.scheduled, []
+        for func in pending:
+            func()
+
+
+class TestTaskRunner(unittest.TestCase):
+    def setUp(self):
+        self.runner = TaskRunner(max_workers=2)
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def test_result_delivered_on_poll(self):
+        """Results reach on_done only when the main thread polls."""
+        results = []
+        task = self.runner.submit(lambda task, x: x * 2, 21, on_done=results.append)
+        task.wait(5)
+        self.assertEqual(task.status, DONE)
+        self.assertEqual(results, [])
+        self.runner.poll()
+        self.assertEqual(results, [42])
+
+    def test_callbacks_run_on_polling_thread(self):
+        """Callbacks should run on the thread that polls, never on a worker."""
+        threads = []
+        self.runner.submit(lambda task: None, on_done=lambda _: threads.append(threading.current_thread()))
+        self.runner.wait_all(5)
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def test_progress_reporting(self):
+        """Progress reports should be forwarded in order."""
+        seen = []
+
+        def job(task):
+            for i in range(1, 5):
+                task.report_progress(i / 4, f"step {i}")
+
+        self.runner.submit(job, on_progress=lambda task: seen.append(task.message))
+        self.runner.wait_all(5)
+        self.assertEqual(seen[-1], "step 4")
+        self.assertEqual(len(seen), 4)
+
+    def test_errors_reach_on_error(self):
+        """Exceptions raised by a job are handed to on_error."""
+        errors = []
+
+        def job(task):
+            raise ValueError("boom")
+
+        task = self.runner.submit(job, on_error=errors.append)
+        self.runner.wait_all(5)
+        self.assertEqual(task.status, FAILED)
+        self.assertEqual(str(errors[0]), "boom")
+
+    def test_cancellation(self):
+        """A cancelled job stops at its next progress report and never calls on_done."""
+        started = threading.Event()
+        release = threading.Event()
+        done = []
+
+        def job(task):
+            started.set()
+            release.wait(5)
+            task.report_progress(0.5)
+            return "finished"
+
+        task = self.runner.submit(job, on_done=done.append)
+        started.wait(5)
+        self.runner.cancel_all()
+        release.set()
+        self.runner.wait_all(5)
+        self.assertEqual(task.status, CANCELLED)
+        self.assertEqual(done, [])
+        with self.assertRaises(TaskCancelled):
+            task.check_cancelled()
+
+    def test_duplicate_requests_are_coalesced(self):
+        """Submitting the same key while the job runs returns the running task."""
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def job(task):
+            calls.append(1)
+            release.wait(5)
+            return "map.html"
+
+        first = self.runner.submit(job, key="preview", on_done=results.append)
+        second = self.runner.submit(job, key="preview", on_done=results.append)
+        self.assertIs(first, second)
+        release.set()
+        self.runner.wait_all(5)
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ["map.html"])
+
+        third = self.runner.submit(job, key="preview")
+        self.assertIsNot(third, first)
+        self.runner.wait_all(5)
+
+    def test_attach_polls_through_root_after(self):
+        """Once attached, results arrive through callbacks scheduled with root.after."""
+        root = FakeRoot()
+        results = []
+        self.runner.attach(root)
+        task = self.runner.submit(lambda task: "ok", on_done=results.append)
+        task.wait(5)
+        root.run_scheduled()
+        self.assertEqual(results, ["ok"])
+        self.assertEqual(len(root.scheduled), 1)  # Polling reschedules itself
+
+
+if __name__ == '__main__':
+    unittest.main()
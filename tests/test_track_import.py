@@ -0,0 +1,167 @@
+"""
+Unit tests for GPX and KML track import in track_import.py
+"""
+
+import unittest
+import os
+import tempfile
+from unittest.mock import patch
+from src import track_import
+from src.distance import EquirectangularEngine
+from src.planner import ColumnarItinerary
+from src.track_import import TrackPoint, is_track_file, iter_track_points, load_track
+from src.utils import haversine_distance
+
+GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <metadata><name>Spring traverse</name></metadata>
+  <wpt lat="69.65" lon="18.95"><ele>12.4</ele><name>Tromsø</name></wpt>
+  <trk>
+    <name>Day 1</name>
+    <trkseg>
+      <trkpt lat="69.70" lon="19.00"><ele>20.6</ele><time>2025-03-01T10:00:00Z</time></trkpt>
+      <trkpt lat="69.71" lon="19.02"><time>2025-03-01T10:05:00Z</time></trkpt>
+      <trkpt lat="69.72" lon="19.04"><ele> 35 </ele></trkpt>
+    </trkseg>
+  </trk>
+</gpx>
+"""
+
+KML = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2">
+  <Document>
+    <name>Plan</name>
+    <Placemark>
+      <name>Depot</name>
+      <Point><coordinates>19.5,70.1,150</coordinates></Point>
+    </Placemark>
+    <Placemark>
+      <name>Approach</name>
+      <LineString>
+        <coordinates>
+          19.6,70.2,160 19.7,70.3
+          19.8,70.4,180
+        </coordinates>
+      </LineString>
+    </Placemark>
+    <Placemark>
+      <gx:Track>
+        <when>2025-03-01T10:00:00Z</when>
+        <gx:coord>19.9 70.5 200</gx:coord>
+        <gx:coord>20.0 70.6 210</gx:coord>
+      </gx:Track>
+    </Placemark>
+  </Document>
+</kml>
+"""
+
+
+class TestTrackImport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.tmpdir):
+            os.remove(os.path.join(self.tmpdir, name))
+        os.rmdir(self.tmpdir)
+
+    def _write(self, name, text):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_gpx_points_in_file_order(self):
+        """Track points are read in order, with elevations where given; standalone waypoints are left out."""
+        points = list(iter_track_points(self._write("trip.gpx", GPX)))
+        self.assertEqual(points, [
+            TrackPoint("", 69.70, 19.00, 20.6),
+            TrackPoint("", 69.71, 19.02, None),
+            TrackPoint("", 69.72, 19.04, 35.0),
+        ])
+
+    def test_gpx_waypoints_only_without_a_track(self):
+        """A file of nothing but waypoints imports them; a route is used like a track."""
+        trk_start, trk_end = GPX.index("<trk>"), GPX.index("</trk>") + len("</trk>")
+        waypoints_only = GPX[:trk_start] + '<wpt lat="69.80" lon="19.10"><name>Cache</name></wpt>' + GPX[trk_end:]
+        self.assertEqual(list(iter_track_points(self._write("pois.gpx", waypoints_only))), [
+            TrackPoint("Tromsø", 69.65, 18.95, 12.4),
+            TrackPoint("Cache", 69.80, 19.10, None),
+        ])
+        route = GPX.replace("trkpt", "rtept").replace("<trkseg>", "").replace("</trkseg>", "")
+        route = route.replace("<trk>", "<rte>").replace("</trk>", "</rte>")
+        self.assertEqual([p.latitude for p in iter_track_points(self._write("route.gpx", route))],
+                         [69.70, 69.71, 69.72])
+
+    def test_kml_points_lines_and_tracks(self):
+        """Only Point placemarks carry their name; line vertices and gx:Track samples are unnamed."""
+        points = list(iter_track_points(self._write("plan.kml", KML)))
+        self.assertEqual(points, [
+            TrackPoint("Depot", 70.1, 19.5, 150.0),
+            TrackPoint("", 70.2, 19.6, 160.0),
+            TrackPoint("", 70.3, 19.7, None),
+            TrackPoint("", 70.4, 19.8, 180.0),
+            TrackPoint("", 70.5, 19.9, 200.0),
+            TrackPoint("", 70.6, 20.0, 210.0),
+        ])
+
+    def test_load_track_builds_itinerary(self):
+        """Leg distances are computed from the coordinates and missing elevations become 0."""
+        itinerary = load_track(self._write("trip.gpx", GPX), speed_kph=4.0)
+        waypoints = itinerary.waypoints
+        self.assertEqual([wp.altitude_m for wp in waypoints], [21, 0, 35])
+        self.assertEqual(waypoints[0].distance_km, 0.0)
+        self.assertAlmostEqual(waypoints[1].distance_km, haversine_distance(69.70, 19.00, 69.71, 19.02), places=2)
+        self.assertTrue(all(wp.estimated_speed_kph == 4.0 for wp in waypoints))
+        self.assertAlmostEqual(itinerary.total_distance(), sum(wp.distance_km for wp in waypoints))
+
+    def test_load_track_with_distance_engine(self):
+        itinerary = load_track(self._write("trip.gpx", GPX), engine=EquirectangularEngine())
+        self.assertAlmostEqual(itinerary.waypoints[1].distance_km,
+                               EquirectangularEngine().distance(69.70, 19.00, 69.71, 19.02), places=9)
+
+    def test_load_track_columnar(self):
+        path = self._write("plan.kml", KML)
+        columnar = load_track(path, columnar=True)
+        self.assertIsInstance(columnar, ColumnarItinerary)
+        self.assertEqual(len(columnar), 6)
+        self.assertEqual(columnar.names[0], "Depot")
+        self.assertAlmostEqual(columnar.total_distance(), load_track(path).total_distance())
+
+    def test_chunk_boundaries_do_not_split_values(self):
+        """Coordinates and text cut across parser chunks are reassembled."""
+        coords = " ".join(f"{20 + i * 0.001:.3f},{70 + i * 0.001:.3f},{i}" for i in range(500))
+        kml = KML.replace("19.6,70.2,160 19.7,70.3\n          19.8,70.4,180", coords)
+        path = self._write("long.kml", kml)
+        expected = list(iter_track_points(path))
+        with patch.object(track_import, "CHUNK_SIZE", 7):
+            self.assertEqual(list(iter_track_points(path)), expected)
+        self.assertEqual(len(expected), 503)
+        self.assertEqual(expected[500], TrackPoint("", 70.499, 20.499, 499.0))
+
+    def test_progress_reports_bytes(self):
+        path = self._write("trip.gpx", GPX)
+        calls = []
+        with patch.object(track_import, "CHUNK_SIZE", 100):
+            load_track(path, progress=lambda done, total: calls.append((done, total)))
+        size = os.path.getsize(path)
+        self.assertGreater(len(calls), 3)
+        self.assertEqual(calls[-1], (size, size))
+        self.assertEqual(calls, sorted(calls))
+
+    def test_invalid_files(self):
+        with self.assertRaises(ValueError):
+            list(iter_track_points(self._write("broken.gpx", GPX[:300])))
+        with self.assertRaises(ValueError):
+            list(iter_track_points(self._write("nolat.gpx", GPX.replace('lat="69.71" ', ""))))
+        with self.assertRaises(ValueError):
+            list(iter_track_points(self._write("bad.kml", KML.replace("19.5,70.1,150", "19.5"))))
+
+    def test_is_track_file(self):
+        self.assertTrue(is_track_file("Run.GPX"))
+        self.assertTrue(is_track_file("plan.kml"))
+        self.assertFalse(is_track_file("plan.json"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Unit tests for the travel-time models in travel_time.py
+"""
+
+import unittest
+import numpy as np
+from unittest.mock import patch
+from src.planner import Waypoint, Itinerary, ColumnarItinerary
+from src.travel_time import (FlatModel, LegTimeCache, PROFILES, SPEED_MODELS, TerrainModel, get_speed_model,
+                             leg_climbs)
+
+
+def glacier_route(n=6):
+    """Legs of 2 km at 4 km/h, climbing 200 m each up to the midpoint and descending after it."""
+    altitudes = [200 * min(i, n - 1 - i) for i in range(n)]
+    return [Waypoint(f"C{i}", 78.0 + i * 0.018, 15.0, 0.0 if i == 0 else 2.0, 4.0, altitudes[i]) for i in range(n)]
+
+
+class TestSpeedModels(unittest.TestCase):
+    def test_foot_profile_is_tobler(self):
+        slopes = np.array([-0.3, -0.05, 0.0, 0.1, 0.25])
+        tobler = 6 * np.exp(-3.5 * np.abs(slopes + 0.05))
+        np.testing.assert_allclose(PROFILES["foot"].speed_factors(slopes), tobler / tobler[2])
+
+    def test_profiles_keep_flat_speed_and_slow_down_uphill(self):
+        for profile in PROFILES.values():
+            factors = profile.speed_factors([0.0, 0.05, 0.2, -0.05, -0.6])
+            self.assertAlmostEqual(factors[0], 1.0, msg=profile.name)
+            self.assertTrue(factors[2] < factors[1] < 1.0, profile.name)
+            self.assertGreater(factors[3], 1.0, profile.name)
+            self.assertLess(factors[4], factors[3], profile.name)
+            self.assertGreaterEqual(factors.min(), profile.min_factor)
+        # Hauling a sled up a 15% slope is slower than walking or skinning it
+        up = {name: PROFILES[name].speed_factors([0.15])[0] for name in PROFILES}
+        self.assertLess(up["sled"], up["ski"])
+        self.assertLess(up["ski"], up["foot"])
+
+    def test_leg_hours(self):
+        distances = np.array([0.0, 2.0, 2.0, 0.0, 3.0])
+        speeds = np.array([4.0, 4.0, 0.0, 4.0, 6.0])
+        climbs = leg_climbs([0, 400, 400, 500, 500])
+        np.testing.assert_allclose(FlatModel().leg_hours(distances, speeds, climbs), [0.0, 0.5, 0.0, 0.0, 0.5])
+        hours = TerrainModel("foot").leg_hours(distances, speeds, climbs)
+        self.assertGreater(hours[1], 0.5 * 2)  # A 20% climb more than doubles the time
+        self.assertEqual((hours[0], hours[2], hours[3]), (0.0, 0.0, 0.0))
+        self.assertAlmostEqual(hours[4], 0.5)
+        self.assertEqual(set(SPEED_MODELS), {"flat", "foot", "ski", "sled"})
+        with self.assertRaises(ValueError):
+            get_speed_model("snowmobile")
+
+
+class TestLegTimeCache(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.distances = rng.uniform(0.5, 5.0, 1000)
+        self.speeds = np.full(1000, 4.0)
+        self.altitudes = rng.integers(0, 1500, 1000).astype(np.float64)
+        self.model = TerrainModel("ski")
+        self.cache = LegTimeCache(self.model)
+
+    def expected(self, distances, speeds, altitudes):
+        return self.model.leg_hours(distances, speeds, leg_climbs(altitudes))
+
+    def test_only_changed_legs_are_evaluated(self):
+        self.cache.hours(self.distances, self.speeds, self.altitudes)
+        self.assertEqual(self.cache.evaluated, 1000)
+        self.cache.hours(self.distances, self.speeds, self.altitudes)
+        self.assertEqual(self.cache.evaluated, 1000)
+
+        # A new altitude changes the legs into and out of that waypoint
+        self.altitudes[500] += 100
+        hours = self.cache.hours(self.distances, self.speeds, self.altitudes)
+        self.assertEqual(self.cache.evaluated, 1002)
+        np.testing.assert_array_equal(hours, self.expected(self.distances, self.speeds, self.altitudes))
+
+    def test_inserts_and_deletes_reuse_head_and_tail(self):
+        self.cache.hours(self.distances, self.speeds, self.altitudes)
+        distances = np.insert(self.distances, 300, 1.0)
+        speeds = np.insert(self.speeds, 300, 4.0)
+        altitudes = np.insert(self.altitudes, 300, 700.0)
+        distances[301] = 1.5  # The leg out of the new waypoint changes as well
+        hours = self.cache.hours(distances, speeds, altitudes)
+        self.assertEqual(self.cache.evaluated, 1002)
+        np.testing.assert_array_equal(hours, self.expected(distances, speeds, altitudes))
+
+        hours = self.cache.hours(np.delete(distances, [300]), np.delete(speeds, [300]), np.delete(altitudes, [300]))
+        self.assertLessEqual(self.cache.evaluated, 1004)
+        self.assertEqual(len(hours), 1000)
+
+
+class TestItineraryTravelTime(unittest.TestCase):
+    def test_uphill_legs_take_longer(self):
+        flat = Itinerary(glacier_route())
+        terrain = Itinerary(glacier_route(), speed_model=get_speed_model("foot"))
+        self.assertAlmostEqual(flat.estimated_time(), 2.5)
+        legs = terrain.leg_times()
+        self.assertAlmostEqual(legs[1], 0.5 / np.exp(-0.35))  # Tobler: 10% up is 0.705 of flat speed
+        self.assertAlmostEqual(legs[5], 0.5)  # ... and 10% down is as fast as flat ground
+        self.assertGreater(terrain.estimated_time(), flat.estimated_time())
+        self.assertAlmostEqual(terrain.stats().total_time(), terrain.estimated_time())
+        self.assertEqual(terrain.stats().summary()["speed_model"], "foot")
+        self.assertEqual(flat.stats().summary()["speed_model"], "flat")
+
+    def test_edits_keep_totals_consistent(self):
+        """Running totals and the stats index stay equal to a full recompute after every edit."""
+        for cls in (Itinerary, ColumnarItinerary):
+            itinerary = cls(glacier_route(), speed_model=get_speed_model("sled"))
+            itinerary.stats()
+            itinerary.insert_waypoint(2, Waypoint("Depot", 78.03, 15.2, 0.0, 3.0, 650))
+            itinerary.swap_waypoints(1, 4)
+            itinerary.delete_waypoint(3)
+            itinerary.append_waypoint(Waypoint("End", 78.2, 15.0, 0.0, 4.0, 0))
+            fresh = cls([Waypoint(wp.name, wp.latitude, wp.longitude, wp.distance_km, wp.estimated_speed_kph,
+                                  wp.altitude_m) for wp in itinerary.waypoints], speed_model=get_speed_model("sled"))
+            self.assertAlmostEqual(itinerary.running_time, fresh.estimated_time(), msg=cls.__name__)
+            self.assertAlmostEqual(itinerary.stats().total_time(), fresh.estimated_time(), msg=cls.__name__)
+
+    def test_edits_only_time_the_legs_they_touch(self):
+        """With a speed model, running_time follows edits without re-timing the whole route."""
+        for cls in (Itinerary, ColumnarItinerary):
+            itinerary = cls(glacier_route(40), speed_model=get_speed_model("foot"))
+            itinerary.running_time
+            with patch.object(cls, "leg_times", side_effect=AssertionError("full recompute")), \
+                    patch.object(itinerary.speed_model, "leg_hours", wraps=itinerary.speed_model.leg_hours) as model:
+                itinerary.insert_waypoint(5, Waypoint("Depot", 78.1, 15.2, 0.0, 3.0, 650))
+                itinerary.swap_waypoints(10, 30)
+                itinerary.delete_waypoint(20)
+                itinerary.extend_waypoints([Waypoint("Top", 78.8, 15.0, 0.0, 4.0, 900),
+                                            Waypoint("End", 78.9, 15.1, 0.0, 4.0, 0)])
+                running = itinerary.running_time
+                self.assertLessEqual(max(len(call.args[0]) for call in model.call_args_list), 4)
+            self.assertAlmostEqual(running, itinerary.estimated_time(), msg=cls.__name__)
+
+    def test_switching_models(self):
+        itinerary = ColumnarItinerary(glacier_route())
+        self.assertAlmostEqual(itinerary.running_time, 2.5)
+        itinerary.set_speed_model(get_speed_model("ski"))
+        self.assertGreater(itinerary.running_time, 2.5)
+        self.assertEqual(itinerary.to_itinerary().speed_model, itinerary.speed_model)
+        self.assertAlmostEqual(ColumnarItinerary.from_itinerary(itinerary).estimated_time(),
+                               itinerary.estimated_time())
+        itinerary.set_speed_model(None)
+        self.assertAlmostEqual(itinerary.running_time, 2.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
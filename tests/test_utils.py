@@ -4,7 +4,9 @@ Unit tests for utility functions in utils.py
 """
 
 import unittest
-from src.utils import is_valid_coordinate, haversine_distance, format_coords
+import numpy as np
+from src.utils import (is_valid_coordinate, haversine_distance, format_coords,
+                       haversine_distances, haversine_matrix, haversine_matrix_chunks)
 
 class TestUtils(unittest.TestCase):
     def test_is_valid_coordinate(self):
@@ -29,5 +31,45 @@ class TestUtils(unittest.TestCase):
         self.assertGreater(dist, 1.0)
         self.assertLess(dist, 10.0)
 
+    def test_haversine_distances_matches_scalar(self):
+        """Batch leg distances should match the scalar function leg by leg."""
+        lats = [69.6496, 69.7000, 70.1000, 70.2500]
+        lons = [18.9560, 19.0000, 20.2000, 20.4500]
+        legs = haversine_distances(lats, lons)
+        self.assertEqual(len(legs), 4)
+        self.assertEqual(legs[0], 0.0)
+        for i in range(1, 4):
+            expected = haversine_distance(lats[i-1], lons[i-1], lats[i], lons[i])
+            self.assertAlmostEqual(legs[i], expected, places=2)
+
+    def test_haversine_distances_edge_cases(self):
+        """Empty and single-point inputs return zero legs; mismatched inputs are rejected."""
+        self.assertEqual(len(haversine_distances([], [])), 0)
+        self.assertEqual(list(haversine_distances([70.0], [20.0])), [0.0])
+        with self.assertRaises(ValueError):
+            haversine_distances([70.0, 71.0], [20.0])
+
+    def test_haversine_matrix_values(self):
+        """Pairwise matrix should be symmetric with a zero diagonal and match the scalar result."""
+        lats = [70.0, 70.1, 70.25]
+        lons = [20.0, 20.2, 20.45]
+        matrix = haversine_matrix(lats, lons)
+        self.assertEqual(matrix.shape, (3, 3))
+        np.testing.assert_allclose(matrix, matrix.T)
+        np.testing.assert_allclose(np.diag(matrix), 0.0, atol=1e-9)
+        self.assertAlmostEqual(matrix[0, 2], haversine_distance(70.0, 20.0, 70.25, 20.45), places=2)
+
+    def test_haversine_matrix_chunking(self):
+        """A tiny memory limit should split the work into chunks without changing the result."""
+        rng = np.random.default_rng(1)
+        lats1, lons1 = rng.uniform(65, 80, 50), rng.uniform(-30, 30, 50)
+        lats2, lons2 = rng.uniform(65, 80, 20), rng.uniform(-30, 30, 20)
+        chunks = list(haversine_matrix_chunks(lats1, lons1, lats2, lons2, max_bytes=2000))
+        self.assertGreater(len(chunks), 1)
+        full = haversine_matrix(lats1, lons1, lats2, lons2)
+        chunked = haversine_matrix(lats1, lons1, lats2, lons2, max_bytes=2000)
+        self.assertEqual(full.shape, (50, 20))
+        np.testing.assert_array_equal(full, chunked)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Unit tests for the virtualized list view in virtual_list.py
+"""
+
+import unittest
+import tkinter as tk
+from unittest.mock import patch
+from src.virtual_list import VirtualListbox
+
+
+class TestVirtualListbox(unittest.TestCase):
+    def setUp(self):
+        """A list over 10,000 rows with 8 visible, counting how often rows are formatted."""
+        self.root = tk.Tk()
+        self.root.withdraw()
+        self.rows = [f"row {i}" for i in range(10_000)]
+        self.formatted = []
+
+        def format_row(i):
+            self.formatted.append(i)
+            return self.rows[i]
+
+        self.view = VirtualListbox(self.root, row_count=lambda: len(self.rows), format_row=format_row, height=8)
+        self.view.refresh()
+
+    def tearDown(self):
+        self.root.destroy()
+
+    def visible(self):
+        return list(self.view.listbox.get(0, tk.END))
+
+    def test_only_visible_rows_are_rendered(self):
+        self.assertEqual(self.visible(), self.rows[:8])
+        self.assertEqual(len(self.formatted), 8)
+        self.assertEqual(self.view.size(), 10_000)
+        self.assertEqual(self.view.get(9_999), "row 9999")
+
+    def test_refresh_rewrites_only_changed_rows(self):
+        """An edit re-formats the visible window but touches only the slots whose text changed."""
+        self.rows[3] = "edited"
+        self.rows[5_000] = "off screen"
+        with patch.object(self.view.listbox, "insert", wraps=self.view.listbox.insert) as insert:
+            self.view.refresh()
+        insert.assert_called_once_with(3, "edited")
+        self.assertEqual(self.visible()[3], "edited")
+
+    def test_scrolling_moves_the_window(self):
+        self.view.yview("moveto", 0.5)
+        self.assertEqual(self.visible(), self.rows[5_000:5_008])
+        self.view.yview("scroll", 1, "pages")
+        self.assertEqual(self.view.top, 5_008)
+        self.view.yview("scroll", -3, "units")
+        self.assertEqual(self.view.top, 5_005)
+        self.assertEqual(self.view.yview(), (0.5005, 0.5013))
+        self.view.yview("moveto", 1.0)
+        self.assertEqual(self.visible(), self.rows[-8:])
+
+    def test_selection_survives_scrolling(self):
+        self.view.selection_set(2)
+        self.assertEqual(self.view.listbox.curselection(), (2,))
+        self.view.yview("moveto", 0.5)
+        self.assertEqual(self.view.curselection(), (2,))
+        self.assertEqual(self.view.listbox.curselection(), ())
+        self.view.yview("moveto", 0.0)
+        self.assertEqual(self.view.listbox.curselection(), (2,))
+        self.view.selection_clear(0, tk.END)
+        self.assertEqual(self.view.curselection(), ())
+
+    def test_see_scrolls_the_least_distance(self):
+        self.view.see(20)
+        self.assertEqual(self.view.top, 13)
+        self.view.see(15)
+        self.assertEqual(self.view.top, 13)
+        self.view.see(4)
+        self.assertEqual(self.view.top, 4)
+
+    def test_shrinking_clamps_scroll_and_selection(self):
+        self.view.yview("moveto", 1.0)
+        self.view.selection_set(9_999)
+        del self.rows[5:]
+        self.view.refresh()
+        self.assertEqual(self.view.top, 0)
+        self.assertEqual(self.visible(), self.rows)
+        self.assertEqual(self.view.curselection(), (4,))
+        del self.rows[:]
+        self.view.refresh()
+        self.assertEqual((self.visible(), self.view.curselection()), ([], ()))
+
+    def test_keyboard_moves_selection_into_view(self):
+        self.view.selection_set(7)
+        self.view._move_selection(1)
+        self.assertEqual((self.view.curselection(), self.view.top), ((8,), 1))
+        self.view._move_selection(-100)
+        self.assertEqual((self.view.curselection(), self.view.top), ((0,), 0))
+
+
+if __name__ == '__main__':
+    unittest.main()